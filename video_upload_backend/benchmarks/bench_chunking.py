@@ -0,0 +1,126 @@
+"""
+Compare ingest chunk strategies: fixed 64 KiB, fixed 1 MiB and adaptive.
+
+Each run simulates a number of concurrent clients delivering the body in
+network-sized pieces at a given rate (a fast LAN client and a slow mobile
+client by default), coalesces them with CoalescingWriter and writes them to
+temporary files through the upload I/O executor. Every strategy runs in its
+own subprocess so peak RSS is measured in isolation.
+
+Usage (from video_upload_backend/):
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --clients 16 --size-mb 64 --dir /mnt/disk
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.api.buffers import AdaptiveChunkSizer, CoalescingWriter, get_buffer_pool
+from src.api.io_executor import AsyncFile, get_io_executor, shutdown_io_executor
+
+STRATEGIES = {
+    "fixed-64k": (64 * 1024, 64 * 1024),
+    "fixed-1m": (1024 * 1024, 1024 * 1024),
+    "adaptive": (None, None),
+}
+# name -> (bytes per network read, bytes/second; 0 = as fast as possible)
+PROFILES = {
+    "lan": (64 * 1024, 0),
+    "mobile": (16 * 1024, 2 * 1024 * 1024),
+}
+
+
+async def _client(directory: str, strategy: str, piece: int, rate: int, size: int) -> int:
+    low, high = STRATEGIES[strategy]
+    sizer = AdaptiveChunkSizer() if low is None else AdaptiveChunkSizer(low, high, initial=low)
+    writes = 0
+    path = os.path.join(directory, os.urandom(8).hex() + ".part")
+    out = await AsyncFile.open(get_io_executor(), path, "wb")
+
+    async def flush(view) -> None:
+        nonlocal writes
+        writes += 1
+        await out.write(view)
+
+    writer = CoalescingWriter(flush, get_buffer_pool(), sizer)
+    payload = os.urandom(piece)
+    started = time.monotonic()
+    sent = 0
+    try:
+        while sent < size:
+            if rate:
+                # Pace like a bandwidth-limited client.
+                delay = started + sent / rate - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await writer.write(payload)
+            sent += piece
+        await writer.flush()
+    finally:
+        writer.close()
+        await out.close()
+        os.remove(path)
+    return writes
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    piece, rate = PROFILES[args.profile]
+    size = args.size_mb * 1024 * 1024
+    started = time.monotonic()
+    writes = await asyncio.gather(
+        *(_client(args.dir, args.strategy, piece, rate, size) for _ in range(args.clients))
+    )
+    elapsed = time.monotonic() - started
+    shutdown_io_executor()
+    return {
+        "strategy": args.strategy,
+        "profile": args.profile,
+        "clients": args.clients,
+        "seconds": round(elapsed, 3),
+        "mb_per_sec": round(args.clients * args.size_mb / elapsed, 1),
+        "disk_writes": sum(writes),
+        # ru_maxrss is KiB on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "pool": get_buffer_pool().stats(),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="directory to write to (disk or tmpfs)")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), help="run a single strategy in-process")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="run a single client profile in-process")
+    args = parser.parse_args(argv)
+
+    if args.strategy and args.profile:
+        print(json.dumps(asyncio.run(_run(args))))
+        return
+
+    print(f"{'profile':8} {'strategy':10} {'MB/s':>8} {'writes':>8} {'peak RSS MB':>12}")
+    for profile in args.profile and [args.profile] or PROFILES:
+        for strategy in args.strategy and [args.strategy] or STRATEGIES:
+            output = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.bench_chunking",
+                    "--clients", str(args.clients), "--size-mb", str(args.size_mb), "--dir", args.dir,
+                    "--strategy", strategy, "--profile", profile,
+                ],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output)
+            print(
+                f"{profile:8} {strategy:10} {result['mb_per_sec']:>8} "
+                f"{result['disk_writes']:>8} {result['peak_rss_mb']:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
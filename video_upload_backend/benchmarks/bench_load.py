@@ -0,0 +1,253 @@
+"""
+Load test of the upload API: concurrent multipart uploads against a local server.
+
+For every target directory (by default a disk-backed one under /var/tmp and a
+tmpfs one under /dev/shm) the benchmark starts `python -m src.api` with
+UPLOAD_DIR pointing there, then, for every file size, sends --requests
+uploads with --concurrency of them in flight. Comparing the disk and tmpfs
+rows separates what the network/HTTP path costs from what the disk costs.
+
+Reported per run: throughput (MB/s and requests/s), latency percentiles,
+status codes, server CPU (all worker processes, % of one core) and peak
+RSS, and client CPU. Results are saved under benchmarks/results/ with the
+environment; pass --compare <file> to print the change against an earlier run.
+
+Each multipart body is built once per size and reused, so client-side
+generation does not distort the numbers. Post-processing jobs are disabled
+and the per-client upload limits lifted on the spawned server, since every
+request comes from one client; other settings come from the environment.
+
+Usage (from video_upload_backend/):
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --sizes 1,64 --concurrency 32 --requests 200 --workers 4
+    python -m benchmarks.bench_load --target nvme=/mnt/nvme/bench --compare benchmarks/results/load-....json
+    python -m benchmarks.bench_load --url http://10.0.0.5:8000     # an already running instance
+"""
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import ProcessSampler, compare, filesystem_type, latency_summary, save_results
+
+BOUNDARY = "benchmarkboundary7f3a"
+# Settings of the spawned server unless already set in the environment.
+SERVER_DEFAULTS = {
+    "JOBS_ENABLED": "false",
+    "UPLOAD_MAX_CONCURRENT": "0",
+    "UPLOAD_MAX_PER_CLIENT": "0",
+}
+
+
+def default_targets() -> List[Tuple[str, str]]:
+    """A disk-backed and, when available, a tmpfs base directory."""
+    targets = [("disk", "/var/tmp" if os.path.isdir("/var/tmp") else tempfile.gettempdir())]
+    if os.path.isdir("/dev/shm"):
+        targets.append(("tmpfs", "/dev/shm"))
+    return targets
+
+
+def multipart_body(size: int) -> bytes:
+    """A multipart/form-data body with one 'file' field of size random bytes."""
+    head = (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bench.mp4\"\r\n"
+        "Content-Type: video/mp4\r\n\r\n"
+    ).encode("latin-1")
+    return head + os.urandom(size) + f"\r\n--{BOUNDARY}--\r\n".encode("latin-1")
+
+
+class Server:
+    """`python -m src.api` on a private upload directory."""
+
+    def __init__(self, base_dir: str, port: int, workers: int) -> None:
+        self.upload_dir = tempfile.mkdtemp(prefix="bench-upload-", dir=base_dir)
+        self.url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, UPLOAD_DIR=self.upload_dir)
+        for name, value in SERVER_DEFAULTS.items():
+            env.setdefault(name, value)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "src.api", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+    async def wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"Server exited: {self.process.stderr.read().decode(errors='replace')}")
+                try:
+                    if (await client.get(self.url + "/")).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        raise RuntimeError("Server did not become ready.")
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+
+async def _sample_forever(sampler: ProcessSampler, interval: float = 0.2) -> None:
+    while True:
+        sampler.sample()
+        await asyncio.sleep(interval)
+
+
+async def run_load(
+    url: str, endpoint: str, body: bytes, requests: int, concurrency: int, sampler: Optional[ProcessSampler]
+) -> dict:
+    """Send requests uploads of body, concurrency at a time; return throughput, latency and resource use."""
+    latencies: List[float] = []
+    codes: Counter = Counter()
+    errors: Counter = Counter()
+    pending = iter(range(requests))
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(600.0)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        async def worker() -> None:
+            for _ in pending:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(endpoint, content=body, headers=headers)
+                    codes[response.status_code] += 1
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError as exc:
+                    errors[type(exc).__name__] += 1
+
+        sampling = asyncio.create_task(_sample_forever(sampler)) if sampler else None
+        client_cpu = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        after = resource.getrusage(resource.RUSAGE_SELF)
+        if sampling:
+            sampling.cancel()
+
+    ok = codes.get(200, 0)
+    result = {
+        "requests": requests,
+        "ok": ok,
+        "status_codes": {str(code): count for code, count in sorted(codes.items())},
+        "transport_errors": dict(errors),
+        "seconds": round(elapsed, 3),
+        "mb_per_sec": round(ok * len(body) / elapsed / (1024 * 1024), 1),
+        "req_per_sec": round(ok / elapsed, 1),
+        **latency_summary(latencies),
+        "client_cpu_seconds": round(
+            (after.ru_utime - client_cpu.ru_utime) + (after.ru_stime - client_cpu.ru_stime), 3
+        ),
+    }
+    if sampler:
+        result.update({f"server_{key}": value for key, value in sampler.summary(elapsed).items()})
+    return result
+
+
+def _print_row(result: dict) -> None:
+    print(
+        f"{result['target']:8} {result['fs'] or '?':7} {result['size_mb']:>8} {result['concurrency']:>5} "
+        f"{result['mb_per_sec']:>8} {result['req_per_sec']:>8} {result['p50_ms'] or '-':>9} "
+        f"{result['p99_ms'] or '-':>9} {result.get('server_cpu_percent', '-'):>8} "
+        f"{result.get('server_peak_rss_mb', '-'):>8} {result['ok']:>5}/{result['requests']}"
+    )
+
+
+async def _main(args: argparse.Namespace) -> List[dict]:
+    sizes = [float(s) for s in args.sizes.split(",")]
+    bodies: Dict[float, bytes] = {size: multipart_body(int(size * 1024 * 1024)) for size in sizes}
+    targets = [(None, args.url)] if args.url else (
+        [tuple(t.split("=", 1)) for t in args.target] if args.target else default_targets()
+    )
+    results = []
+    print(
+        f"{'target':8} {'fs':7} {'size MB':>8} {'conc':>5} {'MB/s':>8} {'req/s':>8} "
+        f"{'p50 ms':>9} {'p99 ms':>9} {'srv CPU%':>8} {'RSS MB':>8} {'ok':>5}"
+    )
+    for label, location in targets:
+        server = None
+        if args.url:
+            url, fs = args.url, None
+            label = "remote"
+        else:
+            os.makedirs(location, exist_ok=True)
+            server = Server(location, args.port, args.workers)
+            url, fs = server.url, filesystem_type(location)
+        try:
+            if server:
+                await server.wait_ready()
+            sampler_pid = server.process.pid if server else None
+            for size in sizes:
+                if args.warmup:
+                    warmup = min(args.warmup, args.requests)
+                    await run_load(url, args.endpoint, bodies[size], warmup, args.concurrency, None)
+                sampler = ProcessSampler(sampler_pid) if sampler_pid else None
+                result = {
+                    "target": label,
+                    "fs": fs,
+                    "endpoint": args.endpoint,
+                    "size_mb": size,
+                    "concurrency": args.concurrency,
+                    "workers": args.workers if server else None,
+                    **await run_load(url, args.endpoint, bodies[size], args.requests, args.concurrency, sampler),
+                }
+                results.append(result)
+                _print_row(result)
+        finally:
+            if server:
+                server.stop()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,16,64", help="comma-separated file sizes in MiB")
+    parser.add_argument("--concurrency", type=int, default=16, help="uploads in flight at once")
+    parser.add_argument("--requests", type=int, default=64, help="uploads per size")
+    parser.add_argument("--warmup", type=int, default=4, help="uploads per size sent before measuring")
+    parser.add_argument("--endpoint", default="/upload/stream", choices=["/upload", "/upload/stream"])
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--target", action="append", metavar="LABEL=DIR",
+        help="base directory for UPLOAD_DIR (repeatable); default: disk=/var/tmp and tmpfs=/dev/shm",
+    )
+    parser.add_argument("--url", help="benchmark a running instance instead of spawning servers")
+    parser.add_argument("--results-dir", help="where to save the result file (default benchmarks/results)")
+    parser.add_argument("--no-save", action="store_true", help="do not save a result file")
+    parser.add_argument("--compare", metavar="FILE", help="earlier result file to compare with")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(_main(args))
+    if not args.no_save:
+        config = {key: value for key, value in vars(args).items() if key not in {"compare", "no_save", "results_dir"}}
+        kwargs = {"results_dir": args.results_dir} if args.results_dir else {}
+        print(f"\nSaved {save_results('load', config, results, **kwargs)}")
+    if args.compare:
+        compare(
+            args.compare, results, ("target", "endpoint", "size_mb", "concurrency"),
+            ("mb_per_sec", "req_per_sec", "p50_ms", "p99_ms", "server_cpu_seconds", "server_peak_rss_mb"),
+        )
+
+
+if __name__ == "__main__":
+    main()
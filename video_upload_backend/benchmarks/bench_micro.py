@@ -0,0 +1,193 @@
+"""
+Microbenchmarks of the upload hot path: _safe_destination_filename and _enforce_file_size.
+
+_safe_destination_filename is called once per upload; it is timed in a tight
+loop. _enforce_file_size is the copy loop of POST /upload (read a chunk from
+the spooled request body, write it to the storage writer); it is timed on an
+UploadFile over a temporary file already holding the data, writing into a
+fresh writer that is aborted afterwards, so only the copy is measured, not
+the network or the commit.
+
+Run it once with --dir on a disk-backed directory and once on tmpfs (the
+default runs both when /dev/shm exists) to see how much of the copy is disk.
+Results are saved under benchmarks/results/; --compare <file> prints the
+change against an earlier run.
+
+Usage (from video_upload_backend/):
+    python -m benchmarks.bench_micro
+    python -m benchmarks.bench_micro --sizes 1,64 --iterations 50 --dir /mnt/disk
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+from benchmarks.common import compare, filesystem_type, latency_summary, save_results
+
+
+def _run_target(args: argparse.Namespace, label: str, base_dir: str) -> List[dict]:
+    """Benchmark against one UPLOAD_DIR; src.api.main reads it at import, so each target is a subprocess."""
+    upload_dir = tempfile.mkdtemp(prefix="bench-micro-", dir=base_dir)
+    try:
+        env = dict(os.environ, UPLOAD_DIR=upload_dir, JOBS_ENABLED="false")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_micro", "--child", "--sizes", args.sizes,
+             "--iterations", str(args.iterations), "--filename-iterations", str(args.filename_iterations)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    fs = filesystem_type(base_dir)
+    return [{"target": label, "fs": fs, **result} for result in json.loads(output)]
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bench_filename(iterations: int) -> dict:
+    from src.api.main import _safe_destination_filename
+
+    names = ["video.mp4", "Holiday Clip.MOV", "no_extension", "archive.tar.gz"]
+    timings = []
+    cpu = _cpu_seconds()
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        _safe_destination_filename(names[i % len(names)])
+        timings.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    return {
+        "function": "_safe_destination_filename",
+        "size_mb": None,
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed),
+        # Per-call latencies in microseconds: scaled so latency_summary's milliseconds read as microseconds.
+        **{key.replace("_ms", "_us"): value for key, value in latency_summary([t * 1000 for t in timings]).items()},
+        "cpu_seconds": round(_cpu_seconds() - cpu, 3),
+    }
+
+
+async def bench_enforce(size_mb: float, iterations: int) -> dict:
+    from starlette.datastructures import UploadFile
+
+    from src.api.main import _abort_writer, _enforce_file_size, _open_writer
+
+    size = int(size_mb * 1024 * 1024)
+    source = tempfile.TemporaryFile()
+    block = os.urandom(min(size, 1024 * 1024) or 1)
+    written = 0
+    while written < size:
+        written += source.write(block[: size - written])
+    timings = []
+    cpu = _cpu_seconds()
+    try:
+        for _ in range(iterations):
+            source.seek(0)
+            upload = UploadFile(source, size=size, filename="bench.mp4")
+            writer = await _open_writer("bench.mp4", "video/mp4")
+            started = time.perf_counter()
+            total = await _enforce_file_size(upload, writer)
+            timings.append(time.perf_counter() - started)
+            await _abort_writer(writer)
+            assert total == size
+    finally:
+        source.close()
+    seconds = sum(timings)
+    return {
+        "function": "_enforce_file_size",
+        "size_mb": size_mb,
+        "iterations": iterations,
+        "mb_per_sec": round(size_mb * iterations / seconds, 1) if seconds else None,
+        **latency_summary(timings),
+        "cpu_seconds": round(_cpu_seconds() - cpu, 3),
+    }
+
+
+def _child(args: argparse.Namespace) -> None:
+    from src.api.io_executor import shutdown_io_executor
+
+    results = [bench_filename(args.filename_iterations)]
+
+    async def run() -> None:
+        try:
+            for size in (float(s) for s in args.sizes.split(",")):
+                results.append(await bench_enforce(size, args.iterations))
+        finally:
+            shutdown_io_executor()
+
+    asyncio.run(run())
+    for result in results:
+        result["peak_rss_mb"] = _peak_rss_mb()
+    json.dump(results, sys.stdout)
+
+
+def default_targets() -> List[Tuple[str, str]]:
+    targets = [("disk", "/var/tmp" if os.path.isdir("/var/tmp") else tempfile.gettempdir())]
+    if os.path.isdir("/dev/shm"):
+        targets.append(("tmpfs", "/dev/shm"))
+    return targets
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="0.0625,1,16", help="comma-separated file sizes in MiB")
+    parser.add_argument("--iterations", type=int, default=20, help="copies per size")
+    parser.add_argument("--filename-iterations", type=int, default=100000)
+    parser.add_argument("--dir", action="append", metavar="[LABEL=]DIR",
+                        help="base directory for UPLOAD_DIR (repeatable); default: /var/tmp and /dev/shm")
+    parser.add_argument("--results-dir", help="where to save the result file (default benchmarks/results)")
+    parser.add_argument("--no-save", action="store_true", help="do not save a result file")
+    parser.add_argument("--compare", metavar="FILE", help="earlier result file to compare with")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args)
+        return
+
+    if args.dir:
+        targets = [tuple(d.split("=", 1)) if "=" in d else (d, d) for d in args.dir]
+    else:
+        targets = default_targets()
+    results = []
+    print(f"{'target':8} {'fs':7} {'function':28} {'size MB':>8} {'rate':>12} {'p50':>11} {'p99':>11} {'RSS MB':>7}")
+    for label, base_dir in targets:
+        for r in _run_target(args, label, base_dir):
+            results.append(r)
+            if r["size_mb"] is None:
+                rate, p50, p99 = f"{r['ops_per_sec']}/s", f"{r['p50_us']} us", f"{r['p99_us']} us"
+            else:
+                rate, p50, p99 = f"{r['mb_per_sec']} MB/s", f"{r['p50_ms']} ms", f"{r['p99_ms']} ms"
+            print(
+                f"{label:8} {r['fs'] or '?':7} {r['function']:28} {r['size_mb'] or '-':>8} {rate:>12} "
+                f"{p50:>11} {p99:>11} {r['peak_rss_mb']:>7}"
+            )
+
+    if not args.no_save:
+        skip = {"compare", "no_save", "results_dir", "child"}
+        config = {key: value for key, value in vars(args).items() if key not in skip}
+        kwargs = {"results_dir": args.results_dir} if args.results_dir else {}
+        print(f"\nSaved {save_results('micro', config, results, **kwargs)}")
+    if args.compare:
+        compare(
+            args.compare, results, ("target", "function", "size_mb"),
+            ("ops_per_sec", "mb_per_sec", "p50_ms", "p99_ms", "p50_us", "p99_us", "peak_rss_mb"),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Shared helpers of the benchmarks: percentiles, process CPU/RSS sampling and
+result files.
+
+Results are JSON files under benchmarks/results/ (or --results-dir), named
+after the benchmark and the time of the run. Each holds the environment
+(Python, FastAPI/Starlette/uvicorn versions, git revision, relevant settings)
+next to the numbers, so a later run can be compared with --compare against
+the file of an earlier one.
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from importlib.metadata import version
+from typing import Dict, Iterable, List, Optional, Sequence
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Environment variables recorded with every result.
+RECORDED_SETTINGS = (
+    "UPLOAD_IO_BACKEND", "UPLOAD_IO_WORKERS", "UPLOAD_IO_QUEUE_SIZE", "UPLOAD_DURABILITY", "STORAGE_BACKEND",
+    "UPLOAD_MAX_CONCURRENT", "UPLOAD_CHUNK_MIN_BYTES", "UPLOAD_CHUNK_MAX_BYTES", "CONTENT_DEDUP_ENABLED",
+)
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, Optional[float]]:
+    """p50/p90/p99/max of latencies, in milliseconds."""
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000.0, 3)
+
+    return {
+        "p50_ms": ms(percentile(seconds, 50)),
+        "p90_ms": ms(percentile(seconds, 90)),
+        "p99_ms": ms(percentile(seconds, 99)),
+        "max_ms": ms(max(seconds) if seconds else None),
+    }
+
+
+def _process_tree(root_pid: int) -> List[int]:
+    """root_pid and all its descendants (Linux /proc)."""
+    children: Dict[int, List[int]] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (FileNotFoundError, ProcessLookupError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(name))
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, ()))
+    return tree
+
+
+class ProcessSampler:
+    """CPU seconds and RSS of a process and its children (e.g. uvicorn workers), from /proc."""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.peak_rss = 0
+        self._cpu_start = self.cpu_seconds()
+
+    def cpu_seconds(self) -> float:
+        total = 0
+        for pid in _process_tree(self.pid):
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except FileNotFoundError:
+                continue
+            # utime and stime are fields 14 and 15 of /proc/<pid>/stat.
+            total += int(fields[11]) + int(fields[12])
+        return total / _CLOCK_TICKS
+
+    def rss_bytes(self) -> int:
+        total = 0
+        for pid in _process_tree(self.pid):
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * _PAGE_SIZE
+            except FileNotFoundError:
+                continue
+        return total
+
+    def sample(self) -> None:
+        """Record the current RSS; call periodically during the run."""
+        self.peak_rss = max(self.peak_rss, self.rss_bytes())
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        """CPU used since construction (seconds and % of one core) and peak RSS."""
+        cpu = self.cpu_seconds() - self._cpu_start
+        self.sample()
+        return {
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent": round(100.0 * cpu / elapsed, 1) if elapsed > 0 else None,
+            "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1),
+        }
+
+
+def _version(module: str) -> Optional[str]:
+    try:
+        return version(module)
+    except Exception:
+        return None
+
+
+def environment() -> Dict[str, object]:
+    """What a result depends on besides the code under test."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "git_revision": revision,
+        "versions": {name: _version(name) for name in ("fastapi", "starlette", "uvicorn", "uvloop", "httptools")},
+        "settings": {name: os.environ[name] for name in RECORDED_SETTINGS if name in os.environ},
+    }
+
+
+def filesystem_type(path: str) -> Optional[str]:
+    """Filesystem type of the mount holding path (e.g. 'tmpfs', 'ext4'), from /proc/mounts."""
+    path = os.path.realpath(path)
+    best, best_type = "", None
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                _, mount_point, fs_type = line.split()[:3]
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > len(best):
+                    best, best_type = mount_point, fs_type
+    except FileNotFoundError:
+        return None
+    return best_type
+
+
+def save_results(benchmark: str, config: dict, results: List[dict], results_dir: str = RESULTS_DIR) -> str:
+    """Write a result file and return its path."""
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{benchmark}-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(
+            {"benchmark": benchmark, "created_at": time.time(), "environment": environment(), "config": config,
+             "results": results},
+            f,
+            indent=2,
+        )
+    return path
+
+
+def compare(baseline_path: str, results: Iterable[dict], key_fields: Sequence[str], metrics: Sequence[str]) -> None:
+    """Print each metric of results next to the matching baseline entry and the relative change."""
+    with open(baseline_path) as f:
+        baseline = {tuple(r.get(k) for k in key_fields): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        key = tuple(result.get(k) for k in key_fields)
+        before = baseline.get(key)
+        label = " ".join(str(k) for k in key)
+        if before is None:
+            print(f"  {label}: no baseline entry")
+            continue
+        changes = []
+        for metric in metrics:
+            old, new = before.get(metric), result.get(metric)
+            if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+                changes.append(f"{metric} {old} -> {new} ({100.0 * (new - old) / old:+.1f}%)")
+        print(f"  {label}: " + ", ".join(changes))
@@ -1,5 +1,174 @@
+import argparse
+import importlib.util
+import os
+
 import uvicorn
 
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m src.api", description="Run the Video Upload Backend.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"), help="Bind address (env HOST).")
+    parser.add_argument("--port", type=int, default=_env_int("PORT", 8000), help="Bind port (env PORT).")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        default=os.getenv("SERVER_MODE", "").lower() == "production",
+        help="Accepted for compatibility: workers already default to one per CPU (env SERVER_MODE=production).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=_env_int("WEB_CONCURRENCY", 0),
+        help=(
+            "Number of worker processes (env WEB_CONCURRENCY). Defaults to the CPU count; "
+            "limits marked 'per worker' in the README then apply to each of them."
+        ),
+    )
+    parser.add_argument(
+        "--loop",
+        choices=["auto", "asyncio", "uvloop"],
+        default=os.getenv("SERVER_LOOP", "auto"),
+        help="Event loop implementation (env SERVER_LOOP). 'auto' prefers uvloop when installed.",
+    )
+    parser.add_argument(
+        "--http",
+        choices=["auto", "h11", "httptools"],
+        default=os.getenv("SERVER_HTTP", "auto"),
+        help="HTTP/1.1 parser of uvicorn (env SERVER_HTTP). 'auto' prefers httptools when installed.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["uvicorn", "hypercorn"],
+        default=os.getenv("SERVER_BACKEND", "uvicorn"),
+        help=(
+            "ASGI server (env SERVER_BACKEND): uvicorn (HTTP/1.1) or hypercorn (HTTP/1.1 and HTTP/2; "
+            "needs the 'hypercorn' package)."
+        ),
+    )
+    parser.add_argument(
+        "--keep-alive",
+        type=int,
+        default=_env_int("SERVER_KEEPALIVE_SECONDS", 75),
+        help=(
+            "Seconds an idle keep-alive connection stays open (env SERVER_KEEPALIVE_SECONDS). Keep it above the "
+            "idle timeout of client connection pools so reused connections are not closed under them."
+        ),
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=_env_int("SERVER_BACKLOG", 2048),
+        help="Pending connections the listening socket queues (env SERVER_BACKLOG).",
+    )
+    parser.add_argument(
+        "--ssl-certfile",
+        default=os.getenv("SERVER_SSL_CERTFILE") or None,
+        help="TLS certificate file (env SERVER_SSL_CERTFILE). With hypercorn, TLS clients negotiate HTTP/2 via ALPN.",
+    )
+    parser.add_argument(
+        "--ssl-keyfile",
+        default=os.getenv("SERVER_SSL_KEYFILE") or None,
+        help="TLS private key file (env SERVER_SSL_KEYFILE).",
+    )
+    parser.add_argument(
+        "--h2-max-streams",
+        type=int,
+        default=_env_int("SERVER_H2_MAX_STREAMS", 100),
+        help="Concurrent HTTP/2 streams (uploads) per connection, hypercorn only (env SERVER_H2_MAX_STREAMS).",
+    )
+    parser.add_argument(
+        "--h2-stream-window",
+        type=int,
+        default=_env_int("SERVER_H2_STREAM_WINDOW_BYTES", 8 * 1024 * 1024),
+        help="HTTP/2 receive window per stream in bytes, hypercorn only (env SERVER_H2_STREAM_WINDOW_BYTES).",
+    )
+    parser.add_argument(
+        "--h2-connection-window",
+        type=int,
+        default=_env_int("SERVER_H2_CONNECTION_WINDOW_BYTES", 32 * 1024 * 1024),
+        help="HTTP/2 receive window per connection in bytes, hypercorn only (env SERVER_H2_CONNECTION_WINDOW_BYTES).",
+    )
+    parser.add_argument(
+        "--h2-max-frame-size",
+        type=int,
+        default=_env_int("SERVER_H2_MAX_FRAME_BYTES", 256 * 1024),
+        help=(
+            "Largest HTTP/2 DATA frame accepted, 16384-16777215 bytes; larger frames cut per-frame overhead of "
+            "uploads. hypercorn only (env SERVER_H2_MAX_FRAME_BYTES)."
+        ),
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=_env_int("SERVER_GRACEFUL_TIMEOUT", 300),
+        help=(
+            "Seconds to let in-flight uploads finish after SIGTERM/SIGINT before they are cancelled "
+            "(env SERVER_GRACEFUL_TIMEOUT)."
+        ),
+    )
+    return parser.parse_args(argv)
+
+
+def _run_hypercorn(args: argparse.Namespace, workers: int) -> None:
+    """Serve the API with hypercorn (HTTP/1.1 and HTTP/2) in workers processes."""
+    # Checked before any worker starts, so a missing package is one clear error rather than a crash per worker.
+    missing = [name for name in ("hypercorn", "h2") if importlib.util.find_spec(name) is None]
+    if missing:
+        raise SystemExit(
+            f"--backend hypercorn requires {' and '.join(missing)}: pip install -r requirements-http2.txt"
+        )
+    from hypercorn.config import Config
+    from hypercorn.run import run
+    # Worker processes read the window sizes from the environment when they import src.api.http2.
+    os.environ["SERVER_H2_STREAM_WINDOW_BYTES"] = str(args.h2_stream_window)
+    os.environ["SERVER_H2_CONNECTION_WINDOW_BYTES"] = str(args.h2_connection_window)
+    config = Config()
+    config.application_path = "src.api.http2:app"
+    config.bind = [f"[{args.host}]:{args.port}" if ":" in args.host else f"{args.host}:{args.port}"]
+    config.workers = workers
+    use_uvloop = args.loop == "uvloop" or (args.loop == "auto" and importlib.util.find_spec("uvloop") is not None)
+    config.worker_class = "uvloop" if use_uvloop else "asyncio"
+    config.keep_alive_timeout = args.keep_alive
+    config.backlog = args.backlog
+    config.graceful_timeout = args.graceful_timeout
+    config.h2_max_concurrent_streams = args.h2_max_streams
+    config.h2_max_inbound_frame_size = min(max(args.h2_max_frame_size, 2 ** 14), 2 ** 24 - 1)
+    config.certfile = args.ssl_certfile
+    config.keyfile = args.ssl_keyfile
+    run(config)
+
+
+# PUBLIC_INTERFACE
+def main(argv=None) -> None:
+    """Run the API with uvicorn or hypercorn, optionally as several worker processes."""
+    args = _parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+    if args.backend == "hypercorn":
+        _run_hypercorn(args, workers)
+        return
+    uvicorn.run(
+        "src.api.main:app",
+        host=args.host,
+        port=args.port,
+        reload=False,
+        workers=workers,
+        loop=args.loop,
+        http=args.http,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        ssl_certfile=args.ssl_certfile,
+        ssl_keyfile=args.ssl_keyfile,
+        # On shutdown uvicorn stops accepting connections and waits this long for
+        # in-flight requests (uploads) to complete before cancelling them.
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+
 # Entrypoint to run: python -m src.api
 if __name__ == "__main__":
-    uvicorn.run("src.api.main:app", host="0.0.0.0", port=8000, reload=False)
+    main()
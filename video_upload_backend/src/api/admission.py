@@ -0,0 +1,186 @@
+"""
+Request admission checks that run before the application touches the body.
+
+RequestSizeLimitMiddleware rejects requests whose declared Content-Length
+exceeds the limit for their route with 413, without reading a single body
+byte. Because the body is never received, servers that implement
+'Expect: 100-continue' (uvicorn does, on the first receive) never send the
+interim 100 response, so a well-behaved client does not transmit the body at
+all. Chunked bodies (no Content-Length) are counted as they are received and
+cut off with 413 as soon as they pass the limit, which also protects routes
+whose framework parsing would otherwise spool the entire body first.
+
+DiskSpaceAdmissionMiddleware reserves the projected size of an upload (its
+Content-Length, or the route's cap for chunked bodies) against free disk space
+in the same way, answering 507 before the body is read. The reservation is
+left in the request state for the endpoint and released when it returns.
+"""
+import re
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.disk_space import InsufficientStorageError
+
+
+class RequestBodyTooLarge(Exception):
+    """
+    Raised from the wrapped receive channel when a streamed body passes its limit.
+    The middleware answers 413 whatever the endpoint does with it; endpoints that map
+    receive errors to responses should recognize it so it is not counted as a failure.
+    """
+
+
+def declared_length(scope: Scope) -> Optional[int]:
+    """Return the Content-Length of a request, or None for chunked or invalid values."""
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            return int(value) if value.isdigit() else None
+    return None
+
+
+class RequestSizeLimitMiddleware:
+    """ASGI middleware enforcing per-route request body size limits."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Iterable[Tuple[str, str, int]] = (),
+        default_limit: Optional[int] = None,
+    ) -> None:
+        """
+        Parameters:
+        - limits: (method, path regex, max body bytes) rules; the first match wins.
+        - default_limit: limit for requests matching no rule (None = unlimited).
+        """
+        self.app = app
+        self.rules: List[Tuple[str, Pattern[str], int]] = [
+            (method.upper(), re.compile(pattern), limit) for method, pattern, limit in limits
+        ]
+        self.default_limit = default_limit
+        self.rejected_early = 0
+        self.rejected_streaming = 0
+
+    def limit_for(self, method: str, path: str) -> Optional[int]:
+        """Return the body size limit for a request, or None if unlimited."""
+        for rule_method, pattern, limit in self.rules:
+            if rule_method == method and pattern.match(path):
+                return limit
+        return self.default_limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limit_for(scope["method"], scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = declared_length(scope)
+        if declared is not None:
+            if declared > limit:
+                # Respond before calling receive(): the body (and any 100 Continue) is never requested.
+                self.rejected_early += 1
+                await self._reject(scope, receive, send, limit)
+                return
+            # The server enforces Content-Length framing, so the body cannot exceed it.
+            await self.app(scope, receive, send)
+            return
+
+        await self._call_with_counted_body(scope, receive, send, limit)
+
+    async def _call_with_counted_body(self, scope: Scope, receive: Receive, send: Send, limit: int) -> None:
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def counting_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise RequestBodyTooLarge(f"Request body too large. Max allowed size is {limit} bytes.")
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            if exceeded:
+                # Whatever the application answers after the cut-off (typically a
+                # generic parse error), the client gets the 413 instead.
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, guarded_send)
+        except RequestBodyTooLarge:
+            pass
+        if exceeded and not response_started:
+            self.rejected_streaming += 1
+            await self._reject(scope, receive, send, limit)
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, limit: int) -> None:
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body too large. Max allowed size is {limit} bytes."},
+            # Unread body bytes make the connection unusable for further requests.
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
+
+
+class DiskSpaceAdmissionMiddleware:
+    """ASGI middleware reserving free disk space for upload bodies before they are read."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        reserve: Callable[[int], Awaitable[Any]],
+        routes: Iterable[Tuple[str, str, int]] = (),
+    ) -> None:
+        """
+        Parameters:
+        - reserve: async callable taking the projected bytes and returning a reservation with
+          release(), or raising InsufficientStorageError.
+        - routes: (method, path regex, max body bytes) of uploads to admit; the cap is the
+          projection for bodies without Content-Length.
+        """
+        self.app = app
+        self.reserve = reserve
+        self.rules: List[Tuple[str, Pattern[str], int]] = [
+            (method.upper(), re.compile(pattern), limit) for method, pattern, limit in routes
+        ]
+        self.rejected = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cap = None
+        for method, pattern, limit in self.rules:
+            if method == scope["method"] and pattern.match(scope["path"]):
+                cap = limit
+                break
+        if cap is None:
+            await self.app(scope, receive, send)
+            return
+        declared = declared_length(scope)
+        try:
+            reservation = await self.reserve(min(declared if declared is not None else cap, cap))
+        except InsufficientStorageError as exc:
+            # As for 413: answer before calling receive(), so the body is never requested.
+            self.rejected += 1
+            response = JSONResponse(status_code=507, content={"detail": str(exc)}, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+        scope.setdefault("state", {})["disk_reservation"] = reservation
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reservation.release()
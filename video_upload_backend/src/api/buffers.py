@@ -0,0 +1,234 @@
+"""
+Chunk sizing and buffer reuse for the ingest loops.
+
+AdaptiveChunkSizer picks a per-connection chunk size from the throughput
+observed so far: enough bytes for roughly UPLOAD_CHUNK_TARGET_SECONDS of
+traffic, rounded to a power of two and clamped to [UPLOAD_CHUNK_MIN_BYTES,
+UPLOAD_CHUNK_MAX_BYTES]. Fast LAN clients get large chunks (few syscalls and
+executor hand-offs per byte); slow mobile clients get small ones (little
+memory held per idle connection).
+
+Network reads arrive in whatever pieces the server hands out (typically
+<= 64 KiB), so CoalescingWriter gathers them into one pooled buffer of the
+current chunk size and flushes it with a single disk write. Buffers come from
+a BufferPool and are returned to it when the upload ends, so steady-state
+ingest does not allocate per chunk.
+
+Paths that read from a file (spooled form uploads, digesting stored files)
+use readinto() on a pooled buffer instead of read(), which would allocate a
+new bytes object per chunk; see iter_readinto. Their rate is the local disk's,
+not a client's, so they use fixed large chunks rather than AdaptiveChunkSizer.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional
+
+UPLOAD_CHUNK_MIN_BYTES = int(os.getenv("UPLOAD_CHUNK_MIN_BYTES", str(64 * 1024)))
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv("UPLOAD_CHUNK_MAX_BYTES", str(2 * 1024 * 1024)))
+# Amount of traffic (in seconds at the observed rate) each chunk should hold.
+UPLOAD_CHUNK_TARGET_SECONDS = float(os.getenv("UPLOAD_CHUNK_TARGET_SECONDS", "0.05"))
+# Upper bound on idle buffer memory kept for reuse, per worker.
+BUFFER_POOL_MAX_BYTES = int(os.getenv("BUFFER_POOL_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_INITIAL_CHUNK_BYTES = 1024 * 1024
+# Weight of the newest throughput sample in the moving average.
+_EWMA_ALPHA = 0.3
+
+
+def _round_pow2(value: float, low: int, high: int) -> int:
+    size = low
+    while size < value and size < high:
+        size <<= 1
+    return min(size, high)
+
+
+class AdaptiveChunkSizer:
+    """Per-connection chunk size derived from an exponentially weighted throughput estimate."""
+
+    __slots__ = ("min_size", "max_size", "target_seconds", "size", "throughput")
+
+    def __init__(
+        self,
+        min_size: int = UPLOAD_CHUNK_MIN_BYTES,
+        max_size: int = UPLOAD_CHUNK_MAX_BYTES,
+        target_seconds: float = UPLOAD_CHUNK_TARGET_SECONDS,
+        initial: int = _INITIAL_CHUNK_BYTES,
+    ) -> None:
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.target_seconds = target_seconds
+        self.size = _round_pow2(initial, self.min_size, self.max_size)
+        self.throughput: Optional[float] = None
+
+    def record(self, nbytes: int, seconds: float) -> int:
+        """Feed one observation (bytes moved in seconds) and return the next chunk size."""
+        if nbytes <= 0 or seconds <= 0:
+            return self.size
+        sample = nbytes / seconds
+        if self.throughput is None:
+            self.throughput = sample
+        else:
+            self.throughput += _EWMA_ALPHA * (sample - self.throughput)
+        self.size = _round_pow2(self.throughput * self.target_seconds, self.min_size, self.max_size)
+        return self.size
+
+
+class BufferPool:
+    """
+    Reusable bytearrays in power-of-two size classes, with a cap on idle memory.
+    Safe to use from the event loop and from I/O threads.
+    """
+
+    def __init__(self, max_idle_bytes: int = BUFFER_POOL_MAX_BYTES) -> None:
+        self.max_idle_bytes = max_idle_bytes
+        self._free: Dict[int, List[bytearray]] = {}
+        self._lock = threading.Lock()
+        self.idle_bytes = 0
+        self.in_use = 0
+        self.in_use_bytes = 0
+        self.peak_in_use_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def acquire(self, size: int) -> bytearray:
+        """Return a buffer of at least size bytes (exactly a power of two >= size)."""
+        size_class = _round_pow2(size, 4096, 1 << 40)
+        with self._lock:
+            self.in_use += 1
+            self.in_use_bytes += size_class
+            self.peak_in_use_bytes = max(self.peak_in_use_bytes, self.in_use_bytes)
+            free = self._free.get(size_class)
+            if free:
+                self.hits += 1
+                self.idle_bytes -= size_class
+                return free.pop()
+            self.misses += 1
+        return bytearray(size_class)
+
+    def release(self, buf: bytearray) -> None:
+        """Give a buffer back; it is dropped if keeping it would exceed the idle cap."""
+        size_class = len(buf)
+        with self._lock:
+            self.in_use -= 1
+            self.in_use_bytes -= size_class
+            if self.idle_bytes + size_class > self.max_idle_bytes:
+                self.dropped += 1
+                return
+            self._free.setdefault(size_class, []).append(buf)
+            self.idle_bytes += size_class
+
+    @contextmanager
+    def lease(self, size: int) -> Iterator[bytearray]:
+        """Borrow a buffer for the duration of a with block."""
+        buf = self.acquire(size)
+        try:
+            yield buf
+        finally:
+            self.release(buf)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool occupancy and hit/miss counters."""
+        with self._lock:
+            return {
+                "buffers_in_use": self.in_use,
+                "in_use_bytes": self.in_use_bytes,
+                "peak_in_use_bytes": self.peak_in_use_bytes,
+                "idle_buffers": sum(len(v) for v in self._free.values()),
+                "idle_bytes": self.idle_bytes,
+                "max_idle_bytes": self.max_idle_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "dropped": self.dropped,
+            }
+
+
+def iter_readinto(fileobj: BinaryIO, buf: bytearray, size: Optional[int] = None) -> Iterator[memoryview]:
+    """
+    Read fileobj to the end with readinto(), yielding views of buf (blocking).
+    Each view is only valid until the next one is requested.
+    """
+    view = memoryview(buf)[:size or len(buf)]
+    while True:
+        n = fileobj.readinto(view)
+        if not n:
+            return
+        yield view[:n]
+
+
+class CoalescingWriter:
+    """
+    Gathers small incoming pieces into a pooled buffer sized by an AdaptiveChunkSizer
+    and hands full buffers to flush_fn. Call close() when done (also on errors) to
+    return the buffer to the pool.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[memoryview], Awaitable[Any]],
+        pool: "BufferPool",
+        sizer: Optional[AdaptiveChunkSizer] = None,
+    ) -> None:
+        self._flush_fn = flush_fn
+        self._pool = pool
+        self.sizer = sizer or AdaptiveChunkSizer()
+        self._buf: Optional[bytearray] = None
+        self._fill = 0
+        self._window_start = time.monotonic()
+
+    async def write(self, data) -> None:
+        """Append data, flushing whenever the buffer fills up."""
+        view = memoryview(data)
+        if not self._fill and len(view) >= self.sizer.size:
+            # Already a full chunk: write it as is instead of copying it through the buffer.
+            await self._emit(view)
+            return
+        while view:
+            if self._buf is None or len(self._buf) < self.sizer.size:
+                self._swap_buffer()
+            take = min(len(view), self.sizer.size - self._fill)
+            self._buf[self._fill:self._fill + take] = view[:take]
+            self._fill += take
+            view = view[take:]
+            if self._fill >= self.sizer.size:
+                await self.flush()
+
+    async def flush(self) -> None:
+        """Write out whatever is buffered."""
+        if self._fill:
+            fill, self._fill = self._fill, 0
+            await self._emit(memoryview(self._buf)[:fill])
+
+    def close(self) -> None:
+        """Return the buffer to the pool. Unflushed data is discarded."""
+        if self._buf is not None:
+            self._pool.release(self._buf)
+            self._buf = None
+        self._fill = 0
+
+    async def _emit(self, view: memoryview) -> None:
+        await self._flush_fn(view)
+        now = time.monotonic()
+        # Arrival rate since the previous flush, including the time spent writing.
+        self.sizer.record(len(view), now - self._window_start)
+        self._window_start = now
+
+    def _swap_buffer(self) -> None:
+        # Only called with an empty buffer, so nothing needs to be carried over.
+        if self._buf is not None:
+            self._pool.release(self._buf)
+        self._buf = self._pool.acquire(self.sizer.size)
+
+
+_pool: Optional[BufferPool] = None
+
+
+# PUBLIC_INTERFACE
+def get_buffer_pool() -> BufferPool:
+    """Return the process-wide buffer pool."""
+    global _pool
+    if _pool is None:
+        _pool = BufferPool()
+    return _pool
@@ -0,0 +1,249 @@
+"""
+Persistent catalog of stored uploads.
+
+Every saved file gets a row in a SQLite database (WAL mode, so readers never
+block the writer and several worker processes can share it) with its original
+name, saved name, size, content type, digests and creation time. Lookups by
+saved name, digest or original name and time-ordered listings are served from
+indexes instead of scanning UPLOAD_DIR.
+
+Listings use keyset pagination on (created_at, id): the opaque cursor encodes
+the last row returned, so every page costs one index range scan no matter how
+deep into the catalog it is.
+
+Files stored before the catalog existed can be imported with
+    python -m src.api.catalog backfill
+(which walks every root of the sharded storage backend; objects in an S3
+bucket are not scanned).
+"""
+import argparse
+import base64
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.api.io_executor import get_io_executor
+from src.api.layout import iter_stored_files
+from src.api.storage import STORAGE_BACKEND, STORAGE_ROOTS
+
+CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "true").lower() in {"1", "true", "yes"}
+# Database file; defaults to '<UPLOAD_DIR>/.catalog.sqlite3'.
+CATALOG_PATH = os.getenv("CATALOG_PATH", "")
+CATALOG_FILE_NAME = ".catalog.sqlite3"
+# Largest page size accepted by list().
+MAX_PAGE_SIZE = 1000
+
+_COLUMNS = (
+    "id", "saved_as", "filename", "size_bytes", "content_type", "sha256", "fast_hash",
+    "deduplicated", "job_id", "created_at",
+)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    saved_as TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    content_type TEXT,
+    sha256 TEXT,
+    fast_hash TEXT,
+    deduplicated INTEGER NOT NULL DEFAULT 0,
+    job_id TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_created_at ON uploads (created_at, id);
+CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads (sha256);
+CREATE INDEX IF NOT EXISTS uploads_filename ON uploads (filename);
+"""
+
+
+class InvalidCursor(ValueError):
+    """Raised for a pagination cursor that was not produced by this catalog."""
+
+
+def utc_timestamp(value: datetime) -> str:
+    """Format a time the way created_at is stored: naive UTC, ISO 8601 (so text order is time order)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+def normalize_timestamp(value: str) -> str:
+    """Convert an ISO 8601 time (naive = UTC, or with an offset) to the stored format; raises ValueError."""
+    return utc_timestamp(datetime.fromisoformat(value))
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """Return the opaque cursor pointing after the given row."""
+    return base64.urlsafe_b64encode(json.dumps([created_at, row_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor; raises InvalidCursor."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor.") from exc
+
+
+def _row_to_dict(row: tuple) -> Dict[str, Any]:
+    entry = dict(zip(_COLUMNS, row))
+    entry["deduplicated"] = bool(entry["deduplicated"])
+    return entry
+
+
+class UploadCatalog:
+    """SQLite-backed catalog; every call runs on the I/O executor with a per-thread connection."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False only so close() may run on another thread at shutdown.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def initialize(self) -> None:
+        """Create the database and its schema if needed (blocking)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close all connections."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def _insert(self, entry: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO uploads (saved_as, filename, size_bytes, content_type, sha256, fast_hash,"
+            " deduplicated, job_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry["saved_as"], entry["filename"], entry["size_bytes"], entry.get("content_type"),
+                entry.get("sha256"), entry.get("fast_hash"), int(bool(entry.get("deduplicated"))),
+                entry.get("job_id"), entry.get("created_at") or utc_timestamp(datetime.now(timezone.utc)),
+            ),
+        )
+
+    def _get(self, saved_as: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM uploads WHERE saved_as = ?", (saved_as,)
+        ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def _list(
+        self,
+        limit: int,
+        cursor: Optional[str],
+        since: Optional[str],
+        until: Optional[str],
+        sha256: Optional[str],
+        filename: Optional[str],
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        where, params = [], []
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params += [created_at, created_at, row_id]
+        # created_at is compared as text, so the bounds must be in the same format.
+        if since:
+            where.append("created_at >= ?")
+            params.append(normalize_timestamp(since))
+        if until:
+            where.append("created_at < ?")
+            params.append(normalize_timestamp(until))
+        if sha256:
+            where.append("sha256 = ?")
+            params.append(sha256)
+        if filename:
+            where.append("filename = ?")
+            params.append(filename)
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM uploads"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Newest first; one extra row tells whether there is a next page.
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = [_row_to_dict(row) for row in self._conn().execute(sql, params).fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return rows, next_cursor
+
+    async def record(self, entry: Dict[str, Any]) -> None:
+        """Add (or replace) the row of a saved file."""
+        await get_io_executor().run(self._insert, entry)
+
+    async def get(self, saved_as: str) -> Optional[Dict[str, Any]]:
+        """Return the row of a saved file, or None."""
+        return await get_io_executor().run(self._get, saved_as)
+
+    async def list(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        sha256: Optional[str] = None,
+        filename: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return (rows, next_cursor), newest first. since/until bound created_at
+        (ISO 8601; UTC unless they carry an offset); next_cursor is None on the
+        last page. Raises InvalidCursor, or ValueError for a malformed bound.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        return await get_io_executor().run(self._list, limit, cursor, since, until, sha256, filename)
+
+    def backfill(self, upload_dir: str) -> int:
+        """Add rows for stored files that are not in the catalog yet (blocking). Returns the count added."""
+        conn = self._conn()
+        added = 0
+        for saved_as, path in iter_stored_files(upload_dir):
+            stat = os.stat(path)
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO uploads (saved_as, filename, size_bytes, created_at) VALUES (?, ?, ?, ?)",
+                (saved_as, saved_as, stat.st_size, utc_timestamp(datetime.fromtimestamp(stat.st_mtime, timezone.utc))),
+            )
+            added += cur.rowcount
+        return added
+
+
+def catalog_path(upload_dir: str) -> str:
+    """Return the configured database path for an upload directory."""
+    return CATALOG_PATH or os.path.join(upload_dir, CATALOG_FILE_NAME)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: python -m src.api.catalog backfill [--upload-dir DIR]."""
+    parser = argparse.ArgumentParser(prog="python -m src.api.catalog", description="Upload catalog maintenance.")
+    parser.add_argument("command", choices=["backfill"], help="backfill: add rows for files missing from the catalog")
+    parser.add_argument("--upload-dir", default=os.getenv("UPLOAD_DIR", "./upload"))
+    args = parser.parse_args(argv)
+    catalog = UploadCatalog(catalog_path(args.upload_dir))
+    catalog.initialize()
+    try:
+        roots = STORAGE_ROOTS if STORAGE_BACKEND == "sharded" else [args.upload_dir]
+        print(f"Added {sum(catalog.backfill(root) for root in roots)} files to {catalog.path}.")
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Streaming content hashing and content-addressed deduplication.
+
+Uploads are hashed incrementally on the disk I/O threads while their chunks
+are written (see AsyncFile), so the digest is ready when the last byte lands
+and hashing never runs on the event loop.
+
+With CONTENT_DEDUP_ENABLED, every stored file is also hard-linked into
+'<UPLOAD_DIR>/.objects/<aa>/<bb>/<sha256>'. When a later upload has the same
+SHA-256, its saved file becomes another hard link to the existing object and
+the freshly received copy is dropped. The object's link count is its reference
+count, so no separate bookkeeping is needed and removing a saved file never
+affects other uploads of the same content. Once every saved file of some
+content is deleted, only the object's own link is left (st_nlink == 1);
+sweep() removes such objects.
+
+Looking content up by digest (/objects, POST /upload/by-hash) is off unless
+CONTENT_BY_HASH_ENABLED is set: anyone who knows a digest could otherwise learn
+that the content is stored and get a readable copy of it without the bytes.
+"""
+import hashlib
+import os
+import re
+import time
+from typing import Optional, Tuple
+
+from src.api.buffers import get_buffer_pool, iter_readinto
+from src.api.io_executor import get_io_executor
+
+OBJECTS_DIR_NAME = ".objects"
+CONTENT_DEDUP_ENABLED = os.getenv("CONTENT_DEDUP_ENABLED", "false").lower() in {"1", "true", "yes"}
+# Serve /objects and POST /upload/by-hash; only for deployments where every client may read all content.
+CONTENT_BY_HASH_ENABLED = os.getenv("CONTENT_BY_HASH_ENABLED", "false").lower() in {"1", "true", "yes"}
+# Seconds an unreferenced object must be untouched (st_ctime, which a new link updates) before it is removed.
+CONTENT_OBJECT_GRACE_SECONDS = float(os.getenv("CONTENT_OBJECT_GRACE_SECONDS", "3600"))
+# Optional second, faster digest: "" (off), "blake2b", or "blake3" (needs the blake3 package).
+UPLOAD_FAST_HASH = os.getenv("UPLOAD_FAST_HASH", "").lower()
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _new_fast_hasher(name: str):
+    if name == "blake2b":
+        return hashlib.blake2b()
+    if name == "blake3":
+        try:
+            import blake3
+        except ImportError as exc:  # pragma: no cover
+            raise RuntimeError("UPLOAD_FAST_HASH=blake3 requires the 'blake3' package.") from exc
+        return blake3.blake3(max_threads=1)
+    raise ValueError(f"Unknown UPLOAD_FAST_HASH '{name}'; expected 'blake2b' or 'blake3'.")
+
+
+class StreamingDigest:
+    """SHA-256 (plus the optional fast hash) computed incrementally over written chunks."""
+
+    def __init__(self, fast_hash: str = UPLOAD_FAST_HASH) -> None:
+        self._sha256 = hashlib.sha256()
+        self.fast_hash_algorithm = fast_hash or None
+        self._fast = _new_fast_hasher(fast_hash) if fast_hash else None
+
+    def update(self, data) -> None:
+        """Feed the next chunk (blocking; call from an I/O thread for large chunks)."""
+        self._sha256.update(data)
+        if self._fast is not None:
+            self._fast.update(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def fast_hash(self) -> Optional[str]:
+        return self._fast.hexdigest() if self._fast is not None else None
+
+
+def is_sha256(value: str) -> bool:
+    """True for a lowercase hex SHA-256 digest."""
+    return bool(_SHA256_RE.match(value))
+
+
+def digest_file(path: str, chunk_size: int = 1024 * 1024) -> StreamingDigest:
+    """Hash an existing file (blocking)."""
+    digest = StreamingDigest()
+    with open(path, "rb") as f, get_buffer_pool().lease(chunk_size) as buf:
+        for view in iter_readinto(f, buf, chunk_size):
+            digest.update(view)
+    return digest
+
+
+def _store(tmp_path: str, object_path: str, dest_path: str) -> bool:
+    """Publish tmp_path at dest_path, deduplicating against object_path. Returns True if deduplicated."""
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    try:
+        os.link(object_path, dest_path)
+    except FileNotFoundError:
+        pass
+    else:
+        os.remove(tmp_path)
+        return True
+    try:
+        # First copy of this content: it becomes the object.
+        os.link(tmp_path, object_path)
+    except FileExistsError:
+        # Another upload of the same content won the race; share its object.
+        os.link(object_path, dest_path)
+        os.remove(tmp_path)
+        return True
+    os.replace(tmp_path, dest_path)
+    return False
+
+
+class ContentStore:
+    """Content-addressed object directory shared by all saved files through hard links."""
+
+    def __init__(self, upload_dir: str) -> None:
+        self.objects_dir = os.path.join(upload_dir, OBJECTS_DIR_NAME)
+
+    def ensure_dirs(self) -> None:
+        """Create the object directory if needed."""
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def object_path(self, sha256: str) -> str:
+        """Return the object path for a digest (two directory levels to keep directories small)."""
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], sha256)
+
+    async def store(self, tmp_path: str, sha256: str, dest_path: str) -> bool:
+        """Move a completed upload to dest_path, sharing storage with identical content. True if deduplicated."""
+        return await get_io_executor().run(_store, tmp_path, self.object_path(sha256), dest_path)
+
+    def sweep(self, grace_seconds: float = CONTENT_OBJECT_GRACE_SECONDS) -> Tuple[int, int]:
+        """
+        Remove objects no saved file links to any more (blocking); returns (objects, bytes)
+        removed. The grace period leaves alone objects an upload is linking right now.
+        """
+        now = time.time()
+        removed = freed = 0
+        for root, _, files in os.walk(self.objects_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    if st.st_nlink != 1 or now - st.st_ctime < grace_seconds:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += st.st_size
+        return removed, freed
+
+    async def link(self, sha256: str, dest_path: str) -> bool:
+        """Create dest_path as a new reference to known content. False if the content is unknown."""
+        try:
+            await get_io_executor().run(os.link, self.object_path(sha256), dest_path)
+        except FileNotFoundError:
+            return False
+        return True
@@ -0,0 +1,112 @@
+"""
+Free-space admission control and preallocation for the upload directory.
+
+Before an upload starts receiving data it reserves its projected size against
+the free space of the upload filesystem; if the projection (free space minus
+bytes already reserved by in-flight uploads) would drop below
+DISK_MIN_FREE_BYTES the upload is rejected with 507 before any bandwidth is
+spent on it. Single-request uploads are admitted from their Content-Length by
+DiskSpaceAdmissionMiddleware (src/api/admission.py), before the framework
+spools the body; sessions reserve their declared size when they are created.
+
+When the size is known up front, the '.part' file is preallocated with
+posix_fallocate so the filesystem can hand out contiguous extents and the
+space is claimed immediately. Preallocated space is visible to statvfs, so
+other worker processes account for it without sharing reservation state.
+"""
+import errno
+import os
+import shutil
+from typing import Any, Dict
+
+from src.api.io_executor import get_io_executor
+
+# Free space that must remain on the upload filesystem after admitting an upload.
+DISK_MIN_FREE_BYTES = int(os.getenv("DISK_MIN_FREE_BYTES", str(256 * 1024 * 1024)))
+# Preallocate '.part' files with posix_fallocate when the upload size is known.
+UPLOAD_PREALLOCATE = os.getenv("UPLOAD_PREALLOCATE", "true").lower() in {"1", "true", "yes"}
+
+# errno values meaning "preallocation is not supported here"; the upload proceeds without it.
+_FALLOCATE_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL}
+
+
+class InsufficientStorageError(Exception):
+    """Raised when admitting an upload would exhaust the upload filesystem."""
+
+
+def is_out_of_space(exc: BaseException) -> bool:
+    """True if exc is the OS reporting a full disk or exhausted quota."""
+    return isinstance(exc, OSError) and exc.errno in (errno.ENOSPC, errno.EDQUOT)
+
+
+def preallocate(fileobj, length: int) -> bool:
+    """
+    Allocate length bytes for an open file (blocking). Returns False if the
+    filesystem does not support preallocation; raises OSError(ENOSPC) when full.
+    """
+    if not UPLOAD_PREALLOCATE or length <= 0:
+        return False
+    try:
+        os.posix_fallocate(fileobj.fileno(), 0, length)
+    except OSError as exc:
+        if exc.errno in _FALLOCATE_UNSUPPORTED:
+            return False
+        raise
+    return True
+
+
+class DiskReservation:
+    """Bytes reserved for one in-flight upload; release exactly once when it ends."""
+
+    def __init__(self, guard: "DiskSpaceGuard", nbytes: int) -> None:
+        self._guard = guard
+        self.nbytes = nbytes
+        # Directory whose filesystem the bytes are reserved on.
+        self.root = guard.path
+
+    def release(self) -> None:
+        if self.nbytes:
+            self._guard.reserved_bytes -= self.nbytes
+            self._guard.in_flight -= 1
+            self.nbytes = 0
+
+
+class DiskSpaceGuard:
+    """Tracks projected in-flight bytes of this worker against free space on the upload filesystem."""
+
+    def __init__(self, path: str, min_free_bytes: int = DISK_MIN_FREE_BYTES) -> None:
+        self.path = path
+        self.min_free_bytes = min_free_bytes
+        self.reserved_bytes = 0
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def free_bytes(self) -> int:
+        usage = await get_io_executor().run(shutil.disk_usage, self.path)
+        return usage.free
+
+    async def reserve(self, nbytes: int) -> DiskReservation:
+        """Reserve nbytes for an upload or raise InsufficientStorageError."""
+        free = await self.free_bytes()
+        # No await between the check and the update: admission is atomic per worker.
+        projected = free - self.reserved_bytes - nbytes
+        if projected < self.min_free_bytes:
+            self.rejected += 1
+            raise InsufficientStorageError(
+                f"Insufficient storage: {free - self.reserved_bytes} bytes available for new uploads, "
+                f"{nbytes} bytes requested."
+            )
+        self.reserved_bytes += nbytes
+        self.in_flight += 1
+        return DiskReservation(self, nbytes)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Return free space and reservation metrics."""
+        return {
+            "free_bytes": await self.free_bytes(),
+            "reserved_bytes": self.reserved_bytes,
+            "in_flight_uploads": self.in_flight,
+            "min_free_bytes": self.min_free_bytes,
+            "rejected_uploads": self.rejected,
+            "preallocate": UPLOAD_PREALLOCATE,
+        }
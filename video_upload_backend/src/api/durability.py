@@ -0,0 +1,232 @@
+"""
+Durability of finalized uploads: when stored files are flushed to stable storage.
+
+Publishing an upload is a rename (or hard link) into its destination; without
+an fsync of the file and of its directory, a power loss or kernel crash can
+lose an upload that was already answered with 200. UPLOAD_DURABILITY selects
+the trade-off between that risk and latency:
+
+- "none": no fsync; the page cache decides (fastest, the previous behaviour).
+- "fsync" (default): fsync the file and its directory before answering.
+- "group": group commit. Finalized files are queued and synced together every
+  UPLOAD_GROUP_COMMIT_MS milliseconds (or as soon as UPLOAD_GROUP_COMMIT_MAX
+  are waiting); each request answers once its batch is synced. A directory
+  shared by the batch is synced once, and concurrent fsyncs on one filesystem
+  share journal commits, so the per-upload cost drops with concurrency.
+- "async": answer right away and sync in the same batches in the background.
+  Each finalized file gets a sequence number; the durability watermark is the
+  highest number up to which every file has been through a sync (failures are
+  logged and counted), so the lag between acknowledged and durable uploads is
+  visible in GET /health/durability.
+
+Only local storage backends are synced here; object stores acknowledge a PUT
+once it is durable.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.api.io_executor import get_io_executor
+
+# "none", "fsync", "group" or "async".
+UPLOAD_DURABILITY = os.getenv("UPLOAD_DURABILITY", "fsync").lower()
+# Longest time a finalized file waits for its group commit, in milliseconds.
+UPLOAD_GROUP_COMMIT_MS = float(os.getenv("UPLOAD_GROUP_COMMIT_MS", "5"))
+# Files that trigger a group commit before the interval elapses.
+UPLOAD_GROUP_COMMIT_MAX = int(os.getenv("UPLOAD_GROUP_COMMIT_MAX", "64"))
+
+DURABILITY_MODES = ("none", "fsync", "group", "async")
+# Shard directories remembered as synced into their parents; the set is reset beyond this size.
+_MAX_KNOWN_DIRECTORIES = 100000
+
+logger = logging.getLogger(__name__)
+
+
+def _fsync_path(path: str, directory: bool = False) -> None:
+    fd = os.open(path, os.O_RDONLY | (os.O_DIRECTORY if directory else 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_files(
+    paths: List[str], roots: Iterable[str] = (), known_directories: Optional[Set[str]] = None
+) -> Tuple[int, int, List[Optional[BaseException]]]:
+    """
+    fsync each file, then each distinct parent directory once (blocking).
+    Directories between a file and the storage root containing it (from roots)
+    may have just been created for it (shard directories), so each of them is
+    also synced into its own parent, up to the root; known_directories records
+    the ones already done, so that happens once per directory.
+    Returns (files synced, directories synced, per-path error or None).
+    """
+    errors: List[Optional[BaseException]] = []
+    directories: Dict[str, List[int]] = {}
+    # New directory -> its parent, which must be synced for the directory entry to be durable.
+    entries: Dict[str, str] = {}
+    roots = [os.path.abspath(root) for root in roots]
+    known = known_directories if known_directories is not None else set()
+    for index, path in enumerate(paths):
+        try:
+            _fsync_path(path)
+            errors.append(None)
+        except OSError as exc:
+            errors.append(exc)
+        directory = os.path.dirname(os.path.abspath(path))
+        directories.setdefault(directory, []).append(index)
+        root = next((r for r in roots if directory.startswith(r + os.sep)), None)
+        while root is not None and directory != root and directory not in known:
+            parent = os.path.dirname(directory)
+            entries[directory] = parent
+            directories.setdefault(parent, []).append(index)
+            directory = parent
+    failed = set()
+    for directory, indexes in directories.items():
+        try:
+            _fsync_path(directory, directory=True)
+        except OSError as exc:
+            failed.add(directory)
+            for index in indexes:
+                errors[index] = errors[index] or exc
+    if len(known) > _MAX_KNOWN_DIRECTORIES:
+        known.clear()
+    known.update(directory for directory, parent in entries.items() if parent not in failed)
+    return len(paths), len(directories), errors
+
+
+class DurabilityManager:
+    """Applies the durability mode to finalized files of this worker."""
+
+    def __init__(
+        self,
+        mode: str = UPLOAD_DURABILITY,
+        interval_ms: float = UPLOAD_GROUP_COMMIT_MS,
+        max_batch: int = UPLOAD_GROUP_COMMIT_MAX,
+    ) -> None:
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown UPLOAD_DURABILITY '{mode}'; expected {', '.join(DURABILITY_MODES)}.")
+        self.mode = mode
+        # Storage roots; directories below them created for a file are synced up to the root.
+        self.roots: List[str] = []
+        self._known_directories: Set[str] = set()
+        self.interval = interval_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        # (path, sequence number, future of a waiting request or None)
+        self._pending: List[Tuple[str, int, Optional[asyncio.Future]]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.acked_seq = 0
+        self.durable_seq = 0
+        self.batches = 0
+        self.files_synced = 0
+        self.directories_synced = 0
+        self.errors = 0
+
+    async def persist(self, path: str) -> bool:
+        """
+        Apply the durability mode to a file just published at path.
+        Returns True if it is on stable storage when this returns. Raises OSError
+        if a synchronous mode ("fsync", "group") fails to sync it.
+        """
+        if self.mode == "none":
+            return False
+        self.acked_seq += 1
+        seq = self.acked_seq
+        if self.mode == "fsync":
+            _, directories, errors = await get_io_executor().run(
+                sync_files, [path], self.roots, self._known_directories
+            )
+            self._account(1, directories, errors)
+            if errors[0] is not None:
+                raise errors[0]
+            self.durable_seq = max(self.durable_seq, seq)
+            return True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future() if self.mode == "group" else None
+        self._pending.append((path, seq, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.interval, self._start_flush)
+        if future is None:
+            return False
+        await future
+        return True
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[str, int, Optional[asyncio.Future]]]) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # Batches complete in order, which keeps the watermark monotonic.
+        async with self._flush_lock:
+            try:
+                files, directories, errors = await get_io_executor().run(
+                    sync_files, [p for p, _, _ in batch], self.roots, self._known_directories
+                )
+            except BaseException as exc:  # pragma: no cover - executor shut down
+                files, directories, errors = 0, 0, [exc] * len(batch)
+            self._account(files, directories, errors)
+            self.batches += 1
+            for (path, seq, future), error in zip(batch, errors):
+                if error is not None and future is None:
+                    logger.error("Failed to sync %s after acknowledging it: %s", path, error)
+                if future is not None and not future.done():
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+            # Failed syncs are logged and counted in errors; they do not hold the watermark back forever.
+            self.durable_seq = max(self.durable_seq, batch[-1][1])
+
+    def _account(self, files: int, directories: int, errors: List[Optional[BaseException]]) -> None:
+        failed = sum(1 for error in errors if error is not None)
+        self.files_synced += files - failed
+        self.directories_synced += directories
+        self.errors += failed
+
+    async def drain(self) -> None:
+        """Sync everything still queued (at shutdown)."""
+        self._start_flush()
+        while self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return durability metrics of this worker."""
+        return {
+            "mode": self.mode,
+            "group_commit_ms": self.interval * 1000.0,
+            "group_commit_max": self.max_batch,
+            "acked_seq": self.acked_seq,
+            "durable_seq": self.durable_seq,
+            "lag": self.acked_seq - self.durable_seq,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "files_synced": self.files_synced,
+            "directories_synced": self.directories_synced,
+            "errors": self.errors,
+        }
+
+
+_durability: Optional[DurabilityManager] = None
+
+
+# PUBLIC_INTERFACE
+def get_durability() -> DurabilityManager:
+    """Return the process-wide durability manager configured from the environment."""
+    global _durability
+    if _durability is None:
+        _durability = DurabilityManager()
+    return _durability
@@ -0,0 +1,105 @@
+"""
+HTTP/2 serving through hypercorn (optional: `pip install -r requirements-http2.txt`).
+
+`python -m src.api --backend hypercorn` serves the app with hypercorn, which
+speaks HTTP/1.1 and HTTP/2: over TLS (--ssl-certfile/--ssl-keyfile) clients
+negotiate h2 with ALPN; in cleartext they can upgrade (h2c) or start with
+HTTP/2 directly (prior knowledge). A client then multiplexes its parallel
+uploads as streams of one connection instead of opening a connection each.
+
+HTTP/2 flow control starts every stream and the connection with a 64 KiB
+receive window: a client may only have that much unacknowledged body data in
+flight, so an upload moves at most 64 KiB per round trip (about 13 MB/s at a
+5 ms RTT), and all streams of a connection share one 64 KiB window. hypercorn
+does not expose the window sizes, so TunedH2Protocol advertises
+SERVER_H2_STREAM_WINDOW_BYTES per stream in its SETTINGS and opens the
+connection window to SERVER_H2_CONNECTION_WINDOW_BYTES right after the preface.
+It also announces the configured maximum frame size (--h2-max-frame-size), so
+clients send upload data in fewer, larger DATA frames.
+
+Body data may still arrive for a stream that was already answered (an early
+413 or 429 while the client is still sending). hypercorn would fail the whole
+connection, with every other upload on it; the data is discarded instead and
+the client is told to stop sending with RST_STREAM(NO_ERROR).
+
+The launcher gives hypercorn `src.api.http2:app` as the application, so every
+worker process installs the tuned protocol when it imports this module.
+"""
+import os
+
+import h2.errors
+import h2.events
+import h2.exceptions
+import h2.settings
+import hypercorn.protocol
+from hypercorn.protocol.h2 import H2Protocol
+
+from src.api.main import app
+
+# Receive window of each HTTP/2 stream (one upload), in bytes.
+SERVER_H2_STREAM_WINDOW_BYTES = int(os.getenv("SERVER_H2_STREAM_WINDOW_BYTES", str(8 * 1024 * 1024)))
+# Receive window shared by all streams of a connection, in bytes.
+SERVER_H2_CONNECTION_WINDOW_BYTES = int(os.getenv("SERVER_H2_CONNECTION_WINDOW_BYTES", str(32 * 1024 * 1024)))
+
+# Initial and largest flow-control windows allowed by HTTP/2 (RFC 9113, 6.9).
+DEFAULT_WINDOW_BYTES = 65535
+MAX_WINDOW_BYTES = 2 ** 31 - 1
+
+__all__ = ["app", "TunedH2Protocol", "install"]
+
+
+def _window(size: int) -> int:
+    return max(DEFAULT_WINDOW_BYTES, min(size, MAX_WINDOW_BYTES))
+
+
+class TunedH2Protocol(H2Protocol):
+    """hypercorn's HTTP/2 protocol with receive windows sized for large uploads."""
+
+    stream_window = _window(SERVER_H2_STREAM_WINDOW_BYTES)
+    connection_window = _window(SERVER_H2_CONNECTION_WINDOW_BYTES)
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Advertised in the server preface; new streams start with this inbound window. hypercorn
+        # accepts frames up to h2_max_inbound_frame_size but never advertises it, so clients would
+        # keep to 16 KiB frames; announce it too.
+        frame_size = self.config.h2_max_inbound_frame_size
+        settings = self.connection.local_settings
+        values = {code: settings[code] for code in settings}
+        values[h2.settings.SettingCodes.INITIAL_WINDOW_SIZE] = self.stream_window
+        values[h2.settings.SettingCodes.MAX_FRAME_SIZE] = frame_size
+        self.connection.local_settings = h2.settings.Settings(client=False, initial_values=values)
+        self.connection.max_inbound_frame_size = frame_size
+
+    async def initiate(self, *args, **kwargs) -> None:
+        await super().initiate(*args, **kwargs)
+        # SETTINGS do not cover the connection window; it is opened with a WINDOW_UPDATE after the preface.
+        increment = self.connection_window - DEFAULT_WINDOW_BYTES
+        if increment > 0:
+            self.connection.increment_flow_control_window(increment)
+            await self._flush()
+
+    async def _handle_events(self, events) -> None:
+        # One event at a time: handling an event can create a stream (headers) or, by
+        # letting the app finish its response, remove one before the next event.
+        for event in events:
+            if isinstance(event, h2.events.DataReceived) and event.stream_id not in self.streams:
+                # Answered already: hand the window back and, unless this was the end of the body, stop the rest.
+                self.connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                if event.stream_ended is None:
+                    try:
+                        self.connection.reset_stream(event.stream_id, error_code=h2.errors.ErrorCodes.NO_ERROR)
+                    except h2.exceptions.StreamClosedError:
+                        pass
+                await self._flush()
+            else:
+                await super()._handle_events([event])
+
+
+# PUBLIC_INTERFACE
+def install() -> None:
+    """Make hypercorn use TunedH2Protocol for HTTP/2 connections of this process."""
+    hypercorn.protocol.H2Protocol = TunedH2Protocol
+
+
+install()
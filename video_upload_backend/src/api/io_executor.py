@@ -0,0 +1,265 @@
+"""
+Off-event-loop disk I/O for the upload paths.
+
+Every blocking filesystem call made while receiving an upload (open, write,
+fsync, close, replace, remove) goes through a DiskIOExecutor so that a slow
+disk never stalls the event loop that also serves health checks and small
+requests. The default executor is backed by a dedicated thread pool with a
+bounded number of queued operations; when the queue is full, callers wait,
+which naturally applies backpressure to the client connection.
+"""
+import asyncio
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.api.metrics import DISK_WRITE_BYTES, DISK_WRITE_SECONDS
+
+# Number of threads performing disk I/O for uploads.
+IO_WORKERS = int(os.getenv("UPLOAD_IO_WORKERS", "4"))
+# Maximum number of disk operations queued or running at once across all uploads.
+IO_QUEUE_SIZE = int(os.getenv("UPLOAD_IO_QUEUE_SIZE", "64"))
+# "thread" (default) or "inline" (run on the event loop; only sensible for tmpfs or tests).
+IO_BACKEND = os.getenv("UPLOAD_IO_BACKEND", "thread")
+
+
+class DiskIOExecutor:
+    """Base executor: runs blocking file operations and tracks queue metrics."""
+
+    name = "base"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Execute fn(*args) and return its result."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the executor metrics."""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queue_depth": self.max_queue_depth,
+            }
+
+    def shutdown(self) -> None:
+        """Release executor resources."""
+
+    def _call(self, fn: Callable[..., Any], args: tuple) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            result = fn(*args)
+        except BaseException:
+            with self._lock:
+                self.running -= 1
+                self.failed += 1
+            raise
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+        return result
+
+    def _enqueue(self) -> None:
+        with self._lock:
+            self.queued += 1
+            if self.queued > self.max_queue_depth:
+                self.max_queue_depth = self.queued
+
+
+class InlineIOExecutor(DiskIOExecutor):
+    """Runs operations directly on the calling (event loop) thread."""
+
+    name = "inline"
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._enqueue()
+        return self._call(fn, args)
+
+
+class ThreadPoolIOExecutor(DiskIOExecutor):
+    """Runs operations on a dedicated thread pool with a bounded operation queue."""
+
+    name = "thread"
+
+    def __init__(self, workers: int = IO_WORKERS, max_queue: int = IO_QUEUE_SIZE) -> None:
+        super().__init__()
+        self.workers = max(1, workers)
+        self.max_queue = max(self.workers, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload-io")
+        # Slot accounting is done per event loop: asyncio primitives are loop-bound.
+        self._slots: Dict[int, asyncio.Semaphore] = {}
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        key = id(asyncio.get_running_loop())
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self.max_queue)
+        return slots
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        async with self._loop_slots():
+            self._enqueue()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, self._call, fn, args)
+
+    def stats(self) -> Dict[str, Any]:
+        data = super().stats()
+        data.update({"workers": self.workers, "max_queue": self.max_queue})
+        return data
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+class AsyncFile:
+    """A binary file whose blocking operations are dispatched through a DiskIOExecutor."""
+
+    def __init__(self, executor: DiskIOExecutor, fileobj, digest=None) -> None:
+        self._executor = executor
+        self._file = fileobj
+        self.path = fileobj.name
+        # Optional object with update(data); fed every written chunk on the I/O thread.
+        self.digest = digest
+
+    @classmethod
+    async def open(cls, executor: DiskIOExecutor, path: str, mode: str = "wb", digest=None) -> "AsyncFile":
+        """Open path in the given binary mode off the event loop."""
+        fileobj = await executor.run(open, path, mode)
+        return cls(executor, fileobj, digest)
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    async def write(self, data) -> int:
+        started = time.monotonic()
+        if self.digest is not None:
+            written = await self._executor.run(_write_and_digest, self._file, self.digest, data)
+        else:
+            written = await self._executor.run(self._file.write, data)
+        _observe_write(started, len(data))
+        return written
+
+    async def pwrite(self, data, offset: int) -> int:
+        """Write data at an absolute offset without moving the file position (unbuffered)."""
+        started = time.monotonic()
+        written = await self._executor.run(_pwrite_all, self._file, data, offset)
+        _observe_write(started, len(data))
+        return written
+
+    async def truncate(self) -> None:
+        """Cut the file at the current write position (drops unused preallocated space)."""
+        await self._executor.run(self._file.truncate)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(fileobj, *args) on the executor for operations without a dedicated method."""
+        return await self._executor.run(fn, self._file, *args)
+
+    async def fsync(self) -> None:
+        await self._executor.run(_flush_and_fsync, self._file)
+
+    async def close(self) -> None:
+        if not self._file.closed:
+            await self._executor.run(self._file.close)
+
+    async def try_lock(self) -> bool:
+        """Take a non-blocking exclusive advisory lock; False if another writer holds it."""
+        return await self._executor.run(_try_flock, self._file)
+
+
+def _observe_write(started: float, nbytes: int) -> None:
+    DISK_WRITE_SECONDS.observe(time.monotonic() - started)
+    DISK_WRITE_BYTES.observe(nbytes)
+
+
+def _flush_and_fsync(fileobj) -> None:
+    fileobj.flush()
+    os.fsync(fileobj.fileno())
+
+
+def _write_and_digest(fileobj, digest, data) -> int:
+    digest.update(data)
+    return fileobj.write(data)
+
+
+def _pwrite_all(fileobj, data, offset: int) -> int:
+    view = memoryview(data)
+    fd = fileobj.fileno()
+    written = 0
+    while written < len(view):
+        written += os.pwrite(fd, view[written:], offset + written)
+    return written
+
+
+def _try_flock(fileobj) -> bool:
+    try:
+        fcntl.flock(fileobj.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _remove_if_exists(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _create_executor(backend: str) -> DiskIOExecutor:
+    if backend == "inline":
+        return InlineIOExecutor()
+    if backend == "thread":
+        return ThreadPoolIOExecutor()
+    raise ValueError(f"Unknown UPLOAD_IO_BACKEND '{backend}'; expected 'thread' or 'inline'.")
+
+
+_executor: Optional[DiskIOExecutor] = None
+
+
+# PUBLIC_INTERFACE
+def get_io_executor() -> DiskIOExecutor:
+    """Return the process-wide disk I/O executor, creating it from UPLOAD_IO_BACKEND on first use."""
+    global _executor
+    if _executor is None:
+        _executor = _create_executor(IO_BACKEND)
+    return _executor
+
+
+# PUBLIC_INTERFACE
+def set_io_executor(executor: DiskIOExecutor) -> None:
+    """Install a custom executor (e.g. a tuned thread pool); the previous one is shut down."""
+    global _executor
+    previous, _executor = _executor, executor
+    if previous is not None and previous is not executor:
+        previous.shutdown()
+
+
+# PUBLIC_INTERFACE
+def shutdown_io_executor() -> None:
+    """Shut down the process-wide executor, waiting for queued operations to finish."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+# PUBLIC_INTERFACE
+async def remove_file(path: str) -> None:
+    """Remove path off the event loop; missing files are ignored."""
+    await get_io_executor().run(_remove_if_exists, path)
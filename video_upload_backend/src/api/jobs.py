@@ -0,0 +1,423 @@
+"""
+Background post-processing of stored uploads.
+
+With JOBS_ENABLED (off by default), every successful upload enqueues a job that
+runs a pipeline of stages (JOB_STAGES, by default probe and thumbnail;
+checksum and transcode are opt-in) against the saved file. Stages are plain functions executed in a process pool,
+so CPU-heavy work (hashing, ffmpeg supervision) never competes with request
+handling on the event loop. Stages are looked up in a registry; add one with
+register_stage().
+
+Job state lives in '<UPLOAD_DIR>/.jobs/<id>.json' and stage artifacts
+(thumbnails, transcodes) in '<UPLOAD_DIR>/.jobs/<id>/'. A failed stage is
+retried with exponential backoff up to JOB_MAX_ATTEMPTS times. Jobs that were
+queued or running when a worker stopped are picked up again on the next
+start; a per-job lock file ensures only one worker process runs a job.
+
+Stages read the stored file directly when the storage backend is local, and
+through a presigned URL otherwise (ffmpeg and ffprobe read URLs natively).
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.api.content_store import StreamingDigest, digest_file
+from src.api.io_executor import get_io_executor
+from src.api.resumable import read_json, write_json_atomic
+from src.api.storage import get_storage
+
+JOBS_DIR_NAME = ".jobs"
+# Opt-in: the default stages need ffmpeg/ffprobe, which this service does not depend on; without them
+# every upload would cost a job record and a process pool start only to have each stage skipped.
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "false").lower() in {"1", "true", "yes"}
+# Comma-separated stages run for every upload, in order. 'checksum' is not a default: ingest already
+# returns the SHA-256 of every upload, and the stage reads the whole file back to verify it.
+JOB_STAGES = [s.strip() for s in os.getenv("JOB_STAGES", "probe,thumbnail").split(",") if s.strip()]
+# Processes executing stages, per worker.
+JOB_PROCESS_WORKERS = int(os.getenv("JOB_PROCESS_WORKERS", "1"))
+# Jobs processed concurrently, per worker.
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", str(JOB_PROCESS_WORKERS)))
+# Attempts per stage before the job fails.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Delay before the first retry of a stage; doubled on every further attempt.
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "10"))
+# Upper bound on one ffmpeg/ffprobe invocation.
+JOB_STAGE_TIMEOUT_SECONDS = int(os.getenv("JOB_STAGE_TIMEOUT_SECONDS", "3600"))
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+FFPROBE_PATH = os.getenv("FFPROBE_PATH", "ffprobe")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+logger = logging.getLogger(__name__)
+
+
+class StageSkipped(Exception):
+    """Raised by a stage that does not apply (e.g. a required tool is not installed); not retried."""
+
+
+# A stage takes (source file path or http(s) URL, artifact directory) and returns a JSON-serializable result;
+# files it produces go into the artifact directory.
+StageFn = Callable[[str, str], Dict[str, Any]]
+STAGES: Dict[str, StageFn] = {}
+
+
+# PUBLIC_INTERFACE
+def register_stage(name: str, fn: StageFn) -> None:
+    """
+    Make a stage available to JOB_STAGES. fn runs in a worker process, so it must
+    be a module-level function of an importable module.
+    """
+    STAGES[name] = fn
+
+
+def _require_tool(path: str) -> str:
+    resolved = shutil.which(path)
+    if resolved is None:
+        raise StageSkipped(f"'{path}' is not installed.")
+    return resolved
+
+
+def _run_tool(args: List[str]) -> subprocess.CompletedProcess:
+    result = subprocess.run(args, capture_output=True, timeout=JOB_STAGE_TIMEOUT_SECONDS)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", "replace").strip().splitlines()
+        reason = stderr[-1] if stderr else "no output"
+        raise RuntimeError(f"{os.path.basename(args[0])} exited with {result.returncode}: {reason}")
+    return result
+
+
+def probe_stage(source: str, artifacts_dir: str) -> Dict[str, Any]:
+    """Container and stream metadata from ffprobe."""
+    ffprobe = _require_tool(FFPROBE_PATH)
+    result = _run_tool([
+        ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", source,
+    ])
+    info = json.loads(result.stdout or b"{}")
+    fmt = info.get("format", {})
+    return {
+        "format": fmt.get("format_name"),
+        "duration_seconds": float(fmt["duration"]) if fmt.get("duration") else None,
+        "bit_rate": int(fmt["bit_rate"]) if fmt.get("bit_rate") else None,
+        "streams": [
+            {
+                key: stream.get(key)
+                for key in ("index", "codec_type", "codec_name", "width", "height", "r_frame_rate", "sample_rate")
+                if stream.get(key) is not None
+            }
+            for stream in info.get("streams", [])
+        ],
+    }
+
+
+def thumbnail_stage(source: str, artifacts_dir: str) -> Dict[str, Any]:
+    """A JPEG of the frame one second in (or the first frame of shorter videos)."""
+    ffmpeg = _require_tool(FFMPEG_PATH)
+    target = os.path.join(artifacts_dir, "thumbnail.jpg")
+    try:
+        _run_tool([ffmpeg, "-y", "-v", "error", "-ss", "1", "-i", source, "-frames:v", "1", target])
+    except RuntimeError:
+        pass
+    if not os.path.exists(target):
+        _run_tool([ffmpeg, "-y", "-v", "error", "-i", source, "-frames:v", "1", target])
+    return {"artifact": "thumbnail.jpg", "size_bytes": os.path.getsize(target)}
+
+
+def _digest_url(url: str) -> Tuple[StreamingDigest, int]:
+    import httpx
+
+    digest = StreamingDigest()
+    size = 0
+    with httpx.stream("GET", url, timeout=60) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes(1024 * 1024):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest, size
+
+
+def checksum_stage(source: str, artifacts_dir: str) -> Dict[str, Any]:
+    """SHA-256 of the stored file, read back from storage (verifies what is at rest against the ingest digest)."""
+    if source.startswith(("http://", "https://")):
+        digest, size = _digest_url(source)
+        return {"sha256": digest.sha256, "size_bytes": size}
+    digest = digest_file(source)
+    return {"sha256": digest.sha256, "size_bytes": os.path.getsize(source)}
+
+
+def transcode_stage(source: str, artifacts_dir: str) -> Dict[str, Any]:
+    """An H.264/AAC MP4 rendition suitable for progressive playback."""
+    ffmpeg = _require_tool(FFMPEG_PATH)
+    target = os.path.join(artifacts_dir, "transcoded.mp4")
+    tmp = target + ".tmp.mp4"
+    _run_tool([
+        ffmpeg, "-y", "-v", "error", "-i", source,
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+        "-c:a", "aac", "-movflags", "+faststart", tmp,
+    ])
+    os.replace(tmp, target)
+    return {"artifact": "transcoded.mp4", "size_bytes": os.path.getsize(target)}
+
+
+register_stage("probe", probe_stage)
+register_stage("thumbnail", thumbnail_stage)
+register_stage("checksum", checksum_stage)
+register_stage("transcode", transcode_stage)
+
+
+@dataclass
+class Job:
+    """A post-processing job as persisted on disk."""
+    id: str
+    saved_as: str
+    status: str
+    created_at: str
+    updated_at: str
+    # stage name -> {"status", "attempts", "error", "result"}, in pipeline order.
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+def _try_lock(path: str) -> Optional[int]:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _unlock(fd: int, remove_path: Optional[str] = None) -> None:
+    if remove_path is not None:
+        # Safe once the job is finished: whoever locks the path next sees the final status and skips it.
+        try:
+            os.remove(remove_path)
+        except FileNotFoundError:
+            pass
+    os.close(fd)
+
+
+def _pending_job_ids(jobs_dir: str) -> List[str]:
+    pending = []
+    try:
+        entries = list(os.scandir(jobs_dir))
+    except FileNotFoundError:
+        return []
+    for entry in entries:
+        if not entry.name.endswith(".json"):
+            continue
+        data = read_json(entry.path)
+        if data is not None and data.get("status") in (QUEUED, RUNNING):
+            pending.append((data.get("created_at", ""), data["id"]))
+    return [job_id for _, job_id in sorted(pending)]
+
+
+class JobQueue:
+    """Persistent post-processing queue: asyncio consumers feeding a process pool."""
+
+    def __init__(
+        self,
+        upload_dir: str,
+        stages: Optional[List[str]] = None,
+        processes: int = JOB_PROCESS_WORKERS,
+        concurrency: int = JOB_CONCURRENCY,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_delay: float = JOB_RETRY_DELAY_SECONDS,
+    ) -> None:
+        self.upload_dir = upload_dir
+        self.jobs_dir = os.path.join(upload_dir, JOBS_DIR_NAME)
+        self.stages = list(JOB_STAGES if stages is None else stages)
+        self.processes = max(1, processes)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def artifacts_dir(self, job_id: str) -> str:
+        """Return the directory holding a job's stage outputs."""
+        return os.path.join(self.jobs_dir, job_id)
+
+    def ensure_dirs(self) -> None:
+        """Create the job state directory if needed."""
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    async def start(self) -> None:
+        """Start the consumers and re-queue jobs left unfinished by a previous run."""
+        unknown = [name for name in self.stages if name not in STAGES]
+        if unknown:
+            raise RuntimeError(f"Unknown JOB_STAGES entries: {', '.join(unknown)}.")
+        self._queue = asyncio.Queue()
+        for job_id in await get_io_executor().run(_pending_job_ids, self.jobs_dir):
+            self._queue.put_nowait(job_id)
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Stop the consumers; interrupted jobs stay queued on disk for the next start."""
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, saved_as: str) -> Job:
+        """Persist a job for a stored file and queue it."""
+        now = datetime.utcnow().isoformat()
+        job = Job(
+            id=uuid.uuid4().hex,
+            saved_as=saved_as,
+            status=QUEUED,
+            created_at=now,
+            updated_at=now,
+            stages={name: {"status": QUEUED, "attempts": 0, "error": None, "result": None} for name in self.stages},
+        )
+        await self._save(job)
+        if self._queue is not None:
+            self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Load a job by id; None if the id is malformed or unknown."""
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        data = await get_io_executor().run(read_json, self._record_path(job_id))
+        if data is None:
+            return None
+        return Job(**data)
+
+    async def _save(self, job: Job) -> None:
+        job.updated_at = datetime.utcnow().isoformat()
+        await get_io_executor().run(write_json_atomic, self._record_path(job.id), asdict(job))
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and I/O threads is unsafe.
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _consume(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover
+                logger.exception("Post-processing job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        io = get_io_executor()
+        lock_path = self._record_path(job_id) + ".lock"
+        lock_fd = await io.run(_try_lock, lock_path)
+        if lock_fd is None:
+            # Another worker process is running it.
+            return
+        self.running += 1
+        job = None
+        try:
+            # Re-read under the lock: another worker may have finished it meanwhile.
+            job = await self.get(job_id)
+            if job is None or job.status not in (QUEUED, RUNNING):
+                return
+            job.status = RUNNING
+            await self._save(job)
+            storage = get_storage()
+            if storage.local:
+                source = await io.run(storage.locate, job.saved_as)
+                # A missing file fails the stages with FileNotFoundError like any other error.
+                source = source or os.path.join(self.upload_dir, job.saved_as)
+            else:
+                # Presigned for this run; a missing object fails the stages with an HTTP error.
+                source = storage.url(job.saved_as)
+            artifacts_dir = self.artifacts_dir(job.id)
+            await io.run(os.makedirs, artifacts_dir, 0o755, True)
+            for name, stage in job.stages.items():
+                if stage["status"] in (SUCCEEDED, SKIPPED):
+                    continue
+                if not await self._run_stage(job, name, stage, source, artifacts_dir):
+                    job.status = FAILED
+                    self.failed += 1
+                    await self._save(job)
+                    return
+            job.status = SUCCEEDED
+            self.succeeded += 1
+            await self._save(job)
+        finally:
+            self.running -= 1
+            finished = job is None or job.status in (SUCCEEDED, FAILED)
+            await io.run(_unlock, lock_fd, lock_path if finished else None)
+
+    async def _run_stage(self, job: Job, name: str, stage: Dict[str, Any], source: str, artifacts_dir: str) -> bool:
+        """Run one stage with retries; False if it failed for good."""
+        loop = asyncio.get_running_loop()
+        while True:
+            stage["attempts"] += 1
+            stage["status"] = RUNNING
+            await self._save(job)
+            try:
+                fn = STAGES[name]
+                stage["result"] = await loop.run_in_executor(self._executor(), fn, source, artifacts_dir)
+            except StageSkipped as exc:
+                stage.update(status=SKIPPED, error=str(exc))
+                await self._save(job)
+                return True
+            except Exception as exc:
+                if isinstance(exc, BrokenProcessPool) and self._pool is not None:
+                    # A stage process died (e.g. OOM-killed); start a fresh pool for the retry.
+                    self._pool.shutdown(wait=False)
+                    self._pool = None
+                stage["error"] = f"{type(exc).__name__}: {exc}"
+                if stage["attempts"] >= self.max_attempts:
+                    stage["status"] = FAILED
+                    return False
+                stage["status"] = QUEUED
+                self.retries += 1
+                await self._save(job)
+                await asyncio.sleep(self.retry_delay * 2 ** (stage["attempts"] - 1))
+                continue
+            stage.update(status=SUCCEEDED, error=None)
+            await self._save(job)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and outcome counters of this worker."""
+        return {
+            "enabled": self._queue is not None,
+            "stages": list(self.stages),
+            "queued_jobs": self._queue.qsize() if self._queue is not None else 0,
+            "running_jobs": self.running,
+            "succeeded_jobs": self.succeeded,
+            "failed_jobs": self.failed,
+            "stage_retries": self.retries,
+            "processes": self.processes,
+            "concurrency": self.concurrency,
+        }
@@ -0,0 +1,265 @@
+"""
+Sharded directory layout of stored uploads.
+
+Saved names stay '<YYYYMMDDTHHMMSSZ>_<uuid32>.<ext>' everywhere in the API,
+but the file lives in a subdirectory derived from the name itself, e.g. with
+UPLOAD_SHARD_BY_DATE=day and UPLOAD_SHARD_HEX_LEVELS=1:
+
+    20261016T120000Z_ab12...ef.mp4  ->  2026/10/16/ab/20261016T120000Z_ab12...ef.mp4
+
+Date levels keep each directory to one day's uploads (and make backups and
+expiry by date cheap); hex levels split a day into 256^N evenly filled
+buckets. Since the location is a pure function of the name, no lookup table
+is needed. Names that do not follow the pattern stay at the top level.
+
+Readers use resolve(), which falls back to the flat (top-level) location, so
+files stored before sharding was enabled, or not yet moved by the reshard
+tool, keep working:
+
+    python -m src.api.layout reshard [--upload-dir DIR] [--dry-run]
+
+moves every stored file to its location under the current settings with
+rename(2), while the server keeps running.
+
+Only the configured and the flat location are looked up, so a directory in a
+different sharded layout would serve 404s for every file. Each root therefore
+records its layout in a '.layout' marker: the server refuses to start when the
+marker names another sharded layout (check_layout), and reshard rewrites it
+once every file has moved. Moving from one sharded layout to another is thus
+done with the server stopped; from a flat directory it can run live.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from typing import Iterator, List, Optional, Tuple
+
+# Date directories: "none", "month" (YYYY/MM) or "day" (YYYY/MM/DD).
+UPLOAD_SHARD_BY_DATE = os.getenv("UPLOAD_SHARD_BY_DATE", "day").lower()
+# Directory levels named after successive 2-hex-digit prefixes of the uuid (0-4).
+UPLOAD_SHARD_HEX_LEVELS = int(os.getenv("UPLOAD_SHARD_HEX_LEVELS", "1"))
+
+_NAME_RE = re.compile(r"^(\d{4})(\d{2})(\d{2})T\d{6}Z_([0-9a-f]{32})(\.[^/]*)?$")
+# File in each root recording the layout its files are stored in.
+LAYOUT_MARKER = ".layout"
+# Stored files checked against the configured layout when a root has no marker yet.
+_UNMARKED_SAMPLE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class LayoutMismatchError(RuntimeError):
+    """The files of a root are stored in a different layout than the configured one."""
+
+
+class ShardLayout:
+    """Maps saved names to their path below the upload directory."""
+
+    def __init__(self, by_date: str = UPLOAD_SHARD_BY_DATE, hex_levels: int = UPLOAD_SHARD_HEX_LEVELS) -> None:
+        if by_date not in ("none", "month", "day"):
+            raise ValueError(f"UPLOAD_SHARD_BY_DATE must be none, month or day, not '{by_date}'.")
+        if not 0 <= hex_levels <= 4:
+            raise ValueError("UPLOAD_SHARD_HEX_LEVELS must be between 0 and 4.")
+        self.by_date = by_date
+        self.hex_levels = hex_levels
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ShardLayout) and (self.by_date, self.hex_levels) == (other.by_date, other.hex_levels)
+
+    def __repr__(self) -> str:
+        return f"ShardLayout(by_date={self.by_date!r}, hex_levels={self.hex_levels})"
+
+    @property
+    def depth(self) -> int:
+        """Number of directory levels between the upload directory and a file."""
+        return {"none": 0, "month": 2, "day": 3}[self.by_date] + self.hex_levels
+
+    def shard_dirs(self, saved_as: str) -> List[str]:
+        """Return the directory components a saved name is stored under (empty = top level)."""
+        match = _NAME_RE.match(saved_as)
+        if match is None:
+            return []
+        year, month, day, unique, _ = match.groups()
+        dirs = []
+        if self.by_date != "none":
+            dirs += [year, month]
+            if self.by_date == "day":
+                dirs.append(day)
+        dirs += [unique[2 * i:2 * i + 2] for i in range(self.hex_levels)]
+        return dirs
+
+    def relative_path(self, saved_as: str) -> str:
+        """Return the path of a saved name relative to the upload directory."""
+        return os.path.join(*self.shard_dirs(saved_as), saved_as)
+
+    def path(self, upload_dir: str, saved_as: str) -> str:
+        """Return where a saved name is stored under the current settings."""
+        return os.path.join(upload_dir, self.relative_path(saved_as))
+
+    def prepare(self, upload_dir: str, saved_as: str) -> str:
+        """Create the shard directory of a new file and return its path (blocking)."""
+        path = self.path(upload_dir, saved_as)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def resolve(self, upload_dir: str, saved_as: str) -> Optional[str]:
+        """
+        Return the existing path of a saved name, or None (blocking). Checks the
+        sharded location, then the flat one, then the sharded one again, so a file
+        moved by a concurrent reshard between the first two checks is still found.
+        """
+        if os.path.basename(saved_as) != saved_as or saved_as.startswith("."):
+            return None
+        sharded = self.path(upload_dir, saved_as)
+        flat = os.path.join(upload_dir, saved_as)
+        for candidate in (sharded, flat, sharded):
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+
+def iter_stored_files(upload_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yield (saved name, path) of every stored file, skipping internal dot entries (blocking)."""
+    stack = [upload_dir]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.name, entry.path
+
+
+def read_layout_marker(upload_dir: str) -> Optional[ShardLayout]:
+    """Return the layout recorded in a root's marker, or None if it has none (blocking)."""
+    try:
+        with open(os.path.join(upload_dir, LAYOUT_MARKER), encoding="utf-8") as f:
+            recorded = json.load(f)
+    except FileNotFoundError:
+        return None
+    return ShardLayout(recorded["by_date"], int(recorded["hex_levels"]))
+
+
+def write_layout_marker(upload_dir: str, layout: ShardLayout) -> None:
+    """Record the layout of a root, replacing the marker atomically (blocking)."""
+    path = os.path.join(upload_dir, LAYOUT_MARKER)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"by_date": layout.by_date, "hex_levels": layout.hex_levels}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def check_layout(upload_dir: str, layout: ShardLayout) -> None:
+    """
+    Make sure the stored files of a root can be found under layout, then record it
+    (blocking). Raises LayoutMismatchError when the marker names another sharded
+    layout; a flat one is fine since resolve() falls back to it. A root without a
+    marker is checked by sampling its sharded files.
+    """
+    recorded = read_layout_marker(upload_dir)
+    if recorded == layout:
+        return
+    if recorded is not None and recorded.depth:
+        raise LayoutMismatchError(
+            f"{upload_dir} is stored in {recorded}, but {layout} is configured. Restore the previous "
+            "UPLOAD_SHARD_* settings, or stop the server and run `python -m src.api.layout reshard` first."
+        )
+    if recorded is None:
+        for count, (saved_as, path) in enumerate(iter_stored_files(upload_dir)):
+            if count >= _UNMARKED_SAMPLE:
+                break
+            if path not in (os.path.join(upload_dir, saved_as), layout.path(upload_dir, saved_as)):
+                raise LayoutMismatchError(
+                    f"{path} is not where {layout} stores it. Run `python -m src.api.layout reshard` with the "
+                    "configured UPLOAD_SHARD_* settings before starting the server."
+                )
+    logger.info("Recording %s as the layout of %s.", layout, upload_dir)
+    write_layout_marker(upload_dir, layout)
+
+
+def _remove_empty_dirs(upload_dir: str, keep_depth: int) -> None:
+    """
+    Remove empty directories nested deeper than keep_depth levels. Shallower ones may
+    be shard directories of the current layout that the server is about to use.
+    """
+    candidates = []
+    for root, dirs, _ in os.walk(upload_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        depth = 0 if root == upload_dir else len(os.path.relpath(root, upload_dir).split(os.sep))
+        if depth >= keep_depth:
+            candidates.extend(os.path.join(root, d) for d in dirs)
+    # Children before their parents.
+    for path in reversed(candidates):
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def reshard(
+    upload_dir: str, layout: "ShardLayout", dry_run: bool = False, batch: int = 1000, pause: float = 0.0
+) -> Tuple[int, int]:
+    """
+    Move every stored file to its location under layout and record it in the
+    marker (blocking). Returns (files moved, files already in place). Pauses for
+    `pause` seconds after every `batch` moves to limit the I/O impact on a live server.
+    """
+    # Collect first: renaming while scanning could visit a file twice.
+    files = list(iter_stored_files(upload_dir))
+    moved = in_place = 0
+    for saved_as, current in files:
+        target = layout.path(upload_dir, saved_as)
+        if os.path.abspath(current) == os.path.abspath(target):
+            in_place += 1
+            continue
+        moved += 1
+        if dry_run:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # rename() is atomic and keeps hard links (deduplicated content) intact.
+        os.rename(current, target)
+        if pause and moved % batch == 0:
+            time.sleep(pause)
+    if not dry_run:
+        _remove_empty_dirs(upload_dir, layout.depth)
+        write_layout_marker(upload_dir, layout)
+    return moved, in_place
+
+
+_layout: Optional[ShardLayout] = None
+
+
+# PUBLIC_INTERFACE
+def get_shard_layout() -> ShardLayout:
+    """Return the layout configured from the environment."""
+    global _layout
+    if _layout is None:
+        _layout = ShardLayout()
+    return _layout
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point: python -m src.api.layout reshard [--upload-dir DIR] [--dry-run]."""
+    parser = argparse.ArgumentParser(prog="python -m src.api.layout", description="Upload directory layout tools.")
+    parser.add_argument("command", choices=["reshard"], help="reshard: move stored files to the configured layout")
+    parser.add_argument("--upload-dir", default=os.getenv("UPLOAD_DIR", "./upload"))
+    parser.add_argument("--by-date", default=UPLOAD_SHARD_BY_DATE, choices=["none", "month", "day"])
+    parser.add_argument("--hex-levels", type=int, default=UPLOAD_SHARD_HEX_LEVELS)
+    parser.add_argument("--dry-run", action="store_true", help="only count the files that would move")
+    parser.add_argument("--batch", type=int, default=1000, help="files moved between pauses")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep after every batch")
+    args = parser.parse_args(argv)
+    layout = ShardLayout(args.by_date, args.hex_levels)
+    moved, in_place = reshard(args.upload_dir, layout, args.dry_run, max(1, args.batch), args.pause)
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"{verb} {moved} files; {in_place} already in place.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,140 @@
+import asyncio
+import hmac
+import json
+import logging
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, status, Request
+from fastapi import Depends, FastAPI, File, Header, Query, UploadFile, HTTPException, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.requests import ClientDisconnect
+
+from src.api.admission import DiskSpaceAdmissionMiddleware, RequestBodyTooLarge, RequestSizeLimitMiddleware
+from src.api.buffers import UPLOAD_CHUNK_MAX_BYTES, CoalescingWriter, get_buffer_pool
+from src.api.catalog import (
+    CATALOG_ENABLED,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    UploadCatalog,
+    catalog_path,
+    normalize_timestamp,
+)
+from src.api.content_store import (
+    CONTENT_BY_HASH_ENABLED,
+    CONTENT_DEDUP_ENABLED,
+    ContentStore,
+    StreamingDigest,
+    digest_file,
+    is_sha256,
+)
+from src.api.disk_space import DiskReservation, DiskSpaceGuard, InsufficientStorageError, is_out_of_space
+from src.api.durability import get_durability
+from src.api.io_executor import AsyncFile, get_io_executor, remove_file, shutdown_io_executor
+from src.api.jobs import JOBS_ENABLED, JobQueue
+from src.api.media import (
+    RangeNotSatisfiable,
+    StoredFileResponse,
+    guess_media_type,
+    not_modified,
+    parse_range,
+    range_applies,
+    validator_headers,
+)
+from src.api.metrics import (
+    CHUNK_READ_SECONDS,
+    COMMIT_SECONDS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    DURABILITY_SECONDS,
+    METRIC_PREFIX,
+    UPLOAD_ERRORS,
+    UploadMetricsMiddleware,
+    gauge_family,
+    get_metrics_registry,
+    timed_chunks,
+)
+from src.api.multipart_upload import MAX_PART_COUNT, MIN_PART_SIZE_BYTES, MultipartUpload, MultipartUploadStore
+from src.api.progress import (
+    COMPLETED,
+    FAILED,
+    PAUSED,
+    RECEIVING,
+    UploadProgress,
+    UploadProgressMiddleware,
+    get_progress_registry,
+)
+from src.api.ratelimit import BandwidthShapingMiddleware, get_bandwidth_shaper
+from src.api.recovery import PartReaper
+from src.api.resumable import ResumableSessionStore, UploadSession
+from src.api.scheduler import UploadSchedulerMiddleware, get_upload_scheduler
+from src.api.storage import ObjectWriter, get_storage
+from src.api.streaming import MultipartStreamError, iter_multipart
 
 # Constants
 MAX_FILE_SIZE_BYTES = 500 * 1024 * 1024  # 500 MB
 # Use a writable relative directory instead of an absolute root path to avoid PermissionError
 # The directory is relative to the working directory where the app is started.
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./upload")
+# Media type required for resumable PATCH bodies (as in the tus protocol).
+OFFSET_OCTET_STREAM = "application/offset+octet-stream"
+# Allowance for multipart framing (boundaries, part headers, small form fields) on top of the file size.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# Caps of POST /upload/batch: file parts per request, bytes per file and file bytes per request.
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "1000"))
+UPLOAD_BATCH_MAX_FILE_BYTES = min(
+    int(os.getenv("UPLOAD_BATCH_MAX_FILE_BYTES", str(MAX_FILE_SIZE_BYTES))), MAX_FILE_SIZE_BYTES
+)
+UPLOAD_BATCH_MAX_BYTES = int(os.getenv("UPLOAD_BATCH_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Received files of a batch being stored (published, synced, cataloged) while the next ones arrive.
+UPLOAD_BATCH_PARALLEL_COMMITS = max(1, int(os.getenv("UPLOAD_BATCH_PARALLEL_COMMITS", "16")))
+# Framing allowance per file part of a batch (boundary and part headers).
+BATCH_PART_OVERHEAD_BYTES = 1024
+# Body limit for all non-upload requests (JSON control endpoints).
+MAX_CONTROL_BODY_BYTES = 1024 * 1024
+# Seconds between events of the upload progress stream.
+PROGRESS_SSE_INTERVAL_SECONDS = float(os.getenv("PROGRESS_SSE_INTERVAL_SECONDS", "1.0"))
+# Seconds the progress stream waits for an upload that has not started yet.
+PROGRESS_SSE_WAIT_SECONDS = float(os.getenv("PROGRESS_SSE_WAIT_SECONDS", "10"))
+# Token expected in the X-Admin-Token header by /admin endpoints; they are disabled when unset.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Start the subsystems before the first request and stop them after the server has
+    drained in-flight requests: background tasks first, then pending syncs, then the
+    storage, catalog and I/O executor they write through.
+    """
+    ensure_upload_dir()
+    await start_metrics()
+    await start_progress_sharing()
+    await start_bandwidth_sync()
+    await start_part_reaper()
+    await start_job_queue()
+    try:
+        yield
+    finally:
+        cleanup_worker_part_files()
+        await stop_metrics()
+        await stop_progress_sharing()
+        await stop_bandwidth_sync()
+        await stop_part_reaper()
+        await stop_job_queue()
+        await drain_durability()
+        await close_storage()
+        close_catalog()
+        stop_io_executor()
+
 
 # Application with metadata and tags for OpenAPI
 app = FastAPI(
+    lifespan=lifespan,
     title="Video Upload Backend",
     description=(
         "REST API for uploading video files. "
@@ -34,10 +153,125 @@ app = FastAPI(
         {
             "name": "docs",
             "description": "Helpful documentation endpoints."
+        },
+        {
+            "name": "videos",
+            "description": "Download and playback of stored videos."
+        },
+        {
+            "name": "catalog",
+            "description": "Indexed lookup and listing of stored uploads."
+        },
+        {
+            "name": "jobs",
+            "description": "Background post-processing of uploaded videos."
+        },
+        {
+            "name": "admin",
+            "description": "Runtime configuration (requires ADMIN_TOKEN)."
         }
     ],
 )
 
+# Requests that carry upload data: (method, path regex, max body bytes).
+UPLOAD_DATA_ROUTES = [
+    ("POST", r"^/upload(/stream)?$", MAX_FILE_SIZE_BYTES + MULTIPART_OVERHEAD_BYTES),
+    (
+        "POST",
+        r"^/upload/batch$",
+        UPLOAD_BATCH_MAX_BYTES + MULTIPART_OVERHEAD_BYTES + UPLOAD_BATCH_MAX_FILES * BATCH_PART_OVERHEAD_BYTES,
+    ),
+    ("PATCH", r"^/uploads/[^/]+$", MAX_FILE_SIZE_BYTES),
+    ("PUT", r"^/multipart-uploads/[^/]+/parts/[^/]+$", MAX_FILE_SIZE_BYTES),
+]
+
+# Record body bytes of uploads that carry an X-Upload-Id header, and of resumable
+# PATCH requests, for GET /uploads/{id}/progress. Innermost, so it counts bytes
+# as the endpoint consumes them.
+app.add_middleware(
+    UploadProgressMiddleware,
+    registry=get_progress_registry(),
+    routes=[("POST", r"^/upload(/stream|/batch)?$"), ("PATCH", r"^/uploads/(?P<id>[0-9a-f]{32})$")],
+)
+
+# Pace upload bodies through the global and per-client token buckets. Added
+# first so that only requests admitted by the scheduler below are shaped.
+app.add_middleware(
+    BandwidthShapingMiddleware,
+    shaper=get_bandwidth_shaper(),
+    routes=[(method, pattern) for method, pattern, _ in UPLOAD_DATA_ROUTES],
+)
+
+async def _admit_ingest(nbytes: int) -> DiskReservation:
+    """
+    Reserve nbytes for a single-request upload on the root its file will be written to:
+    UPLOAD_DIR for the local backend, the root ShardedStorage.choose_root() picks for the
+    sharded one (the endpoint opens its writer there). Object stores use no local disk.
+    Raises InsufficientStorageError, answered with 507 by DiskSpaceAdmissionMiddleware.
+    """
+    try:
+        root = await storage.staging_root()
+    except OSError as exc:
+        if not is_out_of_space(exc):
+            raise
+        UPLOAD_ERRORS.labels("insufficient_storage").inc()
+        raise InsufficientStorageError("No storage root has enough free space.")
+    if root is None and storage.name != "local":
+        return DiskReservation(disk_guard, 0)
+    try:
+        return await disk_guards.get(root or UPLOAD_DIR, disk_guard).reserve(nbytes)
+    except InsufficientStorageError:
+        UPLOAD_ERRORS.labels("insufficient_storage").inc()
+        raise
+
+
+# Reserve the projected size of single-request uploads (Content-Length, or the cap
+# for chunked bodies) against free disk space and answer 507 before the body is
+# read; the endpoints would otherwise spool it first. Added before the scheduler so
+# that queued requests hold no reservation.
+app.add_middleware(
+    DiskSpaceAdmissionMiddleware,
+    reserve=_admit_ingest,
+    routes=[
+        ("POST", r"^/upload(/stream)?$", MAX_FILE_SIZE_BYTES),
+        ("POST", r"^/upload/batch$", UPLOAD_BATCH_MAX_BYTES),
+    ],
+)
+
+# Admit upload requests through the concurrency/fairness scheduler before their
+# body is read. Added before the size check so it runs inside it.
+app.add_middleware(
+    UploadSchedulerMiddleware,
+    scheduler=get_upload_scheduler(),
+    routes=[(method, pattern) for method, pattern, _ in UPLOAD_DATA_ROUTES],
+    default_bytes=MAX_FILE_SIZE_BYTES,
+)
+
+# Reject oversize bodies from Content-Length before any byte is read (and cut off
+# chunked bodies once they pass the limit). Registered before CORS so that CORS
+# headers are still added to the 413 responses.
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits=UPLOAD_DATA_ROUTES,
+    default_limit=MAX_CONTROL_BODY_BYTES,
+)
+
+# Measure upload requests end to end, including the 413/429 answers of the layers
+# above. Outermost upload middleware, so its timings cover admission as well.
+app.add_middleware(
+    UploadMetricsMiddleware,
+    routes=[
+        ("POST", r"^/upload$", "upload"),
+        ("POST", r"^/upload/stream$", "upload_stream"),
+        ("POST", r"^/upload/batch$", "upload_batch"),
+        ("POST", r"^/upload/by-hash$", "upload_by_hash"),
+        ("PATCH", r"^/uploads/[^/]+$", "resumable_patch"),
+        ("POST", r"^/uploads/[^/]+/complete$", "resumable_complete"),
+        ("PUT", r"^/multipart-uploads/[^/]+/parts/[^/]+$", "multipart_part"),
+        ("POST", r"^/multipart-uploads/[^/]+/complete$", "multipart_complete"),
+    ],
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Adjust in production to specific origins
@@ -59,6 +293,160 @@ class UploadResponse(BaseModel):
     size_bytes: int = Field(..., description="Size of the uploaded file in bytes.")
     content_type: Optional[str] = Field(None, description="Detected content type of the file.")
     upload_dir: str = Field(..., description="Directory path where file is saved.")
+    sha256: Optional[str] = Field(None, description="SHA-256 of the file content (hex).")
+    fast_hash: Optional[str] = Field(
+        None, description="Optional fast digest of the content (hex); algorithm set by UPLOAD_FAST_HASH."
+    )
+    deduplicated: bool = Field(
+        False, description="True if identical content was already stored and the file shares its storage."
+    )
+    job_id: Optional[str] = Field(
+        None, description="Post-processing job for the saved file (see GET /jobs/{job_id}); null if disabled."
+    )
+    durable: bool = Field(
+        False,
+        description="True if the file was flushed to stable storage before answering (see UPLOAD_DURABILITY).",
+    )
+
+
+class BatchUploadItem(BaseModel):
+    """Outcome of one file of a batch upload."""
+    index: int = Field(..., description="Position of the file among the file parts of the request (0-based).")
+    filename: Optional[str] = Field(None, description="Original filename submitted by the client.")
+    status_code: int = Field(
+        ...,
+        description="200 if the file was stored; otherwise the status it would have got on its own (413, 500, ...).",
+    )
+    detail: Optional[str] = Field(None, description="Why the file was not stored.")
+    upload: Optional[UploadResponse] = Field(None, description="The stored file; null if it failed.")
+
+
+class BatchUploadResponse(BaseModel):
+    """Per-file results of a batch upload, in request order."""
+    stored: int = Field(..., description="Number of files stored.")
+    failed: int = Field(..., description="Number of files not stored.")
+    items: List[BatchUploadItem] = Field(..., description="One entry per file part.")
+
+
+class CatalogEntry(BaseModel):
+    """Catalog record of a stored upload."""
+    saved_as: str = Field(..., description="Saved filename on server.")
+    filename: str = Field(..., description="Original filename submitted by the client.")
+    size_bytes: int = Field(..., description="Size of the file in bytes.")
+    content_type: Optional[str] = Field(None, description="Content type of the file.")
+    sha256: Optional[str] = Field(None, description="SHA-256 of the content (hex), if known.")
+    fast_hash: Optional[str] = Field(None, description="Fast digest of the content (hex), if computed.")
+    deduplicated: bool = Field(False, description="True if the file shares storage with identical content.")
+    job_id: Optional[str] = Field(None, description="Post-processing job of the file.")
+    created_at: str = Field(..., description="UTC time the file was stored (ISO 8601).")
+
+
+class CatalogPage(BaseModel):
+    """One page of catalog entries, newest first."""
+    items: List[CatalogEntry] = Field(..., description="Entries of this page.")
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to fetch the next page; null on the last page.")
+
+
+class JobStageResponse(BaseModel):
+    """State of one post-processing stage."""
+    status: str = Field(..., description="queued, running, succeeded, failed or skipped.")
+    attempts: int = Field(..., description="Number of times the stage has been started.")
+    error: Optional[str] = Field(None, description="Error of the last failed attempt, or why the stage was skipped.")
+    result: Optional[Dict[str, Any]] = Field(None, description="Stage output (e.g. probed metadata, checksum).")
+
+
+class JobResponse(BaseModel):
+    """State of a post-processing job."""
+    job_id: str = Field(..., description="Identifier of the job.")
+    saved_as: str = Field(..., description="Saved filename the job processes.")
+    status: str = Field(..., description="queued, running, succeeded or failed.")
+    created_at: str = Field(..., description="UTC time the job was created.")
+    updated_at: str = Field(..., description="UTC time of the last state change.")
+    stages: Dict[str, JobStageResponse] = Field(..., description="Stages in pipeline order.")
+
+
+class UploadByHashRequest(BaseModel):
+    """Request body to save a file whose content is already stored on the server."""
+    sha256: str = Field(..., description="SHA-256 of the content (hex).")
+    filename: str = Field(..., description="Original filename of the video.")
+    content_type: Optional[str] = Field(None, description="Content type of the file.")
+
+
+class BandwidthLimits(BaseModel):
+    """Upload bandwidth limits in bytes per second (0 = unlimited)."""
+    global_bytes_per_sec: int = Field(0, ge=0, description="Aggregate upload bandwidth of one worker.")
+    per_client_bytes_per_sec: int = Field(0, ge=0, description="Default upload bandwidth per client.")
+    client_overrides: Dict[str, int] = Field(
+        default_factory=dict,
+        description=(
+            "Per-client limits keyed by client: 'ip:<address>', or 'key:<value>' of UPLOAD_CLIENT_KEY_HEADER when "
+            "a trusted proxy sets it."
+        ),
+    )
+
+
+class StoredObjectResponse(BaseModel):
+    """Information about stored content identified by its SHA-256."""
+    sha256: str = Field(..., description="SHA-256 of the content (hex).")
+    size_bytes: int = Field(..., description="Size of the content in bytes.")
+    references: int = Field(..., description="Number of saved files sharing this content.")
+
+
+class CreateResumableUploadRequest(BaseModel):
+    """Request body to create a resumable upload session."""
+    filename: str = Field(..., description="Original filename of the video.")
+    size_bytes: int = Field(..., ge=1, description="Total size of the file in bytes.")
+    content_type: Optional[str] = Field(None, description="Content type of the file.")
+
+
+class ResumableUploadResponse(BaseModel):
+    """State of a resumable upload session."""
+    upload_id: str = Field(..., description="Identifier of the upload session.")
+    filename: str = Field(..., description="Original filename submitted by the client.")
+    size_bytes: int = Field(..., description="Declared total size of the file in bytes.")
+    offset: int = Field(..., description="Number of bytes received so far; the next PATCH must start here.")
+    content_type: Optional[str] = Field(None, description="Declared content type of the file.")
+    expires_at: str = Field(..., description="UTC time after which the session is discarded.")
+
+
+class UploadProgressResponse(BaseModel):
+    """Progress of an upload in flight (or just finished)."""
+    upload_id: str = Field(..., description="X-Upload-Id of the upload, or the resumable session id.")
+    state: str = Field(..., description="receiving, paused (resumable, between requests), completed or failed.")
+    bytes_received: int = Field(..., description="Body bytes received so far.")
+    total_bytes: Optional[int] = Field(None, description="Expected bytes (Content-Length, or the session size).")
+    percent: Optional[float] = Field(None, description="bytes_received as a percentage of total_bytes.")
+    bytes_per_sec: int = Field(..., description="Current receive rate (0 unless receiving).")
+    eta_seconds: Optional[float] = Field(None, description="Estimated seconds until all bytes are received.")
+    elapsed_seconds: float = Field(..., description="Seconds since the current request started.")
+
+
+class CreateMultipartUploadRequest(BaseModel):
+    """Request body to initiate a parallel multi-part upload."""
+    filename: str = Field(..., description="Original filename of the video.")
+    size_bytes: int = Field(..., ge=1, description="Total size of the file in bytes.")
+    part_size_bytes: int = Field(
+        8 * 1024 * 1024, ge=1, description="Size of every part except the last, which holds the remainder."
+    )
+    content_type: Optional[str] = Field(None, description="Content type of the file.")
+
+
+class MultipartUploadResponse(BaseModel):
+    """State of a parallel multi-part upload."""
+    upload_id: str = Field(..., description="Identifier of the multi-part upload.")
+    filename: str = Field(..., description="Original filename submitted by the client.")
+    size_bytes: int = Field(..., description="Declared total size of the file in bytes.")
+    part_size_bytes: int = Field(..., description="Size of every part except the last.")
+    part_count: int = Field(..., description="Number of parts the file is split into (numbered from 1).")
+    parts_received: List[int] = Field(..., description="Part numbers that have been fully received.")
+    content_type: Optional[str] = Field(None, description="Declared content type of the file.")
+    expires_at: str = Field(..., description="UTC time after which the upload is discarded.")
+
+
+class MultipartPartResponse(BaseModel):
+    """Acknowledgement of a received part."""
+    part_number: int = Field(..., description="The part number that was stored.")
+    size_bytes: int = Field(..., description="Size of the stored part in bytes.")
 
 
 # PUBLIC_INTERFACE
@@ -68,15 +456,159 @@ def health_check():
     return {"message": "Healthy"}
 
 
-# Ensure upload directory exists on startup
-@app.on_event("startup")
+resumable_store = ResumableSessionStore(UPLOAD_DIR)
+multipart_store = MultipartUploadStore(UPLOAD_DIR)
+job_queue = JobQueue(UPLOAD_DIR)
+catalog = UploadCatalog(catalog_path(UPLOAD_DIR))
+# Where saved files are stored (STORAGE_BACKEND; see src/api/storage.py).
+storage = get_storage()
+# Free space admission per directory uploads are staged in: UPLOAD_DIR and each storage root,
+# which may be separate filesystems with the sharded backend.
+disk_guards = {path: DiskSpaceGuard(path) for path in dict.fromkeys([UPLOAD_DIR, *storage.part_dirs()])}
+disk_guard = disk_guards[UPLOAD_DIR]
+# When finalized files are flushed to stable storage (UPLOAD_DURABILITY; see src/api/durability.py).
+durability = get_durability()
+# Shard directories created below these roots are synced into their parents too.
+durability.roots = storage.part_dirs()
+# Reclaims '.part' files and sessions left behind by crashed workers (see src/api/recovery.py).
+part_reaper = PartReaper(
+    UPLOAD_DIR,
+    storage.part_dirs(),
+    resumable_store,
+    multipart_store,
+    content_stores=[store for _, store in storage.content_stores()],
+)
+metrics_registry = get_metrics_registry()
+
+
+def _collect_runtime_metrics() -> Dict[str, Dict[str, Any]]:
+    """Expose state kept by other subsystems as metrics at scrape time."""
+    io = get_io_executor().stats()
+    scheduler = get_upload_scheduler().stats()
+    pool = get_buffer_pool().stats()
+    reaper = part_reaper.stats()
+    families = {
+        "io_queue_depth": gauge_family("Disk operations queued on the I/O executor.", io["queue_depth"]),
+        "io_running": gauge_family("Disk operations running on the I/O executor.", io["running"]),
+        "io_failed_total": gauge_family("Disk operations that raised.", io["failed"], "counter"),
+        "scheduler_active_uploads": gauge_family("Uploads admitted by the scheduler.", scheduler["active_uploads"]),
+        "scheduler_queued_uploads": gauge_family("Uploads waiting for a scheduler slot.", scheduler["queued_uploads"]),
+        "scheduler_rejected_total": gauge_family(
+            "Uploads rejected by the scheduler (429).", scheduler["rejected_uploads"], "counter"
+        ),
+        "buffer_pool_in_use_bytes": gauge_family("Ingest buffer memory in use.", pool["in_use_bytes"]),
+        "durability_lag": gauge_family(
+            "Acknowledged uploads not yet synced to stable storage.", durability.stats()["lag"]
+        ),
+        "reaper_reclaimed_bytes_total": gauge_family(
+            "Bytes of stale '.part' files reclaimed.", reaper["bytes_reclaimed"], "counter"
+        ),
+    }
+    return {METRIC_PREFIX + name: family for name, family in families.items()}
+
+
+metrics_registry.add_collector(_collect_runtime_metrics)
+
+
 def ensure_upload_dir() -> None:
-    """Create the upload directory if it does not exist."""
+    """Create the upload directory (and the resumable session directory) if it does not exist."""
     try:
         os.makedirs(UPLOAD_DIR, exist_ok=True)
+        resumable_store.ensure_dirs()
+        multipart_store.ensure_dirs()
+        storage.ensure_ready()
+        if JOBS_ENABLED:
+            job_queue.ensure_dirs()
+        if CATALOG_ENABLED:
+            catalog.initialize()
     except Exception as exc:  # pragma: no cover
         # Using startup exception helps surface misconfigurations early
         raise RuntimeError(f"Failed to ensure upload directory at {UPLOAD_DIR}: {exc}") from exc
+    if CONTENT_DEDUP_ENABLED and not storage.content_stores():
+        logging.getLogger(__name__).warning(
+            "CONTENT_DEDUP_ENABLED is set, but the %s backend has no content store: dedup is inactive.", storage.name
+        )
+
+
+async def start_metrics() -> None:
+    """Start sharing this worker's metrics with the others (METRICS_MULTIPROCESS_DIR)."""
+    await metrics_registry.start()
+
+
+async def start_progress_sharing() -> None:
+    """Start sharing this worker's upload progress with the others (PROGRESS_SHARED_DIR)."""
+    await get_progress_registry().start_sharing()
+
+
+async def start_bandwidth_sync() -> None:
+    """Apply the bandwidth limits published by any worker and keep following them (UPLOAD_BANDWIDTH_LIMITS_FILE)."""
+    await get_bandwidth_shaper().start_reloading()
+
+
+async def start_part_reaper() -> None:
+    """Recover from crashed workers (reclaim stale '.part' files, re-adopt live sessions) and start the periodic reaper."""
+    await part_reaper.start()
+
+
+async def start_job_queue() -> None:
+    """Start post-processing consumers and resume jobs left unfinished by a previous run."""
+    if JOBS_ENABLED:
+        await job_queue.start()
+
+
+def cleanup_worker_part_files() -> None:
+    """
+    Remove temp files of single-request uploads this worker did not finish.
+    Runs after the server has drained in-flight requests (see --graceful-timeout in
+    src/api/__main__.py), so anything left belongs to a cancelled upload.
+    Resumable and multi-part '.part' files are not touched: they must outlive the worker.
+    """
+    storage.cleanup()
+
+
+async def stop_metrics() -> None:
+    """Withdraw this worker's metrics snapshot."""
+    await metrics_registry.stop()
+
+
+async def stop_progress_sharing() -> None:
+    """Withdraw this worker's upload progress snapshot."""
+    await get_progress_registry().stop_sharing()
+
+
+async def stop_bandwidth_sync() -> None:
+    """Stop following the shared bandwidth limits."""
+    await get_bandwidth_shaper().stop_reloading()
+
+
+async def stop_part_reaper() -> None:
+    """Stop the periodic stale part reaper."""
+    await part_reaper.stop()
+
+
+async def stop_job_queue() -> None:
+    """Stop post-processing; interrupted jobs are resumed on the next start."""
+    await job_queue.stop()
+
+
+async def drain_durability() -> None:
+    """Sync finalized files still waiting for a group or background commit."""
+    await durability.drain()
+
+
+async def close_storage() -> None:
+    """Close connections to the storage backend."""
+    await storage.close()
+
+
+def close_catalog() -> None:
+    """Close the catalog database connections."""
+    catalog.close()
+
+
+def stop_io_executor() -> None:
+    """Wait for queued disk operations to finish and stop the I/O threads."""
+    shutdown_io_executor()
 
 
 def _safe_destination_filename(original_name: str) -> str:
@@ -92,48 +624,309 @@ def _safe_destination_filename(original_name: str) -> str:
     return f"{ts}_{unique}{ext}"
 
 
-async def _enforce_file_size(file: UploadFile) -> int:
+async def _abort_writer(writer: Optional[ObjectWriter]) -> None:
+    """Discard a partially written object; errors are logged, the original failure is what matters."""
+    if writer is None:
+        return
+    try:
+        await writer.abort()
+    except Exception:  # pragma: no cover
+        logging.getLogger(__name__).exception("Failed to discard partial upload %s", writer.saved_as)
+
+
+def _insufficient_storage(detail: str) -> HTTPException:
+    """Build the 507 error raised when the upload filesystem cannot take more data."""
+    UPLOAD_ERRORS.labels("insufficient_storage").inc()
+    return HTTPException(status_code=status.HTTP_507_INSUFFICIENT_STORAGE, detail=detail)
+
+
+def _receive_failed(exc: Exception) -> HTTPException:
+    """Map an error raised while receiving file data to 413 (body limit), 507 (disk full) or 500."""
+    if isinstance(exc, RequestBodyTooLarge):
+        # Cut off by RequestSizeLimitMiddleware, which sends the 413 to the client itself.
+        UPLOAD_ERRORS.labels("too_large").inc()
+        return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
+    if is_out_of_space(exc):
+        return _insufficient_storage("Insufficient storage to receive the file.")
+    UPLOAD_ERRORS.labels("receive_failed").inc()
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Failed to receive file data: {exc}",
+    )
+
+
+async def _reserve_disk_space(nbytes: int, root: Optional[str] = None) -> DiskReservation:
+    """Admit an upload of nbytes against free space in root (a staging root; UPLOAD_DIR if None) or raise 507."""
+    try:
+        return await disk_guards.get(root or UPLOAD_DIR, disk_guard).reserve(nbytes)
+    except InsufficientStorageError as exc:
+        raise _insufficient_storage(str(exc))
+
+
+def _ingest_root(request: Request) -> Optional[str]:
+    """Return the root DiskSpaceAdmissionMiddleware reserved the upload's space on, if any."""
+    reservation = getattr(request.state, "disk_reservation", None)
+    return reservation.root if reservation is not None and reservation.nbytes else None
+
+
+async def _staging_root() -> Optional[str]:
+    """Pick the directory of a new session's '.part' file, or raise 507 if no storage root has room."""
+    try:
+        return await storage.staging_root()
+    except OSError as exc:
+        if is_out_of_space(exc):
+            raise _insufficient_storage("No storage root has enough free space.")
+        raise
+
+
+def _declared_body_length(request: Request) -> Optional[int]:
+    """Return the request's Content-Length, or None for chunked/invalid values."""
+    value = request.headers.get("content-length")
+    if value is None or not value.isdigit():
+        return None
+    return int(value)
+
+
+def _file_too_large() -> HTTPException:
+    """Build the 413 error raised when an upload exceeds MAX_FILE_SIZE_BYTES."""
+    UPLOAD_ERRORS.labels("too_large").inc()
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Max allowed size is {MAX_FILE_SIZE_BYTES} bytes (500MB).",
+    )
+
+
+async def _enforce_file_size(file: UploadFile, writer: ObjectWriter) -> int:
     """
-    Read the incoming file in chunks to enforce size limit and write to a temp file.
-    Returns the total size if within limit. Raises HTTPException otherwise.
+    Read the incoming file in chunks to enforce size limit and stream it into the storage writer.
+    Returns the total size if within limit. Raises HTTPException otherwise, after aborting the writer.
 
-    We stream to disk to avoid loading entire file into memory.
+    We stream to storage to avoid loading entire file into memory. All disk calls run
+    on the I/O executor so a slow disk does not block the event loop; the writer
+    hashes each chunk on its way. The body is already spooled to a local file, so
+    its read rate says nothing about the client: chunks are always
+    UPLOAD_CHUNK_MAX_BYTES, read with readinto() into one pooled buffer, so no
+    memory is allocated per chunk.
     """
-    chunk_size = 1024 * 1024  # 1MB
+    pool = get_buffer_pool()
+    buf = pool.acquire(UPLOAD_CHUNK_MAX_BYTES)
     total = 0
-    tmp_path = os.path.join(UPLOAD_DIR, f".uploading_{uuid.uuid4().hex}.part")
-    try:
-        with open(tmp_path, "wb") as out:
-            while True:
-                chunk = await file.read(chunk_size)
-                if not chunk:
-                    break
-                total += len(chunk)
-                if total > MAX_FILE_SIZE_BYTES:
-                    # Stop early if exceeding limit
-                    raise HTTPException(
-                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                        detail=f"File too large. Max allowed size is {MAX_FILE_SIZE_BYTES} bytes (500MB).",
-                    )
-                out.write(chunk)
+    io = get_io_executor()
+    read_seconds = CHUNK_READ_SECONDS.labels("upload")
+    try:
+        if file.size is not None and file.size <= MAX_FILE_SIZE_BYTES:
+            await writer.preallocate(file.size)
+        view = memoryview(buf)[:UPLOAD_CHUNK_MAX_BYTES]
+        while True:
+            started = time.monotonic()
+            n = await io.run(file.file.readinto, view)
+            read_seconds.observe(time.monotonic() - started)
+            if not n:
+                break
+            total += n
+            if total > MAX_FILE_SIZE_BYTES:
+                # Stop early if exceeding limit
+                raise _file_too_large()
+            await writer.write(view[:n])
     except HTTPException:
         # Cleanup partial file on size violation
         try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+            await _abort_writer(writer)
         finally:
             raise
     except Exception as exc:
         # Cleanup on any other read/write error
         try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+            await _abort_writer(writer)
+        finally:
+            raise _receive_failed(exc)
+    finally:
+        pool.release(buf)
+    return total
+
+
+async def _open_writer(
+    original_name: str, content_type: Optional[str] = None, staging_dir: Optional[str] = None
+) -> ObjectWriter:
+    """Start storing a new file under a fresh unique name. Raises HTTPException (507/500) on failure."""
+    try:
+        return await storage.open_writer(_safe_destination_filename(original_name), content_type, staging_dir)
+    except Exception as exc:
+        raise _receive_failed(exc)
+
+
+async def _persist_upload(saved_as: str) -> bool:
+    """
+    Apply UPLOAD_DURABILITY to a just-published file and return whether it is on
+    stable storage. If syncing fails, the file is removed and HTTPException (500)
+    is raised, so an upload is never acknowledged as durable when it is not.
+    """
+    if durability.mode == "none" or not storage.local:
+        return not storage.local
+    path = await get_io_executor().run(storage.locate, saved_as)
+    if path is None:  # pragma: no cover - removed underneath us
+        return False
+    started = time.monotonic()
+    try:
+        durable = await durability.persist(path)
+    except Exception as exc:
+        UPLOAD_ERRORS.labels("durability_failed").inc()
+        try:
+            await storage.delete(saved_as)
+        finally:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to persist file: {exc}",
+            )
+    DURABILITY_SECONDS.observe(time.monotonic() - started)
+    return durable
+
+
+async def _commit_upload(writer: ObjectWriter) -> Tuple[str, bool, bool]:
+    """
+    Publish a fully received file in the storage backend and make it durable.
+    Returns (saved filename, deduplicated, durable). Raises HTTPException (500) if storing fails.
+    """
+    started = time.monotonic()
+    try:
+        deduplicated = await writer.commit()
+    except Exception as exc:
+        UPLOAD_ERRORS.labels("commit_failed").inc()
+        try:
+            await _abort_writer(writer)
+        finally:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to save file: {exc}",
+            )
+    COMMIT_SECONDS.observe(time.monotonic() - started)
+    return writer.saved_as, deduplicated, await _persist_upload(writer.saved_as)
+
+
+async def _finalize_upload(
+    tmp_path: str,
+    original_name: str,
+    digest: Optional[StreamingDigest] = None,
+    content_type: Optional[str] = None,
+) -> Tuple[str, bool, bool]:
+    """
+    Hand a '.part' file assembled over several requests (resumable and multi-part
+    uploads) to the storage backend under a new, uniquely named destination on the
+    same storage root as the '.part' file, so it is moved with a rename.
+    With a local backend, content dedup enabled and a digest available, identical
+    content already stored is shared via a hard link instead of keeping a second copy.
+    The stored file is then made durable per UPLOAD_DURABILITY.
+    Returns (saved filename, deduplicated, durable). Raises HTTPException (500) if storing fails.
+    """
+    started = time.monotonic()
+    try:
+        final_name = await storage.assign_name(_safe_destination_filename(original_name), os.path.dirname(tmp_path))
+        deduplicated = await storage.put_file(tmp_path, final_name, digest.sha256 if digest else None, content_type)
+    except Exception as exc:
+        UPLOAD_ERRORS.labels("commit_failed").inc()
+        # Cleanup temp file if storing fails
+        try:
+            await remove_file(tmp_path)
         finally:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to receive file data: {exc}",
+                detail=f"Failed to save file: {exc}",
             )
-    return total, tmp_path
+    COMMIT_SECONDS.observe(time.monotonic() - started)
+    return final_name, deduplicated, await _persist_upload(final_name)
+
+
+async def _enqueue_post_processing(final_name: str) -> Optional[str]:
+    """
+    Queue post-processing for a saved file and return the job id (None if disabled).
+    The file is already stored at this point, so failing to queue the job does not fail the upload.
+    """
+    if not JOBS_ENABLED:
+        return None
+    try:
+        job = await job_queue.submit(final_name)
+    except Exception:  # pragma: no cover
+        logging.getLogger(__name__).exception("Failed to queue post-processing for %s", final_name)
+        return None
+    return job.id
+
+
+async def _record_upload(response: UploadResponse) -> None:
+    """
+    Add a saved file to the catalog. Like job submission, a failure here is logged
+    and does not fail the upload; `python -m src.api.catalog backfill` can add it later.
+    """
+    if not CATALOG_ENABLED:
+        return
+    try:
+        await catalog.record(response.model_dump(exclude={"upload_dir"}))
+    except Exception:  # pragma: no cover
+        logging.getLogger(__name__).exception("Failed to catalog %s", response.saved_as)
+
+
+async def _stream_multipart_to_storage(request: Request, preallocate_bytes: int = 0) -> tuple:
+    """
+    Parse the multipart body straight from the request stream and write the 'file'
+    field into a storage writer, enforcing MAX_FILE_SIZE_BYTES as bytes arrive.
+    If preallocate_bytes is set, the local '.part' file is preallocated to that size
+    and trimmed to the received size at the end.
+
+    Unlike the UploadFile path, the body is never spooled by Starlette first, so
+    every byte is written to storage exactly once. Small network reads are coalesced
+    into pooled buffers so each write covers an adaptively sized chunk.
+    Returns (total_size, writer, part); the caller commits the writer.
+    Raises HTTPException on failure.
+    """
+    writer = None
+    coalescer = None
+    part = None
+    total = 0
+    in_file_part = False
+    try:
+        async for kind, payload in timed_chunks(iter_multipart(request), CHUNK_READ_SECONDS.labels("upload_stream")):
+            if kind == "part":
+                in_file_part = part is None and payload.name == "file" and payload.is_file
+                if in_file_part:
+                    part = payload
+                    writer = await storage.open_writer(
+                        _safe_destination_filename(part.filename or "upload.bin"),
+                        part.content_type or None,
+                        _ingest_root(request),
+                    )
+                    coalescer = CoalescingWriter(writer.write, get_buffer_pool())
+                    await writer.preallocate(preallocate_bytes)
+            elif kind == "data":
+                if not in_file_part:
+                    # Other form fields are not used by this endpoint; discard them.
+                    continue
+                total += len(payload)
+                if total > MAX_FILE_SIZE_BYTES:
+                    raise _file_too_large()
+                await coalescer.write(payload)
+            elif kind == "end":
+                in_file_part = False
+        if part is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file part provided.")
+        await coalescer.flush()
+    except HTTPException:
+        try:
+            await _abort_writer(writer)
+        finally:
+            raise
+    except MultipartStreamError as exc:
+        try:
+            await _abort_writer(writer)
+        finally:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except Exception as exc:
+        try:
+            await _abort_writer(writer)
+        finally:
+            raise _receive_failed(exc)
+    finally:
+        if coalescer is not None:
+            coalescer.close()
+    return total, writer, part
 
 
 # PUBLIC_INTERFACE
@@ -145,6 +938,7 @@ async def _enforce_file_size(file: UploadFile) -> int:
         413: {"model": ErrorResponse, "description": "Payload Too Large"},
         415: {"model": ErrorResponse, "description": "Unsupported Media Type"},
         500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        507: {"model": ErrorResponse, "description": "Insufficient Storage"},
     },
     tags=["uploads"],
     summary="Upload a video file (max 500MB)",
@@ -153,11 +947,14 @@ async def _enforce_file_size(file: UploadFile) -> int:
         "The file is validated to be at most 500MB. On success, it is saved into the configured upload directory."
     ),
 )
-async def upload_video(file: UploadFile = File(..., description="The video file to upload.")) -> UploadResponse:
+async def upload_video(
+    request: Request, file: UploadFile = File(..., description="The video file to upload.")
+) -> UploadResponse:
     """
     Upload a video file up to 500MB. The file must be provided as multipart/form-data with field name 'file'.
 
     Parameters:
+    - request: Request - The raw request; carries the disk reservation made before the body was read.
     - file: UploadFile - The file uploaded by the client.
 
     Returns:
@@ -180,54 +977,1584 @@ async def upload_video(file: UploadFile = File(..., description="The video file
         # raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Only video files are allowed.")
         pass
 
-    # Stream-read and enforce the size limit into a temporary file
-    total_size, tmp_path = await _enforce_file_size(file)
+    # Stream-read and enforce the size limit into the storage backend, on the root whose
+    # space DiskSpaceAdmissionMiddleware reserved before the body was read
+    writer = await _open_writer(file.filename or "upload.bin", content_type or None, _ingest_root(request))
+    total_size = await _enforce_file_size(file, writer)
+    digest = writer.digest
 
-    # Now finalize: move temp file to final destination with a safe unique name
-    final_name = _safe_destination_filename(file.filename or "upload.bin")
-    dest_path = os.path.join(UPLOAD_DIR, final_name)
+    # Now finalize: publish the file under its safe unique name
+    final_name, deduplicated, durable = await _commit_upload(writer)
+    job_id = await _enqueue_post_processing(final_name)
 
-    try:
-        os.replace(tmp_path, dest_path)
-    except Exception as exc:
-        # Cleanup temp file if move fails
-        try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        finally:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to save file: {exc}",
-            )
-
-    return UploadResponse(
+    response = UploadResponse(
         filename=file.filename or final_name,
         saved_as=final_name,
         size_bytes=total_size,
         content_type=content_type if content_type else None,
         upload_dir=UPLOAD_DIR,
+        sha256=digest.sha256,
+        fast_hash=digest.fast_hash,
+        deduplicated=deduplicated,
+        job_id=job_id,
+        durable=durable,
     )
+    await _record_upload(response)
+    return response
 
 
 # PUBLIC_INTERFACE
-@app.get(
-    "/docs/usage",
-    tags=["docs"],
-    summary="Upload API usage",
-    description="Provides example curl command for uploading a file to the API.",
+@app.post(
+    "/upload/stream",
+    response_model=UploadResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        413: {"model": ErrorResponse, "description": "Payload Too Large"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        507: {"model": ErrorResponse, "description": "Insufficient Storage"},
+    },
+    tags=["uploads"],
+    summary="Upload a video file without server-side spooling (max 500MB)",
+    description=(
+        "Same contract as POST /upload (multipart/form-data, field name 'file'), but the request body is parsed "
+        "incrementally and the file bytes are written straight into the destination temp file. Avoids writing "
+        "large uploads to disk twice."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {
+                            "file": {"type": "string", "format": "binary", "description": "The video file to upload."}
+                        },
+                    }
+                }
+            },
+        }
+    },
 )
-def docs_usage() -> dict:
-    """
-    Returns a simple usage example to assist clients with the upload endpoint.
+async def upload_video_stream(request: Request) -> UploadResponse:
     """
-    return {
-        "example_curl": (
-            "curl -X POST http://localhost:8000/upload "
+    Upload a video file up to 500MB by streaming the multipart body directly to disk.
+
+    Parameters:
+    - request: Request - The raw request; its body must be multipart/form-data with a 'file' part.
+
+    Returns:
+    - UploadResponse: Information about the saved file.
+
+    Errors:
+    - 400 if the body is not valid multipart/form-data or has no 'file' part.
+    - 413 if the file exceeds 500MB.
+    - 500 for server-side errors such as disk write failures.
+    """
+    # The body length bounds the file size, so it is the preallocation size (disk space for it
+    # was reserved by DiskSpaceAdmissionMiddleware).
+    expected = min(_declared_body_length(request) or MAX_FILE_SIZE_BYTES, MAX_FILE_SIZE_BYTES)
+    total_size, writer, part = await _stream_multipart_to_storage(request, preallocate_bytes=expected)
+    digest = writer.digest
+
+    final_name, deduplicated, durable = await _commit_upload(writer)
+    job_id = await _enqueue_post_processing(final_name)
+
+    response = UploadResponse(
+        filename=part.filename or final_name,
+        saved_as=final_name,
+        size_bytes=total_size,
+        content_type=part.content_type or None,
+        upload_dir=UPLOAD_DIR,
+        sha256=digest.sha256,
+        fast_hash=digest.fast_hash,
+        deduplicated=deduplicated,
+        job_id=job_id,
+        durable=durable,
+    )
+    await _record_upload(response)
+    return response
+
+
+def _batch_item_failed(item: BatchUploadItem, exc: HTTPException) -> None:
+    """Record why a file of a batch was not stored."""
+    item.status_code = exc.status_code
+    item.detail = str(exc.detail)
+
+
+def _batch_too_large(detail: str) -> HTTPException:
+    """Build the 413 error of a batch file over UPLOAD_BATCH_MAX_FILE_BYTES or past a request cap."""
+    UPLOAD_ERRORS.labels("too_large").inc()
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+async def _store_batch_item(item: BatchUploadItem, writer: ObjectWriter, part, size: int) -> None:
+    """Publish one received file of a batch and fill in its outcome; failures are recorded on the item."""
+    try:
+        digest = writer.digest
+        final_name, deduplicated, durable = await _commit_upload(writer)
+    except HTTPException as exc:
+        _batch_item_failed(item, exc)
+        return
+    except Exception as exc:  # pragma: no cover
+        logging.getLogger(__name__).exception("Failed to store batch file %s", writer.saved_as)
+        _batch_item_failed(item, HTTPException(status_code=500, detail=f"Failed to save file: {exc}"))
+        return
+    job_id = await _enqueue_post_processing(final_name)
+    response = UploadResponse(
+        filename=part.filename or final_name,
+        saved_as=final_name,
+        size_bytes=size,
+        content_type=part.content_type or None,
+        upload_dir=UPLOAD_DIR,
+        sha256=digest.sha256,
+        fast_hash=digest.fast_hash,
+        deduplicated=deduplicated,
+        job_id=job_id,
+        durable=durable,
+    )
+    await _record_upload(response)
+    item.status_code = status.HTTP_200_OK
+    item.upload = response
+
+
+async def _stream_batch_to_storage(request: Request, items: List[BatchUploadItem], commits: set) -> None:
+    """
+    Parse a multipart body with many file parts and write each into its own storage
+    writer as it arrives. When a file is complete, storing it (commit, durability,
+    job, catalog) starts as a task in commits, so it overlaps with receiving the next
+    file; at most UPLOAD_BATCH_PARALLEL_COMMITS run at once.
+
+    A file over UPLOAD_BATCH_MAX_FILE_BYTES, past UPLOAD_BATCH_MAX_FILES or
+    UPLOAD_BATCH_MAX_BYTES, or whose write fails is discarded and marked failed in
+    items; the rest of the batch continues. A malformed body stops the batch and
+    fails the file in progress (400 if no file part was seen at all). Other errors
+    (client disconnect, body limit) propagate after discarding the file in progress.
+    One coalescing buffer serves the whole request, so its chunk size carries over
+    from file to file.
+    """
+    writer: Optional[ObjectWriter] = None
+    item: Optional[BatchUploadItem] = None
+    part = None
+    size = 0
+    total = 0
+    slots = asyncio.Semaphore(UPLOAD_BATCH_PARALLEL_COMMITS)
+    coalescer = CoalescingWriter(lambda view: writer.write(view), get_buffer_pool())
+
+    async def discard(exc: HTTPException) -> None:
+        nonlocal writer
+        coalescer.close()
+        await _abort_writer(writer)
+        writer = None
+        _batch_item_failed(item, exc)
+
+    try:
+        async for kind, payload in timed_chunks(iter_multipart(request), CHUNK_READ_SECONDS.labels("upload_batch")):
+            if kind == "part":
+                item = None
+                if payload.name not in ("file", "files") or not payload.is_file:
+                    # Other form fields are not used by this endpoint; discard them.
+                    continue
+                part, size = payload, 0
+                item = BatchUploadItem(index=len(items), filename=part.filename, status_code=0)
+                items.append(item)
+                if len(items) > UPLOAD_BATCH_MAX_FILES:
+                    detail = f"Too many files in batch. Max allowed is {UPLOAD_BATCH_MAX_FILES} per request."
+                    _batch_item_failed(item, _batch_too_large(detail))
+                elif total >= UPLOAD_BATCH_MAX_BYTES:
+                    detail = f"Batch too large. Max allowed is {UPLOAD_BATCH_MAX_BYTES} bytes of files per request."
+                    _batch_item_failed(item, _batch_too_large(detail))
+                else:
+                    try:
+                        writer = await storage.open_writer(
+                            _safe_destination_filename(part.filename or "upload.bin"),
+                            part.content_type or None,
+                            _ingest_root(request),
+                        )
+                    except Exception as exc:
+                        _batch_item_failed(item, _receive_failed(exc))
+            elif kind == "data":
+                if writer is None:
+                    continue
+                size += len(payload)
+                total += len(payload)
+                if size > UPLOAD_BATCH_MAX_FILE_BYTES:
+                    await discard(_batch_too_large(
+                        f"File too large. Max allowed size is {UPLOAD_BATCH_MAX_FILE_BYTES} bytes per batch file."
+                    ))
+                    continue
+                if total > UPLOAD_BATCH_MAX_BYTES:
+                    await discard(_batch_too_large(
+                        f"Batch too large. Max allowed is {UPLOAD_BATCH_MAX_BYTES} bytes of files per request."
+                    ))
+                    continue
+                try:
+                    await coalescer.write(payload)
+                except Exception as exc:
+                    await discard(_receive_failed(exc))
+            elif kind == "end":
+                if writer is None:
+                    continue
+                try:
+                    await coalescer.flush()
+                except Exception as exc:
+                    await discard(_receive_failed(exc))
+                    continue
+                await slots.acquire()
+                task = asyncio.ensure_future(_store_batch_item(item, writer, part, size))
+                task.add_done_callback(lambda _: slots.release())
+                commits.add(task)
+                writer = None
+    except MultipartStreamError as exc:
+        if writer is not None:
+            await discard(HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)))
+        if not items:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except Exception:
+        await _abort_writer(writer)
+        raise
+    finally:
+        coalescer.close()
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file part provided.")
+
+
+# PUBLIC_INTERFACE
+@app.post(
+    "/upload/batch",
+    response_model=BatchUploadResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        413: {"model": ErrorResponse, "description": "Payload Too Large"},
+        507: {"model": ErrorResponse, "description": "Insufficient Storage"},
+    },
+    tags=["uploads"],
+    summary="Upload many video files in one request",
+    description=(
+        "Accepts multipart/form-data with any number of file parts named 'file' or 'files' (up to "
+        "UPLOAD_BATCH_MAX_FILES). Each file is streamed to storage as it is parsed and stored as soon as it is "
+        "complete. Files over UPLOAD_BATCH_MAX_FILE_BYTES, or past UPLOAD_BATCH_MAX_BYTES of files per request, "
+        "fail on their own without failing the batch; the response lists the outcome of every file in order."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["files"],
+                        "properties": {
+                            "files": {
+                                "type": "array",
+                                "items": {"type": "string", "format": "binary"},
+                                "description": "The video files to upload.",
+                            }
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_video_batch(request: Request) -> BatchUploadResponse:
+    """
+    Upload many video files in one multipart request, streaming each to storage as it is parsed.
+
+    Parameters:
+    - request: Request - The raw request; its body must be multipart/form-data with 'file' or 'files' parts.
+
+    Returns:
+    - BatchUploadResponse: Per-file status codes and UploadResponse of each stored file, in request order.
+
+    Errors:
+    - 400 if the body is not valid multipart/form-data or has no file part.
+    - 413 if the declared body exceeds the batch limits (individual files over a cap fail per item).
+    - 507 if the upload filesystem cannot take the batch.
+    """
+    # Disk space for the batch was reserved (and its root chosen) by DiskSpaceAdmissionMiddleware.
+    items: List[BatchUploadItem] = []
+    commits: set = set()
+    try:
+        await _stream_batch_to_storage(request, items, commits)
+    finally:
+        # Files received completely are stored even if the rest of the body failed.
+        if commits:
+            await asyncio.gather(*commits)
+    stored = sum(1 for item in items if item.status_code == status.HTTP_200_OK)
+    return BatchUploadResponse(stored=stored, failed=len(items) - stored, items=items)
+
+
+async def _completed_part_digest(part_path: str) -> Optional[StreamingDigest]:
+    """
+    Digest of a '.part' file assembled over several requests. Those uploads cannot be
+    hashed while streaming, so the file is read back once, and only when dedup needs it.
+    """
+    if not CONTENT_DEDUP_ENABLED:
+        return None
+    return await get_io_executor().run(digest_file, part_path)
+
+
+async def _load_resumable_session(upload_id: str) -> UploadSession:
+    """Load a resumable session or raise 404 (unknown) / 410 (expired)."""
+    session = await resumable_store.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found.")
+    if session.is_expired():
+        await resumable_store.delete(session)
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload session has expired.")
+    return session
+
+
+async def _resumable_offset(session: UploadSession) -> int:
+    """Return the current offset of a session; 410 if its '.part' file has disappeared."""
+    offset = await resumable_store.offset(session)
+    if offset is None:
+        await resumable_store.delete(session)
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload session data is no longer available.")
+    return offset
+
+
+def _resumable_response(session: UploadSession, offset: int) -> ResumableUploadResponse:
+    return ResumableUploadResponse(
+        upload_id=session.id,
+        filename=session.filename,
+        size_bytes=session.length,
+        offset=offset,
+        content_type=session.content_type,
+        expires_at=session.expires_at,
+    )
+
+
+# PUBLIC_INTERFACE
+@app.post(
+    "/uploads",
+    status_code=status.HTTP_201_CREATED,
+    response_model=ResumableUploadResponse,
+    responses={
+        413: {"model": ErrorResponse, "description": "Payload Too Large"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        507: {"model": ErrorResponse, "description": "Insufficient Storage"},
+    },
+    tags=["uploads"],
+    summary="Create a resumable upload session",
+    description=(
+        "Creates a resumable upload session for a file of the declared size. Send the data with PATCH "
+        "/uploads/{upload_id} in one or more chunks, query progress with HEAD, then finalize with "
+        "POST /uploads/{upload_id}/complete. Sessions survive server restarts."
+    ),
+)
+async def create_resumable_upload(body: CreateResumableUploadRequest, response: Response) -> ResumableUploadResponse:
+    """
+    Create a resumable upload session.
+
+    Parameters:
+    - body: CreateResumableUploadRequest - Filename, total size and optional content type.
+
+    Returns:
+    - ResumableUploadResponse: The new session (offset 0). The Location header points to the session URL.
+
+    Errors:
+    - 413 if the declared size exceeds 500MB.
+    - 500 if the session cannot be persisted.
+    """
+    if body.size_bytes > MAX_FILE_SIZE_BYTES:
+        raise _file_too_large()
+    # Chunks arrive over time, so only check that the whole file fits right now, where it is staged.
+    part_dir = await _staging_root()
+    (await _reserve_disk_space(body.size_bytes, part_dir)).release()
+    try:
+        session = await resumable_store.create(body.filename, body.size_bytes, body.content_type, part_dir=part_dir)
+    except Exception as exc:
+        if is_out_of_space(exc):
+            raise _insufficient_storage("Insufficient storage for the declared upload size.")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create upload session: {exc}",
+        )
+    response.headers["Location"] = f"/uploads/{session.id}"
+    return _resumable_response(session, 0)
+
+
+# PUBLIC_INTERFACE
+@app.head(
+    "/uploads/{upload_id}",
+    tags=["uploads"],
+    summary="Query the offset of a resumable upload",
+    description="Returns the current offset in the Upload-Offset header and the total size in Upload-Length.",
+)
+async def head_resumable_upload(upload_id: str) -> Response:
+    """Return the session offset and length as Upload-Offset / Upload-Length headers."""
+    session = await _load_resumable_session(upload_id)
+    offset = await _resumable_offset(session)
+    return Response(
+        status_code=status.HTTP_200_OK,
+        headers={
+            "Upload-Offset": str(offset),
+            "Upload-Length": str(session.length),
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/uploads/{upload_id}",
+    response_model=ResumableUploadResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        410: {"model": ErrorResponse, "description": "Gone"},
+    },
+    tags=["uploads"],
+    summary="Get a resumable upload session",
+    description="Returns the state of a resumable upload session, including the current offset.",
+)
+async def get_resumable_upload(upload_id: str) -> ResumableUploadResponse:
+    """Return the state of a resumable upload session."""
+    session = await _load_resumable_session(upload_id)
+    return _resumable_response(session, await _resumable_offset(session))
+
+
+# PUBLIC_INTERFACE
+@app.patch(
+    "/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        409: {"model": ErrorResponse, "description": "Offset mismatch or concurrent write"},
+        410: {"model": ErrorResponse, "description": "Gone"},
+        413: {"model": ErrorResponse, "description": "Payload Too Large"},
+        415: {"model": ErrorResponse, "description": "Unsupported Media Type"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        507: {"model": ErrorResponse, "description": "Insufficient Storage"},
+    },
+    tags=["uploads"],
+    summary="Append a chunk to a resumable upload",
+    description=(
+        f"Appends the raw request body (Content-Type: {OFFSET_OCTET_STREAM}) to the upload at the offset given in "
+        "the Upload-Offset header, which must equal the current server offset. If the connection drops, the bytes "
+        "received so far are kept; query HEAD /uploads/{upload_id} and resume from the returned offset."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {OFFSET_OCTET_STREAM: {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def patch_resumable_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0, description="Offset this chunk starts at."),
+) -> Response:
+    """
+    Append a chunk to a resumable upload.
+
+    Parameters:
+    - upload_id: str - The upload session id.
+    - request: Request - Raw body containing the chunk bytes.
+    - upload_offset: int - Upload-Offset header; must match the current server offset.
+
+    Returns:
+    - 204 response with the new offset in the Upload-Offset header.
+
+    Errors:
+    - 404/410 if the session is unknown or expired.
+    - 409 if the offset does not match or another request is writing to the session.
+    - 413 if the chunk would grow the upload past its declared size.
+    - 415 if the Content-Type is not application/offset+octet-stream.
+    """
+    media_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    if media_type != OFFSET_OCTET_STREAM:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be {OFFSET_OCTET_STREAM}.",
+        )
+    session = await _load_resumable_session(upload_id)
+    progress = get_progress_registry().get(upload_id)
+    if progress is not None and progress.state == RECEIVING:
+        progress.total = session.length
+    tmp_path = resumable_store.part_path(session)
+    try:
+        out = await AsyncFile.open(get_io_executor(), tmp_path, "ab")
+    except FileNotFoundError:
+        await resumable_store.delete(session)
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload session data is no longer available.")
+
+    try:
+        if not await out.try_lock():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another request is currently writing to this upload.",
+            )
+        total = await _resumable_offset(session)
+        if upload_offset != total:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload-Offset mismatch; current offset is {total}.",
+            )
+        writer = CoalescingWriter(out.write, get_buffer_pool())
+        try:
+            try:
+                async for chunk in timed_chunks(request.stream(), CHUNK_READ_SECONDS.labels("resumable_patch")):
+                    if total + len(chunk) > session.length:
+                        await writer.flush()
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Chunk exceeds the declared upload size of {session.length} bytes.",
+                        )
+                    await writer.write(chunk)
+                    total += len(chunk)
+            except ClientDisconnect:
+                # Keep what arrived; the client resumes from the persisted offset.
+                pass
+            await writer.flush()
+        except HTTPException:
+            raise
+        except Exception as exc:
+            raise _receive_failed(exc)
+        finally:
+            writer.close()
+    finally:
+        await out.close()
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Upload-Offset": str(total)})
+
+
+async def _progress_snapshot(upload_id: str) -> Optional[dict]:
+    """
+    Progress of an upload from this worker's registry, or another worker's with
+    PROGRESS_SHARED_DIR. Resumable sessions not receiving anywhere are reported
+    from their persisted offset.
+    """
+    snapshot = await get_progress_registry().lookup(upload_id)
+    if snapshot is not None:
+        return snapshot
+    session = await resumable_store.get(upload_id)
+    if session is None or session.is_expired():
+        return None
+    offset = await resumable_store.offset(session)
+    if offset is None:
+        return None
+    progress = UploadProgress(upload_id, session.length, offset)
+    progress.state = PAUSED
+    return progress.snapshot()
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/uploads/{upload_id}/progress",
+    response_model=UploadProgressResponse,
+    tags=["uploads"],
+    summary="Get upload progress",
+    description=(
+        "Returns bytes received, rate and ETA of an upload started with an X-Upload-Id header, "
+        "or of a resumable upload session."
+    ),
+    responses={404: {"model": ErrorResponse}},
+)
+async def get_upload_progress(upload_id: str) -> UploadProgressResponse:
+    """
+    Report the progress of an upload.
+
+    Parameters:
+    - upload_id: str - The X-Upload-Id sent with POST /upload or /upload/stream, or a resumable session id.
+
+    Returns:
+    - UploadProgressResponse: State, bytes received, expected total, rate and ETA.
+
+    Errors:
+    - 404 if no such upload is in progress (or finished recently) on this worker, or on any
+      worker when PROGRESS_SHARED_DIR is set.
+    """
+    snapshot = await _progress_snapshot(upload_id)
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+    return UploadProgressResponse(**snapshot)
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/uploads/{upload_id}/progress/stream",
+    tags=["uploads"],
+    summary="Stream upload progress (server-sent events)",
+    description=(
+        "Server-sent events with the same payload as GET /uploads/{upload_id}/progress, every "
+        "PROGRESS_SSE_INTERVAL_SECONDS until the upload completes or fails."
+    ),
+    response_class=StreamingResponse,
+)
+async def stream_upload_progress(upload_id: str, request: Request) -> StreamingResponse:
+    """
+    Stream the progress of an upload as server-sent events.
+
+    Parameters:
+    - upload_id: str - The X-Upload-Id of the upload, or a resumable session id.
+    - request: Request - Used to stop when the client disconnects.
+
+    Returns:
+    - text/event-stream of 'progress' events. The stream may be opened before the upload
+      request starts; it waits up to PROGRESS_SSE_WAIT_SECONDS for it, then sends an
+      'error' event and ends.
+    """
+
+    async def events():
+        waited = 0.0
+        while not await request.is_disconnected():
+            snapshot = await _progress_snapshot(upload_id)
+            if snapshot is None:
+                if waited >= PROGRESS_SSE_WAIT_SECONDS:
+                    yield f"event: error\ndata: {json.dumps({'detail': 'Upload not found.'})}\n\n"
+                    return
+                waited += PROGRESS_SSE_INTERVAL_SECONDS
+            else:
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot["state"] in (COMPLETED, FAILED):
+                    return
+            await asyncio.sleep(PROGRESS_SSE_INTERVAL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# PUBLIC_INTERFACE
+@app.post(
+    "/uploads/{upload_id}/complete",
+    response_model=UploadResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        409: {"model": ErrorResponse, "description": "Upload incomplete"},
+        410: {"model": ErrorResponse, "description": "Gone"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    tags=["uploads"],
+    summary="Finalize a resumable upload",
+    description="Moves a fully received resumable upload into the upload directory under a safe unique name.",
+)
+async def complete_resumable_upload(upload_id: str) -> UploadResponse:
+    """
+    Finalize a resumable upload once all bytes have been received.
+
+    Returns:
+    - UploadResponse: Information about the saved file.
+
+    Errors:
+    - 404/410 if the session is unknown or expired.
+    - 409 if the offset has not reached the declared size yet.
+    - 500 if the file cannot be moved into place.
+    """
+    session = await _load_resumable_session(upload_id)
+    offset = await _resumable_offset(session)
+    if offset != session.length:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: received {offset} of {session.length} bytes.",
+        )
+    part_path = resumable_store.part_path(session)
+    digest = await _completed_part_digest(part_path)
+    final_name, deduplicated, durable = await _finalize_upload(
+        part_path, session.filename or "upload.bin", digest, session.content_type
+    )
+    await resumable_store.delete(session, keep_part=True)
+    job_id = await _enqueue_post_processing(final_name)
+
+    response = UploadResponse(
+        filename=session.filename or final_name,
+        saved_as=final_name,
+        size_bytes=offset,
+        content_type=session.content_type,
+        upload_dir=UPLOAD_DIR,
+        sha256=digest.sha256 if digest else None,
+        fast_hash=digest.fast_hash if digest else None,
+        deduplicated=deduplicated,
+        job_id=job_id,
+        durable=durable,
+    )
+    await _record_upload(response)
+    return response
+
+
+# PUBLIC_INTERFACE
+@app.delete(
+    "/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={404: {"model": ErrorResponse, "description": "Not Found"}},
+    tags=["uploads"],
+    summary="Abort a resumable upload",
+    description="Discards a resumable upload session and the data received so far.",
+)
+async def delete_resumable_upload(upload_id: str) -> Response:
+    """Abort a resumable upload and remove its partial data."""
+    session = await resumable_store.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found.")
+    await resumable_store.delete(session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+async def _load_multipart_upload(upload_id: str) -> MultipartUpload:
+    """Load a multi-part upload or raise 404 (unknown) / 410 (expired)."""
+    upload = await multipart_store.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Multi-part upload not found.")
+    if upload.is_expired():
+        await multipart_store.delete(upload)
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Multi-part upload has expired.")
+    return upload
+
+
+async def _multipart_response(upload: MultipartUpload) -> MultipartUploadResponse:
+    return MultipartUploadResponse(
+        upload_id=upload.id,
+        filename=upload.filename,
+        size_bytes=upload.length,
+        part_size_bytes=upload.part_size,
+        part_count=upload.part_count,
+        parts_received=await multipart_store.received_parts(upload),
+        content_type=upload.content_type,
+        expires_at=upload.expires_at,
+    )
+
+
+# PUBLIC_INTERFACE
+@app.post(
+    "/multipart-uploads",
+    status_code=status.HTTP_201_CREATED,
+    response_model=MultipartUploadResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        413: {"model": ErrorResponse, "description": "Payload Too Large"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        507: {"model": ErrorResponse, "description": "Insufficient Storage"},
+    },
+    tags=["uploads"],
+    summary="Initiate a parallel multi-part upload",
+    description=(
+        "Declares the file size and part size. Parts are then sent with PUT "
+        "/multipart-uploads/{upload_id}/parts/{part_number} in any order and concurrently over several "
+        "connections, and assembled with POST /multipart-uploads/{upload_id}/complete."
+    ),
+)
+async def create_multipart_upload(body: CreateMultipartUploadRequest, response: Response) -> MultipartUploadResponse:
+    """
+    Initiate a parallel multi-part upload.
+
+    Parameters:
+    - body: CreateMultipartUploadRequest - Filename, total size, part size and optional content type.
+
+    Returns:
+    - MultipartUploadResponse: The new upload. The Location header points to the upload URL.
+
+    Errors:
+    - 400 if the part size is below the minimum or yields too many parts.
+    - 413 if the declared size exceeds 500MB.
+    """
+    if body.size_bytes > MAX_FILE_SIZE_BYTES:
+        raise _file_too_large()
+    if body.part_size_bytes < MIN_PART_SIZE_BYTES and body.part_size_bytes < body.size_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"part_size_bytes must be at least {MIN_PART_SIZE_BYTES} bytes.",
+        )
+    if (body.size_bytes + body.part_size_bytes - 1) // body.part_size_bytes > MAX_PART_COUNT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many parts; at most {MAX_PART_COUNT} parts are allowed.",
+        )
+    # The '.part' file is preallocated to the full size on creation, which claims the space.
+    part_dir = await _staging_root()
+    reservation = await _reserve_disk_space(body.size_bytes, part_dir)
+    try:
+        upload = await multipart_store.create(
+            body.filename,
+            body.size_bytes,
+            min(body.part_size_bytes, body.size_bytes),
+            body.content_type,
+            part_dir=part_dir,
+        )
+    except Exception as exc:
+        if is_out_of_space(exc):
+            raise _insufficient_storage("Insufficient storage for the declared upload size.")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create multi-part upload: {exc}",
+        )
+    finally:
+        reservation.release()
+    response.headers["Location"] = f"/multipart-uploads/{upload.id}"
+    return await _multipart_response(upload)
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/multipart-uploads/{upload_id}",
+    response_model=MultipartUploadResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        410: {"model": ErrorResponse, "description": "Gone"},
+    },
+    tags=["uploads"],
+    summary="Get a multi-part upload",
+    description="Returns the state of a multi-part upload, including the parts received so far.",
+)
+async def get_multipart_upload(upload_id: str) -> MultipartUploadResponse:
+    """Return the state of a multi-part upload."""
+    return await _multipart_response(await _load_multipart_upload(upload_id))
+
+
+# PUBLIC_INTERFACE
+@app.put(
+    "/multipart-uploads/{upload_id}/parts/{part_number}",
+    response_model=MultipartPartResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        410: {"model": ErrorResponse, "description": "Gone"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        507: {"model": ErrorResponse, "description": "Insufficient Storage"},
+    },
+    tags=["uploads"],
+    summary="Upload one part of a multi-part upload",
+    description=(
+        "Stores the raw request body as the given 1-based part. Every part must be exactly part_size_bytes long "
+        "except the last. Parts may be sent in any order and concurrently; re-sending a part replaces it."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def upload_multipart_part(upload_id: str, part_number: int, request: Request) -> MultipartPartResponse:
+    """
+    Upload one part of a multi-part upload.
+
+    Parameters:
+    - upload_id: str - The multi-part upload id.
+    - part_number: int - 1-based part number.
+    - request: Request - Raw body containing the part bytes.
+
+    Returns:
+    - MultipartPartResponse: The stored part number and size.
+
+    Errors:
+    - 400 if the part number is out of range or the body size does not match the part size.
+    - 404/410 if the upload is unknown or expired.
+    - 500 for server-side errors such as disk write failures.
+    """
+    upload = await _load_multipart_upload(upload_id)
+    if not 1 <= part_number <= upload.part_count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"part_number must be between 1 and {upload.part_count}.",
+        )
+    offset, size = upload.part_range(part_number)
+    wrong_size = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Part {part_number} must be exactly {size} bytes.",
+    )
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) != size:
+        raise wrong_size
+
+    await multipart_store.unmark_received(upload, part_number)
+    try:
+        out = await AsyncFile.open(get_io_executor(), multipart_store.part_path(upload), "r+b")
+    except FileNotFoundError:
+        await multipart_store.delete(upload)
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Multi-part upload data is no longer available.")
+
+    received = 0
+    written = 0
+
+    async def write_at_offset(data) -> None:
+        # Written straight at the part's final offset; parts never need reassembly.
+        nonlocal written
+        await out.pwrite(data, offset + written)
+        written += len(data)
+
+    writer = CoalescingWriter(write_at_offset, get_buffer_pool())
+    try:
+        async for chunk in timed_chunks(request.stream(), CHUNK_READ_SECONDS.labels("multipart_part")):
+            if received + len(chunk) > size:
+                raise wrong_size
+            await writer.write(chunk)
+            received += len(chunk)
+        await writer.flush()
+    except HTTPException:
+        raise
+    except ClientDisconnect:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Client disconnected during upload.")
+    except Exception as exc:
+        raise _receive_failed(exc)
+    finally:
+        writer.close()
+        await out.close()
+    if received != size:
+        raise wrong_size
+
+    await multipart_store.mark_received(upload, part_number)
+    return MultipartPartResponse(part_number=part_number, size_bytes=received)
+
+
+# PUBLIC_INTERFACE
+@app.post(
+    "/multipart-uploads/{upload_id}/complete",
+    response_model=UploadResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        409: {"model": ErrorResponse, "description": "Parts missing"},
+        410: {"model": ErrorResponse, "description": "Gone"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    tags=["uploads"],
+    summary="Complete a multi-part upload",
+    description="Verifies that every part was received and moves the assembled file into the upload directory.",
+)
+async def complete_multipart_upload(upload_id: str) -> UploadResponse:
+    """
+    Complete a multi-part upload once all parts have been received.
+
+    Returns:
+    - UploadResponse: Information about the saved file.
+
+    Errors:
+    - 404/410 if the upload is unknown or expired.
+    - 409 if parts are missing.
+    - 500 if the file cannot be moved into place.
+    """
+    upload = await _load_multipart_upload(upload_id)
+    received = set(await multipart_store.received_parts(upload))
+    missing = [n for n in range(1, upload.part_count + 1) if n not in received]
+    if missing:
+        shown = ", ".join(str(n) for n in missing[:20])
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: {len(missing)} part(s) missing ({shown}{', ...' if len(missing) > 20 else ''}).",
+        )
+    part_path = multipart_store.part_path(upload)
+    digest = await _completed_part_digest(part_path)
+    final_name, deduplicated, durable = await _finalize_upload(
+        part_path, upload.filename or "upload.bin", digest, upload.content_type
+    )
+    await multipart_store.delete(upload, keep_part=True)
+    job_id = await _enqueue_post_processing(final_name)
+
+    response = UploadResponse(
+        filename=upload.filename or final_name,
+        saved_as=final_name,
+        size_bytes=upload.length,
+        content_type=upload.content_type,
+        upload_dir=UPLOAD_DIR,
+        sha256=digest.sha256 if digest else None,
+        fast_hash=digest.fast_hash if digest else None,
+        deduplicated=deduplicated,
+        job_id=job_id,
+        durable=durable,
+    )
+    await _record_upload(response)
+    return response
+
+
+# PUBLIC_INTERFACE
+@app.delete(
+    "/multipart-uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={404: {"model": ErrorResponse, "description": "Not Found"}},
+    tags=["uploads"],
+    summary="Abort a multi-part upload",
+    description="Discards a multi-part upload and all parts received so far.",
+)
+async def abort_multipart_upload(upload_id: str) -> Response:
+    """Abort a multi-part upload and remove its data."""
+    upload = await multipart_store.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Multi-part upload not found.")
+    await multipart_store.delete(upload)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _find_content(sha256: str) -> Optional[Tuple[str, ContentStore, os.stat_result]]:
+    """Return (root, store, stat) of the first content store holding sha256, or None (blocking)."""
+    for root, store in storage.content_stores():
+        try:
+            return root, store, os.stat(store.object_path(sha256))
+        except FileNotFoundError:
+            continue
+    return None
+
+
+async def _stored_object(sha256: str) -> Tuple[StoredObjectResponse, str, ContentStore]:
+    """
+    Look up stored content by digest; returns it with the root and store holding it.
+    Raises 403 (lookup by digest disabled), 409 (dedup inactive), 400 (malformed) or 404 (unknown).
+    """
+    if not CONTENT_BY_HASH_ENABLED:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Lookup by content hash is disabled.")
+    if not storage.content_stores():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(
+                "Content dedup is not active: CONTENT_DEDUP_ENABLED is off or the storage backend does not support it."
+            ),
+        )
+    sha256 = sha256.lower()
+    if not is_sha256(sha256):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid SHA-256 digest.")
+    found = await get_io_executor().run(_find_content, sha256)
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Content not found.")
+    root, store, st = found
+    obj = StoredObjectResponse(sha256=sha256, size_bytes=st.st_size, references=max(st.st_nlink - 1, 0))
+    return obj, root, store
+
+
+# PUBLIC_INTERFACE
+@app.head(
+    "/objects/{sha256}",
+    tags=["uploads"],
+    summary="Check whether content is already stored",
+    description=(
+        "Returns 200 if content with this SHA-256 is already stored, 404 otherwise, 403 unless "
+        "CONTENT_BY_HASH_ENABLED is set, and 409 if content dedup is not active. Clients can then use "
+        "POST /upload/by-hash instead of uploading the bytes again."
+    ),
+)
+async def head_stored_object(sha256: str) -> Response:
+    """Return 200 with Content-Length of the stored content, 404 if unknown, 403 if disabled, or 409 without dedup."""
+    obj, _, _ = await _stored_object(sha256)
+    return Response(status_code=status.HTTP_200_OK, headers={"Content-Length": str(obj.size_bytes)})
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/objects/{sha256}",
+    response_model=StoredObjectResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        403: {"model": ErrorResponse, "description": "Lookup by content hash disabled"},
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        409: {"model": ErrorResponse, "description": "Content dedup not active"},
+    },
+    tags=["uploads"],
+    summary="Describe stored content",
+    description="Returns the size and reference count of stored content identified by its SHA-256.",
+)
+async def get_stored_object(sha256: str) -> StoredObjectResponse:
+    """Return size and reference count of stored content."""
+    obj, _, _ = await _stored_object(sha256)
+    return obj
+
+
+# PUBLIC_INTERFACE
+@app.post(
+    "/upload/by-hash",
+    response_model=UploadResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Bad Request"},
+        403: {"model": ErrorResponse, "description": "Lookup by content hash disabled"},
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        409: {"model": ErrorResponse, "description": "Content dedup not active"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    tags=["uploads"],
+    summary="Save a file from already stored content",
+    description=(
+        "Creates a new saved file that shares storage with content already on the server, identified by its "
+        "SHA-256, without transferring the bytes. Requires content dedup (CONTENT_DEDUP_ENABLED) and "
+        "CONTENT_BY_HASH_ENABLED, since knowing a digest is enough to get a readable copy of the content."
+    ),
+)
+async def upload_by_hash(body: UploadByHashRequest) -> UploadResponse:
+    """
+    Save a file from content that is already stored.
+
+    Parameters:
+    - body: UploadByHashRequest - SHA-256 of the content, filename and optional content type.
+
+    Returns:
+    - UploadResponse: Information about the saved file (deduplicated is always true).
+
+    Errors:
+    - 400 if the digest is malformed.
+    - 403 unless CONTENT_BY_HASH_ENABLED is set.
+    - 404 if no content with this digest is stored.
+    - 409 if content dedup is not active (disabled, or the s3 backend).
+    """
+    obj, root, store = await _stored_object(body.sha256)
+    try:
+        # The new file must be on the root holding the content: hard links cannot cross devices.
+        final_name = await storage.assign_name(_safe_destination_filename(body.filename or "upload.bin"), root)
+        linked = await store.link(obj.sha256, await storage.destination(final_name))
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {exc}",
+        )
+    if not linked:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Content not found.")
+    durable = await _persist_upload(final_name)
+    job_id = await _enqueue_post_processing(final_name)
+
+    response = UploadResponse(
+        filename=body.filename or final_name,
+        saved_as=final_name,
+        size_bytes=obj.size_bytes,
+        content_type=body.content_type,
+        upload_dir=UPLOAD_DIR,
+        sha256=obj.sha256,
+        deduplicated=True,
+        job_id=job_id,
+        durable=durable,
+    )
+    await _record_upload(response)
+    return response
+
+
+def _open_stored_file(saved_as: str) -> Optional[Tuple[BinaryIO, str, os.stat_result]]:
+    """Open a stored file by saved name; returns (file, path, fstat) or None (blocking)."""
+    path = storage.locate(saved_as)
+    if path is None:
+        return None
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    return file, path, os.fstat(file.fileno())
+
+
+async def _video_response(saved_as: str, request: Request, send_body: bool) -> Response:
+    if not storage.local:
+        # The object store serves ranges and validators itself; send the client there.
+        if saved_as.startswith(".") or os.path.basename(saved_as) != saved_as:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found.")
+        return RedirectResponse(storage.url(saved_as), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    io = get_io_executor()
+    opened = await io.run(_open_stored_file, saved_as)
+    if opened is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found.")
+    file, path, st = opened
+    headers = validator_headers(st)
+    etag = headers["ETag"]
+    if not_modified(request.headers, st, etag):
+        await io.run(file.close)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    ranges = None
+    range_header = request.headers.get("range")
+    if range_header and range_applies(request.headers, st, etag):
+        try:
+            ranges = parse_range(range_header, st.st_size)
+        except RangeNotSatisfiable:
+            await io.run(file.close)
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable.",
+                headers={"Content-Range": f"bytes */{st.st_size}"},
+            )
+    return StoredFileResponse(file, path, st, guess_media_type(saved_as), ranges, headers, send_body)
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/videos/{saved_as}",
+    tags=["videos"],
+    summary="Download or stream a stored video",
+    description=(
+        "Returns a stored file by its saved filename. Supports Range requests (including several ranges, "
+        "answered as multipart/byteranges), ETag/If-None-Match, Last-Modified/If-Modified-Since and If-Range, "
+        "so players can seek and caches can revalidate. With an object store backend (STORAGE_BACKEND=s3) "
+        "the response is a 307 redirect to a presigned URL of the object."
+    ),
+    responses={
+        200: {"description": "The whole file", "content": {"video/mp4": {}}},
+        206: {"description": "The requested range(s)"},
+        304: {"description": "Not Modified"},
+        307: {"description": "Redirect to the object store"},
+        404: {"model": ErrorResponse, "description": "Not Found"},
+        416: {"model": ErrorResponse, "description": "Range Not Satisfiable"},
+    },
+)
+async def get_video(saved_as: str, request: Request) -> Response:
+    """
+    Serve a stored video.
+
+    Parameters:
+    - saved_as: str - Saved filename returned by the upload endpoints.
+    - Range / If-Range / If-None-Match / If-Modified-Since request headers.
+
+    Returns:
+    - 200 with the file, 206 with one range (Content-Range) or several (multipart/byteranges),
+      or 304 if the client's copy is current; 307 to a presigned URL with an object store backend.
+
+    Errors:
+    - 404 if no stored file has this name.
+    - 416 if no requested range overlaps the file.
+    """
+    return await _video_response(saved_as, request, send_body=True)
+
+
+# PUBLIC_INTERFACE
+@app.head(
+    "/videos/{saved_as}",
+    tags=["videos"],
+    summary="Get the headers of a stored video",
+    description="Same as GET /videos/{saved_as} without the body: size, validators and range support.",
+)
+async def head_video(saved_as: str, request: Request) -> Response:
+    """Return the headers GET /videos/{saved_as} would send."""
+    return await _video_response(saved_as, request, send_body=False)
+
+
+def _require_catalog() -> None:
+    if not CATALOG_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The upload catalog is disabled.")
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/catalog",
+    response_model=CatalogPage,
+    tags=["catalog"],
+    summary="List stored uploads",
+    description=(
+        "Lists stored uploads newest first from the indexed catalog, optionally filtered by time range, "
+        "SHA-256 or original filename. Follow next_cursor for further pages."
+    ),
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+)
+async def list_catalog(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="Maximum entries per page."),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+    since: Optional[str] = Query(
+        None, description="Only uploads stored at or after this time (ISO 8601; UTC unless an offset is given)."
+    ),
+    until: Optional[str] = Query(
+        None, description="Only uploads stored before this time (ISO 8601; UTC unless an offset is given)."
+    ),
+    sha256: Optional[str] = Query(None, description="Only uploads with this content digest."),
+    filename: Optional[str] = Query(None, description="Only uploads with this original filename."),
+) -> CatalogPage:
+    """
+    List stored uploads with keyset pagination.
+
+    Parameters:
+    - limit: int - Page size (1-1000).
+    - cursor: str - Continuation token from a previous page.
+    - since / until: str - created_at bounds (ISO 8601; UTC unless they carry an offset such as +02:00 or Z).
+    - sha256 / filename: str - Exact-match filters.
+
+    Returns:
+    - CatalogPage: Entries and the cursor of the next page (null on the last page).
+
+    Errors:
+    - 400 if the cursor or a time bound is malformed.
+    - 404 if the catalog is disabled.
+    """
+    _require_catalog()
+    for name, value in (("since", since), ("until", until)):
+        if value is not None:
+            try:
+                normalize_timestamp(value)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {name} timestamp.")
+    try:
+        rows, next_cursor = await catalog.list(limit, cursor, since, until, sha256, filename)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return CatalogPage(items=[CatalogEntry(**row) for row in rows], next_cursor=next_cursor)
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/catalog/{saved_as}",
+    response_model=CatalogEntry,
+    tags=["catalog"],
+    summary="Look up a stored upload",
+    description="Returns the catalog record of a stored upload by its saved filename.",
+    responses={404: {"model": ErrorResponse}},
+)
+async def get_catalog_entry(saved_as: str) -> CatalogEntry:
+    """
+    Look up a stored upload.
+
+    Parameters:
+    - saved_as: str - Saved filename returned by the upload endpoints.
+
+    Returns:
+    - CatalogEntry: Original name, size, content type, digests and creation time.
+
+    Errors:
+    - 404 if the file is not in the catalog (or the catalog is disabled).
+    """
+    _require_catalog()
+    row = await catalog.get(saved_as)
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found in the catalog.")
+    return CatalogEntry(**row)
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    tags=["jobs"],
+    summary="Get post-processing job status",
+    description="Returns the state of a post-processing job and of each of its stages (probe, thumbnail, ...).",
+    responses={404: {"model": ErrorResponse}},
+)
+async def get_job(job_id: str) -> JobResponse:
+    """
+    Report the progress of a post-processing job.
+
+    Parameters:
+    - job_id: str - Job identifier returned as job_id by the upload endpoints.
+
+    Returns:
+    - JobResponse: Job status, timestamps and per-stage status, attempts, errors and results.
+
+    Errors:
+    - 404 if the job does not exist.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found.")
+    return JobResponse(
+        job_id=job.id,
+        saved_as=job.saved_as,
+        status=job.status,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        stages=job.stages,
+    )
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/health/io",
+    tags=["health"],
+    summary="Disk I/O executor metrics",
+    description=(
+        "Returns queue depth and throughput counters of the executor that performs upload disk I/O, "
+        "and the occupancy of the ingest buffer pool."
+    ),
+)
+def io_stats() -> dict:
+    """Return a snapshot of the upload disk I/O executor and buffer pool metrics."""
+    stats = get_io_executor().stats()
+    stats["buffer_pool"] = get_buffer_pool().stats()
+    return stats
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/health/storage",
+    tags=["health"],
+    summary="Storage backend metrics",
+    description="Returns the configured storage backend and its write counters (objects, bytes, requests, retries).",
+)
+def storage_stats() -> dict:
+    """Return a snapshot of the storage backend metrics of this worker."""
+    return storage.stats()
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/health/durability",
+    tags=["health"],
+    summary="Upload durability metrics",
+    description="Returns the durability mode, group-commit counters and the durability watermark of this worker.",
+)
+def durability_stats() -> dict:
+    """Return the acknowledged and durable sequence numbers and fsync counters of this worker."""
+    return durability.stats()
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/health/disk",
+    tags=["health"],
+    summary="Upload disk space metrics",
+    description="Returns free space of the upload filesystem and the bytes reserved by in-flight uploads of this worker.",
+)
+async def disk_stats() -> dict:
+    """Return free space and upload admission metrics for UPLOAD_DIR, and per root with the sharded backend."""
+    stats = await disk_guard.stats()
+    roots = [(path, guard) for path, guard in disk_guards.items() if guard is not disk_guard]
+    if roots:
+        stats["roots"] = [{"path": path, **await guard.stats()} for path, guard in roots]
+    return stats
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/health/scheduler",
+    tags=["health"],
+    summary="Upload scheduler metrics",
+    description="Returns active, queued and rejected upload counts of this worker's upload admission scheduler.",
+)
+def scheduler_stats() -> dict:
+    """Return a snapshot of the upload admission scheduler."""
+    return get_upload_scheduler().stats()
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/health/jobs",
+    tags=["health"],
+    summary="Post-processing queue metrics",
+    description="Returns queue depth, running jobs and outcome counters of this worker's post-processing queue.",
+)
+def job_stats() -> dict:
+    """Return a snapshot of the post-processing job queue."""
+    return job_queue.stats()
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/metrics",
+    tags=["health"],
+    summary="Prometheus metrics",
+    description=(
+        "Upload throughput, latency histograms (request, chunk read, disk write, commit, durability), "
+        "in-flight uploads and bytes, and error counts in the Prometheus text format."
+    ),
+    response_class=PlainTextResponse,
+)
+async def metrics() -> PlainTextResponse:
+    """Return the metrics of this worker, or of all workers when METRICS_MULTIPROCESS_DIR is set."""
+    return PlainTextResponse(await metrics_registry.exposition(), media_type=METRICS_CONTENT_TYPE)
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/health/reaper",
+    tags=["health"],
+    summary="Stale upload part reaper metrics",
+    description="Returns the scanned directories, thresholds and reclaim counters of this worker's part reaper.",
+)
+def reaper_stats() -> dict:
+    """Return the stale part reaper metrics of this worker."""
+    return part_reaper.stats()
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")) -> None:
+    """Dependency guarding /admin endpoints with ADMIN_TOKEN."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled.")
+    if not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token.")
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/admin/bandwidth",
+    dependencies=[Depends(_require_admin)],
+    tags=["admin"],
+    summary="Get upload bandwidth limits",
+    description="Returns the upload bandwidth limits in effect on the worker that answers, and its shaping counters.",
+)
+def get_bandwidth_limits() -> dict:
+    """Return the current bandwidth limits and shaping counters."""
+    return get_bandwidth_shaper().stats()
+
+
+# PUBLIC_INTERFACE
+@app.put(
+    "/admin/bandwidth",
+    dependencies=[Depends(_require_admin)],
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        403: {"model": ErrorResponse, "description": "Forbidden"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    tags=["admin"],
+    summary="Set upload bandwidth limits",
+    description=(
+        "Replaces the global, default per-client and per-client override bandwidth limits. Takes effect "
+        "immediately on the worker that answers, including for uploads in progress, and on the other workers "
+        "within UPLOAD_BANDWIDTH_RELOAD_SECONDS (they share the limits through UPLOAD_BANDWIDTH_LIMITS_FILE)."
+    ),
+)
+async def set_bandwidth_limits(limits: BandwidthLimits) -> dict:
+    """
+    Replace the upload bandwidth limits at runtime, for every worker.
+
+    Parameters:
+    - limits: BandwidthLimits - New limits in bytes per second (0 = unlimited).
+
+    Returns:
+    - dict: The limits now in effect and shaping counters.
+
+    Errors:
+    - 500 if the limits cannot be written to the shared limits file.
+    """
+    shaper = get_bandwidth_shaper()
+    try:
+        await get_io_executor().run(
+            shaper.publish, limits.global_bytes_per_sec, limits.per_client_bytes_per_sec, limits.client_overrides
+        )
+    except OSError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to share the bandwidth limits with the other workers: {exc}",
+        )
+    return shaper.stats()
+
+
+# PUBLIC_INTERFACE
+@app.post(
+    "/admin/reaper/sweep",
+    dependencies=[Depends(_require_admin)],
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        403: {"model": ErrorResponse, "description": "Forbidden"},
+    },
+    tags=["admin"],
+    summary="Reclaim stale upload parts now",
+    description=(
+        "Runs one sweep of the stale part reaper immediately instead of waiting for the next interval. "
+        "Returns an empty result if another worker is sweeping at the same time."
+    ),
+)
+async def sweep_stale_parts() -> dict:
+    """
+    Reclaim stale '.part' files and abandoned sessions now.
+
+    Returns:
+    - dict: What this sweep found (parts and bytes reclaimed, sessions expired, adopted or orphaned).
+    """
+    return await part_reaper.run_once()
+
+
+# PUBLIC_INTERFACE
+@app.get(
+    "/docs/usage",
+    tags=["docs"],
+    summary="Upload API usage",
+    description="Provides example curl command for uploading a file to the API.",
+)
+def docs_usage() -> dict:
+    """
+    Returns a simple usage example to assist clients with the upload endpoint.
+    """
+    return {
+        "example_curl": (
+            "curl -X POST http://localhost:8000/upload "
             "-H 'Accept: application/json' "
             "-F 'file=@/path/to/video.mp4'"
         ),
         "max_size_bytes": MAX_FILE_SIZE_BYTES,
         "upload_field": "file",
+        "streaming_upload_endpoint": "/upload/stream",
+        "batch_upload_endpoint": "/upload/batch",
+        "job_status_endpoint": "/jobs/{job_id}",
+        "video_endpoint": "/videos/{saved_as}",
         "destination_dir": UPLOAD_DIR,
     }
 
@@ -236,7 +2563,7 @@ def docs_usage() -> dict:
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Return standardized JSON error for HTTPException."""
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
 
 
 @app.exception_handler(Exception)
@@ -246,3 +2573,4 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "An unexpected error occurred."},
     )
+
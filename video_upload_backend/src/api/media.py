@@ -0,0 +1,237 @@
+"""
+Serving stored videos: byte ranges, validators and chunked transmission.
+
+StoredFileResponse sends (parts of) a stored file for GET /videos/{saved_as}:
+
+- Range requests (RFC 9110 section 14): single ranges answer 206 with a
+  Content-Range header; several ranges answer 206 multipart/byteranges.
+  Overlapping or adjacent ranges are merged first, unsatisfiable ones answer
+  416, and more than VIDEO_MAX_RANGES ranges (or a malformed header) make the
+  request a plain 200, as nginx does.
+- Validators: a strong ETag from size and mtime (stored files never change in
+  place), Last-Modified, If-None-Match / If-Modified-Since (304) and If-Range.
+- Transmission: the file is read with pread() on the upload I/O executor in
+  VIDEO_READ_CHUNK_BYTES pieces, sent with the server's backpressure, and
+  stopped as soon as the client disconnects. There is no sendfile(2) path:
+  ASGI servers do not hand the application their socket, and uvicorn and
+  hypercorn implement neither the 'http.response.zerocopysend' nor the
+  'http.response.pathsend' extension. Put a reverse proxy that serves
+  UPLOAD_DIR itself in front when downloads must bypass Python.
+"""
+import email.utils
+import mimetypes
+import os
+import re
+import uuid
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+from starlette.responses import StreamingResponse
+from starlette.types import Send
+
+from src.api.io_executor import get_io_executor
+
+# Bytes read per pread() when sending a stored file.
+VIDEO_READ_CHUNK_BYTES = int(os.getenv("VIDEO_READ_CHUNK_BYTES", str(512 * 1024)))
+# Most ranges honoured in one request (after merging); more are answered with the whole file.
+VIDEO_MAX_RANGES = int(os.getenv("VIDEO_MAX_RANGES", "16"))
+# Cache-Control of stored files; saved names are unique and files are never rewritten.
+VIDEO_CACHE_CONTROL = os.getenv("VIDEO_CACHE_CONTROL", "public, max-age=31536000, immutable")
+
+_RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+# A body part: literal bytes, or (offset, count) of the file.
+Part = Union[bytes, Tuple[int, int]]
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlaps the file."""
+
+
+def make_etag(st: os.stat_result) -> str:
+    """Return the strong ETag of a stored file."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def validator_headers(st: os.stat_result) -> dict:
+    """Return the ETag, Last-Modified and Cache-Control headers of a stored file."""
+    return {
+        "ETag": make_etag(st),
+        "Last-Modified": email.utils.formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": VIDEO_CACHE_CONTROL,
+    }
+
+
+def guess_media_type(saved_as: str) -> str:
+    """Return the Content-Type for a saved name from its extension."""
+    media_type, _ = mimetypes.guess_type(saved_as)
+    return media_type or "application/octet-stream"
+
+
+def parse_range(header: str, size: int, max_ranges: int = VIDEO_MAX_RANGES) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header into sorted, merged (start, end-inclusive) ranges.
+
+    Returns None when the header should be ignored (malformed, not 'bytes', or
+    too many ranges) and raises RangeNotSatisfiable when no range overlaps the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        match = _RANGE_RE.match(item)
+        if match is None:
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+        elif last:
+            # Suffix range: the final N bytes ('-0' selects nothing).
+            if not int(last):
+                continue
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged if len(merged) <= max_ranges else None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match list against etag."""
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == opaque
+        for tag in (t.strip() for t in header.split(","))
+    )
+
+
+def _parse_http_date(value: str) -> Optional[float]:
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def not_modified(headers, st: os.stat_result, etag: str) -> bool:
+    """True if the conditional request headers allow answering 304."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    since = _parse_http_date(headers.get("if-modified-since", ""))
+    return since is not None and int(st.st_mtime) <= since
+
+
+def range_applies(headers, st: os.stat_result, etag: str) -> bool:
+    """Evaluate If-Range: the Range header is only used if the validator still matches."""
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Strong comparison; a weak tag never matches.
+        return if_range == etag
+    date = _parse_http_date(if_range)
+    return date is not None and int(st.st_mtime) == int(date)
+
+
+class StoredFileResponse(StreamingResponse):
+    """Streams whole files, single ranges or multipart/byteranges from an open file."""
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        path: str,
+        st: os.stat_result,
+        media_type: str,
+        ranges: Optional[List[Tuple[int, int]]] = None,
+        headers: Optional[dict] = None,
+        send_body: bool = True,
+    ) -> None:
+        """
+        Parameters:
+        - file: the open stored file; the response closes it.
+        - path / st: its path and fstat() result.
+        - ranges: merged (start, end-inclusive) ranges, or None for the whole file.
+        - headers: validator and caching headers to add.
+        - send_body: False for HEAD.
+        """
+        self.file = file
+        self.path = path
+        self.size = st.st_size
+        self.send_body = send_body
+        headers = dict(headers or {})
+        headers["Accept-Ranges"] = "bytes"
+        if not ranges:
+            self.parts: List[Part] = [(0, self.size)] if self.size else []
+            status_code = 200
+            content_type = media_type
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.parts = [(start, end - start + 1)]
+            status_code = 206
+            content_type = media_type
+            headers["Content-Range"] = f"bytes {start}-{end}/{self.size}"
+        else:
+            boundary = uuid.uuid4().hex
+            self.parts = []
+            for start, end in ranges:
+                self.parts.append(
+                    f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n".encode("latin-1")
+                )
+                self.parts.append((start, end - start + 1))
+                self.parts.append(b"\r\n")
+            self.parts.append(f"--{boundary}--\r\n".encode("latin-1"))
+            status_code = 206
+            content_type = f"multipart/byteranges; boundary={boundary}"
+        headers["Content-Length"] = str(sum(p[1] if isinstance(p, tuple) else len(p) for p in self.parts))
+        super().__init__((), status_code=status_code, headers=headers, media_type=content_type)
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await get_io_executor().run(self.file.close)
+
+    async def stream_response(self, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or not self.parts:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        last = len(self.parts) - 1
+        for index, part in enumerate(self.parts):
+            more_body = index < last
+            if isinstance(part, bytes):
+                await send({"type": "http.response.body", "body": part, "more_body": more_body})
+            else:
+                await self._send_range(send, *part, more_body)
+
+    async def _send_range(self, send: Send, offset: int, count: int, more_body: bool) -> None:
+        io = get_io_executor()
+        fd = self.file.fileno()
+        end = offset + count
+        while offset < end:
+            chunk = await io.run(os.pread, fd, min(VIDEO_READ_CHUNK_BYTES, end - offset), offset)
+            if not chunk:
+                # Truncated underneath us; the declared Content-Length can no longer be met.
+                raise OSError(f"Unexpected end of file in {self.path}.")
+            offset += len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body or offset < end})
+
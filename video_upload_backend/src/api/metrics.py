@@ -0,0 +1,465 @@
+"""
+Prometheus metrics for the upload hot paths, served by GET /metrics.
+
+Metrics are plain Python objects updated from the worker's event loop thread
+only, so an increment is an integer add with no lock, and histograms have
+fixed bucket bounds: observe() is one bisect plus two adds. That keeps the
+instrumentation cheap enough to stay on for every chunk in production.
+Values that already exist elsewhere (I/O queue depth, durability lag, ...)
+are read by collectors at scrape time instead of being tracked twice.
+
+The text exposition format (version 0.0.4) is rendered here, so no client
+library is needed. Every worker process has its own registry. With several
+workers, set METRICS_MULTIPROCESS_DIR: each worker then writes a snapshot
+there every METRICS_FLUSH_SECONDS, and a scrape, whichever worker answers it,
+sums the snapshots of all live workers.
+
+UploadMetricsMiddleware records, per upload route, request duration, the
+response status counts (413/429/500/507 included, whichever layer answered),
+uploads and body bytes in flight, and bytes received.
+"""
+import asyncio
+import copy
+import json
+import math
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Directory shared by the workers for aggregated metrics; unset = each worker reports its own.
+METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR", "")
+# Seconds between snapshots written to METRICS_MULTIPROCESS_DIR.
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+METRIC_PREFIX = "video_upload_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Whole requests: 5 ms to 10 minutes.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Single chunk reads/writes, renames and fsyncs: 50 us to 5 s.
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+)
+# Disk write sizes: 4 KiB to 16 MiB.
+SIZE_BUCKETS = tuple(4096 * 4 ** i for i in range(7))
+
+_LABEL_ESCAPE = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value).translate(_LABEL_ESCAPE)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # counts[i] holds observations in (bounds[i-1], bounds[i]]; the last one is +Inf.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """A metric family: name, help text and one child per label value combination."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def _sample(self, child: Any) -> Any:
+        return child.value
+
+    def labels(self, *values: str) -> Any:
+        """Return the child for these label values; keep it to skip the lookup on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}.")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state, mergeable across workers."""
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(values), self._sample(child)] for values, child in self._children.items()],
+        }
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    """Distribution over fixed, pre-computed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _sample(self, child: _HistogramChild) -> Any:
+        return [list(child.counts), child.sum]
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["bounds"] = list(self.bounds)
+        return data
+
+
+# A collector returns families shaped like Metric.snapshot() (counters and gauges), keyed by full name.
+Collector = Callable[[], Dict[str, Dict[str, Any]]]
+
+
+def gauge_family(documentation: str, value: float, kind: str = "gauge") -> Dict[str, Any]:
+    """Build an unlabelled family for a collector."""
+    return {"kind": kind, "help": documentation, "labelnames": [], "samples": [[[], value]]}
+
+
+def _merge(target: Dict[str, Dict[str, Any]], families: Dict[str, Dict[str, Any]]) -> None:
+    """Add the samples of families into target (label sets matched by value)."""
+    for name, family in families.items():
+        merged = target.get(name)
+        if merged is None:
+            target[name] = copy.deepcopy(family)
+            continue
+        index = {tuple(sample[0]): sample for sample in merged["samples"]}
+        for values, value in family["samples"]:
+            sample = index.get(tuple(values))
+            if sample is None:
+                merged["samples"].append([list(values), copy.deepcopy(value)])
+            elif family["kind"] == "histogram":
+                counts, total = sample[1]
+                sample[1] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+            else:
+                sample[1] += value
+
+
+def render(families: Dict[str, Dict[str, Any]]) -> str:
+    """Render families in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for name in sorted(families):
+        family = families[name]
+        names = tuple(family["labelnames"])
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for values, value in family["samples"]:
+            values = tuple(values)
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(list(family["bounds"]) + [math.inf], counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{name}_bucket{_format_labels(names, values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, values)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(names, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# PUBLIC_INTERFACE
+def pid_alive(pid: int) -> bool:
+    """True if a process with this pid exists; used to drop files left in shared directories by dead workers."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # pragma: no cover - exists, owned by someone else
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """The metric families and scrape-time collectors of one worker."""
+
+    def __init__(self, multiprocess_dir: str = METRICS_MULTIPROCESS_DIR) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Collector] = []
+        self.multiprocess_dir = multiprocess_dir
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _register(self, metric: Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Create and register a gauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector) -> None:
+        """Add a function returning extra families at scrape time."""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return the families of this worker."""
+        families = {name: metric.snapshot() for name, metric in self._metrics.items()}
+        for collector in self._collectors:
+            families.update(collector())
+        return families
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiprocess_dir, f"{pid}.json")
+
+    def _write_snapshot(self, families: Dict[str, Dict[str, Any]]) -> None:
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(families, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _read_snapshots(self) -> List[Dict[str, Dict[str, Any]]]:
+        """Load the latest snapshots of the other live workers (blocking)."""
+        snapshots = []
+        try:
+            names = os.listdir(self.multiprocess_dir)
+        except FileNotFoundError:
+            return snapshots
+        for name in names:
+            match = re.fullmatch(r"(\d+)\.json", name)
+            if match is None or int(match.group(1)) == os.getpid():
+                continue
+            path = os.path.join(self.multiprocess_dir, name)
+            if not pid_alive(int(match.group(1))):
+                # Left by a worker that was killed.
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return snapshots
+
+    async def exposition(self) -> str:
+        """Render this worker's metrics, summed with the other workers' when multiprocess mode is on."""
+        families = self.snapshot()
+        if self.multiprocess_dir:
+            # Imported here: io_executor itself records disk write metrics from this module.
+            from src.api.io_executor import get_io_executor
+
+            merged: Dict[str, Dict[str, Any]] = {}
+            _merge(merged, families)
+            for other in await get_io_executor().run(self._read_snapshots):
+                _merge(merged, other)
+            families = merged
+        return render(families)
+
+    async def start(self) -> None:
+        """Start writing snapshots for the other workers (multiprocess mode only)."""
+        if self.multiprocess_dir and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        from src.api.io_executor import get_io_executor
+
+        while True:
+            try:
+                await get_io_executor().run(self._write_snapshot, self.snapshot())
+            except Exception:  # pragma: no cover
+                pass
+            await asyncio.sleep(METRICS_FLUSH_SECONDS)
+
+    async def stop(self) -> None:
+        """Stop writing snapshots and withdraw this worker's (its counters leave the sums)."""
+        if self._flush_task is None:
+            return
+        self._flush_task.cancel()
+        await asyncio.gather(self._flush_task, return_exceptions=True)
+        self._flush_task = None
+        try:
+            os.remove(self._snapshot_path(os.getpid()))
+        except FileNotFoundError:
+            pass
+
+
+REGISTRY = MetricsRegistry()
+
+UPLOAD_DURATION = REGISTRY.histogram(
+    "request_duration_seconds", "Duration of upload requests, from admission to the last response byte.",
+    ("route",), DURATION_BUCKETS,
+)
+UPLOAD_RESPONSES = REGISTRY.counter("responses_total", "Upload responses by route and status code.", ("route", "code"))
+UPLOADS_IN_FLIGHT = REGISTRY.gauge("in_flight", "Upload requests being processed.", ("route",))
+UPLOAD_BYTES_IN_FLIGHT = REGISTRY.gauge("in_flight_bytes", "Body bytes received by upload requests still in progress.")
+UPLOAD_RECEIVED_BYTES = REGISTRY.counter("received_bytes_total", "Body bytes received by upload requests.", ("route",))
+CHUNK_READ_SECONDS = REGISTRY.histogram(
+    "chunk_read_seconds", "Time to obtain the next chunk of an upload body (network wait, or spooled-file read).",
+    ("route",),
+)
+DISK_WRITE_SECONDS = REGISTRY.histogram(
+    "disk_write_seconds", "Latency of one disk write of upload data, including I/O queue wait."
+)
+DISK_WRITE_BYTES = REGISTRY.histogram("disk_write_bytes", "Size of each disk write of upload data.", (), SIZE_BUCKETS)
+COMMIT_SECONDS = REGISTRY.histogram(
+    "commit_seconds", "Time to publish a received file in storage (rename, dedup link or object store completion)."
+)
+DURABILITY_SECONDS = REGISTRY.histogram("durability_seconds", "Time spent waiting for a finalized file to be synced.")
+UPLOAD_ERRORS = REGISTRY.counter("errors_total", "Failed uploads by cause.", ("reason",))
+
+
+async def timed_chunks(chunks: AsyncIterator[Any], histogram: _HistogramChild) -> AsyncIterator[Any]:
+    """Yield from chunks, observing how long each one took to arrive."""
+    started = time.monotonic()
+    async for chunk in chunks:
+        histogram.observe(time.monotonic() - started)
+        yield chunk
+        started = time.monotonic()
+
+
+class UploadMetricsMiddleware:
+    """ASGI middleware recording request-level metrics of the upload routes."""
+
+    def __init__(self, app: ASGIApp, routes: Iterable[Tuple[str, str, str]] = ()) -> None:
+        """
+        Parameters:
+        - routes: (method, path regex, route label) of requests to measure.
+        """
+        self.app = app
+        self.routes: List[Tuple[str, Pattern[str], str]] = [(m.upper(), re.compile(p), label) for m, p, label in routes]
+
+    def _route(self, scope: Scope) -> Optional[str]:
+        for method, pattern, label in self.routes:
+            if method == scope["method"] and pattern.match(scope["path"]):
+                return label
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = self._route(scope) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        in_flight = UPLOADS_IN_FLIGHT.labels(route)
+        received_total = UPLOAD_RECEIVED_BYTES.labels(route)
+        bytes_in_flight = UPLOAD_BYTES_IN_FLIGHT.labels()
+        received = 0
+        code = 500
+
+        async def counting_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                n = len(message.get("body", b""))
+                received += n
+                received_total.inc(n)
+                bytes_in_flight.inc(n)
+            return message
+
+        async def status_send(message: Message) -> None:
+            nonlocal code
+            if message["type"] == "http.response.start":
+                code = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        started = time.monotonic()
+        try:
+            await self.app(scope, counting_receive, status_send)
+        finally:
+            in_flight.dec()
+            bytes_in_flight.dec(received)
+            UPLOAD_DURATION.labels(route).observe(time.monotonic() - started)
+            UPLOAD_RESPONSES.labels(route, str(code)).inc()
+
+
+# PUBLIC_INTERFACE
+def get_metrics_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return REGISTRY
@@ -0,0 +1,157 @@
+"""
+State for parallel multi-part uploads (S3-multipart style).
+
+The client declares the total size and a fixed part size up front. The server
+sizes a single '.uploading_<id>.part' file to the full length, and every part
+is written with pwrite() directly at its final offset, so parts can arrive in
+any order over any number of connections (and worker processes) and completing
+the upload is a rename: no part is ever re-read or copied.
+
+Received parts are tracked as marker files under
+'<UPLOAD_DIR>/.multipart/<id>.parts/', created only after a part's bytes are
+fully written. Markers are independent files, so concurrent part uploads never
+contend on a shared state record.
+"""
+import os
+import re
+import shutil
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from src.api.disk_space import preallocate
+from src.api.io_executor import get_io_executor, remove_file
+from src.api.resumable import SESSION_TTL_HOURS, part_path_for, read_json, write_json_atomic
+
+MULTIPART_DIR_NAME = ".multipart"
+# Smallest accepted part size (the last part may be shorter).
+MIN_PART_SIZE_BYTES = int(os.getenv("MULTIPART_MIN_PART_SIZE_BYTES", str(1024 * 1024)))
+# Maximum number of parts per upload.
+MAX_PART_COUNT = int(os.getenv("MULTIPART_MAX_PART_COUNT", "10000"))
+
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class MultipartUpload:
+    """A multi-part upload as persisted on disk."""
+    id: str
+    filename: str
+    length: int
+    part_size: int
+    content_type: Optional[str]
+    created_at: str
+    expires_at: str
+    # Directory of the '.part' file when it is not the upload directory (a storage root).
+    part_dir: Optional[str] = None
+
+    @property
+    def part_count(self) -> int:
+        return (self.length + self.part_size - 1) // self.part_size
+
+    def part_range(self, part_number: int) -> tuple:
+        """Return (offset, size) of a 1-based part number."""
+        offset = (part_number - 1) * self.part_size
+        return offset, min(self.part_size, self.length - offset)
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        """True when the upload is past its expiry time."""
+        now = now or datetime.utcnow()
+        return now >= datetime.fromisoformat(self.expires_at)
+
+
+def _create_sized(path: str, length: int) -> None:
+    try:
+        with open(path, "xb") as f:
+            # Claim contiguous space up front where supported; otherwise a sparse file of the right size.
+            if not preallocate(f, length):
+                f.truncate(length)
+    except OSError:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def _list_markers(path: str) -> List[int]:
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def _touch(path: str) -> None:
+    with open(path, "wb"):
+        pass
+
+
+class MultipartUploadStore:
+    """Creates, loads and deletes multi-part uploads under an upload directory."""
+
+    def __init__(self, upload_dir: str) -> None:
+        self.upload_dir = upload_dir
+        self.state_dir = os.path.join(upload_dir, MULTIPART_DIR_NAME)
+
+    def ensure_dirs(self) -> None:
+        """Create the multi-part state directory if needed."""
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def _record_path(self, upload_id: str) -> str:
+        return os.path.join(self.state_dir, f"{upload_id}.json")
+
+    def _markers_dir(self, upload_id: str) -> str:
+        return os.path.join(self.state_dir, f"{upload_id}.parts")
+
+    def part_path(self, upload: MultipartUpload) -> str:
+        """Return the '.part' file the parts are written into."""
+        return part_path_for(upload.part_dir or self.upload_dir, upload.id)
+
+    async def create(
+        self, filename: str, length: int, part_size: int, content_type: Optional[str], part_dir: Optional[str] = None
+    ) -> MultipartUpload:
+        """Persist a new upload and create its full-length '.part' file (in part_dir if given)."""
+        now = datetime.utcnow()
+        upload = MultipartUpload(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            length=length,
+            part_size=part_size,
+            content_type=content_type,
+            created_at=now.isoformat(),
+            expires_at=(now + timedelta(hours=SESSION_TTL_HOURS)).isoformat(),
+            part_dir=part_dir,
+        )
+        io = get_io_executor()
+        await io.run(os.makedirs, self._markers_dir(upload.id))
+        await io.run(_create_sized, self.part_path(upload), length)
+        await io.run(write_json_atomic, self._record_path(upload.id), asdict(upload))
+        return upload
+
+    async def get(self, upload_id: str) -> Optional[MultipartUpload]:
+        """Load an upload by id; None if the id is malformed or unknown."""
+        if not _UPLOAD_ID_RE.match(upload_id):
+            return None
+        data = await get_io_executor().run(read_json, self._record_path(upload_id))
+        if data is None:
+            return None
+        return MultipartUpload(**data)
+
+    async def received_parts(self, upload: MultipartUpload) -> List[int]:
+        """Return the sorted part numbers that have been fully written."""
+        return await get_io_executor().run(_list_markers, self._markers_dir(upload.id))
+
+    async def mark_received(self, upload: MultipartUpload, part_number: int) -> None:
+        """Record that a part has been fully written."""
+        await get_io_executor().run(_touch, os.path.join(self._markers_dir(upload.id), str(part_number)))
+
+    async def unmark_received(self, upload: MultipartUpload, part_number: int) -> None:
+        """Forget a part (it is being rewritten)."""
+        await remove_file(os.path.join(self._markers_dir(upload.id), str(part_number)))
+
+    async def delete(self, upload: MultipartUpload, keep_part: bool = False) -> None:
+        """Remove the upload's state and, unless keep_part is set, its '.part' file."""
+        if not keep_part:
+            await remove_file(self.part_path(upload))
+        await remove_file(self._record_path(upload.id))
+        await get_io_executor().run(shutil.rmtree, self._markers_dir(upload.id), True)
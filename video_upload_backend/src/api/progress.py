@@ -0,0 +1,325 @@
+"""
+In-memory progress of uploads in flight.
+
+UploadProgressMiddleware counts the body bytes of upload requests as the
+application receives them and records them in a ProgressRegistry entry keyed
+by the upload id: the client-chosen 'X-Upload-Id' header of single-request
+uploads, or the session id of resumable PATCH requests. Everything runs on the
+worker's event loop, so an update is a plain integer add with no locking; the
+transfer rate is a moving average refreshed at most every
+_RATE_INTERVAL_SECONDS, and percent/ETA are only computed when someone asks.
+
+Finished entries are kept for PROGRESS_RETENTION_SECONDS so a client polling
+right after the upload ends still sees its final state. The registry is per
+worker process; with several workers, set PROGRESS_SHARED_DIR (like
+METRICS_MULTIPROCESS_DIR): each worker then writes the snapshots of its uploads
+there every PROGRESS_FLUSH_SECONDS, and a worker asked about an upload it is
+not receiving answers from the other live workers' files.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.io_executor import get_io_executor
+from src.api.metrics import pid_alive
+
+# Seconds a finished upload stays visible in the registry.
+PROGRESS_RETENTION_SECONDS = float(os.getenv("PROGRESS_RETENTION_SECONDS", "300"))
+# Directory shared by the workers for upload progress; unset = each worker only knows its own uploads.
+PROGRESS_SHARED_DIR = os.getenv("PROGRESS_SHARED_DIR", "")
+# Seconds between progress snapshots written to PROGRESS_SHARED_DIR.
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "1.0"))
+# Request header carrying the client-chosen id of a single-request upload.
+UPLOAD_ID_HEADER = "x-upload-id"
+
+RECEIVING = "receiving"
+PAUSED = "paused"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_RATE_INTERVAL_SECONDS = 0.5
+# Weight of the newest rate sample in the moving average.
+_RATE_ALPHA = 0.5
+
+
+def is_valid_upload_id(upload_id: str) -> bool:
+    """True if upload_id is acceptable as an X-Upload-Id value."""
+    return bool(_UPLOAD_ID_RE.match(upload_id))
+
+
+class UploadProgress:
+    """Progress of one upload; mutated only from the event loop."""
+
+    __slots__ = (
+        "upload_id", "state", "received", "total", "started", "updated",
+        "rate", "_sample_time", "_sample_received",
+    )
+
+    def __init__(self, upload_id: str, total: Optional[int] = None, received: int = 0) -> None:
+        now = time.monotonic()
+        self.upload_id = upload_id
+        self.state = RECEIVING
+        self.received = received
+        self.total = total
+        self.started = now
+        self.updated = now
+        self.rate = 0.0
+        self._sample_time = now
+        self._sample_received = received
+
+    def advance(self, nbytes: int) -> None:
+        """Count nbytes more received bytes."""
+        self.received += nbytes
+        now = time.monotonic()
+        self.updated = now
+        elapsed = now - self._sample_time
+        if elapsed >= _RATE_INTERVAL_SECONDS:
+            sample = (self.received - self._sample_received) / elapsed
+            self.rate = sample if not self.rate else self.rate + _RATE_ALPHA * (sample - self.rate)
+            self._sample_time = now
+            self._sample_received = self.received
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the progress as a JSON-serializable dict."""
+        now = time.monotonic()
+        elapsed = (self.updated if self.state != RECEIVING else now) - self.started
+        rate = self.rate
+        if self.state == RECEIVING and not rate and elapsed > 0:
+            # No full sampling interval yet: use the average so far.
+            rate = (self.received - self._sample_received) / elapsed
+        remaining = None if self.total is None else max(self.total - self.received, 0)
+        return {
+            "upload_id": self.upload_id,
+            "state": self.state,
+            "bytes_received": self.received,
+            "total_bytes": self.total,
+            "percent": round(100.0 * self.received / self.total, 1) if self.total else None,
+            "bytes_per_sec": round(rate) if self.state == RECEIVING else 0,
+            "eta_seconds": (
+                round(remaining / rate, 1)
+                if self.state == RECEIVING and remaining is not None and rate > 0 else None
+            ),
+            "elapsed_seconds": round(elapsed, 3),
+        }
+
+
+class ProgressRegistry:
+    """Uploads of this worker by id, with finished ones expiring after a retention period."""
+
+    def __init__(
+        self, retention_seconds: float = PROGRESS_RETENTION_SECONDS, shared_dir: str = PROGRESS_SHARED_DIR
+    ) -> None:
+        self.retention_seconds = retention_seconds
+        self.shared_dir = shared_dir
+        self._entries: Dict[str, UploadProgress] = {}
+        self._finished: Deque[Tuple[float, UploadProgress]] = deque()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._finished and self._finished[0][0] <= now:
+            _, entry = self._finished.popleft()
+            # The id may have been reused by a newer upload since.
+            if self._entries.get(entry.upload_id) is entry:
+                del self._entries[entry.upload_id]
+
+    def start(self, upload_id: str, total: Optional[int] = None, received: int = 0) -> UploadProgress:
+        """Register (or restart) an upload and return its entry."""
+        self._expire()
+        entry = self._entries[upload_id] = UploadProgress(upload_id, total, received)
+        return entry
+
+    def get(self, upload_id: str) -> Optional[UploadProgress]:
+        """Return the entry of an upload, or None if unknown or expired."""
+        self._expire()
+        return self._entries.get(upload_id)
+
+    def finish(self, entry: UploadProgress, state: str) -> None:
+        """Mark an upload as no longer receiving; it expires after the retention period."""
+        entry.state = state
+        entry.updated = time.monotonic()
+        self._finished.append((entry.updated + self.retention_seconds, entry))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of tracked uploads by state."""
+        self._expire()
+        counts: Dict[str, int] = {}
+        for entry in self._entries.values():
+            counts[entry.state] = counts.get(entry.state, 0) + 1
+        return {"tracked_uploads": len(self._entries), "by_state": counts}
+
+    async def lookup(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Return the snapshot of an upload from this worker, else from the other workers (shared mode only)."""
+        entry = self.get(upload_id)
+        if entry is not None:
+            return entry.snapshot()
+        if not self.shared_dir:
+            return None
+        return await get_io_executor().run(self._read_shared, upload_id)
+
+    def _shared_path(self, pid: int) -> str:
+        return os.path.join(self.shared_dir, f"{pid}.json")
+
+    def _write_shared(self, uploads: Dict[str, Any]) -> None:
+        os.makedirs(self.shared_dir, exist_ok=True)
+        path = self._shared_path(os.getpid())
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(uploads, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _read_shared(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Find an upload in the other live workers' snapshots, preferring the most recently updated (blocking)."""
+        best: Optional[Tuple[float, Dict[str, Any]]] = None
+        try:
+            names = os.listdir(self.shared_dir)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            match = re.fullmatch(r"(\d+)\.json", name)
+            if match is None or int(match.group(1)) == os.getpid():
+                continue
+            path = os.path.join(self.shared_dir, name)
+            if not pid_alive(int(match.group(1))):
+                # Left by a worker that was killed.
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    found = json.load(f).get(upload_id)
+            except (FileNotFoundError, ValueError):
+                continue
+            if found is not None and (best is None or found[0] > best[0]):
+                best = (found[0], found[1])
+        return best[1] if best is not None else None
+
+    def _shared_snapshot(self) -> Dict[str, Any]:
+        """This worker's uploads as {id: [wall-clock time of the last update, snapshot]}."""
+        self._expire()
+        wall, now = time.time(), time.monotonic()
+        return {
+            upload_id: [wall - (now - entry.updated), entry.snapshot()]
+            for upload_id, entry in self._entries.items()
+        }
+
+    async def start_sharing(self) -> None:
+        """Start writing snapshots for the other workers (shared mode only)."""
+        if self.shared_dir and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        written_empty = False
+        while True:
+            try:
+                uploads = self._shared_snapshot()
+                # An idle worker writes its empty snapshot once, not every interval.
+                if uploads or not written_empty:
+                    await get_io_executor().run(self._write_shared, uploads)
+                    written_empty = not uploads
+            except Exception:  # pragma: no cover
+                pass
+            await asyncio.sleep(PROGRESS_FLUSH_SECONDS)
+
+    async def stop_sharing(self) -> None:
+        """Stop writing snapshots and withdraw this worker's."""
+        if self._flush_task is None:
+            return
+        self._flush_task.cancel()
+        await asyncio.gather(self._flush_task, return_exceptions=True)
+        self._flush_task = None
+        try:
+            os.remove(self._shared_path(os.getpid()))
+        except FileNotFoundError:
+            pass
+
+
+class UploadProgressMiddleware:
+    """ASGI middleware feeding the body bytes of upload requests into a ProgressRegistry."""
+
+    def __init__(self, app: ASGIApp, registry: ProgressRegistry, routes: Iterable[Tuple[str, str]] = ()) -> None:
+        """
+        Parameters:
+        - registry: where progress is recorded.
+        - routes: (method, path regex) pairs of upload requests. A named group 'id' in the
+          regex supplies the upload id (e.g. a resumable session); otherwise the
+          X-Upload-Id header does, and requests without it are not tracked.
+        """
+        self.app = app
+        self.registry = registry
+        self.routes: List[Tuple[str, Pattern[str]]] = [(m.upper(), re.compile(p)) for m, p in routes]
+        self._id_header = UPLOAD_ID_HEADER.encode("latin-1")
+
+    def _upload_id(self, scope: Scope) -> Tuple[Optional[str], bool]:
+        for method, pattern in self.routes:
+            match = pattern.match(scope["path"]) if method == scope["method"] else None
+            if match is None:
+                continue
+            if "id" in pattern.groupindex:
+                return match.group("id"), True
+            for name, value in scope["headers"]:
+                if name == self._id_header:
+                    upload_id = value.decode("latin-1")
+                    return (upload_id if is_valid_upload_id(upload_id) else None), False
+            return None, False
+        return None, False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        upload_id, resumable = self._upload_id(scope) if scope["type"] == "http" else (None, False)
+        if upload_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length", b"")
+        offset = headers.get(b"upload-offset", b"")
+        base = int(offset) if resumable and offset.isdigit() else 0
+        previous = self.registry.get(upload_id) if resumable else None
+        # A resumable session keeps its declared total across PATCH requests.
+        total = previous.total if previous is not None else (None if resumable or not length.isdigit() else int(length))
+        entry = self.registry.start(upload_id, total, base)
+        status_code = None
+
+        async def counting_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                entry.advance(len(message.get("body", b"")))
+            return message
+
+        async def watching_send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, watching_send)
+        finally:
+            if status_code is not None and status_code < 400 and (entry.total is None or entry.received >= entry.total):
+                state = COMPLETED
+            elif resumable and (status_code is None or status_code < 400):
+                # The session continues with the next PATCH.
+                state = PAUSED
+            else:
+                state = FAILED
+            self.registry.finish(entry, state)
+
+
+_registry: Optional[ProgressRegistry] = None
+
+
+# PUBLIC_INTERFACE
+def get_progress_registry() -> ProgressRegistry:
+    """Return the process-wide upload progress registry."""
+    global _registry
+    if _registry is None:
+        _registry = ProgressRegistry()
+    return _registry
@@ -0,0 +1,280 @@
+"""
+Token-bucket bandwidth shaping for upload bodies.
+
+BandwidthShaper holds a global bucket plus one bucket per client (tenant).
+Clients are identified like the admission scheduler does (scheduler.client_key):
+by peer address, or by UPLOAD_CLIENT_KEY_HEADER only when a trusted proxy sets
+it, so a client cannot get fresh buckets by sending a different header value.
+BandwidthShapingMiddleware charges every body chunk an upload request
+receives against both and delays the next receive() when a bucket runs dry.
+Not reading from the connection lets the server's flow control pause the
+socket, so a client on a fast link is slowed down by TCP backpressure instead
+of starving other uploads on the same worker.
+
+Limits can be changed at runtime with BandwidthShaper.configure; buckets pick
+up new rates on their next use. Each worker process has its own shaper, so
+runtime limits are published to UPLOAD_BANDWIDTH_LIMITS_FILE (by default in
+UPLOAD_DIR, which the workers share) with BandwidthShaper.publish, and every
+worker reloads that file when it changes, at most UPLOAD_BANDWIDTH_RELOAD_SECONDS
+later. The file outlives restarts; remove it to go back to the environment's limits.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.io_executor import get_io_executor
+from src.api.scheduler import client_key
+
+# Aggregate upload bandwidth of one worker in bytes/second (0 = unlimited).
+UPLOAD_BANDWIDTH_GLOBAL_BPS = int(os.getenv("UPLOAD_BANDWIDTH_GLOBAL_BPS", "0"))
+# Default upload bandwidth per client in bytes/second (0 = unlimited).
+UPLOAD_BANDWIDTH_PER_CLIENT_BPS = int(os.getenv("UPLOAD_BANDWIDTH_PER_CLIENT_BPS", "0"))
+# Bucket capacity expressed in seconds of traffic at the configured rate.
+UPLOAD_BANDWIDTH_BURST_SECONDS = float(os.getenv("UPLOAD_BANDWIDTH_BURST_SECONDS", "1.0"))
+# File holding the limits set at runtime, shared by the workers; empty = <UPLOAD_DIR>/.bandwidth.json.
+UPLOAD_BANDWIDTH_LIMITS_FILE = os.getenv("UPLOAD_BANDWIDTH_LIMITS_FILE", "")
+# Seconds between checks of UPLOAD_BANDWIDTH_LIMITS_FILE for limits published by another worker.
+UPLOAD_BANDWIDTH_RELOAD_SECONDS = float(os.getenv("UPLOAD_BANDWIDTH_RELOAD_SECONDS", "1.0"))
+
+# Name of the shared limits file in UPLOAD_DIR when UPLOAD_BANDWIDTH_LIMITS_FILE is not set.
+LIMITS_FILE_NAME = ".bandwidth.json"
+_MIN_BURST_BYTES = 256 * 1024
+# Idle per-client buckets are dropped once there are this many.
+_MAX_CLIENT_BUCKETS = 10000
+_IDLE_BUCKET_SECONDS = 60.0
+
+
+class TokenBucket:
+    """A token bucket whose balance may go negative; the debt is the caller's delay."""
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst_seconds: float = UPLOAD_BANDWIDTH_BURST_SECONDS) -> None:
+        self.rate = rate
+        self.burst = max(rate * burst_seconds, _MIN_BURST_BYTES)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def set_rate(self, rate: float, burst_seconds: float = UPLOAD_BANDWIDTH_BURST_SECONDS) -> None:
+        self.rate = rate
+        self.burst = max(rate * burst_seconds, _MIN_BURST_BYTES)
+        self.tokens = min(self.tokens, self.burst)
+
+    def reserve(self, nbytes: int) -> float:
+        """Take nbytes from the bucket and return how long the caller must wait (seconds)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= nbytes
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthShaper:
+    """Global and per-client token buckets for upload bodies."""
+
+    def __init__(
+        self,
+        global_bps: int = UPLOAD_BANDWIDTH_GLOBAL_BPS,
+        per_client_bps: int = UPLOAD_BANDWIDTH_PER_CLIENT_BPS,
+        client_overrides: Optional[Dict[str, int]] = None,
+        limits_file: str = "",
+    ) -> None:
+        """
+        Parameters:
+        - global_bps, per_client_bps, client_overrides: initial limits (bytes/second, 0 = unlimited).
+        - limits_file: file the workers share runtime limits through ("" = this process only).
+        """
+        self.limits_file = limits_file
+        # (mtime_ns, size) of the limits file when last applied.
+        self._limits_version: Optional[Tuple[int, int]] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self.global_bps = 0
+        self.per_client_bps = 0
+        self.client_overrides: Dict[str, int] = {}
+        self._global: Optional[TokenBucket] = None
+        self._clients: Dict[str, TokenBucket] = {}
+        self.throttled_seconds = 0.0
+        self.configure(global_bps, per_client_bps, client_overrides or {})
+
+    def configure(self, global_bps: int, per_client_bps: int, client_overrides: Dict[str, int]) -> None:
+        """Replace the limits (bytes/second, 0 = unlimited). Applies to uploads already in progress."""
+        self.global_bps = global_bps
+        self.per_client_bps = per_client_bps
+        self.client_overrides = dict(client_overrides)
+        if global_bps <= 0:
+            self._global = None
+        elif self._global is None:
+            self._global = TokenBucket(global_bps)
+        else:
+            self._global.set_rate(global_bps)
+        for client, bucket in list(self._clients.items()):
+            rate = self.rate_for(client)
+            if rate <= 0:
+                del self._clients[client]
+            else:
+                bucket.set_rate(rate)
+
+    def publish(self, global_bps: int, per_client_bps: int, client_overrides: Dict[str, int]) -> None:
+        """Apply new limits here and write them to the limits file for the other workers (blocking)."""
+        self.configure(global_bps, per_client_bps, client_overrides)
+        if not self.limits_file:
+            return
+        directory = os.path.dirname(self.limits_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        limits = {"global_bps": global_bps, "per_client_bps": per_client_bps, "client_overrides": client_overrides}
+        tmp_path = f"{self.limits_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(limits, f)
+        os.replace(tmp_path, self.limits_file)
+        self._limits_version = self._file_version()
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.limits_file)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self) -> bool:
+        """Apply the limits file if it changed since it was last applied (blocking). Returns True if applied."""
+        if not self.limits_file:
+            return False
+        version = self._file_version()
+        if version is None or version == self._limits_version:
+            return False
+        try:
+            with open(self.limits_file) as f:
+                limits = json.load(f)
+            self.configure(
+                int(limits.get("global_bps", 0)),
+                int(limits.get("per_client_bps", 0)),
+                {str(client): int(rate) for client, rate in limits.get("client_overrides", {}).items()},
+            )
+        except (FileNotFoundError, ValueError, TypeError, AttributeError):
+            # Replaced mid-read or malformed; keep the limits in effect and try again later.
+            return False
+        self._limits_version = version
+        return True
+
+    async def start_reloading(self) -> None:
+        """Apply the shared limits file now and keep following it (no-op without a limits file)."""
+        if not self.limits_file or self._reload_task is not None:
+            return
+        await get_io_executor().run(self.reload)
+        self._reload_task = asyncio.create_task(self._reload_loop())
+
+    async def _reload_loop(self) -> None:
+        while True:
+            await asyncio.sleep(UPLOAD_BANDWIDTH_RELOAD_SECONDS)
+            try:
+                await get_io_executor().run(self.reload)
+            except Exception:  # pragma: no cover
+                pass
+
+    async def stop_reloading(self) -> None:
+        """Stop following the limits file."""
+        if self._reload_task is None:
+            return
+        self._reload_task.cancel()
+        await asyncio.gather(self._reload_task, return_exceptions=True)
+        self._reload_task = None
+
+    def rate_for(self, client: str) -> int:
+        """Return the bytes/second limit of a client (0 = unlimited)."""
+        return self.client_overrides.get(client, self.per_client_bps)
+
+    @property
+    def enabled(self) -> bool:
+        return self._global is not None or self.per_client_bps > 0 or bool(self.client_overrides)
+
+    def _client_bucket(self, client: str) -> Optional[TokenBucket]:
+        bucket = self._clients.get(client)
+        if bucket is None:
+            rate = self.rate_for(client)
+            if rate <= 0:
+                return None
+            if len(self._clients) >= _MAX_CLIENT_BUCKETS:
+                self._drop_idle_buckets()
+            bucket = self._clients[client] = TokenBucket(rate)
+        return bucket
+
+    def _drop_idle_buckets(self) -> None:
+        cutoff = time.monotonic() - _IDLE_BUCKET_SECONDS
+        for client, bucket in list(self._clients.items()):
+            if bucket.stamp < cutoff:
+                del self._clients[client]
+
+    async def throttle(self, client: str, nbytes: int) -> None:
+        """Charge nbytes to the client's and the global bucket, sleeping if either is in debt."""
+        delay = 0.0
+        bucket = self._client_bucket(client)
+        if bucket is not None:
+            delay = bucket.reserve(nbytes)
+        if self._global is not None:
+            delay = max(delay, self._global.reserve(nbytes))
+        if delay > 0:
+            self.throttled_seconds += delay
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the configured limits and shaping counters."""
+        return {
+            "global_bytes_per_sec": self.global_bps,
+            "per_client_bytes_per_sec": self.per_client_bps,
+            "client_overrides": dict(self.client_overrides),
+            "shaped_clients": len(self._clients),
+            "limits_file": self.limits_file or None,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+class BandwidthShapingMiddleware:
+    """ASGI middleware pacing the request body of upload routes through a BandwidthShaper."""
+
+    def __init__(self, app: ASGIApp, shaper: BandwidthShaper, routes: Iterable[Tuple[str, str]] = ()) -> None:
+        self.app = app
+        self.shaper = shaper
+        self.routes: List[Tuple[str, Pattern[str]]] = [(m.upper(), re.compile(p)) for m, p in routes]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.shaper.enabled
+            or not any(m == scope["method"] and p.match(scope["path"]) for m, p in self.routes)
+        ):
+            await self.app(scope, receive, send)
+            return
+        client = client_key(scope)
+        pending = 0
+
+        async def shaped_receive() -> Message:
+            nonlocal pending
+            # Pay for the previous chunk before pulling the next one off the socket.
+            if pending:
+                await self.shaper.throttle(client, pending)
+                pending = 0
+            message = await receive()
+            if message["type"] == "http.request":
+                pending = len(message.get("body", b""))
+            return message
+
+        await self.app(scope, shaped_receive, send)
+
+
+_shaper: Optional[BandwidthShaper] = None
+
+
+# PUBLIC_INTERFACE
+def get_bandwidth_shaper() -> BandwidthShaper:
+    """Return the process-wide bandwidth shaper, configured from the environment."""
+    global _shaper
+    if _shaper is None:
+        default_file = os.path.join(os.getenv("UPLOAD_DIR", "./upload"), LIMITS_FILE_NAME)
+        _shaper = BandwidthShaper(limits_file=UPLOAD_BANDWIDTH_LIMITS_FILE or default_file)
+    return _shaper
@@ -0,0 +1,271 @@
+"""
+Recovery of interrupted uploads: stale '.part' files and abandoned sessions.
+
+A worker that dies mid-upload (crash, OOM kill, SIGKILL after the graceful
+timeout) never reaches the cleanup of its '.uploading_<id>.part' files. The
+PartReaper reclaims them at startup and then every UPLOAD_REAPER_INTERVAL_SECONDS:
+
+- Only the top level of UPLOAD_DIR and of each storage root is scanned, with a
+  single os.scandir() per directory; '.part' files are never created deeper,
+  so shard directories, '.jobs', '.catalog*' and the content store are not
+  walked.
+- A '.part' file that backs a live resumable or multi-part session is
+  re-adopted: the session record is kept and the client resumes from the
+  bytes on disk (the offset is the file size, received parts are markers).
+- Sessions past their expiry, records whose '.part' file is gone, and
+  '.part' files no session refers to are reclaimed once untouched for
+  UPLOAD_PART_STALE_SECONDS. The age threshold keeps the reaper safe while
+  other worker processes are still writing their own '.part' files.
+- With content dedup, objects in the content stores that no saved file links
+  to any more are removed (ContentStore.sweep).
+
+Workers share one lock file, so only one of them sweeps at a time.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from src.api.content_store import ContentStore
+from src.api.io_executor import get_io_executor
+from src.api.multipart_upload import MultipartUpload, MultipartUploadStore
+from src.api.resumable import ResumableSessionStore, UploadSession, read_json
+from src.api.storage import PART_PREFIX
+
+# Seconds a '.part' file (or expired session) must be untouched before it is reclaimed.
+UPLOAD_PART_STALE_SECONDS = float(os.getenv("UPLOAD_PART_STALE_SECONDS", "3600"))
+# Seconds between background sweeps; 0 only sweeps at startup.
+UPLOAD_REAPER_INTERVAL_SECONDS = float(os.getenv("UPLOAD_REAPER_INTERVAL_SECONDS", "300"))
+
+REAPER_LOCK_NAME = ".reaper.lock"
+
+logger = logging.getLogger(__name__)
+
+
+def _age(path: str, now: float) -> Optional[float]:
+    """Seconds since path was last modified; None if it is gone."""
+    try:
+        return now - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _remove(path: str) -> int:
+    """Remove a file and return the bytes freed (0 if it was already gone)."""
+    try:
+        size = os.stat(path).st_size
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+def _scan_files(directory: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(directory) as entries:
+            return [entry for entry in entries if entry.is_file(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+
+def _load(path: str, cls):
+    """Load a session record; None if it vanished or does not parse."""
+    try:
+        data = read_json(path)
+        return cls(**data) if data is not None else None
+    except (ValueError, TypeError):
+        logger.warning("Ignoring unreadable upload session record %s", path)
+        return None
+
+
+class PartReaper:
+    """Sweeps stale '.part' files and abandoned upload sessions."""
+
+    def __init__(
+        self,
+        upload_dir: str,
+        part_dirs: List[str],
+        resumable_store: ResumableSessionStore,
+        multipart_store: MultipartUploadStore,
+        stale_seconds: float = UPLOAD_PART_STALE_SECONDS,
+        interval_seconds: float = UPLOAD_REAPER_INTERVAL_SECONDS,
+        content_stores: Sequence[ContentStore] = (),
+    ) -> None:
+        self.upload_dir = upload_dir
+        self.content_stores = list(content_stores)
+        # Directories holding '.part' files, deduplicated; UPLOAD_DIR always included.
+        self.part_dirs: List[str] = []
+        for directory in [upload_dir, *part_dirs]:
+            if os.path.abspath(directory) not in map(os.path.abspath, self.part_dirs):
+                self.part_dirs.append(directory)
+        self.resumable_store = resumable_store
+        self.multipart_store = multipart_store
+        self.stale_seconds = stale_seconds
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.last_sweep_at: Optional[str] = None
+        self.last_sweep_seconds: Optional[float] = None
+        self.totals: Dict[str, int] = {
+            "parts_reclaimed": 0,
+            "bytes_reclaimed": 0,
+            "sessions_expired": 0,
+            "records_orphaned": 0,
+            "objects_reclaimed": 0,
+        }
+        # Sessions with a '.part' file found by the last sweep.
+        self.sessions_adopted = 0
+
+    def _is_stale(self, path: str, now: float) -> bool:
+        age = _age(path, now)
+        return age is None or age >= self.stale_seconds
+
+    def _sweep_resumable(self, now: float, live: Set[str], result: Dict[str, int]) -> None:
+        store = self.resumable_store
+        for entry in _scan_files(store.sessions_dir):
+            if entry.name.endswith(".tmp"):
+                # Interrupted write_json_atomic().
+                if self._is_stale(entry.path, now):
+                    _remove(entry.path)
+                continue
+            session = _load(entry.path, UploadSession) if entry.name.endswith(".json") else None
+            if session is None:
+                continue
+            part_path = store.part_path(session)
+            part_exists = os.path.exists(part_path)
+            if session.is_expired() and self._is_stale(part_path, now):
+                result["bytes_reclaimed"] += _remove(part_path)
+                _remove(entry.path)
+                result["sessions_expired"] += 1
+            elif not part_exists and self._is_stale(entry.path, now):
+                # Nothing to resume from; requests already answer 404 for it.
+                _remove(entry.path)
+                result["records_orphaned"] += 1
+            else:
+                live.add(os.path.abspath(part_path))
+                result["sessions_adopted"] += int(part_exists)
+
+    def _sweep_multipart(self, now: float, live: Set[str], result: Dict[str, int]) -> None:
+        store = self.multipart_store
+        record_ids = set()
+        for entry in _scan_files(store.state_dir):
+            if entry.name.endswith(".tmp"):
+                if self._is_stale(entry.path, now):
+                    _remove(entry.path)
+                continue
+            upload = _load(entry.path, MultipartUpload) if entry.name.endswith(".json") else None
+            if upload is None:
+                continue
+            part_path = store.part_path(upload)
+            part_exists = os.path.exists(part_path)
+            if upload.is_expired() and self._is_stale(part_path, now):
+                result["bytes_reclaimed"] += _remove(part_path)
+                _remove(entry.path)
+                shutil.rmtree(os.path.join(store.state_dir, f"{upload.id}.parts"), True)
+                result["sessions_expired"] += 1
+            elif not part_exists and self._is_stale(entry.path, now):
+                _remove(entry.path)
+                shutil.rmtree(os.path.join(store.state_dir, f"{upload.id}.parts"), True)
+                result["records_orphaned"] += 1
+            else:
+                record_ids.add(upload.id)
+                live.add(os.path.abspath(part_path))
+                result["sessions_adopted"] += int(part_exists)
+        # Marker directories left behind by a record that was removed mid-delete.
+        try:
+            with os.scandir(store.state_dir) as entries:
+                markers = [e for e in entries if e.name.endswith(".parts") and e.is_dir(follow_symlinks=False)]
+        except FileNotFoundError:
+            markers = []
+        for entry in markers:
+            if entry.name[: -len(".parts")] not in record_ids and self._is_stale(entry.path, now):
+                shutil.rmtree(entry.path, True)
+
+    def sweep(self) -> Dict[str, int]:
+        """Run one sweep (blocking); returns what it found. Skipped if another worker is sweeping."""
+        lock_path = os.path.join(self.upload_dir, REAPER_LOCK_NAME)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {}
+            started = time.monotonic()
+            now = time.time()
+            result = {key: 0 for key in self.totals}
+            result["sessions_adopted"] = 0
+            # Session records first, so every '.part' file a session owns is known before deciding.
+            live: Set[str] = set()
+            self._sweep_resumable(now, live, result)
+            self._sweep_multipart(now, live, result)
+            for directory in self.part_dirs:
+                try:
+                    with os.scandir(directory) as entries:
+                        parts = [
+                            entry.path for entry in entries
+                            if entry.name.startswith(PART_PREFIX) and entry.name.endswith(".part")
+                        ]
+                except FileNotFoundError:
+                    continue
+                for path in parts:
+                    if os.path.abspath(path) in live or not self._is_stale(path, now):
+                        continue
+                    freed = _remove(path)
+                    result["bytes_reclaimed"] += freed
+                    result["parts_reclaimed"] += 1
+                    logger.info("Reclaimed stale upload part %s (%d bytes)", path, freed)
+            for store in self.content_stores:
+                objects, freed = store.sweep()
+                result["objects_reclaimed"] += objects
+                result["bytes_reclaimed"] += freed
+        finally:
+            os.close(fd)
+        self.sessions_adopted = result["sessions_adopted"]
+        for key in self.totals:
+            self.totals[key] += result[key]
+        self.sweeps += 1
+        self.last_sweep_at = datetime.utcnow().isoformat()
+        self.last_sweep_seconds = time.monotonic() - started
+        return result
+
+    async def run_once(self) -> Dict[str, int]:
+        """Run one sweep on the disk I/O executor."""
+        return await get_io_executor().run(self.sweep)
+
+    async def start(self) -> None:
+        """Sweep once (crash recovery) and start the periodic reaper."""
+        await self.run_once()
+        if self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception:  # pragma: no cover
+                logger.exception("Upload part reaper sweep failed")
+
+    async def stop(self) -> None:
+        """Stop the periodic reaper."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return reaper metrics of this worker."""
+        return {
+            "directories": self.part_dirs,
+            "stale_seconds": self.stale_seconds,
+            "interval_seconds": self.interval_seconds,
+            "sweeps": self.sweeps,
+            "last_sweep_at": self.last_sweep_at,
+            "last_sweep_seconds": self.last_sweep_seconds,
+            "sessions_adopted": self.sessions_adopted,
+            **self.totals,
+        }
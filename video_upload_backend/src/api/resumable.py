@@ -0,0 +1,134 @@
+"""
+Persistent state for resumable (tus-style) uploads.
+
+A resumable upload is an ordinary '.uploading_<id>.part' file in the upload
+directory (or in the storage root chosen for it, see part_dir) plus a small
+JSON session record under '<UPLOAD_DIR>/.sessions'.
+The authoritative offset is the size of the '.part' file itself, so a session
+survives worker restarts and crashes: whatever bytes reached the disk count,
+and the client resumes from there.
+"""
+import json
+import os
+import re
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from src.api.io_executor import get_io_executor, remove_file
+
+SESSIONS_DIR_NAME = ".sessions"
+# Sessions not completed within this many hours are considered expired.
+SESSION_TTL_HOURS = int(os.getenv("RESUMABLE_SESSION_TTL_HOURS", "24"))
+
+_SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class UploadSession:
+    """A resumable upload session as persisted on disk."""
+    id: str
+    filename: str
+    length: int
+    content_type: Optional[str]
+    created_at: str
+    expires_at: str
+    # Directory of the '.part' file when it is not the upload directory (a storage root).
+    part_dir: Optional[str] = None
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        """True when the session is past its expiry time."""
+        now = now or datetime.utcnow()
+        return now >= datetime.fromisoformat(self.expires_at)
+
+
+def part_path_for(upload_dir: str, session_id: str) -> str:
+    """Return the '.part' path backing the given session."""
+    return os.path.join(upload_dir, f".uploading_{session_id}.part")
+
+
+def write_json_atomic(path: str, data: dict) -> None:
+    """Write data as JSON to path via a temp file and rename (blocking)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_json(path: str) -> Optional[dict]:
+    """Load JSON from path; None if the file does not exist (blocking)."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _create_empty(path: str) -> None:
+    with open(path, "xb"):
+        pass
+
+
+def _file_size(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+
+class ResumableSessionStore:
+    """Creates, loads and deletes resumable upload sessions under an upload directory."""
+
+    def __init__(self, upload_dir: str) -> None:
+        self.upload_dir = upload_dir
+        self.sessions_dir = os.path.join(upload_dir, SESSIONS_DIR_NAME)
+
+    def ensure_dirs(self) -> None:
+        """Create the session directory if needed."""
+        os.makedirs(self.sessions_dir, exist_ok=True)
+
+    def _session_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{session_id}.json")
+
+    def part_path(self, session: UploadSession) -> str:
+        """Return the '.part' path backing the session."""
+        return part_path_for(session.part_dir or self.upload_dir, session.id)
+
+    async def create(
+        self, filename: str, length: int, content_type: Optional[str], part_dir: Optional[str] = None
+    ) -> UploadSession:
+        """Persist a new session and create its empty '.part' file (in part_dir if given)."""
+        now = datetime.utcnow()
+        session = UploadSession(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            length=length,
+            content_type=content_type,
+            created_at=now.isoformat(),
+            expires_at=(now + timedelta(hours=SESSION_TTL_HOURS)).isoformat(),
+            part_dir=part_dir,
+        )
+        io = get_io_executor()
+        await io.run(_create_empty, self.part_path(session))
+        await io.run(write_json_atomic, self._session_path(session.id), asdict(session))
+        return session
+
+    async def get(self, session_id: str) -> Optional[UploadSession]:
+        """Load a session by id; None if the id is malformed or unknown."""
+        if not _SESSION_ID_RE.match(session_id):
+            return None
+        data = await get_io_executor().run(read_json, self._session_path(session_id))
+        if data is None:
+            return None
+        return UploadSession(**data)
+
+    async def offset(self, session: UploadSession) -> Optional[int]:
+        """Return the number of bytes received so far; None if the '.part' file is gone."""
+        return await get_io_executor().run(_file_size, self.part_path(session))
+
+    async def delete(self, session: UploadSession, keep_part: bool = False) -> None:
+        """Remove the session record and, unless keep_part is set, its '.part' file."""
+        if not keep_part:
+            await remove_file(self.part_path(session))
+        await remove_file(self._session_path(session.id))
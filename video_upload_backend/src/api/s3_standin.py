@@ -0,0 +1,361 @@
+"""
+Local stand-in for an S3-compatible object store.
+
+Implements the subset of the S3 REST API used by src/api/s3_storage.py, with
+path-style URLs and objects kept as files under a directory:
+
+- PutObject, GetObject (with Range and conditional requests), HeadObject, DeleteObject
+- CreateMultipartUpload, UploadPart, CompleteMultipartUpload, AbortMultipartUpload
+
+Buckets are created implicitly. When credentials are configured, requests
+must carry a valid Signature Version 4 (Authorization header or presigned
+query), so signing problems show up locally rather than against the real
+store. Multipart rules that matter to clients are enforced too: parts other
+than the last must be at least 5 MiB, and the ETags given on completion must
+match the parts.
+
+Run it next to the API for development:
+    python -m src.api.s3_standin --dir ./s3data --port 9000
+and start the API with STORAGE_BACKEND=s3 S3_ENDPOINT=http://127.0.0.1:9000.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import shutil
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from src.api.io_executor import get_io_executor
+from src.api.media import (
+    RangeNotSatisfiable,
+    StoredFileResponse,
+    not_modified,
+    parse_range,
+    range_applies,
+)
+from src.api.s3_storage import MIN_PART_SIZE_BYTES, UNSIGNED_PAYLOAD, canonical_query, sigv4_signature
+
+_UPLOADS_DIR = ".multipart"
+# Accepted difference between a request's x-amz-date and the server clock.
+_MAX_CLOCK_SKEW_SECONDS = 900
+
+
+class S3Error(Exception):
+    def __init__(self, status_code: int, code: str, message: str = "") -> None:
+        super().__init__(message or code)
+        self.status_code = status_code
+        self.code = code
+
+
+def _error_response(exc: S3Error) -> Response:
+    body = f"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<Error><Code>{exc.code}</Code><Message>{exc}</Message></Error>"
+    return Response(body, status_code=exc.status_code, media_type="application/xml")
+
+
+def _parse_time(amz_date: str) -> float:
+    try:
+        return datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        raise S3Error(403, "AccessDenied", "Invalid X-Amz-Date.")
+
+
+class StandInStore:
+    """Buckets and objects under one directory."""
+
+    def __init__(self, directory: str, access_key: str = "", secret_key: str = "") -> None:
+        self.directory = directory
+        self.access_key = access_key
+        self.secret_key = secret_key
+
+    # Authentication
+
+    def authenticate(self, request: Request) -> None:
+        """Check the request signature; no-op without configured credentials."""
+        if not self.secret_key:
+            return
+        path = request.scope.get("raw_path", b"").split(b"?")[0].decode("latin-1") or request.url.path
+        params = parse_qsl(request.url.query, keep_blank_values=True)
+        query_args = dict(params)
+        if "X-Amz-Signature" in query_args:
+            credential = query_args.get("X-Amz-Credential", "")
+            amz_date = query_args.get("X-Amz-Date", "")
+            if time.time() > _parse_time(amz_date) + int(query_args.get("X-Amz-Expires", "0")):
+                raise S3Error(403, "AccessDenied", "Request has expired.")
+            signed_names = query_args.get("X-Amz-SignedHeaders", "host").split(";")
+            signature = query_args["X-Amz-Signature"]
+            params = [(k, v) for k, v in params if k != "X-Amz-Signature"]
+            payload_hash = UNSIGNED_PAYLOAD
+        else:
+            auth = request.headers.get("authorization", "")
+            if not auth.startswith("AWS4-HMAC-SHA256 "):
+                raise S3Error(403, "AccessDenied", "Missing or unsupported Authorization.")
+            fields = dict(
+                item.strip().split("=", 1) for item in auth[len("AWS4-HMAC-SHA256 "):].split(",") if "=" in item
+            )
+            credential = fields.get("Credential", "")
+            signed_names = fields.get("SignedHeaders", "").split(";")
+            signature = fields.get("Signature", "")
+            amz_date = request.headers.get("x-amz-date", "")
+            if abs(time.time() - _parse_time(amz_date)) > _MAX_CLOCK_SKEW_SECONDS:
+                raise S3Error(403, "RequestTimeTooSkewed")
+            payload_hash = request.headers.get("x-amz-content-sha256", "")
+        access_key, _, scope = credential.partition("/")
+        region = scope.split("/")[1] if scope.count("/") >= 3 else ""
+        if access_key != self.access_key:
+            raise S3Error(403, "InvalidAccessKeyId")
+        headers = {name: request.headers.get(name, "") for name in signed_names}
+        _, expected = sigv4_signature(
+            request.method, path, canonical_query(params), headers, payload_hash, amz_date, region, self.secret_key
+        )
+        if not hmac.compare_digest(expected, signature):
+            raise S3Error(403, "SignatureDoesNotMatch")
+
+    # Paths
+
+    def object_path(self, bucket: str, key: str) -> str:
+        parts = [bucket] + key.split("/")
+        if any(part in ("", ".", "..") for part in parts) or bucket.startswith("."):
+            raise S3Error(400, "InvalidObjectName")
+        return os.path.join(self.directory, *parts)
+
+    def upload_dir(self, upload_id: str) -> str:
+        if not upload_id.isalnum():
+            raise S3Error(404, "NoSuchUpload")
+        return os.path.join(self.directory, _UPLOADS_DIR, upload_id)
+
+    # Blocking helpers, run on the I/O executor
+
+    @staticmethod
+    def _write_body_start(path: str) -> Tuple[object, "hashlib._Hash"]:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, "wb"), hashlib.md5()
+
+    @staticmethod
+    def _write_chunk(f, md5, chunk: bytes) -> None:
+        md5.update(chunk)
+        f.write(chunk)
+
+    async def receive_to(self, request: Request, path: str) -> Tuple[str, int]:
+        """Write the request body to path via a temp file; returns (md5 hex, size)."""
+        io = get_io_executor()
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        f, md5 = await io.run(self._write_body_start, tmp_path)
+        size = 0
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    size += len(chunk)
+                    await io.run(self._write_chunk, f, md5, chunk)
+            await io.run(f.close)
+            await io.run(os.replace, tmp_path, path)
+        except BaseException:
+            await io.run(f.close)
+            await io.run(_remove_quietly, tmp_path)
+            raise
+        return md5.hexdigest(), size
+
+    def _complete(self, upload_dir: str, target: str, parts: list) -> str:
+        meta = _read_meta(upload_dir)
+        last = len(parts) - 1
+        md5s = []
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            with open(tmp_path, "wb") as out:
+                for index, (number, etag) in enumerate(parts):
+                    part_path = os.path.join(upload_dir, str(number))
+                    if not os.path.isfile(part_path):
+                        raise S3Error(400, "InvalidPart", f"Part {number} was not uploaded.")
+                    stored_etag = _read_text(part_path + ".etag")
+                    if etag.strip('"') != stored_etag:
+                        raise S3Error(400, "InvalidPart", f"ETag of part {number} does not match.")
+                    if index < last and os.path.getsize(part_path) < MIN_PART_SIZE_BYTES:
+                        raise S3Error(400, "EntityTooSmall", f"Part {number} is smaller than 5 MiB.")
+                    with open(part_path, "rb") as src:
+                        shutil.copyfileobj(src, out, 1024 * 1024)
+                    md5s.append(bytes.fromhex(stored_etag))
+            os.replace(tmp_path, target)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        if meta.get("content_type"):
+            _write_text(target + ".content-type", meta["content_type"])
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return f"{hashlib.md5(b''.join(md5s)).hexdigest()}-{len(parts)}"
+
+    # Handlers
+
+    async def handle(self, request: Request) -> Response:
+        try:
+            self.authenticate(request)
+            bucket = request.path_params["bucket"]
+            key = request.path_params["key"]
+            query = dict(parse_qsl(request.url.query, keep_blank_values=True))
+            method = request.method
+            if method == "POST" and "uploads" in query:
+                return await self.create_multipart_upload(request, bucket, key)
+            if method == "PUT" and "uploadId" in query:
+                return await self.upload_part(request, query["uploadId"], query.get("partNumber", ""))
+            if method == "POST" and "uploadId" in query:
+                return await self.complete_multipart_upload(request, bucket, key, query["uploadId"])
+            if method == "DELETE" and "uploadId" in query:
+                await get_io_executor().run(shutil.rmtree, self.upload_dir(query["uploadId"]), True)
+                return Response(status_code=204)
+            if method == "PUT":
+                return await self.put_object(request, bucket, key)
+            if method in ("GET", "HEAD"):
+                return await self.get_object(request, bucket, key)
+            if method == "DELETE":
+                path = self.object_path(bucket, key)
+                await get_io_executor().run(_remove_quietly, path)
+                await get_io_executor().run(_remove_quietly, path + ".content-type")
+                return Response(status_code=204)
+            raise S3Error(405, "MethodNotAllowed")
+        except S3Error as exc:
+            return _error_response(exc)
+
+    async def put_object(self, request: Request, bucket: str, key: str) -> Response:
+        path = self.object_path(bucket, key)
+        md5, _ = await self.receive_to(request, path)
+        content_type = request.headers.get("content-type")
+        if content_type:
+            await get_io_executor().run(_write_text, path + ".content-type", content_type)
+        return Response(status_code=200, headers={"ETag": f'"{md5}"'})
+
+    async def get_object(self, request: Request, bucket: str, key: str) -> Response:
+        io = get_io_executor()
+        path = self.object_path(bucket, key)
+        try:
+            f = await io.run(open, path, "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise S3Error(404, "NoSuchKey")
+        st = await io.run(os.fstat, f.fileno())
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        headers = {"ETag": etag}
+        if not_modified(request.headers, st, etag):
+            await io.run(f.close)
+            return Response(status_code=304, headers=headers)
+        ranges = None
+        if request.headers.get("range") and range_applies(request.headers, st, etag):
+            try:
+                ranges = parse_range(request.headers["range"], st.st_size)
+            except RangeNotSatisfiable:
+                await io.run(f.close)
+                raise S3Error(416, "InvalidRange")
+        content_type = await io.run(_read_text, path + ".content-type") or "binary/octet-stream"
+        return StoredFileResponse(f, path, st, content_type, ranges, headers, request.method != "HEAD")
+
+    async def create_multipart_upload(self, request: Request, bucket: str, key: str) -> Response:
+        self.object_path(bucket, key)
+        upload_id = uuid.uuid4().hex
+        upload_dir = self.upload_dir(upload_id)
+        await get_io_executor().run(os.makedirs, upload_dir)
+        await get_io_executor().run(
+            _write_text, os.path.join(upload_dir, "meta"), request.headers.get("content-type", "")
+        )
+        body = (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<InitiateMultipartUploadResult>"
+            f"<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>"
+            "</InitiateMultipartUploadResult>"
+        )
+        return Response(body, media_type="application/xml")
+
+    async def upload_part(self, request: Request, upload_id: str, part_number: str) -> Response:
+        upload_dir = self.upload_dir(upload_id)
+        if not await get_io_executor().run(os.path.isdir, upload_dir):
+            raise S3Error(404, "NoSuchUpload")
+        if not part_number.isdigit() or not 1 <= int(part_number) <= 10000:
+            raise S3Error(400, "InvalidArgument", "Invalid partNumber.")
+        part_path = os.path.join(upload_dir, str(int(part_number)))
+        md5, _ = await self.receive_to(request, part_path)
+        await get_io_executor().run(_write_text, part_path + ".etag", md5)
+        return Response(status_code=200, headers={"ETag": f'"{md5}"'})
+
+    async def complete_multipart_upload(self, request: Request, bucket: str, key: str, upload_id: str) -> Response:
+        upload_dir = self.upload_dir(upload_id)
+        if not await get_io_executor().run(os.path.isdir, upload_dir):
+            raise S3Error(404, "NoSuchUpload")
+        try:
+            root = ET.fromstring(await request.body())
+        except ET.ParseError:
+            raise S3Error(400, "MalformedXML")
+        parts = []
+        for element in root.iter():
+            if element.tag.rsplit("}", 1)[-1] == "Part":
+                fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "") for child in element}
+                if not fields.get("PartNumber", "").isdigit():
+                    raise S3Error(400, "MalformedXML")
+                parts.append((int(fields["PartNumber"]), fields.get("ETag", "")))
+        if not parts or [n for n, _ in parts] != sorted(n for n, _ in parts):
+            raise S3Error(400, "InvalidPartOrder")
+        etag = await get_io_executor().run(self._complete, upload_dir, self.object_path(bucket, key), parts)
+        body = (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<CompleteMultipartUploadResult>"
+            f"<Bucket>{bucket}</Bucket><Key>{key}</Key><ETag>\"{etag}\"</ETag>"
+            "</CompleteMultipartUploadResult>"
+        )
+        return Response(body, media_type="application/xml")
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _read_meta(upload_dir: str) -> Dict[str, str]:
+    return {"content_type": _read_text(os.path.join(upload_dir, "meta")) or ""}
+
+
+# PUBLIC_INTERFACE
+def create_app(directory: str, access_key: str = "", secret_key: str = "") -> Starlette:
+    """Return the stand-in ASGI application storing objects under directory."""
+    store = StandInStore(directory, access_key, secret_key)
+    return Starlette(routes=[
+        Route("/{bucket}/{key:path}", store.handle, methods=["GET", "HEAD", "PUT", "POST", "DELETE"]),
+    ])
+
+
+def main(argv=None) -> None:
+    """Command line entry point: python -m src.api.s3_standin [--dir DIR] [--port PORT]."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m src.api.s3_standin", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default="./s3data", help="directory holding the buckets")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--access-key", default=os.getenv("S3_ACCESS_KEY_ID", ""))
+    parser.add_argument("--secret-key", default=os.getenv("S3_SECRET_ACCESS_KEY", ""),
+                        help="require signed requests (default: accept anonymous requests)")
+    args = parser.parse_args(argv)
+    os.makedirs(args.dir, exist_ok=True)
+    uvicorn.run(create_app(args.dir, args.access_key, args.secret_key), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
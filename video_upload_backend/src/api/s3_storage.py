@@ -0,0 +1,513 @@
+"""
+S3-compatible storage backend (AWS S3, MinIO, Ceph RGW, ...).
+
+Requests are signed with AWS Signature Version 4 and sent over one pooled
+httpx.AsyncClient per worker, so uploads reuse keep-alive connections instead
+of paying a TCP/TLS handshake per object or part.
+
+An S3ObjectWriter collects the streamed bytes into pooled buffers of
+S3_PART_SIZE_BYTES. Objects that fit into one buffer are stored with a single
+PutObject on commit; larger ones switch to a multipart upload as soon as the
+first buffer fills, with up to S3_UPLOAD_CONCURRENCY parts in flight while the
+client keeps sending, so memory per upload stays bounded and nothing is
+staged on local disk. Failed requests are retried with backoff; an aborted
+writer aborts its multipart upload.
+
+Objects are keyed '<S3_PREFIX><shard path of saved_as>' (see src/api/layout.py)
+with path-style URLs ('<endpoint>/<bucket>/<key>'). Readers get presigned GET
+URLs, which also serve ranges and conditional requests.
+
+src/api/s3_standin.py is a small local server implementing the subset of the
+API used here, for development and tests without an object store.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from src.api.buffers import get_buffer_pool
+from src.api.io_executor import get_io_executor, remove_file
+from src.api.layout import ShardLayout, get_shard_layout
+from src.api.storage import ObjectWriter, StorageBackend, StorageError
+
+S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://localhost:9000")
+S3_BUCKET = os.getenv("S3_BUCKET", "videos")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID", "")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY", "")
+# Prepended to every object key.
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+# Size of multipart upload parts; S3 requires at least 5 MiB for all but the last part.
+S3_PART_SIZE_BYTES = int(os.getenv("S3_PART_SIZE_BYTES", str(8 * 1024 * 1024)))
+# Parts of one upload sent concurrently.
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+# Connections kept open to the object store, per worker.
+S3_MAX_CONNECTIONS = int(os.getenv("S3_MAX_CONNECTIONS", "64"))
+S3_TIMEOUT_SECONDS = float(os.getenv("S3_TIMEOUT_SECONDS", "60"))
+S3_MAX_RETRIES = int(os.getenv("S3_MAX_RETRIES", "3"))
+# Lifetime of presigned download URLs.
+S3_PRESIGN_SECONDS = int(os.getenv("S3_PRESIGN_SECONDS", "3600"))
+
+MIN_PART_SIZE_BYTES = 5 * 1024 * 1024
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_ALGORITHM = "AWS4-HMAC-SHA256"
+_RETRY_STATUSES = {500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def canonical_query(params: Iterable[Tuple[str, str]]) -> str:
+    """Return the SigV4 canonical query string (also used as the request's query string)."""
+    return "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(params))
+
+
+def _signing_key(secret_key: str, date: str, region: str, service: str) -> bytes:
+    key = ("AWS4" + secret_key).encode("utf-8")
+    for part in (date, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    return key
+
+
+def sigv4_signature(
+    method: str,
+    path: str,
+    query: str,
+    headers: Dict[str, str],
+    payload_hash: str,
+    amz_date: str,
+    region: str,
+    secret_key: str,
+    service: str = "s3",
+) -> Tuple[str, str]:
+    """
+    Return (signed header names, signature) of a request.
+
+    path must already be URI-encoded and query be canonical_query(); headers are the
+    ones to sign (at least host and, for header auth, x-amz-date).
+    """
+    names = sorted(name.lower() for name in headers)
+    values = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+    signed_headers = ";".join(names)
+    canonical_request = "\n".join([
+        method, path, query, "".join(f"{name}:{values[name]}\n" for name in names), signed_headers, payload_hash,
+    ])
+    scope = f"{amz_date[:8]}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        _ALGORITHM, amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    signature = hmac.new(
+        _signing_key(secret_key, amz_date[:8], region, service), string_to_sign.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+    return signed_headers, signature
+
+
+def _amz_date(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _xml_text(body: bytes, tag: str) -> Optional[str]:
+    """Return the text of the first element named tag (any namespace) in an XML document."""
+    try:
+        root = ET.fromstring(body)
+    except ET.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] == tag:
+            return element.text
+    return None
+
+
+def _read_at(fd: int, buf: bytearray, length: int, offset: int) -> int:
+    """Fill buf[:length] from fd at offset (blocking). Returns the bytes read."""
+    view = memoryview(buf)[:length]
+    done = 0
+    while done < length:
+        n = os.preadv(fd, [view[done:]], offset + done)
+        if not n:
+            break
+        done += n
+    return done
+
+
+class S3ObjectWriter(ObjectWriter):
+    """Streams one object into S3, switching to a multipart upload once it outgrows one part."""
+
+    def __init__(self, storage: "S3Storage", saved_as: str, content_type: Optional[str]) -> None:
+        super().__init__(saved_as)
+        self.storage = storage
+        self.key = storage.key(saved_as)
+        self.content_type = content_type
+        self._pool = get_buffer_pool()
+        self._buf: Optional[bytearray] = self._pool.acquire(storage.part_size)
+        self._fill = 0
+        self._upload_id: Optional[str] = None
+        self._etags: Dict[int, str] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._slots = asyncio.Semaphore(storage.upload_concurrency)
+        self._error: Optional[BaseException] = None
+
+    async def write(self, data) -> None:
+        if self._error is not None:
+            raise self._error
+        view = memoryview(data)
+        # Hash on an I/O thread like the local writers do; copy on the loop (one memcpy).
+        await get_io_executor().run(self.digest.update, view)
+        while view:
+            take = min(len(view), self.storage.part_size - self._fill)
+            self._buf[self._fill:self._fill + take] = view[:take]
+            self._fill += take
+            view = view[take:]
+            if self._fill == self.storage.part_size:
+                await self._ship_part()
+        self.size += len(data)
+
+    async def _ship_part(self) -> None:
+        if self._upload_id is None:
+            self._upload_id = await self.storage.create_multipart_upload(self.key, self.content_type)
+        # Wait for a free slot: bounds the memory of parts in flight.
+        await self._slots.acquire()
+        if self._error is not None:
+            self._slots.release()
+            raise self._error
+        number = len(self._tasks) + 1
+        buf, fill = self._buf, self._fill
+        self._buf, self._fill = self._pool.acquire(self.storage.part_size), 0
+        self._tasks.append(asyncio.create_task(self._upload_part(number, buf, fill)))
+
+    async def _upload_part(self, number: int, buf: bytearray, length: int) -> None:
+        try:
+            self._etags[number] = await self.storage.upload_part(
+                self.key, self._upload_id, number, memoryview(buf)[:length]
+            )
+        except BaseException as exc:
+            if self._error is None:
+                self._error = exc
+            raise
+        finally:
+            self._pool.release(buf)
+            self._slots.release()
+
+    def _release_buffer(self) -> None:
+        if self._buf is not None:
+            self._pool.release(self._buf)
+            self._buf = None
+
+    async def commit(self) -> bool:
+        try:
+            if self._upload_id is None:
+                await self.storage.put_object(self.key, memoryview(self._buf)[:self._fill], self.content_type)
+            else:
+                if self._fill:
+                    await self._ship_part()
+                await asyncio.gather(*self._tasks)
+                await self.storage.complete_multipart_upload(self.key, self._upload_id, self._etags)
+        except BaseException:
+            await self.abort()
+            raise
+        finally:
+            self._release_buffer()
+        return False
+
+    async def abort(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._release_buffer()
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            try:
+                await self.storage.abort_multipart_upload(self.key, upload_id)
+            except Exception:  # pragma: no cover
+                # The bucket's lifecycle rule for incomplete uploads collects it.
+                logger.warning("Failed to abort multipart upload %s of %s", upload_id, self.key, exc_info=True)
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket."""
+
+    name = "s3"
+    local = False
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        part_size: int = S3_PART_SIZE_BYTES,
+        upload_concurrency: int = S3_UPLOAD_CONCURRENCY,
+        max_connections: int = S3_MAX_CONNECTIONS,
+        timeout: float = S3_TIMEOUT_SECONDS,
+        max_retries: int = S3_MAX_RETRIES,
+        presign_seconds: int = S3_PRESIGN_SECONDS,
+        layout: Optional[ShardLayout] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        """
+        Parameters:
+        - endpoint: base URL of the object store, e.g. 'https://s3.eu-west-1.amazonaws.com'.
+        - part_size: multipart part size (at least 5 MiB).
+        - transport: custom httpx transport (tests run against s3_standin through ASGITransport).
+        """
+        if part_size < MIN_PART_SIZE_BYTES:
+            raise ValueError(f"S3_PART_SIZE_BYTES must be at least {MIN_PART_SIZE_BYTES}.")
+        self.endpoint = endpoint.rstrip("/")
+        self.host = httpx.URL(self.endpoint).netloc.decode("ascii")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        self.part_size = part_size
+        self.upload_concurrency = max(1, upload_concurrency)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.presign_seconds = presign_seconds
+        self.layout = layout or get_shard_layout()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.objects_written = 0
+        self.bytes_written = 0
+        self.parts_uploaded = 0
+
+    @classmethod
+    def from_env(cls) -> "S3Storage":
+        """Build the backend from the S3_* settings."""
+        return cls(S3_ENDPOINT, S3_BUCKET, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, S3_REGION, S3_PREFIX)
+
+    def key(self, saved_as: str) -> str:
+        """Return the object key of a saved name."""
+        return self.prefix + self.layout.relative_path(saved_as).replace(os.sep, "/")
+
+    def _path(self, key: str) -> str:
+        return "/" + _uri_encode(self.bucket) + "/" + _uri_encode(key, safe="-_.~/")
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0)),
+            )
+        return self._client
+
+    def _signed_headers(
+        self, method: str, path: str, query: str, headers: Dict[str, str], payload_hash: str
+    ) -> Dict[str, str]:
+        amz_date = _amz_date()
+        to_sign = {"host": self.host, "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash}
+        to_sign.update({k.lower(): v for k, v in headers.items() if k.lower().startswith("x-amz-")})
+        signed, signature = sigv4_signature(method, path, query, to_sign, payload_hash, amz_date, self.region,
+                                            self.secret_key)
+        result = dict(headers)
+        result.update({"x-amz-date": amz_date, "x-amz-content-sha256": payload_hash})
+        if self.access_key:
+            result["Authorization"] = (
+                f"{_ALGORITHM} Credential={self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request, "
+                f"SignedHeaders={signed}, Signature={signature}"
+            )
+        return result
+
+    async def _request(
+        self,
+        method: str,
+        key: str,
+        params: Iterable[Tuple[str, str]] = (),
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[Callable[[], Any]] = None,
+        length: int = 0,
+        ok: Tuple[int, ...] = (200,),
+    ) -> httpx.Response:
+        """
+        Send a signed request, retrying connection errors and 5xx responses with backoff.
+        body is a factory returning fresh content for every attempt.
+        """
+        path = self._path(key)
+        query = canonical_query(params)
+        url = self.endpoint + path + ("?" + query if query else "")
+        headers = dict(headers or {})
+        if body is not None:
+            headers["Content-Length"] = str(length)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.requests += 1
+            try:
+                response = await self._http().request(
+                    method, url, content=body() if body is not None else None,
+                    headers=self._signed_headers(method, path, query, headers, UNSIGNED_PAYLOAD),
+                )
+            except httpx.TransportError as exc:
+                if attempt > self.max_retries:
+                    self.errors += 1
+                    raise StorageError(f"S3 {method} {key} failed: {exc}") from exc
+            else:
+                if response.status_code in ok:
+                    return response
+                if response.status_code not in _RETRY_STATUSES or attempt > self.max_retries:
+                    self.errors += 1
+                    code = _xml_text(response.content, "Code") or response.reason_phrase
+                    raise StorageError(f"S3 {method} {key} failed: {response.status_code} {code}")
+            self.retries += 1
+            await asyncio.sleep(0.2 * 2 ** (attempt - 1))
+
+    async def put_object(self, key: str, data: memoryview, content_type: Optional[str] = None) -> None:
+        """Store an object with a single PutObject."""
+        headers = {"Content-Type": content_type} if content_type else {}
+        await self._request("PUT", key, headers=headers, body=lambda: _chunks(data), length=len(data))
+        self.objects_written += 1
+        self.bytes_written += len(data)
+
+    async def create_multipart_upload(self, key: str, content_type: Optional[str] = None) -> str:
+        """Start a multipart upload and return its upload id."""
+        headers = {"Content-Type": content_type} if content_type else {}
+        response = await self._request("POST", key, params=[("uploads", "")], headers=headers)
+        upload_id = _xml_text(response.content, "UploadId")
+        if not upload_id:
+            raise StorageError(f"S3 CreateMultipartUpload of {key} returned no UploadId.")
+        return upload_id
+
+    async def upload_part(self, key: str, upload_id: str, number: int, data: memoryview) -> str:
+        """Upload one part and return its ETag."""
+        response = await self._request(
+            "PUT", key, params=[("partNumber", str(number)), ("uploadId", upload_id)],
+            body=lambda: _chunks(data), length=len(data),
+        )
+        self.parts_uploaded += 1
+        self.bytes_written += len(data)
+        return response.headers.get("etag", "")
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, etags: Dict[int, str]) -> None:
+        """Assemble the uploaded parts into the object."""
+        xml = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in sorted(etags.items())
+        ) + "</CompleteMultipartUpload>"
+        payload = xml.encode("utf-8")
+        response = await self._request(
+            "POST", key, params=[("uploadId", upload_id)], headers={"Content-Type": "application/xml"},
+            body=lambda: payload, length=len(payload),
+        )
+        # CompleteMultipartUpload can fail with status 200 and an error document.
+        if _xml_text(response.content, "Code"):
+            self.errors += 1
+            raise StorageError(f"S3 CompleteMultipartUpload of {key} failed: {_xml_text(response.content, 'Code')}")
+        self.objects_written += 1
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        """Discard a multipart upload and its parts."""
+        await self._request("DELETE", key, params=[("uploadId", upload_id)], ok=(200, 204, 404))
+
+    async def open_writer(
+        self, saved_as: str, content_type: Optional[str] = None, staging_dir: Optional[str] = None
+    ) -> ObjectWriter:
+        return S3ObjectWriter(self, saved_as, content_type)
+
+    async def put_file(
+        self, src_path: str, saved_as: str, sha256: Optional[str] = None, content_type: Optional[str] = None
+    ) -> bool:
+        """Upload a completed local file (parts read with preadv into pooled buffers), then remove it."""
+        io = get_io_executor()
+        key = self.key(saved_as)
+        pool = get_buffer_pool()
+        f = await io.run(open, src_path, "rb")
+        try:
+            size = (await io.run(os.fstat, f.fileno())).st_size
+            if size <= self.part_size:
+                with pool.lease(max(size, 1)) as buf:
+                    n = await io.run(_read_at, f.fileno(), buf, size, 0)
+                    await self.put_object(key, memoryview(buf)[:n], content_type)
+            else:
+                await self._put_file_multipart(f.fileno(), size, key, content_type)
+        finally:
+            await io.run(f.close)
+        await remove_file(src_path)
+        return False
+
+    async def _put_file_multipart(self, fd: int, size: int, key: str, content_type: Optional[str]) -> None:
+        io = get_io_executor()
+        pool = get_buffer_pool()
+        upload_id = await self.create_multipart_upload(key, content_type)
+        etags: Dict[int, str] = {}
+        slots = asyncio.Semaphore(self.upload_concurrency)
+
+        async def send_part(number: int, offset: int) -> None:
+            async with slots:
+                with pool.lease(self.part_size) as buf:
+                    n = await io.run(_read_at, fd, buf, min(self.part_size, size - offset), offset)
+                    etags[number] = await self.upload_part(key, upload_id, number, memoryview(buf)[:n])
+
+        offsets = range(0, size, self.part_size)
+        try:
+            await asyncio.gather(*(send_part(i + 1, offset) for i, offset in enumerate(offsets)))
+            await self.complete_multipart_upload(key, upload_id, etags)
+        except BaseException:
+            try:
+                await self.abort_multipart_upload(key, upload_id)
+            except Exception:  # pragma: no cover
+                logger.warning("Failed to abort multipart upload %s of %s", upload_id, key, exc_info=True)
+            raise
+
+    def url(self, saved_as: str, expires: Optional[int] = None) -> str:
+        """Return a presigned GET URL of an object."""
+        amz_date = _amz_date()
+        path = self._path(self.key(saved_as))
+        params = [
+            ("X-Amz-Algorithm", _ALGORITHM),
+            ("X-Amz-Credential", f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request"),
+            ("X-Amz-Date", amz_date),
+            ("X-Amz-Expires", str(expires or self.presign_seconds)),
+            ("X-Amz-SignedHeaders", "host"),
+        ]
+        query = canonical_query(params)
+        _, signature = sigv4_signature(
+            "GET", path, query, {"host": self.host}, UNSIGNED_PAYLOAD, amz_date, self.region, self.secret_key
+        )
+        return f"{self.endpoint}{path}?{query}&X-Amz-Signature={signature}"
+
+    async def delete(self, saved_as: str) -> None:
+        await self._request("DELETE", self.key(saved_as), ok=(200, 204, 404))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "endpoint": self.endpoint,
+            "bucket": self.bucket,
+            "part_size": self.part_size,
+            "max_connections": self.max_connections,
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "objects_written": self.objects_written,
+            "parts_uploaded": self.parts_uploaded,
+            "bytes_written": self.bytes_written,
+        }
+
+
+async def _chunks(data: memoryview, size: int = 1024 * 1024):
+    """Request body over a buffer without copying it into a bytes object."""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
@@ -0,0 +1,261 @@
+"""
+Admission scheduling for upload requests.
+
+UploadScheduler caps the number of concurrent uploads, the bytes they may
+have in flight, and the uploads a single client may run at once. Requests
+that do not fit are either rejected with 429 + Retry-After or, when a wait
+queue is configured, parked until a slot frees up. Waiters are granted slots
+round-robin across clients, so one client queueing hundreds of uploads cannot
+push everyone else to the back of the line.
+
+UploadSchedulerMiddleware applies the scheduler to the upload routes at the
+ASGI level, i.e. before the framework starts reading (or spooling) the body.
+"""
+import asyncio
+import os
+import re
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Maximum uploads processed concurrently by one worker (0 = unlimited).
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "32"))
+# Maximum projected bytes of concurrently processed uploads (0 = unlimited).
+UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv("UPLOAD_MAX_INFLIGHT_BYTES", "0"))
+# Maximum concurrent uploads per client (0 = unlimited). Leaves room for parallel multi-part PUTs,
+# HTTP/2 streams and clients behind one NAT address; their extra uploads wait in the queue below.
+UPLOAD_MAX_PER_CLIENT = int(os.getenv("UPLOAD_MAX_PER_CLIENT", "8"))
+# Uploads allowed to wait for a slot; once it is full, further uploads get 429 + Retry-After at once.
+# 0 disables the queue and rejects immediately.
+UPLOAD_MAX_QUEUED = int(os.getenv("UPLOAD_MAX_QUEUED", "64"))
+# Seconds a queued upload waits before it is rejected with 429.
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "30"))
+# Retry-After value (seconds) sent with 429 responses.
+UPLOAD_RETRY_AFTER_SECONDS = int(os.getenv("UPLOAD_RETRY_AFTER_SECONDS", "5"))
+# Request header identifying the client, set by a trusted authenticating proxy (empty = peer address only).
+# Only set it when that proxy overwrites the header: a client-supplied value could be rotated to evade limits.
+UPLOAD_CLIENT_KEY_HEADER = os.getenv("UPLOAD_CLIENT_KEY_HEADER", "").strip().lower()
+
+
+class SchedulerBusy(Exception):
+    """Raised when an upload cannot be admitted (now, or within the queue timeout)."""
+
+
+class UploadTicket:
+    """An admitted upload; hand it back to UploadScheduler.release exactly once."""
+
+    __slots__ = ("client", "nbytes", "granted")
+
+    def __init__(self, client: str, nbytes: int) -> None:
+        self.client = client
+        self.nbytes = nbytes
+        self.granted = False
+
+
+class UploadScheduler:
+    """Concurrency and in-flight byte limits with a per-client round-robin wait queue."""
+
+    def __init__(
+        self,
+        max_concurrent: int = UPLOAD_MAX_CONCURRENT,
+        max_inflight_bytes: int = UPLOAD_MAX_INFLIGHT_BYTES,
+        max_per_client: int = UPLOAD_MAX_PER_CLIENT,
+        max_queued: int = UPLOAD_MAX_QUEUED,
+        queue_timeout: float = UPLOAD_QUEUE_TIMEOUT,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_per_client = max_per_client
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.inflight_bytes = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._per_client: Dict[str, int] = {}
+        # client -> waiting (ticket, future); client order is the round-robin order.
+        self._waiters: "OrderedDict[str, Deque[Tuple[UploadTicket, asyncio.Future]]]" = OrderedDict()
+
+    def _fits(self, ticket: UploadTicket) -> bool:
+        if self.max_concurrent and self.active >= self.max_concurrent:
+            return False
+        if self.max_per_client and self._per_client.get(ticket.client, 0) >= self.max_per_client:
+            return False
+        # A single upload larger than the byte budget is still admitted when nothing else runs.
+        if self.max_inflight_bytes and self.active and self.inflight_bytes + ticket.nbytes > self.max_inflight_bytes:
+            return False
+        return True
+
+    def _grant(self, ticket: UploadTicket) -> None:
+        ticket.granted = True
+        self.active += 1
+        self.inflight_bytes += ticket.nbytes
+        self._per_client[ticket.client] = self._per_client.get(ticket.client, 0) + 1
+
+    async def acquire(self, client: str, nbytes: int) -> UploadTicket:
+        """Admit an upload or raise SchedulerBusy."""
+        ticket = UploadTicket(client, nbytes)
+        if not self._waiters and self._fits(ticket):
+            self._grant(ticket)
+            return ticket
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise SchedulerBusy("Too many concurrent uploads; retry later.")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (ticket, future)
+        self._waiters.setdefault(client, deque()).append(entry)
+        self.queued += 1
+        # The new waiter may fit right away if it is the only one (e.g. only the per-client cap was hit).
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if ticket.granted:
+                # Granted in the same tick the timeout fired.
+                return ticket
+            self._remove_waiter(client, entry)
+            self.timed_out += 1
+            raise SchedulerBusy("Timed out waiting for an upload slot; retry later.")
+        except BaseException:
+            # Cancelled (e.g. the client went away) while waiting or right after being granted.
+            if ticket.granted:
+                self.release(ticket)
+            else:
+                self._remove_waiter(client, entry)
+            raise
+        return ticket
+
+    def release(self, ticket: UploadTicket) -> None:
+        """Return an admitted upload's slot and wake waiters that now fit."""
+        if not ticket.granted:
+            return
+        ticket.granted = False
+        self.active -= 1
+        self.inflight_bytes -= ticket.nbytes
+        remaining = self._per_client.get(ticket.client, 1) - 1
+        if remaining:
+            self._per_client[ticket.client] = remaining
+        else:
+            self._per_client.pop(ticket.client, None)
+        self._dispatch()
+
+    def _remove_waiter(self, client: str, entry) -> None:
+        waiters = self._waiters.get(client)
+        if waiters is not None and entry in waiters:
+            waiters.remove(entry)
+            self.queued -= 1
+            if not waiters:
+                del self._waiters[client]
+
+    def _dispatch(self) -> None:
+        """Grant slots round-robin: one waiter per client per pass, until nothing more fits."""
+        progress = True
+        while progress and self._waiters:
+            progress = False
+            for client in list(self._waiters):
+                waiters = self._waiters[client]
+                ticket, future = waiters[0]
+                if future.done() or not self._fits(ticket):
+                    continue
+                waiters.popleft()
+                self.queued -= 1
+                self._grant(ticket)
+                future.set_result(None)
+                progress = True
+                # Served clients go to the back of the rotation.
+                del self._waiters[client]
+                if waiters:
+                    self._waiters[client] = waiters
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the scheduler state."""
+        return {
+            "active_uploads": self.active,
+            "inflight_bytes": self.inflight_bytes,
+            "queued_uploads": self.queued,
+            "active_clients": len(self._per_client),
+            "rejected_uploads": self.rejected,
+            "queue_timeouts": self.timed_out,
+            "max_concurrent": self.max_concurrent,
+            "max_inflight_bytes": self.max_inflight_bytes,
+            "max_per_client": self.max_per_client,
+            "max_queued": self.max_queued,
+        }
+
+
+def client_key(scope: Scope, header: str = UPLOAD_CLIENT_KEY_HEADER) -> str:
+    """Identify the client of a request: the trusted header if configured and present, else the peer address."""
+    if header:
+        raw_header = header.encode("latin-1")
+        for name, value in scope["headers"]:
+            if name == raw_header and value:
+                return "key:" + value.decode("latin-1")
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class UploadSchedulerMiddleware:
+    """ASGI middleware admitting requests to upload routes through an UploadScheduler."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        scheduler: UploadScheduler,
+        routes: Iterable[Tuple[str, str]] = (),
+        default_bytes: int = 0,
+        retry_after: int = UPLOAD_RETRY_AFTER_SECONDS,
+    ) -> None:
+        """
+        Parameters:
+        - scheduler: the scheduler shared by all upload routes.
+        - routes: (method, path regex) pairs of requests that count as uploads.
+        - default_bytes: projected size of uploads without a Content-Length.
+        """
+        self.app = app
+        self.scheduler = scheduler
+        self.routes: List[Tuple[str, Pattern[str]]] = [(m.upper(), re.compile(p)) for m, p in routes]
+        self.default_bytes = default_bytes
+        self.retry_after = retry_after
+
+    def _is_upload(self, scope: Scope) -> bool:
+        return any(method == scope["method"] and pattern.match(scope["path"]) for method, pattern in self.routes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._is_upload(scope):
+            await self.app(scope, receive, send)
+            return
+        nbytes = self.default_bytes
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit():
+                nbytes = int(value)
+                break
+        try:
+            ticket = await self.scheduler.acquire(client_key(scope), nbytes)
+        except SchedulerBusy as exc:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": str(exc)},
+                headers={"Retry-After": str(self.retry_after), "Connection": "close"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.scheduler.release(ticket)
+
+
+_scheduler: Optional[UploadScheduler] = None
+
+
+# PUBLIC_INTERFACE
+def get_upload_scheduler() -> UploadScheduler:
+    """Return the process-wide upload scheduler, configured from the environment."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = UploadScheduler()
+    return _scheduler
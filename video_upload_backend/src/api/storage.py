@@ -0,0 +1,512 @@
+"""
+Pluggable storage backends for saved uploads.
+
+The upload endpoints stream file bytes into an ObjectWriter obtained from the
+configured StorageBackend and commit it once the body is complete, so the
+backend decides where the bytes land without a staging copy elsewhere:
+
+- "local" (default): files under UPLOAD_DIR in the shard layout of
+  src/api/layout.py. The writer is a '.part' file on the same filesystem that
+  is renamed into place (or deduplicated, see src/api/content_store.py).
+- "sharded": several local roots (STORAGE_ROOTS, e.g. one per disk). Each new
+  file goes to the root picked by STORAGE_PLACEMENT (fewest writes in flight,
+  most free space, or round-robin; roots below DISK_MIN_FREE_BYTES are
+  skipped), and the uuid of its saved name is chosen so that it maps back to
+  that root: lookups stay a pure function of the name, with no table. Each
+  root is laid out like the local backend and keeps its '.part' files (and,
+  with dedup, its own content store), so every commit is a rename or a hard
+  link on one device.
+- "s3": an S3-compatible object store (src/api/s3_storage.py), written with
+  PutObject or, for large objects, multipart uploads over pooled connections.
+
+Resumable and multi-part upload sessions assemble their '.part' file over
+several requests, because they need random access; it is created in
+staging_root() (the chosen root of the sharded backend, UPLOAD_DIR otherwise)
+and completing the session hands it to put_file() under a name from
+assign_name() for that root.
+"""
+import errno
+import os
+import re
+import shutil
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.api.content_store import CONTENT_DEDUP_ENABLED, ContentStore, StreamingDigest
+from src.api.disk_space import DISK_MIN_FREE_BYTES, preallocate
+from src.api.io_executor import AsyncFile, get_io_executor, remove_file
+from src.api.layout import ShardLayout, check_layout, get_shard_layout
+
+# "local", "sharded" or "s3".
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+# Comma-separated root directories of the sharded backend.
+STORAGE_ROOTS = [root.strip() for root in os.getenv("STORAGE_ROOTS", "").split(",") if root.strip()]
+# Root of each new file with the sharded backend: "least-busy" (fewest writes in flight in this
+# worker), "least-used" (most free space) or "round-robin".
+STORAGE_PLACEMENT = os.getenv("STORAGE_PLACEMENT", "least-busy").lower()
+# Seconds the free space of the roots is cached for placement decisions.
+STORAGE_USAGE_REFRESH_SECONDS = float(os.getenv("STORAGE_USAGE_REFRESH_SECONDS", "1.0"))
+PLACEMENT_POLICIES = ("least-busy", "least-used", "round-robin")
+
+PART_PREFIX = ".uploading_"
+
+_UUID_RE = re.compile(r"_([0-9a-f]{32})(?:\.|$)")
+
+
+class StorageError(Exception):
+    """Raised when a storage backend rejects or fails an operation."""
+
+
+class ObjectWriter:
+    """
+    Receives the bytes of one new object, hashing them on the way. End it with
+    exactly one of commit() or abort().
+    """
+
+    def __init__(self, saved_as: str) -> None:
+        # The name the object is stored under; backends may adjust the requested one.
+        self.saved_as = saved_as
+        self.size = 0
+        self.digest = StreamingDigest()
+
+    async def preallocate(self, nbytes: int) -> None:
+        """Hint the expected size; backends that can reserve space up front do so."""
+
+    async def write(self, data) -> None:
+        """Append data (bytes or memoryview; it may be reused by the caller once this returns)."""
+        raise NotImplementedError
+
+    async def commit(self) -> bool:
+        """Publish the object under saved_as. Returns True if it was deduplicated."""
+        raise NotImplementedError
+
+    async def abort(self) -> None:
+        """Discard everything written so far."""
+        raise NotImplementedError
+
+
+class StorageBackend:
+    """Where saved uploads live."""
+
+    name = "base"
+    # True if objects are files on this host (needed for dedup hard links and serving from disk).
+    local = True
+
+    def ensure_ready(self) -> None:
+        """Create directories or check connectivity at startup (blocking)."""
+
+    def part_dirs(self) -> List[str]:
+        """Directories this backend creates '.part' files in (scanned by the stale part reaper)."""
+        return []
+
+    async def staging_root(self) -> Optional[str]:
+        """Directory for the '.part' file of a new resumable/multi-part session; None means UPLOAD_DIR."""
+        return None
+
+    def content_stores(self) -> List[Tuple[str, ContentStore]]:
+        """(root, store) of each content store; a store only links files into its own root. Empty = no dedup."""
+        return []
+
+    async def assign_name(self, saved_as: str, staging_dir: Optional[str] = None) -> str:
+        """
+        Return the name to store a completed session under, given the directory its
+        '.part' file is in. Backends that place files by name may adjust saved_as.
+        """
+        return saved_as
+
+    async def open_writer(
+        self, saved_as: str, content_type: Optional[str] = None, staging_dir: Optional[str] = None
+    ) -> ObjectWriter:
+        """
+        Start a new object that the caller streams into. staging_dir is the root picked by
+        staging_root() for this upload (its space is reserved there); None lets the backend choose.
+        """
+        raise NotImplementedError
+
+    async def put_file(
+        self, src_path: str, saved_as: str, sha256: Optional[str] = None, content_type: Optional[str] = None
+    ) -> bool:
+        """Store a completed local file under saved_as, consuming it. Returns True if deduplicated."""
+        raise NotImplementedError
+
+    def locate(self, saved_as: str) -> Optional[str]:
+        """Return the local path of a stored object, or None if missing or not local (blocking)."""
+        return None
+
+    def url(self, saved_as: str) -> Optional[str]:
+        """Return a time-limited URL clients and tools can read the object from, if the backend has one."""
+        return None
+
+    async def destination(self, saved_as: str) -> str:
+        """Return (creating its directory) the local path a new object is stored at; local backends only."""
+        raise StorageError(f"The {self.name} storage backend has no local paths.")
+
+    async def delete(self, saved_as: str) -> None:
+        """Remove a stored object if it exists."""
+        raise NotImplementedError
+
+    def cleanup(self) -> None:
+        """Remove leftovers of writers this process did not finish (blocking; at shutdown)."""
+
+    async def close(self) -> None:
+        """Release connections and other resources."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Return backend metrics."""
+        return {"backend": self.name}
+
+
+def _move_file(src_path: str, staging_path: str, dest_path: str) -> None:
+    """rename() src to dest; across filesystems, copy to staging_path next to dest first (blocking)."""
+    try:
+        os.replace(src_path, dest_path)
+        return
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+    try:
+        shutil.copyfile(src_path, staging_path)
+        os.replace(staging_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(staging_path)
+        except FileNotFoundError:
+            pass
+        raise
+    os.remove(src_path)
+
+
+class FileObjectWriter(ObjectWriter):
+    """Writes a '.part' file next to its destination and renames it into place on commit."""
+
+    def __init__(self, backend: "LocalStorage", saved_as: str, part_path: str, out: AsyncFile) -> None:
+        super().__init__(saved_as)
+        self.backend = backend
+        self.part_path = part_path
+        self._out = out
+        self._out.digest = self.digest
+        self._preallocated = False
+        self._finished = False
+        backend.writes_in_flight += 1
+
+    async def preallocate(self, nbytes: int) -> None:
+        self._preallocated = await self._out.run(preallocate, nbytes)
+
+    async def write(self, data) -> None:
+        await self._out.write(data)
+        self.size += len(data)
+
+    async def commit(self) -> bool:
+        try:
+            if self._preallocated:
+                # Drop the unused tail of the preallocated space.
+                await self._out.truncate()
+            await self._out.close()
+            return await self.backend.put_file(self.part_path, self.saved_as, self.digest.sha256)
+        finally:
+            self._done()
+
+    async def abort(self) -> None:
+        try:
+            await self._out.close()
+            await remove_file(self.part_path)
+            self.backend.forget_part(self.part_path)
+        finally:
+            self._done()
+
+    def _done(self) -> None:
+        if not self._finished:
+            self._finished = True
+            self.backend.writes_in_flight -= 1
+
+
+class LocalStorage(StorageBackend):
+    """Files in one directory tree, in the shard layout."""
+
+    name = "local"
+
+    def __init__(
+        self, root: str, layout: Optional[ShardLayout] = None, content_store: Optional[ContentStore] = None
+    ) -> None:
+        self.root = root
+        self.layout = layout or get_shard_layout()
+        # With a content store, identical content is shared through hard links.
+        self.content_store = content_store
+        # '.part' files of writers in flight in this process, removed at shutdown.
+        self._parts: set = set()
+        self.objects_written = 0
+        self.bytes_written = 0
+        # Open writers and put_file() calls in this process; the load signal of "least-busy" placement.
+        self.writes_in_flight = 0
+
+    def ensure_ready(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        check_layout(self.root, self.layout)
+        if self.content_store is not None:
+            self.content_store.ensure_dirs()
+
+    def part_dirs(self) -> List[str]:
+        return [self.root]
+
+    def content_stores(self) -> List[Tuple[str, ContentStore]]:
+        return [(self.root, self.content_store)] if self.content_store is not None else []
+
+    def new_part_path(self) -> str:
+        """Return a fresh '.part' path in the root (same filesystem as the objects), tracked for cleanup."""
+        path = os.path.join(self.root, f"{PART_PREFIX}{uuid.uuid4().hex}.part")
+        self._parts.add(path)
+        return path
+
+    def forget_part(self, path: str) -> None:
+        """Stop tracking a '.part' file that was published or removed."""
+        self._parts.discard(path)
+
+    async def open_writer(
+        self, saved_as: str, content_type: Optional[str] = None, staging_dir: Optional[str] = None
+    ) -> ObjectWriter:
+        part_path = self.new_part_path()
+        try:
+            out = await AsyncFile.open(get_io_executor(), part_path, "wb")
+        except BaseException:
+            self.forget_part(part_path)
+            raise
+        return FileObjectWriter(self, saved_as, part_path, out)
+
+    async def destination(self, saved_as: str) -> str:
+        return await get_io_executor().run(self.layout.prepare, self.root, saved_as)
+
+    async def put_file(
+        self, src_path: str, saved_as: str, sha256: Optional[str] = None, content_type: Optional[str] = None
+    ) -> bool:
+        io = get_io_executor()
+        self.writes_in_flight += 1
+        try:
+            dest_path = await self.destination(saved_as)
+            size = (await io.run(os.stat, src_path)).st_size
+            if self.content_store is not None and sha256 is not None:
+                deduplicated = await self.content_store.store(src_path, sha256, dest_path)
+            else:
+                staging_path = os.path.join(self.root, f"{PART_PREFIX}{uuid.uuid4().hex}.part")
+                await io.run(_move_file, src_path, staging_path, dest_path)
+                deduplicated = False
+        finally:
+            self.writes_in_flight -= 1
+        self.forget_part(src_path)
+        self.objects_written += 1
+        self.bytes_written += size
+        return deduplicated
+
+    def locate(self, saved_as: str) -> Optional[str]:
+        return self.layout.resolve(self.root, saved_as)
+
+    async def delete(self, saved_as: str) -> None:
+        path = await get_io_executor().run(self.locate, saved_as)
+        if path is not None:
+            await remove_file(path)
+
+    def cleanup(self) -> None:
+        for path in list(self._parts):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:  # pragma: no cover
+                pass
+            self._parts.discard(path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "root": self.root,
+            "dedup": self.content_store is not None,
+            "writers_in_flight": len(self._parts),
+            "writes_in_flight": self.writes_in_flight,
+            "objects_written": self.objects_written,
+            "bytes_written": self.bytes_written,
+        }
+
+
+class ShardedStorage(StorageBackend):
+    """Several local roots (typically one per disk); each saved name belongs to one root."""
+
+    name = "sharded"
+
+    def __init__(
+        self,
+        roots: List[str],
+        layout: Optional[ShardLayout] = None,
+        placement: str = STORAGE_PLACEMENT,
+        min_free_bytes: int = DISK_MIN_FREE_BYTES,
+        content_dedup: bool = False,
+    ) -> None:
+        if not roots:
+            raise ValueError("STORAGE_BACKEND=sharded requires STORAGE_ROOTS.")
+        if placement not in PLACEMENT_POLICIES:
+            raise ValueError(f"Unknown STORAGE_PLACEMENT '{placement}'; expected {', '.join(PLACEMENT_POLICIES)}.")
+        # Hard links cannot cross devices, so each root deduplicates within itself.
+        self.roots = [
+            LocalStorage(root, layout, ContentStore(root) if content_dedup else None) for root in roots
+        ]
+        self.placement = placement
+        self.min_free_bytes = min_free_bytes
+        # Free bytes per root and when they were measured (monotonic seconds).
+        self._free: List[Optional[int]] = [None] * len(self.roots)
+        self._free_at = 0.0
+        # Round-robin cursor; also breaks ties between equally loaded roots.
+        self._next = 0
+        self.placed = [0] * len(self.roots)
+
+    def _index_of(self, saved_as: str) -> int:
+        match = _UUID_RE.search(saved_as)
+        key = int(match.group(1)[:8], 16) if match else zlib.crc32(saved_as.encode("utf-8"))
+        return key % len(self.roots)
+
+    def root_for(self, saved_as: str) -> LocalStorage:
+        """Return the root a saved name is stored under: a stable function of its uuid."""
+        return self.roots[self._index_of(saved_as)]
+
+    def _steer(self, saved_as: str, index: int) -> str:
+        """Rewrite the uuid of saved_as so that root_for() maps it to root index."""
+        match = _UUID_RE.search(saved_as)
+        if match is None or self._index_of(saved_as) == index:
+            return saved_as
+        n = len(self.roots)
+        prefix = int(match.group(1)[:8], 16)
+        prefix = prefix - prefix % n + index
+        if prefix > 0xFFFFFFFF:
+            prefix -= n
+        start = match.start(1)
+        return f"{saved_as[:start]}{prefix:08x}{saved_as[start + 8:]}"
+
+    def _refresh_free(self) -> None:
+        """Measure the free space of every root (blocking)."""
+        for index, root in enumerate(self.roots):
+            try:
+                self._free[index] = shutil.disk_usage(root.root).free
+            except OSError:
+                self._free[index] = None
+        self._free_at = time.monotonic()
+
+    async def choose_root(self) -> int:
+        """
+        Pick the root of a new file by STORAGE_PLACEMENT among the roots with at least
+        min_free_bytes free. Raises OSError(ENOSPC) when every root is below it.
+        """
+        if time.monotonic() - self._free_at >= STORAGE_USAGE_REFRESH_SECONDS:
+            await get_io_executor().run(self._refresh_free)
+        n = len(self.roots)
+        # Candidates in round-robin order, so ties go to the next root in turn.
+        order = [(self._next + offset) % n for offset in range(n)]
+        candidates = [i for i in order if self._free[i] is None or self._free[i] >= self.min_free_bytes]
+        if not candidates:
+            raise OSError(errno.ENOSPC, "All storage roots are below the minimum free space.")
+        if self.placement == "least-used":
+            chosen = max(candidates, key=lambda i: self._free[i] if self._free[i] is not None else -1)
+        elif self.placement == "least-busy":
+            chosen = min(candidates, key=lambda i: self.roots[i].writes_in_flight)
+        else:
+            chosen = candidates[0]
+        self._next = (chosen + 1) % n
+        self.placed[chosen] += 1
+        return chosen
+
+    def ensure_ready(self) -> None:
+        for root in self.roots:
+            root.ensure_ready()
+
+    def part_dirs(self) -> List[str]:
+        return [root.root for root in self.roots]
+
+    def content_stores(self) -> List[Tuple[str, ContentStore]]:
+        return [store for root in self.roots for store in root.content_stores()]
+
+    async def staging_root(self) -> Optional[str]:
+        return self.roots[await self.choose_root()].root
+
+    def _index_of_dir(self, directory: Optional[str]) -> Optional[int]:
+        """Return the index of the root at directory, or None."""
+        if directory is not None:
+            directory = os.path.abspath(directory)
+            for index, root in enumerate(self.roots):
+                if os.path.abspath(root.root) == directory:
+                    return index
+        return None
+
+    async def assign_name(self, saved_as: str, staging_dir: Optional[str] = None) -> str:
+        # Keep the completed session on the disk its '.part' file is on.
+        index = self._index_of_dir(staging_dir)
+        return self._steer(saved_as, await self.choose_root() if index is None else index)
+
+    async def open_writer(
+        self, saved_as: str, content_type: Optional[str] = None, staging_dir: Optional[str] = None
+    ) -> ObjectWriter:
+        index = self._index_of_dir(staging_dir)
+        if index is None:
+            index = await self.choose_root()
+        return await self.roots[index].open_writer(self._steer(saved_as, index), content_type)
+
+    async def destination(self, saved_as: str) -> str:
+        return await self.root_for(saved_as).destination(saved_as)
+
+    async def put_file(
+        self, src_path: str, saved_as: str, sha256: Optional[str] = None, content_type: Optional[str] = None
+    ) -> bool:
+        return await self.root_for(saved_as).put_file(src_path, saved_as, sha256, content_type)
+
+    def locate(self, saved_as: str) -> Optional[str]:
+        home = self.root_for(saved_as)
+        path = home.locate(saved_as)
+        if path is not None:
+            return path
+        # Stored before STORAGE_ROOTS changed.
+        for root in self.roots:
+            if root is not home:
+                path = root.locate(saved_as)
+                if path is not None:
+                    return path
+        return None
+
+    async def delete(self, saved_as: str) -> None:
+        path = await get_io_executor().run(self.locate, saved_as)
+        if path is not None:
+            await remove_file(path)
+
+    def cleanup(self) -> None:
+        for root in self.roots:
+            root.cleanup()
+
+    def stats(self) -> Dict[str, Any]:
+        roots = []
+        for index, root in enumerate(self.roots):
+            root_stats = root.stats()
+            root_stats["free_bytes"] = self._free[index]
+            root_stats["placed"] = self.placed[index]
+            roots.append(root_stats)
+        return {"backend": self.name, "placement": self.placement, "roots": roots}
+
+
+def create_storage(upload_dir: str, backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """Build the backend selected by STORAGE_BACKEND."""
+    if backend == "local":
+        return LocalStorage(upload_dir, content_store=ContentStore(upload_dir) if CONTENT_DEDUP_ENABLED else None)
+    if backend == "sharded":
+        return ShardedStorage(STORAGE_ROOTS, content_dedup=CONTENT_DEDUP_ENABLED)
+    if backend == "s3":
+        from src.api.s3_storage import S3Storage
+
+        return S3Storage.from_env()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'; expected local, sharded or s3.")
+
+
+_storage: Optional[StorageBackend] = None
+
+
+# PUBLIC_INTERFACE
+def get_storage() -> StorageBackend:
+    """Return the process-wide storage backend configured from the environment."""
+    global _storage
+    if _storage is None:
+        _storage = create_storage(os.getenv("UPLOAD_DIR", "./upload"))
+    return _storage
@@ -0,0 +1,182 @@
+"""
+Incremental multipart/form-data parsing straight from the ASGI request stream.
+
+FastAPI's UploadFile path lets Starlette spool every file part into a
+SpooledTemporaryFile before the endpoint runs. The helpers here feed the raw
+request body into python-multipart's push parser and hand part data back to
+the caller as memoryview slices of the received network chunks, so the caller
+can write them to their final location without an intermediate copy.
+"""
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # pragma: no cover - older python-multipart releases
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Upper bound for the accumulated headers of a single part. Part headers are
+# tiny in practice; this only guards against a client streaming garbage.
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+
+class MultipartStreamError(ValueError):
+    """Raised when the request body is not well-formed multipart/form-data."""
+
+
+@dataclass
+class StreamedPart:
+    """Metadata of a multipart section, available before its data is streamed."""
+    name: str
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def is_file(self) -> bool:
+        """True when the part was sent as a file (it carries a filename)."""
+        return self.filename is not None
+
+
+# Events yielded by iter_multipart:
+#   ("part", StreamedPart)  - a new part starts; its headers are complete
+#   ("data", memoryview)    - a slice of the current part's body
+#   ("end", None)           - the current part is complete
+MultipartEvent = Tuple[str, Union[StreamedPart, memoryview, None]]
+
+
+def _decode(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+class _PushParser:
+    """Adapter turning python-multipart callbacks into a list of events per fed chunk."""
+
+    def __init__(self, boundary: bytes) -> None:
+        self.events: List[MultipartEvent] = []
+        self.finished = False
+        self._headers: Dict[str, str] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._header_bytes = 0
+        self._buffer: bytes = b""
+        callbacks = {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        }
+        self._parser = MultipartParser(boundary, callbacks)
+
+    def feed(self, chunk: bytes) -> List[MultipartEvent]:
+        """Feed one body chunk and return the events it produced."""
+        self.events = []
+        # Remember which buffer was fed so data slices of it can be viewed without copying.
+        self._buffer = chunk
+        try:
+            self._parser.write(chunk)
+        except MultipartStreamError:
+            raise
+        except Exception as exc:
+            raise MultipartStreamError(f"Malformed multipart body: {exc}") from exc
+        return self.events
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._header_bytes = 0
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._track_header_bytes(end - start)
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._track_header_bytes(end - start)
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[_decode(bytes(self._header_field)).lower()] = _decode(bytes(self._header_value))
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        disposition = self._headers.get("content-disposition")
+        if disposition is None:
+            raise MultipartStreamError("Missing Content-Disposition header in multipart section.")
+        _, options = parse_options_header(disposition)
+        name = options.get(b"name")
+        if name is None:
+            raise MultipartStreamError("Multipart section is missing a field name.")
+        filename = options.get(b"filename")
+        self.events.append((
+            "part",
+            StreamedPart(
+                name=_decode(name),
+                filename=_decode(filename) if filename is not None else None,
+                content_type=self._headers.get("content-type"),
+                headers=dict(self._headers),
+            ),
+        ))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if data is self._buffer:
+            self.events.append(("data", memoryview(data)[start:end]))
+        else:
+            # Partial-boundary lookbehind data lives in a buffer the parser reuses.
+            self.events.append(("data", memoryview(bytes(data[start:end]))))
+
+    def _on_part_end(self) -> None:
+        self.events.append(("end", None))
+
+    def _on_end(self) -> None:
+        self.finished = True
+
+    def _track_header_bytes(self, size: int) -> None:
+        self._header_bytes += size
+        if self._header_bytes > MAX_PART_HEADER_BYTES:
+            raise MultipartStreamError("Multipart section headers are too large.")
+
+
+def multipart_boundary(content_type: Optional[str]) -> bytes:
+    """
+    Extract the multipart boundary from a Content-Type header value.
+    Raises MultipartStreamError if the header is not multipart/form-data with a boundary.
+    """
+    if not content_type:
+        raise MultipartStreamError("Missing Content-Type header; expected multipart/form-data.")
+    media_type, options = parse_options_header(content_type)
+    if media_type != b"multipart/form-data":
+        raise MultipartStreamError("Content-Type must be multipart/form-data.")
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise MultipartStreamError("Missing multipart boundary in Content-Type header.")
+    return boundary
+
+
+# PUBLIC_INTERFACE
+async def iter_multipart(request: Request) -> AsyncIterator[MultipartEvent]:
+    """
+    Parse a multipart/form-data request body incrementally from request.stream().
+
+    Yields ("part", StreamedPart), ("data", memoryview) and ("end", None) events
+    in body order. Data slices are views into the received body chunks, so part
+    data reaches the caller without being copied or spooled.
+
+    Raises MultipartStreamError for malformed or truncated bodies.
+    """
+    parser = _PushParser(multipart_boundary(request.headers.get("content-type")))
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        for event in parser.feed(chunk):
+            yield event
+    if not parser.finished:
+        raise MultipartStreamError("Multipart body ended before the closing boundary.")
@@ -0,0 +1,40 @@
+"""
+Shared fixtures. src.api modules read their settings from the environment at
+import time, so the environment is set up here, before any test imports them.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+UPLOAD_DIR = tempfile.mkdtemp(prefix="video-upload-tests-")
+os.environ["UPLOAD_DIR"] = UPLOAD_DIR
+os.environ["JOBS_ENABLED"] = "false"
+# Small parts keep multi-part upload tests fast.
+os.environ["MULTIPART_MIN_PART_SIZE_BYTES"] = "100"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """A TestClient for the app, with startup and shutdown hooks run once per session."""
+    from fastapi.testclient import TestClient
+
+    from src.api.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+    shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def stored_path():
+    """Return the path of a stored upload by saved name."""
+    from src.api.main import storage
+
+    def locate(saved_as: str) -> str:
+        path = storage.locate(saved_as)
+        assert path is not None, f"{saved_as} is not stored"
+        return path
+
+    return locate
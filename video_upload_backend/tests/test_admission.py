@@ -0,0 +1,125 @@
+"""Request body size limits: 413 from Content-Length before the body is read, and for chunked bodies."""
+import asyncio
+import os
+
+from src.api import main
+from src.api.admission import RequestSizeLimitMiddleware
+from src.api.disk_space import DiskSpaceGuard
+from src.api.metrics import UPLOAD_ERRORS
+
+
+def _call(app, method: str, path: str, headers: list, chunks=(b"",)) -> tuple:
+    """Run one request through an ASGI app; return (status, response headers, body, chunks received)."""
+    pending = list(chunks)
+    received = []
+    sent = []
+
+    async def receive():
+        if not pending:
+            # Nothing more to read; behave like a client that went away.
+            return {"type": "http.disconnect"}
+        chunk = pending.pop(0)
+        received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), body, len(received)
+
+
+def test_declared_length_over_limit_rejected_before_body():
+    headers = [
+        (b"content-type", b"multipart/form-data; boundary=x"),
+        (b"content-length", str(main.MAX_FILE_SIZE_BYTES * 2).encode()),
+    ]
+    for path in ("/upload", "/upload/stream"):
+        status, response_headers, body, received = _call(main.app, "POST", path, headers, [b"x" * 1024])
+        assert status == 413, body
+        assert received == 0
+        assert response_headers[b"connection"] == b"close"
+
+
+def test_declared_length_within_limit_passes_through():
+    async def echo(scope, receive, send):
+        message = await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": message["body"]})
+
+    middleware = RequestSizeLimitMiddleware(echo, [("POST", r"^/upload$", 10)])
+    status, _, body, _ = _call(middleware, "POST", "/upload", [(b"content-length", b"5")], [b"hello"])
+    assert (status, body) == (200, b"hello")
+    assert middleware.rejected_early == 0
+
+
+def test_chunked_body_cut_off_at_limit():
+    reads = []
+
+    async def reader(scope, receive, send):
+        while True:
+            message = await receive()
+            reads.append(len(message["body"]))
+            if not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def swallowing(scope, receive, send):
+        # An endpoint that turns the receive error into its own answer; the client still gets 413.
+        try:
+            await reader(scope, receive, send)
+        except Exception:
+            await send({"type": "http.response.start", "status": 400, "headers": []})
+            await send({"type": "http.response.body", "body": b"parse error"})
+
+    for app in (reader, swallowing):
+        reads.clear()
+        middleware = RequestSizeLimitMiddleware(app, [("POST", r"^/upload$", 100)])
+        status, _, body, received = _call(middleware, "POST", "/upload", [], [b"a" * 60, b"b" * 60, b"c" * 60])
+        assert status == 413, body
+        # The chunk that crossed the limit is never handed to the application.
+        assert reads == [60] and received == 2
+        assert middleware.rejected_streaming == 1
+
+
+def test_chunked_upload_over_limit_counted_as_too_large(monkeypatch):
+    async def plenty(self):
+        return 1 << 50
+
+    # Chunked bodies reserve the route's whole cap; do not depend on the test disk's free space.
+    monkeypatch.setattr(DiskSpaceGuard, "free_bytes", plenty)
+    limited = RequestSizeLimitMiddleware(main.app, [("POST", r"^/upload/stream$", 4096)])
+    head = (
+        b'--x\r\nContent-Disposition: form-data; name="file"; filename="clip.mp4"\r\n'
+        b"Content-Type: video/mp4\r\n\r\n"
+    )
+    chunks = [head] + [b"v" * 1024] * 8 + [b"\r\n--x--\r\n"]
+    parts_before = {name for name in os.listdir(main.UPLOAD_DIR) if name.endswith(".part")}
+    too_large = UPLOAD_ERRORS.labels("too_large")
+    before = too_large.value
+
+    status, _, body, _ = _call(
+        limited, "POST", "/upload/stream", [(b"content-type", b"multipart/form-data; boundary=x")], chunks
+    )
+    assert status == 413, body
+    assert too_large.value == before + 1
+    assert limited.rejected_streaming == 1
+    # The partial file was discarded.
+    assert {name for name in os.listdir(main.UPLOAD_DIR) if name.endswith(".part")} == parts_before
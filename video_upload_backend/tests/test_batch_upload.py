@@ -0,0 +1,108 @@
+"""POST /upload/batch: per-file outcomes, the file and request caps, and malformed bodies."""
+import errno
+import hashlib
+import os
+
+import pytest
+
+from src.api import main
+from src.api.storage import PART_PREFIX
+
+
+@pytest.fixture
+def caps(monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_BATCH_MAX_FILES", 4)
+    monkeypatch.setattr(main, "UPLOAD_BATCH_MAX_FILE_BYTES", 5000)
+    monkeypatch.setattr(main, "UPLOAD_BATCH_MAX_BYTES", 12000)
+
+
+def _files(*sizes, field="files"):
+    return [(field, (f"clip{i}.mp4", bytes([i]) * size, "video/mp4")) for i, size in enumerate(sizes)]
+
+
+def _leftover_parts():
+    return [name for name in os.listdir(main.UPLOAD_DIR) if name.startswith(PART_PREFIX)]
+
+
+def test_batch_stores_every_file_in_order(client, stored_path):
+    files = _files(1000, 2000, 3000) + [("file", ("single.mov", b"m" * 500, "video/quicktime"))]
+    response = client.post("/upload/batch", files=files, data={"note": "ignored"})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["stored"], body["failed"]) == (4, 0)
+    assert [item["index"] for item in body["items"]] == [0, 1, 2, 3]
+    assert [item["filename"] for item in body["items"]] == ["clip0.mp4", "clip1.mp4", "clip2.mp4", "single.mov"]
+    for (_, (_, data, content_type)), item in zip(files, body["items"]):
+        upload = item["upload"]
+        assert item["status_code"] == 200 and item["detail"] is None
+        assert upload["size_bytes"] == len(data) and upload["content_type"] == content_type
+        assert upload["sha256"] == hashlib.sha256(data).hexdigest()
+        with open(stored_path(upload["saved_as"]), "rb") as f:
+            assert f.read() == data
+    assert len({item["upload"]["saved_as"] for item in body["items"]}) == 4
+    assert _leftover_parts() == []
+
+
+def test_oversized_file_fails_alone(client, caps, stored_path):
+    response = client.post("/upload/batch", files=_files(3000, 6000, 3000))
+    body = response.json()
+    assert response.status_code == 200
+    assert (body["stored"], body["failed"]) == (2, 1)
+    assert [item["status_code"] for item in body["items"]] == [200, 413, 200]
+    assert "per batch file" in body["items"][1]["detail"] and body["items"][1]["upload"] is None
+    # The discarded file leaves nothing behind.
+    assert _leftover_parts() == []
+    assert os.path.getsize(stored_path(body["items"][2]["upload"]["saved_as"])) == 3000
+
+
+def test_request_byte_cap(client, caps):
+    response = client.post("/upload/batch", files=_files(4000, 4000, 4000, 4000))
+    items = response.json()["items"]
+    # 12000 bytes of files fit; the fourth file crosses the request cap and fails on its own.
+    assert [item["status_code"] for item in items] == [200, 200, 200, 413]
+    assert "bytes of files per request" in items[3]["detail"]
+
+
+def test_file_count_cap(client, caps):
+    response = client.post("/upload/batch", files=_files(10, 10, 10, 10, 10, 10))
+    items = response.json()["items"]
+    assert [item["status_code"] for item in items] == [200] * 4 + [413] * 2
+    assert "Too many files" in items[4]["detail"]
+
+
+@pytest.mark.parametrize("error, code", [(OSError("disk on fire"), 500), (OSError(errno.ENOSPC, "No space"), 507)])
+def test_failed_writer_fails_its_file(client, monkeypatch, error, code):
+    real_open_writer = main.storage.open_writer
+    calls = []
+
+    async def open_writer(saved_as, content_type=None, staging_dir=None):
+        calls.append(saved_as)
+        if len(calls) == 2:
+            raise error
+        return await real_open_writer(saved_as, content_type, staging_dir)
+
+    monkeypatch.setattr(main.storage, "open_writer", open_writer)
+    items = client.post("/upload/batch", files=_files(100, 100, 100)).json()["items"]
+    assert [item["status_code"] for item in items] == [200, code, 200]
+    assert items[1]["upload"] is None
+
+
+def test_no_file_part_is_400(client):
+    response = client.post("/upload/batch", data={"note": "no files"})
+    assert response.status_code == 400
+    response = client.post("/upload/batch", content=b"garbage", headers={"Content-Type": "text/plain"})
+    assert response.status_code == 400
+
+
+def test_truncated_body_fails_the_file_in_progress(client):
+    body = (
+        b"--b\r\nContent-Disposition: form-data; name=\"files\"; filename=\"a.mp4\"\r\n\r\n" + b"a" * 100 + b"\r\n"
+        b"--b\r\nContent-Disposition: form-data; name=\"files\"; filename=\"b.mp4\"\r\n\r\n" + b"b" * 100
+    )
+    response = client.post("/upload/batch", content=body, headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    # The complete first file is stored; the second, cut off by the end of the body, fails.
+    assert [item["status_code"] for item in items] == [200, 400]
+    assert "closing boundary" in items[1]["detail"]
+    assert _leftover_parts() == []
@@ -0,0 +1,304 @@
+"""Adaptive chunk sizing, the buffer pool, coalesced writes, readinto() copies and the spooled upload copy."""
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException
+
+from src.api import buffers, main
+from src.api.buffers import AdaptiveChunkSizer, BufferPool, CoalescingWriter, _round_pow2, iter_readinto
+from src.api.content_store import digest_file
+
+KIB = 1024
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (0, 4 * KIB),          # below the range: clamped up to low
+        (4 * KIB, 4 * KIB),    # exact powers of two are kept
+        (4 * KIB + 1, 8 * KIB),
+        (100 * KIB, 128 * KIB),
+        (10 ** 9, 1024 * KIB),  # above the range: clamped down to high
+    ],
+)
+def test_round_pow2(value, expected):
+    assert _round_pow2(value, 4 * KIB, 1024 * KIB) == expected
+
+
+def test_round_pow2_high_not_power_of_two():
+    # The cap wins even when it is not a power of two itself.
+    assert _round_pow2(10 ** 9, 4 * KIB, 100 * KIB) == 100 * KIB
+
+
+def test_sizer_follows_throughput():
+    sizer = AdaptiveChunkSizer(min_size=64 * KIB, max_size=2048 * KIB, target_seconds=0.05, initial=1024 * KIB)
+    assert sizer.size == 1024 * KIB
+    # 1 MiB/s: 50 ms of traffic is ~51 KiB, clamped up to the minimum.
+    assert sizer.record(1024 * KIB, 1.0) == 64 * KIB
+    # Invalid observations leave the estimate alone.
+    assert sizer.record(0, 1.0) == 64 * KIB
+    assert sizer.record(KIB, 0) == 64 * KIB
+    # A sustained fast link drives the estimate (EWMA) up to the maximum.
+    for _ in range(30):
+        size = sizer.record(1024 * 1024 * KIB, 1.0)
+    assert size == 2048 * KIB
+
+
+def test_sizer_min_above_max():
+    sizer = AdaptiveChunkSizer(min_size=256 * KIB, max_size=64 * KIB, initial=KIB)
+    assert sizer.max_size == 256 * KIB and sizer.size == 256 * KIB
+
+
+def test_pool_size_classes_and_reuse():
+    pool = BufferPool(max_idle_bytes=1024 * KIB)
+    buf = pool.acquire(5000)
+    assert len(buf) == 8 * KIB
+    pool.release(buf)
+    again = pool.acquire(8 * KIB)
+    assert again is buf
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["buffers_in_use"] == 1 and stats["in_use_bytes"] == 8 * KIB
+    assert stats["idle_bytes"] == 0
+    pool.release(again)
+
+
+def test_pool_idle_cap_and_accounting():
+    pool = BufferPool(max_idle_bytes=16 * KIB)
+    held = [pool.acquire(8 * KIB) for _ in range(3)]
+    assert pool.stats()["peak_in_use_bytes"] == 24 * KIB
+    for buf in held:
+        pool.release(buf)
+    stats = pool.stats()
+    # Two buffers fit under the idle cap; the third is dropped for the garbage collector.
+    assert stats["idle_buffers"] == 2 and stats["idle_bytes"] == 16 * KIB
+    assert stats["dropped"] == 1
+    assert stats["buffers_in_use"] == 0 and stats["in_use_bytes"] == 0
+    assert stats["peak_in_use_bytes"] == 24 * KIB
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.writes = []
+
+    async def __call__(self, view) -> None:
+        self.writes.append(bytes(view))
+
+
+def _coalescer(size: int):
+    pool = BufferPool()
+    recorder = Recorder()
+    sizer = AdaptiveChunkSizer(min_size=size, max_size=size, initial=size)
+    return CoalescingWriter(recorder, pool, sizer), recorder, pool
+
+
+def test_coalescer_flushes_full_chunks():
+    writer, recorder, pool = _coalescer(8 * KIB)
+
+    async def scenario():
+        for _ in range(5):
+            await writer.write(b"a" * (3 * KIB))
+        await writer.flush()
+        writer.close()
+
+    asyncio.run(scenario())
+    assert [len(w) for w in recorder.writes] == [8 * KIB, 7 * KIB]
+    assert b"".join(recorder.writes) == b"a" * (15 * KIB)
+    assert pool.stats()["buffers_in_use"] == 0
+
+
+def test_coalescer_full_chunk_bypasses_buffer():
+    writer, recorder, pool = _coalescer(8 * KIB)
+    payload = bytes(range(256)) * 64
+
+    async def scenario():
+        # An empty buffer and a piece of at least a chunk: written as is, without a copy.
+        await writer.write(payload)
+        await writer.write(b"x" * KIB)
+        # With data buffered, a large piece is copied through the buffer chunk by chunk instead.
+        await writer.write(payload * 2)
+        await writer.flush()
+        writer.close()
+
+    asyncio.run(scenario())
+    assert [len(w) for w in recorder.writes] == [16 * KIB] + [8 * KIB] * 4 + [KIB]
+    assert recorder.writes[0] == payload
+    assert b"".join(recorder.writes) == payload + b"x" * KIB + payload * 2
+    # Only the buffered writes needed a pooled buffer.
+    assert pool.stats()["misses"] == 1
+
+
+def test_coalescer_swaps_buffer_when_chunk_size_grows():
+    pool = BufferPool()
+    recorder = Recorder()
+    # In-memory flushes are far faster than one second per chunk, so the first one
+    # raises the chunk size to the maximum.
+    sizer = AdaptiveChunkSizer(min_size=4 * KIB, max_size=64 * KIB, target_seconds=1.0, initial=4 * KIB)
+    writer = CoalescingWriter(recorder, pool, sizer)
+    sizes = []
+
+    async def scenario():
+        await writer.write(b"a" * (3 * KIB))
+        sizes.append(len(writer._buf))
+        await writer.write(b"b" * (2 * KIB))
+        assert sizer.size == 64 * KIB
+        sizes.append(len(writer._buf))
+        await writer.write(b"c" * (70 * KIB))
+        await writer.flush()
+        writer.close()
+
+    asyncio.run(scenario())
+    assert sizes == [4 * KIB, 64 * KIB]
+    assert [len(w) for w in recorder.writes] == [4 * KIB, 64 * KIB, 7 * KIB]
+    assert b"".join(recorder.writes) == b"a" * (3 * KIB) + b"b" * (2 * KIB) + b"c" * (70 * KIB)
+    stats = pool.stats()
+    # The small buffer went back to the pool when the writer moved to the bigger one.
+    assert stats["buffers_in_use"] == 0 and stats["idle_buffers"] == 2
+
+
+def test_coalescer_close_discards_and_returns_buffer():
+    writer, recorder, pool = _coalescer(8 * KIB)
+
+    async def scenario():
+        await writer.write(b"a" * KIB)
+        writer.close()
+        await writer.flush()
+
+    asyncio.run(scenario())
+    assert recorder.writes == []
+    assert pool.stats()["buffers_in_use"] == 0
+
+
+class FakeSpooledFile:
+    """The parts of UploadFile the spooled copy uses."""
+
+    def __init__(self, data: bytes) -> None:
+        self.file = io.BytesIO(data)
+        self.size = len(data)
+
+
+class RecordingWriter:
+    def __init__(self) -> None:
+        self.writes = []
+        self.preallocated = None
+        self.aborted = False
+        self.saved_as = "test.bin"
+
+    async def preallocate(self, nbytes: int) -> None:
+        self.preallocated = nbytes
+
+    async def write(self, view) -> None:
+        self.writes.append(bytes(view))
+
+    async def abort(self) -> None:
+        self.aborted = True
+
+
+def test_spooled_copy_uses_fixed_chunks(client, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_MAX_BYTES", 16 * KIB)
+    pool = buffers.get_buffer_pool()
+    in_use = pool.stats()["buffers_in_use"]
+    data = bytes(range(256)) * 200  # 50 KiB
+    writer = RecordingWriter()
+
+    async def copy():
+        return await main._enforce_file_size(FakeSpooledFile(data), writer)
+
+    assert asyncio.run(copy()) == len(data)
+    # Every chunk is UPLOAD_CHUNK_MAX_BYTES except the last; the client rate plays no part.
+    assert [len(w) for w in writer.writes] == [16 * KIB, 16 * KIB, 16 * KIB, 2 * KIB]
+    assert b"".join(writer.writes) == data
+    assert writer.preallocated == len(data)
+    assert pool.stats()["buffers_in_use"] == in_use
+
+
+def test_spooled_copy_over_limit_aborts(client, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_MAX_BYTES", 4 * KIB)
+    monkeypatch.setattr(main, "MAX_FILE_SIZE_BYTES", 10 * KIB)
+    writer = RecordingWriter()
+
+    async def copy():
+        return await main._enforce_file_size(FakeSpooledFile(b"z" * (20 * KIB)), writer)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(copy())
+    assert excinfo.value.status_code == 413
+    assert writer.aborted
+    # The limit is checked before the chunk that crosses it is written.
+    assert sum(len(w) for w in writer.writes) <= 10 * KIB
+    assert writer.preallocated is None
+
+
+class ShortReads(io.RawIOBase):
+    """A file whose readinto() returns at most `step` bytes, like a pipe or a slow disk."""
+
+    def __init__(self, data: bytes, step: int) -> None:
+        self._data = memoryview(data)
+        self._step = step
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, view) -> int:
+        n = min(len(view), self._step, len(self._data))
+        view[:n] = self._data[:n]
+        self._data = self._data[n:]
+        return n
+
+
+def test_iter_readinto_reuses_one_buffer():
+    data = bytes(range(256)) * 40  # 10 KiB
+    buf = bytearray(4 * KIB)
+    views = []
+    chunks = []
+    for view in iter_readinto(io.BytesIO(data), buf):
+        views.append(view)
+        chunks.append(bytes(view))
+    assert [len(c) for c in chunks] == [4 * KIB, 4 * KIB, 2 * KIB]
+    assert b"".join(chunks) == data
+    # Every view is a window on the same buffer: nothing is allocated per chunk.
+    assert all(view.obj is buf for view in views)
+
+
+def test_iter_readinto_size_and_short_reads():
+    data = b"q" * (5 * KIB)
+    buf = bytearray(8 * KIB)
+    sizes = [len(view) for view in iter_readinto(io.BytesIO(data), buf, 2 * KIB)]
+    # size caps each read below the buffer length.
+    assert sizes == [2 * KIB, 2 * KIB, KIB]
+    sizes = [len(view) for view in iter_readinto(ShortReads(data, 1500), buf)]
+    assert sum(sizes) == len(data) and max(sizes) == 1500
+    assert list(iter_readinto(io.BytesIO(b""), buf)) == []
+
+
+def test_lease_returns_buffer_on_error():
+    pool = BufferPool()
+    with pytest.raises(RuntimeError):
+        with pool.lease(KIB * 16) as buf:
+            assert len(buf) == 16 * KIB
+            raise RuntimeError("read failed")
+    stats = pool.stats()
+    assert stats["buffers_in_use"] == 0 and stats["idle_buffers"] == 1
+    with pool.lease(KIB * 16) as again:
+        assert again is buf
+
+
+def test_digest_file_reads_through_pool(tmp_path):
+    data = bytes(range(256)) * 1000
+    path = tmp_path / "video.bin"
+    path.write_bytes(data)
+    pool = buffers.get_buffer_pool()
+    in_use = pool.stats()["buffers_in_use"]
+    assert digest_file(str(path), chunk_size=4 * KIB).sha256 == hashlib.sha256(data).hexdigest()
+    assert pool.stats()["buffers_in_use"] == in_use
+
+
+def test_health_io_reports_pool(client):
+    response = client.post("/upload", files={"file": ("clip.mp4", b"v" * (40 * KIB), "video/mp4")})
+    assert response.status_code == 200, response.text
+    pool = client.get("/health/io").json()["buffer_pool"]
+    assert pool["buffers_in_use"] == 0
+    assert pool["peak_in_use_bytes"] >= main.UPLOAD_CHUNK_MAX_BYTES
+    assert {"hits", "misses", "dropped", "idle_bytes", "max_idle_bytes"} <= pool.keys()
@@ -0,0 +1,141 @@
+"""Upload catalog: timestamps, keyset cursors, filters, backfill and the /catalog endpoints."""
+import asyncio
+import os
+
+import pytest
+
+from src.api.catalog import (
+    InvalidCursor,
+    UploadCatalog,
+    decode_cursor,
+    encode_cursor,
+    normalize_timestamp,
+)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2026-10-16T12:00:00", "2026-10-16T12:00:00"),
+        ("2026-10-16T12:00:00+02:00", "2026-10-16T10:00:00"),
+        ("2026-10-16T12:00:00Z", "2026-10-16T12:00:00"),
+        ("2026-10-16T23:30:00-01:00", "2026-10-17T00:30:00"),
+        ("2026-10-16", "2026-10-16T00:00:00"),
+    ],
+)
+def test_normalize_timestamp(value, expected):
+    assert normalize_timestamp(value) == expected
+
+
+def test_normalize_timestamp_rejects_garbage():
+    with pytest.raises(ValueError):
+        normalize_timestamp("yesterday")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2026-10-16T12:00:00.123456", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2026-10-16T12:00:00.123456", 42)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor("x", 1)[:-3], "eyJhIjogMX0"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    db = UploadCatalog(str(tmp_path / "catalog.sqlite3"))
+    db.initialize()
+    yield db
+    db.close()
+
+
+def _record(catalog, saved_as, created_at, **extra):
+    entry = {"saved_as": saved_as, "filename": f"{saved_as}.mp4", "size_bytes": 1, "created_at": created_at}
+    asyncio.run(catalog.record({**entry, **extra}))
+
+
+def _pages(catalog, limit, **filters):
+    rows, cursor, pages = [], None, 0
+    while True:
+        page, cursor = asyncio.run(catalog.list(limit, cursor, **filters))
+        rows += page
+        pages += 1
+        if cursor is None:
+            return rows, pages
+
+
+def test_keyset_pages_cover_every_row_once(catalog):
+    # Rows sharing a created_at are ordered by id, so a page boundary inside a tie loses nothing.
+    times = ["2026-10-16T10:00:00", "2026-10-16T11:00:00", "2026-10-16T11:00:00",
+             "2026-10-16T11:00:00", "2026-10-16T12:00:00", "2026-10-16T09:00:00", "2026-10-16T11:00:00"]
+    for i, created_at in enumerate(times):
+        _record(catalog, f"f{i}", created_at)
+    rows, pages = _pages(catalog, 2)
+    assert pages == 4
+    assert [row["saved_as"] for row in rows] == ["f4", "f6", "f3", "f2", "f1", "f0", "f5"]
+
+
+def test_cursor_stable_under_inserts(catalog):
+    for i in range(4):
+        _record(catalog, f"f{i}", f"2026-10-16T1{i}:00:00")
+    first, cursor = asyncio.run(catalog.list(2))
+    # A newer upload arriving between pages does not shift the next page.
+    _record(catalog, "new", "2026-10-17T00:00:00")
+    second, cursor = asyncio.run(catalog.list(2, cursor))
+    assert [row["saved_as"] for row in first + second] == ["f3", "f2", "f1", "f0"]
+    assert cursor is None
+
+
+def test_filters_and_time_bounds(catalog):
+    _record(catalog, "a", "2026-10-16T08:00:00", sha256="1" * 64)
+    _record(catalog, "b", "2026-10-16T10:00:00", sha256="1" * 64)
+    _record(catalog, "c", "2026-10-16T12:00:00", sha256="2" * 64)
+    # since is inclusive, until exclusive; offsets are converted to UTC before comparing.
+    rows, _ = asyncio.run(catalog.list(10, since="2026-10-16T12:00:00+02:00", until="2026-10-16T12:00:00Z"))
+    assert [row["saved_as"] for row in rows] == ["b"]
+    rows, _ = asyncio.run(catalog.list(10, sha256="1" * 64))
+    assert [row["saved_as"] for row in rows] == ["b", "a"]
+    rows, _ = asyncio.run(catalog.list(10, filename="c.mp4"))
+    assert [row["saved_as"] for row in rows] == ["c"]
+
+
+def test_page_size_clamped(catalog):
+    for i in range(3):
+        _record(catalog, f"f{i}", f"2026-10-16T1{i}:00:00")
+    rows, cursor = asyncio.run(catalog.list(0))
+    assert len(rows) == 1 and cursor is not None
+
+
+def test_backfill_adds_missing_files(catalog, tmp_path):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    for name in ("20261016T120000Z_" + "a" * 32 + ".mp4", "20261016T120000Z_" + "b" * 32 + ".mp4"):
+        (upload_dir / name).write_bytes(b"v" * 10)
+    (upload_dir / ".hidden").write_bytes(b"x")
+    _record(catalog, "20261016T120000Z_" + "a" * 32 + ".mp4", "2026-10-16T12:00:00")
+    assert catalog.backfill(str(upload_dir)) == 1
+    assert catalog.backfill(str(upload_dir)) == 0
+    rows, _ = asyncio.run(catalog.list(10))
+    assert len(rows) == 2
+
+
+def test_upload_recorded_and_listed(client):
+    response = client.post("/upload", files={"file": ("catalog-test.mp4", os.urandom(500), "video/mp4")})
+    assert response.status_code == 200, response.text
+    upload = response.json()
+    entry = client.get(f"/catalog/{upload['saved_as']}").json()
+    assert entry["filename"] == "catalog-test.mp4"
+    assert entry["sha256"] == upload["sha256"] and entry["size_bytes"] == 500
+    page = client.get("/catalog", params={"filename": "catalog-test.mp4"}).json()
+    assert [item["saved_as"] for item in page["items"]] == [upload["saved_as"]]
+    assert page["next_cursor"] is None
+
+
+def test_catalog_endpoint_errors(client):
+    assert client.get("/catalog", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/catalog", params={"since": "yesterday"}).status_code == 400
+    assert client.get("/catalog", params={"limit": 0}).status_code == 422
+    assert client.get("/catalog/not-stored.mp4").status_code == 404
@@ -0,0 +1,158 @@
+"""Content hashing and deduplication (src/api/content_store.py) and the /objects endpoints."""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.api import content_store as content_store_module
+from src.api.content_store import ContentStore, StreamingDigest, _store
+
+
+def write(path, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_streaming_digest():
+    digest = StreamingDigest(fast_hash="blake2b")
+    for chunk in (b"abc", memoryview(b"def")):
+        digest.update(chunk)
+    assert digest.sha256 == hashlib.sha256(b"abcdef").hexdigest()
+    assert digest.fast_hash == hashlib.blake2b(b"abcdef").hexdigest()
+
+
+def test_store_first_copy_then_dedup(tmp_path):
+    store = ContentStore(str(tmp_path))
+    sha = hashlib.sha256(b"video").hexdigest()
+    obj = store.object_path(sha)
+    assert _store(write(tmp_path / "a.tmp", b"video"), obj, str(tmp_path / "a.mp4")) is False
+    assert _store(write(tmp_path / "b.tmp", b"video"), obj, str(tmp_path / "b.mp4")) is True
+    assert os.path.samefile(tmp_path / "a.mp4", tmp_path / "b.mp4")
+    assert os.stat(obj).st_nlink == 3
+    assert not os.path.exists(tmp_path / "a.tmp") and not os.path.exists(tmp_path / "b.tmp")
+
+
+def test_store_race_lost_between_lookup_and_publish(tmp_path, monkeypatch):
+    # Our lookup finds no object; another uploader publishes it before we link ours.
+    store = ContentStore(str(tmp_path))
+    obj = store.object_path(hashlib.sha256(b"video").hexdigest())
+    other = write(tmp_path / "other.tmp", b"video")
+    real_link = os.link
+    calls = []
+
+    def link(src, dst):
+        calls.append((src, dst))
+        if len(calls) == 1:
+            try:
+                return real_link(src, dst)
+            finally:
+                assert _store(other, obj, str(tmp_path / "other.mp4")) is False
+        return real_link(src, dst)
+
+    monkeypatch.setattr(content_store_module.os, "link", link)
+    assert _store(write(tmp_path / "mine.tmp", b"video"), obj, str(tmp_path / "mine.mp4")) is True
+    assert os.path.samefile(tmp_path / "mine.mp4", tmp_path / "other.mp4")
+    assert not os.path.exists(tmp_path / "mine.tmp")
+
+
+def test_concurrent_uploaders_share_one_object(tmp_path):
+    store = ContentStore(str(tmp_path))
+    obj = store.object_path(hashlib.sha256(b"same").hexdigest())
+    tmps = [write(tmp_path / f"{i}.tmp", b"same") for i in range(16)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda i: _store(tmps[i], obj, str(tmp_path / f"{i}.mp4")), range(16)))
+    assert results.count(False) == 1
+    assert os.stat(obj).st_nlink == 17
+    assert all(os.path.samefile(obj, tmp_path / f"{i}.mp4") for i in range(16))
+
+
+def test_sweep_removes_unreferenced_objects(tmp_path):
+    store = ContentStore(str(tmp_path))
+    kept = store.object_path(hashlib.sha256(b"kept").hexdigest())
+    dropped = store.object_path(hashlib.sha256(b"dropped").hexdigest())
+    _store(write(tmp_path / "k.tmp", b"kept"), kept, str(tmp_path / "k.mp4"))
+    _store(write(tmp_path / "d.tmp", b"dropped"), dropped, str(tmp_path / "d.mp4"))
+    os.remove(tmp_path / "d.mp4")
+    # Within the grace period nothing is removed.
+    assert store.sweep(grace_seconds=3600) == (0, 0)
+    assert store.sweep(grace_seconds=0) == (1, len(b"dropped"))
+    assert os.path.exists(kept) and not os.path.exists(dropped)
+
+
+def test_reaper_sweeps_content_stores(tmp_path):
+    from src.api.multipart_upload import MultipartUploadStore
+    from src.api.recovery import PartReaper
+    from src.api.resumable import ResumableSessionStore
+
+    store = ContentStore(str(tmp_path))
+    obj = store.object_path(hashlib.sha256(b"gone").hexdigest())
+    _store(write(tmp_path / "g.tmp", b"gone"), obj, str(tmp_path / "g.mp4"))
+    os.remove(tmp_path / "g.mp4")
+    reaper = PartReaper(
+        str(tmp_path), [], ResumableSessionStore(str(tmp_path)), MultipartUploadStore(str(tmp_path)),
+        content_stores=[store],
+    )
+    store_sweep = store.sweep
+    store.sweep = lambda: store_sweep(grace_seconds=0)
+    assert reaper.sweep()["objects_reclaimed"] == 1
+    assert reaper.stats()["objects_reclaimed"] == 1
+
+
+@pytest.fixture
+def dedup(monkeypatch):
+    """Turn on content dedup for the app's storage, and lookup by digest if asked to."""
+    from src.api import main
+
+    store = ContentStore(main.UPLOAD_DIR)
+    store.ensure_dirs()
+    monkeypatch.setattr(main.storage, "content_store", store)
+
+    def enable_by_hash():
+        monkeypatch.setattr(main, "CONTENT_BY_HASH_ENABLED", True)
+
+    return enable_by_hash
+
+
+def upload(client, data: bytes, name: str = "clip.mp4"):
+    response = client.post("/upload", files={"file": (name, data, "video/mp4")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_upload_dedup_hit(client, dedup, stored_path):
+    data = os.urandom(64 * 1024)
+    first, second = upload(client, data), upload(client, data)
+    assert first["sha256"] == second["sha256"] == hashlib.sha256(data).hexdigest()
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    assert os.path.samefile(stored_path(first["saved_as"]), stored_path(second["saved_as"]))
+
+
+def test_lookup_by_hash_disabled_by_default(client, dedup):
+    sha = upload(client, os.urandom(1024))["sha256"]
+    assert client.head(f"/objects/{sha}").status_code == 403
+    assert client.get(f"/objects/{sha}").status_code == 403
+    assert client.post("/upload/by-hash", json={"sha256": sha, "filename": "x.mp4"}).status_code == 403
+
+
+def test_lookup_by_hash(client, dedup, stored_path):
+    dedup()
+    data = os.urandom(1024)
+    stored = upload(client, data)
+    sha = stored["sha256"]
+    assert client.head(f"/objects/{sha}").status_code == 200
+    assert client.head(f"/objects/{'0' * 64}").status_code == 404
+    assert client.get("/objects/not-a-digest").status_code == 400
+    response = client.post("/upload/by-hash", json={"sha256": sha, "filename": "copy.mp4"})
+    assert response.status_code == 200, response.text
+    assert response.json()["deduplicated"] is True
+    assert os.path.samefile(stored_path(response.json()["saved_as"]), stored_path(stored["saved_as"]))
+    assert client.get(f"/objects/{sha}").json()["references"] == 2
+
+
+def test_lookup_without_dedup(client, monkeypatch):
+    from src.api import main
+
+    monkeypatch.setattr(main, "CONTENT_BY_HASH_ENABLED", True)
+    assert client.head(f"/objects/{'0' * 64}").status_code == 409
@@ -0,0 +1,148 @@
+"""Free-space admission of uploads: 507 before the body is read, and reservations on the right root."""
+import asyncio
+
+from src.api import main
+from src.api.admission import DiskSpaceAdmissionMiddleware
+from src.api.disk_space import DiskSpaceGuard, InsufficientStorageError
+from src.api.storage import ShardedStorage
+
+MIB = 1024 * 1024
+GIB = 1024 * MIB
+
+
+def _call(app, method: str, path: str, headers: list) -> tuple:
+    """Run one request through an ASGI app; return (status, body, whether receive() was called)."""
+    received = []
+    sent = []
+
+    async def receive():
+        received.append(True)
+        return {"type": "http.request", "body": b"x" * 1024, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, body, bool(received)
+
+
+def test_middleware_rejects_without_reading_body():
+    requested = []
+
+    async def reserve(nbytes):
+        requested.append(nbytes)
+        raise InsufficientStorageError("full")
+
+    async def inner(scope, receive, send):  # pragma: no cover - must not be reached
+        raise AssertionError("the endpoint must not run")
+
+    middleware = DiskSpaceAdmissionMiddleware(inner, reserve, [("POST", r"^/upload$", 1000)])
+    status, body, read = _call(middleware, "POST", "/upload", [(b"content-length", b"500")])
+    assert status == 507 and b"full" in body
+    assert not read
+    assert requested == [500]
+    assert middleware.rejected == 1
+
+
+def test_middleware_projects_cap_for_chunked_and_releases():
+    reservations = []
+
+    class Reservation:
+        released = False
+
+        def release(self):
+            self.released = True
+
+    async def reserve(nbytes):
+        reservations.append((nbytes, Reservation()))
+        return reservations[-1][1]
+
+    async def inner(scope, receive, send):
+        if scope["method"] == "POST":
+            assert scope["state"]["disk_reservation"] is reservations[-1][1]
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = DiskSpaceAdmissionMiddleware(inner, reserve, [("POST", r"^/upload$", 1000)])
+    assert _call(middleware, "POST", "/upload", [(b"transfer-encoding", b"chunked")])[0] == 204
+    assert _call(middleware, "POST", "/upload", [(b"content-length", b"5000")])[0] == 204
+    assert [nbytes for nbytes, _ in reservations] == [1000, 1000]
+    assert all(reservation.released for _, reservation in reservations)
+    # Other routes pass through unreserved.
+    assert _call(middleware, "GET", "/upload", [])[0] == 204
+    assert len(reservations) == 2
+
+
+def test_oversized_content_length_gets_507_before_body(monkeypatch):
+    async def low_space(self):
+        return self.min_free_bytes + MIB
+
+    monkeypatch.setattr(DiskSpaceGuard, "free_bytes", low_space)
+    # Within the body size limits, but more than the free space left above DISK_MIN_FREE_BYTES.
+    headers = [(b"content-type", b"multipart/form-data; boundary=x"), (b"content-length", str(100 * MIB).encode())]
+    for path in ("/upload", "/upload/stream", "/upload/batch"):
+        status, body, read = _call(main.app, "POST", path, headers)
+        assert status == 507, (path, body)
+        assert not read, path
+    assert main.disk_guard.reserved_bytes == 0
+
+
+def test_upload_releases_reservation(client):
+    response = client.post("/upload", files={"file": ("clip.mp4", b"v" * 1000, "video/mp4")})
+    assert response.status_code == 200, response.text
+    assert main.disk_guard.reserved_bytes == 0
+    assert main.disk_guard.in_flight == 0
+
+
+def test_sharded_upload_reserves_on_chosen_root(client, monkeypatch, tmp_path):
+    roots = [str(tmp_path / "a"), str(tmp_path / "b")]
+    sharded = ShardedStorage(roots, min_free_bytes=0)
+    sharded.ensure_ready()
+    guards = {root: DiskSpaceGuard(root, min_free_bytes=0) for root in roots}
+    reserved = []
+    original = DiskSpaceGuard.reserve
+
+    async def spy(self, nbytes):
+        reserved.append((self.path, nbytes))
+        return await original(self, nbytes)
+
+    monkeypatch.setattr(DiskSpaceGuard, "reserve", spy)
+    monkeypatch.setattr(main, "storage", sharded)
+    monkeypatch.setattr(main, "disk_guards", {**main.disk_guards, **guards})
+    for expected_root in roots:
+        response = client.post("/upload/stream", files={"file": ("clip.mp4", b"v" * 1000, "video/mp4")})
+        assert response.status_code == 200, response.text
+        path, nbytes = reserved.pop()
+        assert path == expected_root and nbytes > 1000
+        assert sharded.root_for(response.json()["saved_as"]).root == expected_root
+    # Each upload was placed exactly once, on the root it reserved.
+    assert sharded.placed == [1, 1]
+    assert all(guard.reserved_bytes == 0 for guard in guards.values())
+
+
+def test_object_store_reserves_nothing(monkeypatch):
+    class ObjectStore:
+        name = "s3"
+
+        async def staging_root(self):
+            return None
+
+    monkeypatch.setattr(main, "storage", ObjectStore())
+    reservation = asyncio.run(main._admit_ingest(10 * GIB))
+    assert reservation.nbytes == 0
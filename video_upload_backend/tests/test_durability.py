@@ -0,0 +1,188 @@
+"""Durability of finalized uploads: sync_files, the none/fsync/group/async modes and the watermark."""
+import asyncio
+import errno
+import os
+import time
+
+import pytest
+
+from src.api import durability, main
+from src.api.durability import DurabilityManager, sync_files
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    """Record fsync calls as (path, is directory) instead of syncing; paths in `failing` raise EIO."""
+    calls = []
+    failing = set()
+
+    def fsync_path(path, directory=False):
+        calls.append((path, directory))
+        if path in failing:
+            raise OSError(errno.EIO, "I/O error", path)
+
+    monkeypatch.setattr(durability, "_fsync_path", fsync_path)
+    fsync_path.calls = calls
+    fsync_path.failing = failing
+    return fsync_path
+
+
+def _files(root, *relative):
+    paths = []
+    for rel in relative:
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"v")
+        paths.append(path)
+    return paths
+
+
+def test_sync_files_syncs_each_directory_once(tmp_path, synced):
+    root = str(tmp_path)
+    paths = _files(root, "a/1.mp4", "a/2.mp4", "b/3.mp4")
+    files, directories, errors = sync_files(paths)
+    assert (files, directories, errors) == (3, 2, [None, None, None])
+    assert [path for path, directory in synced.calls if not directory] == paths
+    assert sorted(path for path, directory in synced.calls if directory) == [
+        os.path.join(root, "a"), os.path.join(root, "b"),
+    ]
+
+
+def test_sync_files_propagates_new_directories_to_root(tmp_path, synced):
+    root = str(tmp_path / "root")
+    paths = _files(root, "2026/10/1.mp4")
+    known = set()
+    assert sync_files(paths, [root], known)[1] == 3
+    # The file's directory, then each shard directory into its parent, up to the root itself.
+    assert [path for path, directory in synced.calls if directory] == [
+        os.path.join(root, "2026", "10"), os.path.join(root, "2026"), root,
+    ]
+    assert known == {os.path.join(root, "2026", "10"), os.path.join(root, "2026")}
+    # Known directories are not propagated again; only the file's own directory is synced.
+    synced.calls.clear()
+    assert sync_files(_files(root, "2026/10/2.mp4"), [root], known)[1] == 1
+    # Outside every root, nothing above the file's directory is synced.
+    synced.calls.clear()
+    assert sync_files(_files(str(tmp_path / "elsewhere"), "x/3.mp4"), [root], known)[1] == 1
+
+
+def test_sync_files_errors(tmp_path, synced):
+    root = str(tmp_path / "root")
+    good, bad, shared = _files(root, "a/good.mp4", "b/bad.mp4", "c/shared.mp4")
+    synced.failing.update({bad, os.path.join(root, "c")})
+    known = set()
+    files, _, errors = sync_files([good, bad, shared], [root], known)
+    assert files == 3
+    assert errors[0] is None
+    # A failed file sync and a failed sync of the file's directory both count against the file.
+    assert errors[1].errno == errno.EIO and errors[2].errno == errno.EIO
+    # Directories are remembered once their parent is synced, even if their own sync failed.
+    assert os.path.join(root, "a") in known and os.path.join(root, "c") in known
+    # When the parent fails, they are not, so the next upload tries again.
+    synced.failing.add(root)
+    known.clear()
+    sync_files([good], [root], known)
+    assert known == set()
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError, match="UPLOAD_DURABILITY"):
+        DurabilityManager("sometimes")
+
+
+def test_mode_none_skips_sync(tmp_path, synced):
+    manager = DurabilityManager("none")
+    assert asyncio.run(manager.persist(_files(str(tmp_path), "1.mp4")[0])) is False
+    assert synced.calls == []
+    assert manager.stats()["acked_seq"] == 0
+
+
+def test_mode_fsync_syncs_before_returning(tmp_path, synced):
+    manager = DurabilityManager("fsync")
+    path, bad = _files(str(tmp_path), "1.mp4", "2.mp4")
+    assert asyncio.run(manager.persist(path)) is True
+    assert synced.calls == [(path, False), (str(tmp_path), True)]
+    synced.failing.add(bad)
+    with pytest.raises(OSError):
+        asyncio.run(manager.persist(bad))
+    stats = manager.stats()
+    assert (stats["acked_seq"], stats["durable_seq"], stats["lag"]) == (2, 1, 1)
+    assert (stats["files_synced"], stats["errors"]) == (1, 1)
+
+
+def test_mode_group_batches_concurrent_uploads(tmp_path, synced):
+    manager = DurabilityManager("group", interval_ms=50, max_batch=4)
+    paths = _files(str(tmp_path), *[f"{i}.mp4" for i in range(6)])
+
+    async def scenario():
+        return await asyncio.gather(*(manager.persist(path) for path in paths))
+
+    assert asyncio.run(scenario()) == [True] * 6
+    stats = manager.stats()
+    # Four files filled a batch at once; the other two were synced when the interval elapsed.
+    assert stats["batches"] == 2 and stats["files_synced"] == 6
+    # The directory shared by each batch is synced once per batch.
+    assert stats["directories_synced"] == 2
+    assert (stats["durable_seq"], stats["lag"], stats["pending"]) == (6, 0, 0)
+
+
+def test_mode_group_failure_reaches_waiter(tmp_path, synced):
+    manager = DurabilityManager("group", interval_ms=1, max_batch=2)
+    good, bad = _files(str(tmp_path), "good.mp4", "bad.mp4")
+    synced.failing.add(bad)
+
+    async def scenario():
+        return await asyncio.gather(manager.persist(good), manager.persist(bad), return_exceptions=True)
+
+    ok, failed = asyncio.run(scenario())
+    assert ok is True and isinstance(failed, OSError)
+    assert manager.stats()["errors"] == 1
+
+
+def test_mode_async_watermark_trails_acknowledgements(tmp_path, synced, caplog):
+    manager = DurabilityManager("async", interval_ms=10000, max_batch=100)
+    paths = _files(str(tmp_path), "1.mp4", "2.mp4", "3.mp4")
+    synced.failing.add(paths[1])
+    snapshots = []
+
+    async def scenario():
+        for path in paths:
+            # Answered at once; nothing is synced yet.
+            assert await manager.persist(path) is False
+        snapshots.append(manager.stats())
+        await manager.drain()
+        snapshots.append(manager.stats())
+
+    asyncio.run(scenario())
+    before, after = snapshots
+    assert (before["acked_seq"], before["durable_seq"], before["lag"], before["pending"]) == (3, 0, 3, 3)
+    assert synced.calls[:3] == [(path, False) for path in paths]
+    # A failed background sync is logged and counted but does not hold the watermark back.
+    assert (after["durable_seq"], after["lag"], after["pending"]) == (3, 0, 0)
+    assert (after["files_synced"], after["errors"]) == (2, 1)
+    assert "Failed to sync" in caplog.text
+
+
+def test_upload_reports_durable(client, synced):
+    assert main.durability.mode == "fsync"
+    before = main.durability.stats()
+    response = client.post("/upload/stream", files={"file": ("clip.mp4", b"v" * 100, "video/mp4")})
+    assert response.status_code == 200, response.text
+    assert response.json()["durable"] is True
+    stats = client.get("/health/durability").json()
+    assert stats["acked_seq"] == before["acked_seq"] + 1 == stats["durable_seq"]
+    assert any(path.endswith(response.json()["saved_as"]) for path, _ in synced.calls)
+
+
+def test_upload_not_durable_in_async_mode(client, synced, monkeypatch):
+    monkeypatch.setattr(main.durability, "mode", "async")
+    response = client.post("/upload", files={"file": ("clip.mp4", b"v" * 100, "video/mp4")})
+    assert response.status_code == 200, response.text
+    assert response.json()["durable"] is False
+    # The background group commit catches up within UPLOAD_GROUP_COMMIT_MS.
+    for _ in range(200):
+        if client.get("/health/durability").json()["lag"] == 0:
+            break
+        time.sleep(0.01)
+    assert client.get("/health/durability").json()["lag"] == 0
@@ -0,0 +1,130 @@
+"""The disk I/O executor and AsyncFile (src/api/io_executor.py)."""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+from src.api.io_executor import AsyncFile, InlineIOExecutor, ThreadPoolIOExecutor, _create_executor
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolIOExecutor(workers=2, max_queue=4)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_off_the_event_loop(executor):
+    loop_thread = threading.get_ident()
+
+    async def run():
+        # The loop keeps ticking while a slow operation runs on the pool.
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        thread = await executor.run(lambda: (time.sleep(0.2), threading.get_ident())[1])
+        ticker.cancel()
+        return thread, ticks
+
+    thread, ticks = asyncio.run(run())
+    assert thread != loop_thread
+    assert ticks >= 5
+
+
+def test_queue_is_bounded(executor):
+    async def run():
+        await asyncio.gather(*(executor.run(time.sleep, 0.02) for _ in range(20)))
+
+    asyncio.run(run())
+    stats = executor.stats()
+    assert stats["completed"] == 20 and stats["failed"] == 0
+    assert stats["queue_depth"] == 0 and stats["running"] == 0
+    # No more than max_queue operations were ever queued or running at once.
+    assert 0 < stats["max_queue_depth"] <= executor.max_queue
+
+
+def test_failures_are_counted_and_raised(executor):
+    def fail():
+        raise OSError("disk on fire")
+
+    with pytest.raises(OSError):
+        asyncio.run(executor.run(fail))
+    assert executor.stats()["failed"] == 1 and executor.stats()["running"] == 0
+
+
+def test_queue_is_at_least_one_per_worker():
+    pool = ThreadPoolIOExecutor(workers=8, max_queue=2)
+    try:
+        assert pool.max_queue == 8
+    finally:
+        pool.shutdown()
+
+
+def test_unknown_backend():
+    assert isinstance(_create_executor("inline"), InlineIOExecutor)
+    with pytest.raises(ValueError):
+        _create_executor("io_uring")
+
+
+def test_async_file(tmp_path, executor):
+    path = str(tmp_path / "data.bin")
+    digest = hashlib.sha256()
+
+    async def run():
+        f = await AsyncFile.open(executor, path, "wb", digest)
+        assert await f.try_lock()
+        await f.write(b"hello ")
+        await f.write(memoryview(b"world!!"))
+        await f.run(lambda fileobj: fileobj.seek(11))
+        await f.truncate()
+        await f.fsync()
+        await f.close()
+        await f.close()
+        assert f.closed
+
+        f = await AsyncFile.open(executor, path, "r+b")
+        await f.pwrite(b"W", 6)
+        await f.close()
+
+    asyncio.run(run())
+    with open(path, "rb") as f:
+        assert f.read() == b"hello World"
+    # The digest saw every written byte, including the ones truncated afterwards.
+    assert digest.hexdigest() == hashlib.sha256(b"hello world!!").hexdigest()
+
+
+def test_lock_is_exclusive(tmp_path, executor):
+    path = str(tmp_path / "locked")
+    open(path, "wb").close()
+
+    async def run():
+        first = await AsyncFile.open(executor, path, "ab")
+        second = await AsyncFile.open(executor, path, "ab")
+        try:
+            return await first.try_lock(), await second.try_lock()
+        finally:
+            await first.close()
+            await second.close()
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_upload_runs_disk_calls_on_the_executor(client, stored_path):
+    from src.api.io_executor import get_io_executor
+
+    before = get_io_executor().stats()["completed"]
+    data = os.urandom(256 * 1024)
+    response = client.post("/upload", files={"file": ("clip.mp4", data, "video/mp4")})
+    assert response.status_code == 200, response.text
+    assert get_io_executor().stats()["completed"] > before
+    with open(stored_path(response.json()["saved_as"]), "rb") as f:
+        assert f.read() == data
@@ -0,0 +1,142 @@
+"""Post-processing jobs: queued by finished uploads, and stage retries with exponential backoff."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.api import jobs, main
+from src.api.jobs import FAILED, QUEUED, SKIPPED, SUCCEEDED, JobQueue, StageSkipped, register_stage
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    """A JobQueue in tmp_path whose stages run on threads, so test stages need not be importable by a child."""
+    job_queue = JobQueue(str(tmp_path), stages=[], processes=1, concurrency=1, max_attempts=3, retry_delay=0.5)
+    job_queue.ensure_dirs()
+    pool = ThreadPoolExecutor(1)
+    monkeypatch.setattr(job_queue, "_executor", lambda: pool)
+    yield job_queue
+    pool.shutdown()
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    """Record the retry delays instead of sleeping through them."""
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds, *args, **kwargs):
+        delays.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(jobs.asyncio, "sleep", sleep)
+    return delays
+
+
+def _flaky_stage(failures: int):
+    calls = []
+
+    def stage(source, artifacts_dir):
+        calls.append(source)
+        if len(calls) <= failures:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+        return {"calls": len(calls)}
+
+    return stage, calls
+
+
+def test_upload_enqueues_job_when_enabled(client, queue, monkeypatch):
+    queue.stages = ["probe"]
+    monkeypatch.setattr(main, "JOBS_ENABLED", True)
+    monkeypatch.setattr(main, "job_queue", queue)
+    response = client.post("/upload", files={"file": ("clip.mp4", b"v" * 1000, "video/mp4")})
+    assert response.status_code == 200, response.text
+    job_id = response.json()["job_id"]
+    assert job_id is not None
+    assert os.path.exists(os.path.join(queue.jobs_dir, f"{job_id}.json"))
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["saved_as"] == response.json()["saved_as"]
+    assert job["status"] == QUEUED
+    assert job["stages"]["probe"]["attempts"] == 0
+
+
+def test_upload_without_jobs_has_no_job_id(client):
+    response = client.post("/upload", files={"file": ("clip.mp4", b"v" * 1000, "video/mp4")})
+    assert response.status_code == 200, response.text
+    assert response.json()["job_id"] is None
+
+
+def test_failing_stage_retries_with_backoff(queue, backoff, monkeypatch):
+    stage, calls = _flaky_stage(failures=2)
+    monkeypatch.setitem(jobs.STAGES, "flaky", stage)
+    queue.stages = ["flaky"]
+
+    async def scenario():
+        job = await queue.submit("20261016T120000Z_" + "a" * 32 + ".mp4")
+        await queue._run(job.id)
+        return await queue.get(job.id)
+
+    job = asyncio.run(scenario())
+    assert job.status == SUCCEEDED
+    assert job.stages["flaky"]["attempts"] == 3
+    assert job.stages["flaky"]["result"] == {"calls": 3}
+    assert job.stages["flaky"]["error"] is None
+    # Exponential backoff: the delay doubles on every retry.
+    assert backoff == [0.5, 1.0]
+    assert queue.retries == 2 and queue.succeeded == 1
+
+
+def test_stage_failing_every_attempt_fails_job(queue, backoff, monkeypatch):
+    stage, calls = _flaky_stage(failures=10)
+    monkeypatch.setitem(jobs.STAGES, "flaky", stage)
+    after, after_calls = _flaky_stage(failures=0)
+    monkeypatch.setitem(jobs.STAGES, "after", after)
+    queue.stages = ["flaky", "after"]
+
+    async def scenario():
+        job = await queue.submit("20261016T120000Z_" + "b" * 32 + ".mp4")
+        await queue._run(job.id)
+        return await queue.get(job.id)
+
+    job = asyncio.run(scenario())
+    assert job.status == FAILED
+    assert job.stages["flaky"]["status"] == FAILED
+    assert job.stages["flaky"]["attempts"] == queue.max_attempts == len(calls)
+    assert "attempt 3 failed" in job.stages["flaky"]["error"]
+    # Later stages do not run once one has failed for good.
+    assert job.stages["after"]["status"] == QUEUED and after_calls == []
+    assert backoff == [0.5, 1.0]
+    assert queue.failed == 1
+
+
+def _skipping_stage(source, artifacts_dir):
+    raise StageSkipped("'ffprobe' is not installed.")
+
+
+def test_skipped_stage_is_not_retried(queue, backoff, monkeypatch):
+    monkeypatch.setitem(jobs.STAGES, "skipping", _skipping_stage)
+    queue.stages = ["skipping"]
+
+    async def scenario():
+        job = await queue.submit("20261016T120000Z_" + "c" * 32 + ".mp4")
+        await queue._run(job.id)
+        return await queue.get(job.id)
+
+    job = asyncio.run(scenario())
+    assert job.status == SUCCEEDED
+    assert job.stages["skipping"]["status"] == SKIPPED
+    assert job.stages["skipping"]["attempts"] == 1
+    assert backoff == []
+
+
+def test_register_stage_and_unknown_stage(queue):
+    register_stage("noop", _skipping_stage)
+    try:
+        assert jobs.STAGES["noop"] is _skipping_stage
+    finally:
+        del jobs.STAGES["noop"]
+    queue.stages = ["does-not-exist"]
+    with pytest.raises(RuntimeError, match="Unknown JOB_STAGES"):
+        asyncio.run(queue.start())
@@ -0,0 +1,95 @@
+"""The python -m src.api launcher (src/api/__main__.py)."""
+import os
+
+import pytest
+
+from src.api import __main__ as launcher
+
+
+@pytest.fixture
+def uvicorn_run(monkeypatch):
+    """Capture the keyword arguments uvicorn.run would be called with."""
+    calls = []
+    monkeypatch.setattr(launcher.uvicorn, "run", lambda app, **kwargs: calls.append(kwargs))
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.delenv("SERVER_MODE", raising=False)
+    return calls
+
+
+def test_workers_default_to_cpu_count(uvicorn_run, monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 6)
+    launcher.main([])
+    assert uvicorn_run[0]["workers"] == 6
+
+
+def test_workers_fall_back_to_one(uvicorn_run, monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: None)
+    launcher.main([])
+    assert uvicorn_run[0]["workers"] == 1
+
+
+def test_web_concurrency(uvicorn_run, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    launcher.main([])
+    launcher.main(["--workers", "2"])
+    assert [call["workers"] for call in uvicorn_run] == [3, 2]
+
+
+def test_server_options(uvicorn_run):
+    launcher.main(["--keep-alive", "90", "--graceful-timeout", "30", "--workers", "1"])
+    call = uvicorn_run[0]
+    assert call["timeout_keep_alive"] == 90
+    assert call["timeout_graceful_shutdown"] == 30
+    assert call["reload"] is False
+
+
+def _without(monkeypatch, *names):
+    """Make importlib.util.find_spec report the named packages as not installed."""
+    find_spec = launcher.importlib.util.find_spec
+    monkeypatch.setattr(
+        launcher.importlib.util, "find_spec", lambda name, *args: None if name in names else find_spec(name, *args)
+    )
+
+
+def test_hypercorn_backend_fails_fast_when_missing(uvicorn_run, monkeypatch):
+    _without(monkeypatch, "hypercorn", "h2")
+    with pytest.raises(SystemExit, match="requires hypercorn and h2: pip install -r requirements-http2.txt"):
+        launcher.main(["--backend", "hypercorn"])
+    # No server is started.
+    assert uvicorn_run == []
+
+
+def test_hypercorn_config(uvicorn_run, monkeypatch):
+    pytest.importorskip("h2")
+    hypercorn_run = pytest.importorskip("hypercorn.run")
+    configs = []
+    monkeypatch.setattr(hypercorn_run, "run", configs.append)
+    # Restored after the test; the launcher exports the windows to its workers through the environment.
+    monkeypatch.setenv("SERVER_H2_STREAM_WINDOW_BYTES", "")
+    monkeypatch.setenv("SERVER_H2_CONNECTION_WINDOW_BYTES", "")
+    launcher.main([
+        "--backend", "hypercorn", "--host", "::", "--port", "8443", "--workers", "2", "--loop", "asyncio",
+        "--keep-alive", "90", "--h2-max-streams", "50", "--h2-stream-window", "1048576",
+        "--h2-max-frame-size", "1",
+    ])
+    config = configs[0]
+    assert config.application_path == "src.api.http2:app"
+    assert config.bind == ["[::]:8443"]
+    assert (config.workers, config.worker_class, config.keep_alive_timeout) == (2, "asyncio", 90)
+    assert config.h2_max_concurrent_streams == 50
+    # Frame sizes are clamped to what HTTP/2 allows.
+    assert config.h2_max_inbound_frame_size == 2 ** 14
+    assert os.environ["SERVER_H2_STREAM_WINDOW_BYTES"] == "1048576"
+    assert uvicorn_run == []
+
+
+def test_http2_protocol_installed():
+    pytest.importorskip("h2")
+    protocol = pytest.importorskip("hypercorn.protocol")
+    from src.api import http2
+
+    assert protocol.H2Protocol is http2.TunedH2Protocol
+    # Windows are kept between the HTTP/2 default and the largest window allowed.
+    assert http2._window(1) == http2.DEFAULT_WINDOW_BYTES
+    assert http2._window(2 ** 40) == http2.MAX_WINDOW_BYTES
+    assert http2._window(1 << 20) == 1 << 20
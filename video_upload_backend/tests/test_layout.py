@@ -0,0 +1,154 @@
+"""Sharded layout of stored files and the reshard tool."""
+import os
+
+import pytest
+
+from src.api.layout import (
+    LayoutMismatchError, ShardLayout, check_layout, iter_stored_files, read_layout_marker, reshard, write_layout_marker,
+)
+
+NAME = "20261016T120000Z_ab12cd34ef56ab12cd34ef56ab12cd34.mp4"
+LAYOUTS = [("none", 0), ("none", 2), ("month", 0), ("month", 1), ("day", 1), ("day", 4)]
+
+
+def names(count):
+    return [f"2026{month:02d}{day:02d}T120000Z_{i:032x}.mp4"
+            for i, (month, day) in enumerate(((1 + i % 12, 1 + i % 28) for i in range(count)))]
+
+
+def store(upload_dir, layout, saved_names):
+    for saved_as in saved_names:
+        with open(layout.prepare(upload_dir, saved_as), "w") as f:
+            f.write(saved_as)
+
+
+@pytest.mark.parametrize("by_date, hex_levels, expected", [
+    ("none", 0, NAME),
+    ("none", 2, f"ab/12/{NAME}"),
+    ("month", 0, f"2026/10/{NAME}"),
+    ("day", 1, f"2026/10/16/ab/{NAME}"),
+])
+def test_relative_path(by_date, hex_levels, expected):
+    layout = ShardLayout(by_date, hex_levels)
+    assert layout.relative_path(NAME) == expected
+    assert layout.depth == expected.count("/")
+
+
+@pytest.mark.parametrize("saved_as", ["upload.mp4", "20261016T120000Z_short.mp4", "20261016T120000Z_" + "A" * 32])
+def test_other_names_stay_flat(saved_as):
+    assert ShardLayout("day", 2).relative_path(saved_as) == saved_as
+
+
+@pytest.mark.parametrize("by_date, hex_levels", [("week", 1), ("day", 5), ("day", -1)])
+def test_invalid_settings(by_date, hex_levels):
+    with pytest.raises(ValueError):
+        ShardLayout(by_date, hex_levels)
+
+
+def test_resolve_falls_back_to_flat(tmp_path):
+    layout = ShardLayout("day", 1)
+    flat = tmp_path / NAME
+    flat.write_text("x")
+    assert layout.resolve(str(tmp_path), NAME) == str(flat)
+    store(str(tmp_path), layout, [NAME])
+    assert layout.resolve(str(tmp_path), NAME) == layout.path(str(tmp_path), NAME)
+
+
+@pytest.mark.parametrize("saved_as", ["../etc/passwd", ".catalog.sqlite3", "a/b.mp4", "missing.mp4"])
+def test_resolve_rejects(tmp_path, saved_as):
+    assert ShardLayout().resolve(str(tmp_path), saved_as) is None
+
+
+@pytest.mark.parametrize("source", LAYOUTS)
+@pytest.mark.parametrize("target", LAYOUTS)
+def test_reshard_round_trip(tmp_path, source, target):
+    upload_dir = str(tmp_path)
+    saved_names = names(40) + ["legacy.mp4"]
+    source_layout, target_layout = ShardLayout(*source), ShardLayout(*target)
+    store(upload_dir, source_layout, saved_names)
+    os.mkdir(os.path.join(upload_dir, ".internal"))
+
+    moved, in_place = reshard(upload_dir, target_layout)
+    assert moved + in_place == len(saved_names)
+    if source == target:
+        assert moved == 0
+    for saved_as in saved_names:
+        path = target_layout.resolve(upload_dir, saved_as)
+        assert path == target_layout.path(upload_dir, saved_as)
+        with open(path) as f:
+            assert f.read() == saved_as
+    # Nothing is left behind deeper than the target layout, and dot entries are untouched.
+    assert sorted(name for name, _ in iter_stored_files(upload_dir)) == sorted(saved_names)
+    for root, dirs, files in os.walk(upload_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        depth = 0 if root == upload_dir else len(os.path.relpath(root, upload_dir).split(os.sep))
+        assert depth <= target_layout.depth
+    assert os.path.isdir(os.path.join(upload_dir, ".internal"))
+
+    # And back.
+    reshard(upload_dir, source_layout)
+    for saved_as in saved_names:
+        assert source_layout.resolve(upload_dir, saved_as) == source_layout.path(upload_dir, saved_as)
+
+
+def test_reshard_dry_run(tmp_path):
+    upload_dir = str(tmp_path)
+    saved_names = names(10)
+    store(upload_dir, ShardLayout("none", 0), saved_names)
+    assert reshard(upload_dir, ShardLayout("day", 1), dry_run=True) == (10, 0)
+    assert sorted(os.listdir(upload_dir)) == sorted(saved_names)
+
+
+def test_reshard_keeps_hard_links(tmp_path):
+    upload_dir = str(tmp_path)
+    first, second = names(2)
+    store(upload_dir, ShardLayout("none", 0), [first])
+    os.link(os.path.join(upload_dir, first), os.path.join(upload_dir, second))
+    reshard(upload_dir, ShardLayout("month", 1))
+    layout = ShardLayout("month", 1)
+    assert os.path.samefile(layout.path(upload_dir, first), layout.path(upload_dir, second))
+
+
+def test_check_layout_records_marker(tmp_path):
+    upload_dir = str(tmp_path)
+    layout = ShardLayout("day", 1)
+    check_layout(upload_dir, layout)
+    assert read_layout_marker(upload_dir) == layout
+    check_layout(upload_dir, layout)
+
+
+def test_check_layout_refuses_other_sharded_layout(tmp_path):
+    upload_dir = str(tmp_path)
+    store(upload_dir, ShardLayout("month", 0), names(3))
+    write_layout_marker(upload_dir, ShardLayout("month", 0))
+    with pytest.raises(LayoutMismatchError):
+        check_layout(upload_dir, ShardLayout("day", 1))
+    assert read_layout_marker(upload_dir) == ShardLayout("month", 0)
+    # After resharding, the new settings are accepted and the old ones refused.
+    reshard(upload_dir, ShardLayout("day", 1))
+    check_layout(upload_dir, ShardLayout("day", 1))
+    with pytest.raises(LayoutMismatchError):
+        check_layout(upload_dir, ShardLayout("month", 0))
+
+
+def test_check_layout_accepts_flat(tmp_path):
+    upload_dir = str(tmp_path)
+    store(upload_dir, ShardLayout("none", 0), names(3))
+    write_layout_marker(upload_dir, ShardLayout("none", 0))
+    # Flat files are found through the fallback, so sharding can be enabled and resharded live.
+    check_layout(upload_dir, ShardLayout("day", 1))
+    assert read_layout_marker(upload_dir) == ShardLayout("day", 1)
+
+
+def test_check_layout_samples_unmarked_root(tmp_path):
+    upload_dir = str(tmp_path)
+    store(upload_dir, ShardLayout("none", 0), names(2))
+    store(upload_dir, ShardLayout("day", 1), names(4)[2:])
+    check_layout(upload_dir, ShardLayout("day", 1))
+
+    other = tmp_path / "other"
+    other.mkdir()
+    store(str(other), ShardLayout("month", 1), names(2))
+    with pytest.raises(LayoutMismatchError):
+        check_layout(str(other), ShardLayout("day", 1))
+    assert read_layout_marker(str(other)) is None
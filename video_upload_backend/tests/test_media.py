@@ -0,0 +1,167 @@
+"""Range header parsing and the ranges, validators and conditional requests of the video endpoints."""
+import email.utils
+import os
+
+import pytest
+
+from src.api.media import RangeNotSatisfiable, parse_range
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=500-", [(500, 999)]),
+    ("bytes=900-5000", [(900, 999)]),
+    ("BYTES = 0-0", [(0, 0)]),
+    # Suffix ranges select the final N bytes, the whole file when N exceeds it.
+    ("bytes=-100", [(900, 999)]),
+    ("bytes=-5000", [(0, 999)]),
+    ("bytes=-0, 0-9", [(0, 9)]),
+    # Overlapping and adjacent ranges are merged and sorted.
+    ("bytes=50-150, 0-99", [(0, 150)]),
+    ("bytes=0-9, 10-19", [(0, 19)]),
+    ("bytes=0-9, 11-19", [(0, 9), (11, 19)]),
+    ("bytes=500-, -600", [(400, 999)]),
+    ("bytes=0-9, 0-9, 0-9", [(0, 9)]),
+    # Ranges past the end are dropped as long as one overlaps the file.
+    ("bytes=0-9, 2000-2100", [(0, 9)]),
+    ("bytes=0-9,,", [(0, 9)]),
+])
+def test_satisfiable(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=1000-",
+    "bytes=1000-1999",
+    "bytes=-0",
+    "bytes=2000-, 1000-1001",
+])
+def test_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, SIZE)
+
+
+def test_empty_file_is_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-100", 0)
+
+
+@pytest.mark.parametrize("header", [
+    "items=0-9",
+    "bytes=",
+    "bytes=-",
+    "bytes=abc",
+    "bytes=9-0",
+    "bytes=0-9;10-19",
+    "0-9",
+])
+def test_ignored(header):
+    assert parse_range(header, SIZE) is None
+
+
+def test_too_many_ranges():
+    header = "bytes=" + ",".join(f"{i * 10}-{i * 10 + 4}" for i in range(5))
+    assert parse_range(header, SIZE, max_ranges=5) is not None
+    assert parse_range(header, SIZE, max_ranges=4) is None
+    # The limit applies after merging.
+    adjacent = "bytes=" + ",".join(f"{i * 5}-{i * 5 + 4}" for i in range(5))
+    assert parse_range(adjacent, SIZE, max_ranges=1) == [(0, 24)]
+
+
+@pytest.fixture(scope="module")
+def video(client):
+    """A stored upload: (saved_as, content)."""
+    data = os.urandom(5000)
+    response = client.post("/upload", files={"file": ("media-test.mp4", data, "video/mp4")})
+    assert response.status_code == 200, response.text
+    return response.json()["saved_as"], data
+
+
+def test_whole_file_and_validators(client, video):
+    saved_as, data = video
+    response = client.get(f"/videos/{saved_as}")
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"')
+    assert "last-modified" in response.headers and "immutable" in response.headers["cache-control"]
+    head = client.head(f"/videos/{saved_as}")
+    assert head.status_code == 200 and head.content == b""
+    assert head.headers["content-length"] == str(len(data))
+    assert head.headers["etag"] == response.headers["etag"]
+
+
+def test_single_range(client, video):
+    saved_as, data = video
+    response = client.get(f"/videos/{saved_as}", headers={"Range": "bytes=100-1099"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 100-1099/5000"
+    assert response.headers["content-length"] == "1000"
+    assert response.content == data[100:1100]
+    suffix = client.get(f"/videos/{saved_as}", headers={"Range": "bytes=-10"})
+    assert suffix.headers["content-range"] == "bytes 4990-4999/5000"
+    assert suffix.content == data[-10:]
+
+
+def test_multiple_ranges(client, video):
+    saved_as, data = video
+    response = client.get(f"/videos/{saved_as}", headers={"Range": "bytes=0-9, 4000-4009"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+    assert int(response.headers["content-length"]) == len(response.content)
+    parts = response.content.split(b"--" + boundary)
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    headers, body = parts[1].split(b"\r\n\r\n", 1)
+    assert b"Content-Range: bytes 0-9/5000" in headers and body == data[:10] + b"\r\n"
+    headers, body = parts[2].split(b"\r\n\r\n", 1)
+    assert b"Content-Range: bytes 4000-4009/5000" in headers and body == data[4000:4010] + b"\r\n"
+
+
+def test_unsatisfiable_range_416(client, video):
+    saved_as, _ = video
+    response = client.get(f"/videos/{saved_as}", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */5000"
+    # A malformed header is ignored rather than rejected.
+    assert client.get(f"/videos/{saved_as}", headers={"Range": "bytes=9-0"}).status_code == 200
+
+
+def test_if_none_match_and_if_modified_since(client, video):
+    saved_as, _ = video
+    first = client.get(f"/videos/{saved_as}")
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+    response = client.get(f"/videos/{saved_as}", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag
+    assert client.get(f"/videos/{saved_as}", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert client.get(f"/videos/{saved_as}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    # If-None-Match takes precedence over If-Modified-Since.
+    response = client.get(
+        f"/videos/{saved_as}", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 200
+
+
+def test_if_range(client, video):
+    saved_as, data = video
+    first = client.get(f"/videos/{saved_as}")
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+    ranged = {"Range": "bytes=0-99"}
+    assert client.get(f"/videos/{saved_as}", headers={**ranged, "If-Range": etag}).status_code == 206
+    assert client.get(f"/videos/{saved_as}", headers={**ranged, "If-Range": last_modified}).status_code == 206
+    # A changed or weak validator means the client's copy is stale: send the whole file.
+    stale = client.get(f"/videos/{saved_as}", headers={**ranged, "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == data
+    assert client.get(f"/videos/{saved_as}", headers={**ranged, "If-Range": f"W/{etag}"}).status_code == 200
+    earlier = email.utils.formatdate(0, usegmt=True)
+    assert client.get(f"/videos/{saved_as}", headers={**ranged, "If-Range": earlier}).status_code == 200
+
+
+def test_unknown_video_404(client):
+    assert client.get("/videos/not-stored.mp4").status_code == 404
+    assert client.get("/videos/.hidden").status_code == 404
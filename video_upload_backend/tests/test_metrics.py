@@ -0,0 +1,230 @@
+"""Prometheus metrics: the registry, text rendering, merging workers' snapshots, the middleware and /metrics."""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.api import main, metrics
+from src.api.metrics import (
+    CONTENT_TYPE,
+    UPLOAD_RESPONSES,
+    MetricsRegistry,
+    UploadMetricsMiddleware,
+    _merge,
+    gauge_family,
+    pid_alive,
+    render,
+    timed_chunks,
+)
+
+
+def _value(text: str, sample: str) -> float:
+    """Return the value of one sample line (name with labels) in an exposition."""
+    for line in text.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_counter_gauge_and_labels():
+    registry = MetricsRegistry("")
+    counter = registry.counter("things_total", "Things.", ("kind",))
+    gauge = registry.gauge("level", "Level.")
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    counter.labels("b").inc()
+    gauge.inc(5)
+    gauge.dec(2)
+    assert counter.labels("a").value == 3
+    assert gauge.labels().value == 3
+    with pytest.raises(ValueError, match="expects labels"):
+        counter.labels("a", "b")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.counter("things_total", "Again.")
+
+
+def test_render_counters_gauges_and_escaping():
+    registry = MetricsRegistry("")
+    registry.counter("things_total", "Things.", ("kind",)).labels('say "hi"\n').inc(2)
+    registry.gauge("ratio", "Ratio.").labels().set(0.25)
+    text = render(registry.snapshot())
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert lines[:3] == [
+        "# HELP video_upload_ratio Ratio.",
+        "# TYPE video_upload_ratio gauge",
+        "video_upload_ratio 0.25",
+    ]
+    # Integral values print without a decimal point; quotes and newlines in labels are escaped.
+    assert 'video_upload_things_total{kind="say \\"hi\\"\\n"} 2' in lines
+
+
+def test_render_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry("")
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1))
+    child = histogram.labels("upload")
+    for value in (0.05, 0.1, 0.5, 3):
+        child.observe(value)
+    lines = render(registry.snapshot()).splitlines()
+    assert lines[2:] == [
+        'video_upload_latency_seconds_bucket{route="upload",le="0.1"} 2',
+        'video_upload_latency_seconds_bucket{route="upload",le="1"} 3',
+        'video_upload_latency_seconds_bucket{route="upload",le="+Inf"} 4',
+        'video_upload_latency_seconds_sum{route="upload"} 3.65',
+        'video_upload_latency_seconds_count{route="upload"} 4',
+    ]
+
+
+def test_collectors_and_merge():
+    registry = MetricsRegistry("")
+    registry.counter("things_total", "Things.", ("kind",)).labels("a").inc(1)
+    registry.histogram("size_bytes", "Size.", buckets=(10,)).observe(5)
+    registry.add_collector(lambda: {"video_upload_queue_depth": gauge_family("Queue depth.", 7)})
+    mine = registry.snapshot()
+    assert mine["video_upload_queue_depth"]["samples"] == [[[], 7]]
+
+    other = json.loads(json.dumps(mine))
+    other["video_upload_things_total"]["samples"] = [[["a"], 2], [["b"], 5]]
+    other["video_upload_size_bytes"]["samples"] = [[[], [[0, 1], 50.0]]]
+    merged = {}
+    _merge(merged, mine)
+    _merge(merged, other)
+    # Counters and gauges are summed per label set; histograms bucket by bucket.
+    assert merged["video_upload_things_total"]["samples"] == [[["a"], 3], [["b"], 5]]
+    assert merged["video_upload_size_bytes"]["samples"] == [[[], [[1, 1], 55.0]]]
+    assert merged["video_upload_queue_depth"]["samples"] == [[[], 14]]
+    # Merging copies: the worker's own snapshot is left alone.
+    assert mine["video_upload_things_total"]["samples"] == [[["a"], 1]]
+
+
+def test_multiprocess_exposition_sums_live_workers(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter("things_total", "Things.").inc(1)
+    snapshot = registry.snapshot()
+    snapshot["video_upload_things_total"]["samples"] = [[[], 10]]
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    try:
+        for pid in (live.pid, dead.pid, os.getpid()):
+            with open(tmp_path / f"{pid}.json", "w") as f:
+                json.dump(snapshot, f)
+        text = asyncio.run(registry.exposition())
+    finally:
+        live.kill()
+        live.wait()
+    # This worker's live values plus the other live worker's snapshot; its own file is skipped.
+    assert _value(text, "video_upload_things_total") == 11
+    # Snapshots of workers that are gone are removed.
+    assert not (tmp_path / f"{dead.pid}.json").exists()
+    assert (tmp_path / f"{live.pid}.json").exists()
+
+
+def test_pid_alive():
+    assert pid_alive(os.getpid())
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    assert not pid_alive(dead.pid)
+
+
+def test_flush_loop_writes_and_withdraws_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_FLUSH_SECONDS", 0.01)
+    registry = MetricsRegistry(str(tmp_path / "metrics"))
+    registry.counter("things_total", "Things.").inc(4)
+    path = tmp_path / "metrics" / f"{os.getpid()}.json"
+
+    async def scenario():
+        await registry.start()
+        for _ in range(100):
+            if path.exists():
+                break
+            await asyncio.sleep(0.01)
+        with open(path) as f:
+            written = json.load(f)
+        await registry.stop()
+        return written
+
+    assert asyncio.run(scenario())["video_upload_things_total"]["samples"] == [[[], 4]]
+    # A stopped worker's counters leave the sums.
+    assert not path.exists()
+
+
+def test_timed_chunks_observes_each_chunk():
+    histogram = MetricsRegistry("").histogram("read_seconds", "Reads.").labels()
+
+    async def chunks():
+        for chunk in (b"a", b"b", b"c"):
+            yield chunk
+
+    async def scenario():
+        return [chunk async for chunk in timed_chunks(chunks(), histogram)]
+
+    assert asyncio.run(scenario()) == [b"a", b"b", b"c"]
+    assert sum(histogram.counts) == 3
+
+
+def _call(app, method: str, path: str, body: bytes = b""):
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    asyncio.run(app(scope, receive, send))
+
+
+def test_middleware_records_route_status_and_bytes():
+    async def endpoint(scope, receive, send):
+        await receive()
+        await send({"type": "http.response.start", "status": 413, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = UploadMetricsMiddleware(endpoint, [("POST", r"^/upload$", "upload")])
+    responses = UPLOAD_RESPONSES.labels("upload", "413")
+    received = metrics.UPLOAD_RECEIVED_BYTES.labels("upload")
+    duration = metrics.UPLOAD_DURATION.labels("upload")
+    before = (responses.value, received.value, sum(duration.counts))
+    _call(middleware, "POST", "/upload", b"x" * 100)
+    assert (responses.value, received.value, sum(duration.counts)) == (before[0] + 1, before[1] + 100, before[2] + 1)
+    # Nothing is left in flight once the request ends.
+    assert metrics.UPLOADS_IN_FLIGHT.labels("upload").value == 0
+    assert metrics.UPLOAD_BYTES_IN_FLIGHT.labels().value == 0
+    # Other routes pass through unmeasured.
+    _call(middleware, "GET", "/upload", b"x" * 100)
+    assert received.value == before[1] + 100
+
+
+def test_middleware_counts_500_when_the_app_raises():
+    async def endpoint(scope, receive, send):
+        raise RuntimeError("boom")
+
+    middleware = UploadMetricsMiddleware(endpoint, [("POST", r"^/upload$", "upload")])
+    errors = UPLOAD_RESPONSES.labels("upload", "500")
+    before = errors.value
+    with pytest.raises(RuntimeError):
+        _call(middleware, "POST", "/upload")
+    assert errors.value == before + 1
+
+
+def test_metrics_endpoint(client):
+    before = client.get("/metrics").text
+    response = client.post("/upload", files={"file": ("clip.mp4", b"v" * 5000, "video/mp4")})
+    assert response.status_code == 200, response.text
+    scrape = client.get("/metrics")
+    assert scrape.headers["content-type"] == CONTENT_TYPE
+    text = scrape.text
+    ok = 'video_upload_responses_total{route="upload",code="200"}'
+    assert _value(text, ok) == _value(before, ok) + 1
+    received = 'video_upload_received_bytes_total{route="upload"}'
+    assert _value(text, received) - _value(before, received) > 5000
+    count = 'video_upload_request_duration_seconds_count{route="upload"}'
+    assert _value(text, count) == _value(before, count) + 1
+    assert _value(text, "video_upload_commit_seconds_count") > _value(before, "video_upload_commit_seconds_count")
+    # Collectors add state kept by other subsystems at scrape time.
+    assert "# TYPE video_upload_durability_lag gauge" in text
+    assert main.metrics_registry is metrics.get_metrics_registry()
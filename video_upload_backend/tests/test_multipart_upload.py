@@ -0,0 +1,100 @@
+"""Parallel multi-part uploads: part bounds, ordering and completion."""
+import os
+import random
+
+import pytest
+
+PART_SIZE = 100
+
+
+@pytest.fixture
+def upload(client):
+    """Create a 1050-byte upload in 100-byte parts (the last one 50 bytes); return (id, data)."""
+    data = os.urandom(1050)
+    response = client.post(
+        "/multipart-uploads", json={"filename": "m.mp4", "size_bytes": len(data), "part_size_bytes": PART_SIZE}
+    )
+    assert response.status_code == 201, response.text
+    assert response.json()["part_count"] == 11
+    return response.json()["upload_id"], data
+
+
+def part(data, number):
+    return data[(number - 1) * PART_SIZE:number * PART_SIZE]
+
+
+def put(client, upload_id, number, content):
+    return client.put(f"/multipart-uploads/{upload_id}/parts/{number}", content=content)
+
+
+def test_parts_in_any_order(client, upload, stored_path):
+    upload_id, data = upload
+    numbers = list(range(1, 12))
+    random.Random(7).shuffle(numbers)
+    for number in numbers:
+        assert put(client, upload_id, number, part(data, number)).status_code == 200
+    response = client.post(f"/multipart-uploads/{upload_id}/complete")
+    assert response.status_code == 200, response.text
+    with open(stored_path(response.json()["saved_as"]), "rb") as f:
+        assert f.read() == data
+    assert client.get(f"/multipart-uploads/{upload_id}").status_code == 404
+
+
+def test_complete_with_missing_part(client, upload):
+    upload_id, data = upload
+    for number in range(1, 11):
+        put(client, upload_id, number, part(data, number))
+    response = client.post(f"/multipart-uploads/{upload_id}/complete")
+    assert response.status_code == 409
+    assert "1 part(s) missing" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("number, size", [(1, 99), (1, 101), (11, 100), (11, 49)])
+def test_wrong_part_size(client, upload, number, size):
+    upload_id, _ = upload
+    assert put(client, upload_id, number, os.urandom(size)).status_code == 400
+
+
+@pytest.mark.parametrize("number", [0, 12])
+def test_part_number_out_of_range(client, upload, number):
+    upload_id, _ = upload
+    assert put(client, upload_id, number, os.urandom(PART_SIZE)).status_code == 400
+
+
+def test_part_resent_replaces_it(client, upload, stored_path):
+    upload_id, data = upload
+    put(client, upload_id, 3, os.urandom(PART_SIZE))
+    for number in range(1, 12):
+        assert put(client, upload_id, number, part(data, number)).status_code == 200
+    assert client.get(f"/multipart-uploads/{upload_id}").json()["parts_received"] == list(range(1, 12))
+    response = client.post(f"/multipart-uploads/{upload_id}/complete")
+    with open(stored_path(response.json()["saved_as"]), "rb") as f:
+        assert f.read() == data
+
+
+def test_part_size_below_minimum(client):
+    response = client.post(
+        "/multipart-uploads", json={"filename": "m.mp4", "size_bytes": 1000, "part_size_bytes": 50}
+    )
+    assert response.status_code == 400
+
+
+def test_single_part_smaller_than_minimum(client, stored_path):
+    # A file smaller than the minimum part size is one part of its own size.
+    data = os.urandom(30)
+    response = client.post(
+        "/multipart-uploads", json={"filename": "m.mp4", "size_bytes": 30, "part_size_bytes": 50}
+    )
+    assert response.status_code == 201, response.text
+    upload_id = response.json()["upload_id"]
+    assert put(client, upload_id, 1, data).status_code == 200
+    response = client.post(f"/multipart-uploads/{upload_id}/complete")
+    with open(stored_path(response.json()["saved_as"]), "rb") as f:
+        assert f.read() == data
+
+
+def test_abort(client, upload):
+    upload_id, data = upload
+    put(client, upload_id, 1, part(data, 1))
+    assert client.delete(f"/multipart-uploads/{upload_id}").status_code == 204
+    assert put(client, upload_id, 2, part(data, 2)).status_code == 404
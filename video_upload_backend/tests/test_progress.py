@@ -0,0 +1,177 @@
+"""Upload progress: snapshots, registry retention, the progress endpoints and sharing between workers."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.api import progress
+from src.api.progress import COMPLETED, FAILED, PAUSED, RECEIVING, ProgressRegistry, UploadProgress
+
+OFFSET_CONTENT_TYPE = {"Content-Type": "application/offset+octet-stream"}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(progress.time, "monotonic", fake)
+    return fake
+
+
+def test_snapshot_rate_percent_and_eta(clock):
+    entry = UploadProgress("clip", total=4000)
+    clock.now += 1.0
+    entry.advance(1000)
+    snapshot = entry.snapshot()
+    assert snapshot["state"] == RECEIVING
+    assert snapshot["bytes_received"] == 1000 and snapshot["percent"] == 25.0
+    assert snapshot["bytes_per_sec"] == 1000
+    assert snapshot["eta_seconds"] == 3.0
+    # The rate is a moving average of samples taken at most every _RATE_INTERVAL_SECONDS.
+    clock.now += 1.0
+    entry.advance(3000)
+    assert entry.rate == pytest.approx(2000)
+
+
+def test_snapshot_before_first_sample_uses_average(clock):
+    entry = UploadProgress("clip", total=None)
+    clock.now += 0.1
+    entry.advance(100)
+    snapshot = entry.snapshot()
+    # No total: no percent or ETA, but the rate so far is known.
+    assert snapshot["percent"] is None and snapshot["eta_seconds"] is None
+    assert snapshot["bytes_per_sec"] == 1000
+
+
+def test_finished_snapshot_freezes(clock):
+    registry = ProgressRegistry(retention_seconds=60)
+    entry = registry.start("clip", total=100)
+    clock.now += 2.0
+    entry.advance(100)
+    registry.finish(entry, COMPLETED)
+    clock.now += 30
+    snapshot = registry.get("clip").snapshot()
+    assert snapshot["state"] == COMPLETED
+    assert snapshot["bytes_per_sec"] == 0 and snapshot["eta_seconds"] is None
+    # Elapsed time stops at the last update.
+    assert snapshot["elapsed_seconds"] == 2.0
+
+
+def test_registry_retention_and_reuse(clock):
+    registry = ProgressRegistry(retention_seconds=10)
+    old = registry.start("clip")
+    registry.finish(old, FAILED)
+    # Restarting the same id replaces the entry; the old one's expiry must not remove it.
+    new = registry.start("clip")
+    clock.now += 11
+    assert registry.get("clip") is new
+    registry.finish(new, COMPLETED)
+    assert registry.stats()["by_state"] == {COMPLETED: 1}
+    clock.now += 11
+    assert registry.get("clip") is None
+    assert registry.stats()["tracked_uploads"] == 0
+
+
+def test_upload_with_id_reports_completed(client):
+    data = os.urandom(3000)
+    response = client.post(
+        "/upload", files={"file": ("clip.mp4", data, "video/mp4")}, headers={"X-Upload-Id": "test-progress-1"}
+    )
+    assert response.status_code == 200, response.text
+    snapshot = client.get("/uploads/test-progress-1/progress").json()
+    assert snapshot["state"] == COMPLETED
+    # The whole multipart body is counted, and it is the declared total.
+    assert snapshot["bytes_received"] == snapshot["total_bytes"] > len(data)
+    assert snapshot["percent"] == 100.0
+
+
+def test_failed_upload_reported_failed(client):
+    response = client.post(
+        "/upload/stream",
+        content=b"not multipart",
+        headers={"Content-Type": "multipart/form-data; boundary=x", "X-Upload-Id": "test-progress-2"},
+    )
+    assert response.status_code == 400
+    assert client.get("/uploads/test-progress-2/progress").json()["state"] == FAILED
+
+
+def test_untracked_and_invalid_ids(client):
+    assert client.get("/uploads/never-sent/progress").status_code == 404
+    response = client.post(
+        "/upload", files={"file": ("clip.mp4", b"v" * 100, "video/mp4")}, headers={"X-Upload-Id": "bad id!"}
+    )
+    assert response.status_code == 200
+    # Ids outside [A-Za-z0-9_-]{1,64} are not tracked.
+    assert client.get("/uploads/bad%20id!/progress").status_code == 404
+
+
+def test_resumable_session_paused_between_patches(client):
+    data = os.urandom(2500)
+    upload_id = client.post("/uploads", json={"filename": "clip.mov", "size_bytes": len(data)}).json()["upload_id"]
+    client.patch(f"/uploads/{upload_id}", content=data[:1000], headers={**OFFSET_CONTENT_TYPE, "Upload-Offset": "0"})
+    snapshot = client.get(f"/uploads/{upload_id}/progress").json()
+    assert snapshot["state"] == PAUSED
+    assert (snapshot["bytes_received"], snapshot["total_bytes"], snapshot["percent"]) == (1000, 2500, 40.0)
+    client.patch(
+        f"/uploads/{upload_id}", content=data[1000:], headers={**OFFSET_CONTENT_TYPE, "Upload-Offset": "1000"}
+    )
+    assert client.get(f"/uploads/{upload_id}/progress").json()["state"] == COMPLETED
+
+
+def test_progress_stream_ends_with_final_state(client):
+    client.post("/upload", files={"file": ("clip.mp4", b"v" * 100, "video/mp4")}, headers={"X-Upload-Id": "sse-1"})
+    with client.stream("GET", "/uploads/sse-1/progress/stream") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+    events = [block for block in body.split("\n\n") if block]
+    assert len(events) == 1
+    event, data = events[0].split("\n")
+    assert event == "event: progress"
+    assert json.loads(data[len("data: "):])["state"] == COMPLETED
+
+
+def test_progress_stream_unknown_upload(client, monkeypatch):
+    from src.api import main
+
+    monkeypatch.setattr(main, "PROGRESS_SSE_WAIT_SECONDS", 0)
+    with client.stream("GET", "/uploads/nobody/progress/stream") as response:
+        body = "".join(response.iter_text())
+    assert body.startswith("event: error\n")
+
+
+def test_shared_dir_lookup_across_workers(tmp_path):
+    registry = ProgressRegistry(shared_dir=str(tmp_path))
+    entry = registry.start("clip", total=100)
+    entry.advance(40)
+    # This worker's own file is never read back.
+    registry._write_shared(registry._shared_snapshot())
+    assert registry._read_shared("clip") is None
+
+    # A live worker (a child process) and a dead one each published a snapshot.
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        older = [1.0, {"upload_id": "clip", "bytes_received": 10}]
+        newer = [2.0, {"upload_id": "clip", "bytes_received": 40}]
+        with open(tmp_path / f"{child.pid}.json", "w") as f:
+            json.dump({"clip": newer}, f)
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        dead_path = tmp_path / f"{dead.pid}.json"
+        with open(dead_path, "w") as f:
+            json.dump({"clip": older}, f)
+        other = ProgressRegistry(shared_dir=str(tmp_path))
+        assert other._read_shared("clip") == newer[1]
+        # Files of workers that are gone are removed.
+        assert not dead_path.exists()
+    finally:
+        child.kill()
+        child.wait()
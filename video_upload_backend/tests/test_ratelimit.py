@@ -0,0 +1,181 @@
+"""Bandwidth shaping: token buckets, middleware pacing, and limits shared by the workers."""
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from src.api import main, ratelimit
+from src.api.ratelimit import BandwidthShaper, BandwidthShapingMiddleware, TokenBucket
+
+MIB = 1024 * 1024
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_burst_then_debt(clock):
+    bucket = TokenBucket(MIB, burst_seconds=1.0)
+    assert bucket.burst == MIB
+    # A full bucket lets one burst through without waiting.
+    assert bucket.reserve(MIB) == 0.0
+    # Past the burst, the caller waits for the debt to be paid at the rate.
+    assert bucket.reserve(MIB // 2) == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(MIB, burst_seconds=1.0)
+    bucket.reserve(MIB)
+    clock.now += 0.25
+    assert bucket.reserve(MIB // 4) == 0.0
+    # A long idle period refills to the burst size, not beyond it.
+    clock.now += 100
+    assert bucket.reserve(MIB) == 0.0
+    assert bucket.reserve(MIB // 8) == pytest.approx(0.125)
+
+
+def test_bucket_minimum_burst_and_rate_change(clock):
+    bucket = TokenBucket(1024, burst_seconds=1.0)
+    assert bucket.burst == ratelimit._MIN_BURST_BYTES
+    bucket.set_rate(2 * MIB, burst_seconds=0.5)
+    assert bucket.burst == MIB
+    # Tokens saved at the old burst size are clamped to the new one.
+    assert bucket.tokens <= bucket.burst
+
+
+def _scope(client: str) -> dict:
+    return {"type": "http", "method": "POST", "path": "/upload", "headers": [], "client": (client, 1234)}
+
+
+async def _read_body(scope, receive, send):
+    while (await receive()).get("more_body"):
+        pass
+
+
+def _upload(middleware, client: str, chunks: int, chunk_size: int) -> None:
+    """Stream a body of chunks through the middleware."""
+    pending = [b"x" * chunk_size] * chunks
+
+    async def receive():
+        body = pending.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(pending)}
+
+    asyncio.run(middleware(_scope(client), receive, None))
+
+
+def test_middleware_paces_per_client():
+    shaper = BandwidthShaper(global_bps=0, per_client_bps=2 * MIB)
+    middleware = BandwidthShapingMiddleware(_read_body, shaper, [("POST", r"^/upload$")])
+    # 3.25 MiB against a 2 MiB burst at 2 MiB/s; the last chunk is only paid for on a
+    # further receive(), so the endpoint waits for about half a second.
+    started = time.monotonic()
+    _upload(middleware, "10.0.0.1", chunks=13, chunk_size=256 * 1024)
+    assert time.monotonic() - started >= 0.45
+    assert shaper.throttled_seconds == pytest.approx(0.5, abs=0.05)
+    # Another client has its own bucket.
+    throttled = shaper.throttled_seconds
+    _upload(middleware, "10.0.0.2", chunks=4, chunk_size=256 * 1024)
+    assert shaper.throttled_seconds == throttled
+
+
+def test_middleware_paces_all_clients_globally():
+    shaper = BandwidthShaper(global_bps=4 * MIB, per_client_bps=0)
+    middleware = BandwidthShapingMiddleware(_read_body, shaper, [("POST", r"^/upload$")])
+    _upload(middleware, "10.0.0.1", chunks=17, chunk_size=256 * 1024)
+    assert shaper.throttled_seconds == 0
+    # The second client draws from the bucket the first one emptied.
+    _upload(middleware, "10.0.0.2", chunks=5, chunk_size=256 * 1024)
+    assert shaper.throttled_seconds > 0
+
+
+def test_middleware_bypassed_when_disabled():
+    shaper = BandwidthShaper(global_bps=0, per_client_bps=0)
+    seen = []
+
+    async def endpoint(scope, receive, send):
+        seen.append(receive)
+
+    async def receive():  # pragma: no cover - not called
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    middleware = BandwidthShapingMiddleware(endpoint, shaper, [("POST", r"^/upload$")])
+    asyncio.run(middleware(_scope("10.0.0.1"), receive, None))
+    # Without limits, the endpoint gets the server's receive channel unwrapped.
+    assert seen == [receive]
+
+
+def test_limits_file_shared_between_workers(tmp_path):
+    path = str(tmp_path / "limits" / ".bandwidth.json")
+    answering = BandwidthShaper(limits_file=path)
+    other = BandwidthShaper(limits_file=path)
+    answering.publish(5 * MIB, MIB, {"ip:203.0.113.7": 3 * MIB})
+    with open(path) as f:
+        assert json.load(f)["global_bps"] == 5 * MIB
+    # The publishing worker does not reload its own write.
+    assert not answering.reload()
+
+    assert other.reload()
+    assert (other.global_bps, other.per_client_bps) == (5 * MIB, MIB)
+    assert other.rate_for("ip:203.0.113.7") == 3 * MIB
+    assert not other.reload()
+
+    # A malformed file leaves the limits in effect.
+    with open(path, "w") as f:
+        f.write("{not json")
+    os.utime(path, ns=(1, 1))
+    assert not other.reload()
+    assert other.global_bps == 5 * MIB
+
+
+def test_reload_loop_follows_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "UPLOAD_BANDWIDTH_RELOAD_SECONDS", 0.01)
+    path = str(tmp_path / ".bandwidth.json")
+    BandwidthShaper(limits_file=path).publish(MIB, 0, {})
+    follower = BandwidthShaper(limits_file=path)
+
+    async def scenario():
+        await follower.start_reloading()
+        # Existing limits are applied on start.
+        assert follower.global_bps == MIB
+        BandwidthShaper(limits_file=path).publish(2 * MIB, 0, {})
+        for _ in range(200):
+            if follower.global_bps == 2 * MIB:
+                break
+            await asyncio.sleep(0.01)
+        await follower.stop_reloading()
+
+    asyncio.run(scenario())
+    assert follower.global_bps == 2 * MIB
+
+
+def test_put_bandwidth_publishes_limits(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    shaper = ratelimit.get_bandwidth_shaper()
+    headers = {"X-Admin-Token": "secret"}
+    try:
+        response = client.put(
+            "/admin/bandwidth",
+            headers=headers,
+            json={"global_bytes_per_sec": 10 * MIB, "per_client_bytes_per_sec": 0, "client_overrides": {}},
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()["global_bytes_per_sec"] == 10 * MIB
+        with open(shaper.limits_file) as f:
+            assert json.load(f)["global_bps"] == 10 * MIB
+        assert client.get("/admin/bandwidth", headers=headers).json()["global_bytes_per_sec"] == 10 * MIB
+    finally:
+        shaper.configure(0, 0, {})
+        os.remove(shaper.limits_file)
@@ -0,0 +1,176 @@
+"""Stale part reaper: age thresholds, session re-adoption, expiry, orphaned records and markers, and the lock."""
+import dataclasses
+import fcntl
+import json
+import os
+import time
+
+import pytest
+
+from src.api import main
+from src.api.multipart_upload import MultipartUpload, MultipartUploadStore
+from src.api.recovery import REAPER_LOCK_NAME, PartReaper
+from src.api.resumable import ResumableSessionStore, UploadSession
+
+STALE_SECONDS = 60
+FUTURE = "2999-01-01T00:00:00"
+PAST = "2020-01-02T00:00:00"
+
+
+def _make(path, data=b"z" * 10, age: float = 0) -> str:
+    """Create a file last modified age seconds ago."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _age(path, age: float) -> None:
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def _part(directory, hex_char: str) -> str:
+    return os.path.join(directory, f".uploading_{hex_char * 32}.part")
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    return str(tmp_path / "upload")
+
+
+@pytest.fixture
+def reaper(upload_dir, tmp_path):
+    resumable = ResumableSessionStore(upload_dir)
+    multipart = MultipartUploadStore(upload_dir)
+    resumable.ensure_dirs()
+    multipart.ensure_dirs()
+    # The upload directory is listed again as a storage root; it is scanned once.
+    return PartReaper(upload_dir, [str(tmp_path / "disk1"), upload_dir + "/"], resumable, multipart, STALE_SECONDS)
+
+
+def _session(reaper, hex_char: str, expires_at: str = FUTURE, part_dir=None) -> UploadSession:
+    session = UploadSession(hex_char * 32, "r.mp4", 6, None, "2020-01-01T00:00:00", expires_at, part_dir)
+    with open(os.path.join(reaper.resumable_store.sessions_dir, f"{session.id}.json"), "w") as f:
+        json.dump(dataclasses.asdict(session), f)
+    return session
+
+
+def _multipart(reaper, hex_char: str, expires_at: str = FUTURE) -> MultipartUpload:
+    upload = MultipartUpload(hex_char * 32, "m.mp4", 6, 3, None, "2020-01-01T00:00:00", expires_at)
+    with open(os.path.join(reaper.multipart_store.state_dir, f"{upload.id}.json"), "w") as f:
+        json.dump(dataclasses.asdict(upload), f)
+    _make(os.path.join(reaper.multipart_store.state_dir, f"{upload.id}.parts", "1"), b"")
+    return upload
+
+
+def test_part_dirs_deduplicated(reaper, upload_dir, tmp_path):
+    assert reaper.part_dirs == [upload_dir, str(tmp_path / "disk1")]
+
+
+def test_only_stale_orphan_parts_reclaimed(reaper, upload_dir, tmp_path):
+    disk1 = str(tmp_path / "disk1")
+    stale = _make(_part(upload_dir, "a"), b"x" * 100, age=STALE_SECONDS + 10)
+    stale_on_root = _make(_part(disk1, "b"), b"x" * 50, age=STALE_SECONDS + 10)
+    # Another worker may still be writing a recent one.
+    fresh = _make(_part(disk1, "c"), age=STALE_SECONDS - 10)
+    # Only the top level is scanned, and only '.uploading_*.part' names are considered.
+    nested = _make(_part(os.path.join(upload_dir, "ab"), "d"), age=STALE_SECONDS + 10)
+    unrelated = _make(os.path.join(upload_dir, "keep.part"), age=STALE_SECONDS + 10)
+
+    result = reaper.sweep()
+    assert result["parts_reclaimed"] == 2 and result["bytes_reclaimed"] == 150
+    assert not os.path.exists(stale) and not os.path.exists(stale_on_root)
+    assert all(os.path.exists(path) for path in (fresh, nested, unrelated))
+    stats = reaper.stats()
+    assert stats["sweeps"] == 1 and stats["parts_reclaimed"] == 2 and stats["last_sweep_at"] is not None
+
+
+def test_live_session_part_is_adopted(reaper, upload_dir, tmp_path):
+    disk1 = str(tmp_path / "disk1")
+    session = _session(reaper, "a", part_dir=disk1)
+    part = _make(_part(disk1, "a"), b"abc", age=STALE_SECONDS * 100)
+    upload = _multipart(reaper, "b")
+    multipart_part = _make(_part(upload_dir, "b"), b"abcdef", age=STALE_SECONDS * 100)
+
+    result = reaper.sweep()
+    # However old, a '.part' file that backs an unexpired session is kept so the client can resume.
+    assert result["sessions_adopted"] == 2 and result["parts_reclaimed"] == 0
+    assert os.path.exists(part) and os.path.exists(multipart_part)
+    assert os.path.exists(os.path.join(reaper.resumable_store.sessions_dir, f"{session.id}.json"))
+    assert os.path.exists(os.path.join(reaper.multipart_store.state_dir, f"{upload.id}.parts", "1"))
+    assert reaper.stats()["sessions_adopted"] == 2
+
+
+def test_expired_sessions_reclaimed_once_stale(reaper, upload_dir):
+    session = _session(reaper, "a", expires_at=PAST)
+    part = _make(_part(upload_dir, "a"), b"x" * 40, age=STALE_SECONDS - 10)
+    record = os.path.join(reaper.resumable_store.sessions_dir, f"{session.id}.json")
+    # Expired but touched recently: a request may still be writing it.
+    assert reaper.sweep()["sessions_expired"] == 0
+    assert os.path.exists(part) and os.path.exists(record)
+
+    _age(part, STALE_SECONDS + 10)
+    _multipart(reaper, "b", expires_at=PAST)
+    multipart_part = _make(_part(upload_dir, "b"), b"x" * 60, age=STALE_SECONDS + 10)
+    result = reaper.sweep()
+    assert result["sessions_expired"] == 2 and result["bytes_reclaimed"] == 100
+    assert not os.path.exists(part) and not os.path.exists(record)
+    assert not os.path.exists(multipart_part)
+    assert os.listdir(reaper.multipart_store.state_dir) == []
+
+
+def test_records_without_part_orphaned_once_stale(reaper):
+    session = _session(reaper, "a")
+    record = os.path.join(reaper.resumable_store.sessions_dir, f"{session.id}.json")
+    assert reaper.sweep()["records_orphaned"] == 0
+    _age(record, STALE_SECONDS + 10)
+    upload = _multipart(reaper, "b")
+    _age(os.path.join(reaper.multipart_store.state_dir, f"{upload.id}.json"), STALE_SECONDS + 10)
+    assert reaper.sweep()["records_orphaned"] == 2
+    assert os.listdir(reaper.resumable_store.sessions_dir) == []
+    assert os.listdir(reaper.multipart_store.state_dir) == []
+
+
+def test_leftover_markers_and_temp_records(reaper):
+    state_dir = reaper.multipart_store.state_dir
+    sessions_dir = reaper.resumable_store.sessions_dir
+    stale_markers = os.path.join(state_dir, "f" * 32 + ".parts")
+    _make(os.path.join(stale_markers, "1"), b"")
+    _age(stale_markers, STALE_SECONDS + 10)
+    fresh_markers = os.path.join(state_dir, "e" * 32 + ".parts")
+    _make(os.path.join(fresh_markers, "1"), b"")
+    stale_tmp = _make(os.path.join(sessions_dir, "a" * 32 + ".json.tmp"), b"{", age=STALE_SECONDS + 10)
+    fresh_tmp = _make(os.path.join(state_dir, "b" * 32 + ".json.tmp"), b"{")
+    unreadable = _make(os.path.join(sessions_dir, "c" * 32 + ".json"), b"not json", age=STALE_SECONDS + 10)
+
+    reaper.sweep()
+    assert not os.path.exists(stale_markers) and not os.path.exists(stale_tmp)
+    assert os.path.exists(fresh_markers) and os.path.exists(fresh_tmp)
+    # Records that do not parse are left for an operator to look at.
+    assert os.path.exists(unreadable)
+
+
+def test_sweep_skipped_while_another_worker_holds_the_lock(reaper, upload_dir):
+    stale = _make(_part(upload_dir, "a"), age=STALE_SECONDS + 10)
+    fd = os.open(os.path.join(upload_dir, REAPER_LOCK_NAME), os.O_RDWR | os.O_CREAT)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        assert reaper.sweep() == {}
+        assert os.path.exists(stale) and reaper.sweeps == 0
+    finally:
+        os.close(fd)
+    assert reaper.sweep()["parts_reclaimed"] == 1
+
+
+def test_admin_sweep_and_health(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    stale = _make(_part(main.UPLOAD_DIR, "9"), b"x" * 7, age=main.part_reaper.stale_seconds + 10)
+    assert client.post("/admin/reaper/sweep").status_code == 401
+    result = client.post("/admin/reaper/sweep", headers={"X-Admin-Token": "secret"}).json()
+    assert result["parts_reclaimed"] == 1 and result["bytes_reclaimed"] == 7
+    assert not os.path.exists(stale)
+    stats = client.get("/health/reaper").json()
+    assert stats["parts_reclaimed"] >= 1 and main.UPLOAD_DIR in stats["directories"]
@@ -0,0 +1,86 @@
+"""Resumable upload sessions: offsets, bounds and completion."""
+import os
+
+import pytest
+
+OFFSET_CONTENT_TYPE = {"Content-Type": "application/offset+octet-stream"}
+
+
+@pytest.fixture
+def session(client):
+    """Create a 2500-byte session and return (upload id, data to send)."""
+    data = os.urandom(2500)
+    response = client.post("/uploads", json={"filename": "clip.mov", "size_bytes": len(data)})
+    assert response.status_code == 201, response.text
+    assert response.headers["Location"] == f"/uploads/{response.json()['upload_id']}"
+    return response.json()["upload_id"], data
+
+
+def patch(client, upload_id, offset, chunk, headers=OFFSET_CONTENT_TYPE):
+    return client.patch(f"/uploads/{upload_id}", content=chunk, headers={**headers, "Upload-Offset": str(offset)})
+
+
+def test_chunks_then_complete(client, session, stored_path):
+    upload_id, data = session
+    assert patch(client, upload_id, 0, data[:1000]).headers["Upload-Offset"] == "1000"
+    head = client.head(f"/uploads/{upload_id}")
+    assert head.headers["Upload-Offset"] == "1000" and head.headers["Upload-Length"] == "2500"
+    assert patch(client, upload_id, 1000, data[1000:]).status_code == 204
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 200, response.text
+    assert response.json()["size_bytes"] == len(data)
+    with open(stored_path(response.json()["saved_as"]), "rb") as f:
+        assert f.read() == data
+    # The session is gone once completed.
+    assert client.head(f"/uploads/{upload_id}").status_code == 404
+    assert client.post(f"/uploads/{upload_id}/complete").status_code == 404
+
+
+def test_offset_mismatch(client, session):
+    upload_id, data = session
+    patch(client, upload_id, 0, data[:1000])
+    # Replaying a chunk the server already has, and skipping ahead, are both rejected.
+    assert patch(client, upload_id, 0, data[:1000]).status_code == 409
+    assert patch(client, upload_id, 1500, data[1500:]).status_code == 409
+    assert client.head(f"/uploads/{upload_id}").headers["Upload-Offset"] == "1000"
+
+
+def test_chunk_past_declared_size(client, session):
+    upload_id, data = session
+    assert patch(client, upload_id, 0, data + b"x").status_code == 413
+
+
+def test_empty_chunk_keeps_offset(client, session):
+    upload_id, _ = session
+    response = patch(client, upload_id, 0, b"")
+    assert response.status_code == 204 and response.headers["Upload-Offset"] == "0"
+
+
+def test_wrong_content_type(client, session):
+    upload_id, data = session
+    assert patch(client, upload_id, 0, data, headers={"Content-Type": "application/octet-stream"}).status_code == 415
+
+
+def test_complete_before_all_bytes(client, session):
+    upload_id, data = session
+    patch(client, upload_id, 0, data[:-1])
+    assert client.post(f"/uploads/{upload_id}/complete").status_code == 409
+    patch(client, upload_id, len(data) - 1, data[-1:])
+    assert client.post(f"/uploads/{upload_id}/complete").status_code == 200
+
+
+def test_invalid_session_id(client):
+    assert client.head("/uploads/not-a-session").status_code == 404
+    assert patch(client, "0" * 32, 0, b"x").status_code == 404
+
+
+def test_declared_size_over_limit(client):
+    from src.api.main import MAX_FILE_SIZE_BYTES
+
+    assert client.post("/uploads", json={"filename": "x", "size_bytes": MAX_FILE_SIZE_BYTES + 1}).status_code == 413
+
+
+def test_delete(client, session):
+    upload_id, _ = session
+    assert client.delete(f"/uploads/{upload_id}").status_code == 204
+    assert client.head(f"/uploads/{upload_id}").status_code == 404
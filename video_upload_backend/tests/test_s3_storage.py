@@ -0,0 +1,229 @@
+"""S3 backend: SigV4 signing, single and multipart uploads, retries and presigned URLs, against s3_standin."""
+import asyncio
+import hashlib
+import os
+
+import httpx
+import pytest
+
+from src.api import main, s3_storage
+from src.api.layout import ShardLayout
+from src.api.s3_standin import create_app
+from src.api.s3_storage import MIN_PART_SIZE_BYTES, S3Storage, sigv4_signature
+from src.api.storage import StorageError
+
+MIB = 1024 * 1024
+ENDPOINT = "http://s3.test"
+SAVED_AS = "20261016T120000Z_" + "ab" * 16 + ".mp4"
+
+
+def test_sigv4_signature_matches_aws_example():
+    # The GET Object example of the AWS Signature Version 4 documentation.
+    headers = {
+        "host": "examplebucket.s3.amazonaws.com",
+        "range": "bytes=0-9",
+        "x-amz-content-sha256": hashlib.sha256(b"").hexdigest(),
+        "x-amz-date": "20130524T000000Z",
+    }
+    signed, signature = sigv4_signature(
+        "GET", "/test.txt", "", headers, hashlib.sha256(b"").hexdigest(), "20130524T000000Z", "us-east-1",
+        "wJalrXUtnFEMI/K7MDENG/bPxRfiCYEXAMPLEKEY",
+    )
+    assert signed == "host;range;x-amz-content-sha256;x-amz-date"
+    assert signature == "f0e8bdb87c964420e857bd35b5d6ed310bd44f0170aba48dd91039c6036bdb41"
+
+
+@pytest.fixture
+def s3_dir(tmp_path):
+    return tmp_path / "s3"
+
+
+def _storage(s3_dir, secret_key: str = "SK", **kwargs) -> S3Storage:
+    """An S3Storage talking to a signed s3_standin in-process."""
+    transport = httpx.ASGITransport(app=create_app(str(s3_dir), "AK", "SK"))
+    return S3Storage(
+        ENDPOINT, "videos", "AK", secret_key, prefix="media/", part_size=MIN_PART_SIZE_BYTES,
+        layout=ShardLayout("none", 1), transport=transport, **kwargs,
+    )
+
+
+async def _fetch(storage: S3Storage, url: str, **kwargs) -> httpx.Response:
+    async with httpx.AsyncClient(transport=storage._transport) as http:
+        return await http.get(url, **kwargs)
+
+
+def _upload(storage: S3Storage, data: bytes, chunk_size: int = MIB):
+    async def scenario():
+        writer = await storage.open_writer(SAVED_AS, "video/mp4")
+        for start in range(0, len(data), chunk_size):
+            await writer.write(data[start:start + chunk_size])
+        await writer.commit()
+        response = await _fetch(storage, storage.url(SAVED_AS))
+        await storage.close()
+        return writer, response
+
+    return asyncio.run(scenario())
+
+
+def _stored_files(s3_dir) -> list:
+    return sorted(
+        os.path.relpath(os.path.join(root, name), s3_dir) for root, _, names in os.walk(s3_dir) for name in names
+    )
+
+
+def test_small_object_single_put(s3_dir):
+    storage = _storage(s3_dir)
+    data = os.urandom(1000)
+    writer, response = _upload(storage, data)
+    assert writer.digest.sha256 == hashlib.sha256(data).hexdigest() and writer.size == len(data)
+    assert response.status_code == 200 and response.content == data
+    assert response.headers["content-type"] == "video/mp4"
+    # The key is the prefix plus the shard path of the saved name.
+    assert storage.key(SAVED_AS) == "media/ab/" + SAVED_AS
+    assert os.path.isfile(s3_dir / "videos" / "media" / "ab" / SAVED_AS)
+    stats = storage.stats()
+    assert (stats["objects_written"], stats["parts_uploaded"], stats["requests"]) == (1, 0, 1)
+
+
+def test_large_object_multipart(s3_dir):
+    storage = _storage(s3_dir, upload_concurrency=2)
+    data = os.urandom(2 * MIN_PART_SIZE_BYTES + 12345)
+    writer, response = _upload(storage, data)
+    assert response.content == data
+    assert writer.digest.sha256 == hashlib.sha256(data).hexdigest()
+    stats = storage.stats()
+    assert (stats["objects_written"], stats["parts_uploaded"]) == (1, 3)
+    assert stats["bytes_written"] == len(data)
+    # The assembled parts are gone; only the object and its content type remain.
+    assert _stored_files(s3_dir) == [f"videos/media/ab/{SAVED_AS}", f"videos/media/ab/{SAVED_AS}.content-type"]
+
+
+def test_ranges_and_conditions_through_presigned_url(s3_dir):
+    storage = _storage(s3_dir)
+    data = os.urandom(5000)
+    _upload(storage, data)
+
+    async def scenario():
+        url = storage.url(SAVED_AS)
+        ranged = await _fetch(storage, url, headers={"Range": "bytes=100-199"})
+        full = await _fetch(storage, url)
+        cached = await _fetch(storage, url, headers={"If-None-Match": full.headers["etag"]})
+        tampered = await _fetch(storage, url.replace("X-Amz-Signature=", "X-Amz-Signature=0"))
+        return ranged, cached, tampered
+
+    ranged, cached, tampered = asyncio.run(scenario())
+    assert ranged.status_code == 206 and ranged.content == data[100:200]
+    assert cached.status_code == 304
+    assert tampered.status_code == 403
+
+
+def test_wrong_secret_fails_and_aborts_multipart(s3_dir):
+    storage = _storage(s3_dir, secret_key="wrong")
+
+    async def scenario():
+        writer = await storage.open_writer(SAVED_AS, "video/mp4")
+        await writer.write(b"v" * 1000)
+        with pytest.raises(StorageError, match="SignatureDoesNotMatch"):
+            await writer.commit()
+        await storage.close()
+
+    asyncio.run(scenario())
+    assert storage.errors == 1 and storage.retries == 0
+    assert _stored_files(s3_dir) == []
+
+
+def test_failed_part_aborts_upload(s3_dir, monkeypatch):
+    storage = _storage(s3_dir, max_retries=0)
+    original = storage.upload_part
+
+    async def failing_part(key, upload_id, number, data):
+        if number == 2:
+            raise StorageError("S3 PUT failed: 400 InvalidArgument")
+        return await original(key, upload_id, number, data)
+
+    monkeypatch.setattr(storage, "upload_part", failing_part)
+
+    async def scenario():
+        writer = await storage.open_writer(SAVED_AS)
+        with pytest.raises(StorageError):
+            try:
+                for _ in range(3):
+                    await writer.write(os.urandom(MIN_PART_SIZE_BYTES))
+                await writer.commit()
+            except StorageError:
+                # The upload endpoints abort the writer when a write fails.
+                await writer.abort()
+                raise
+        await storage.close()
+
+    asyncio.run(scenario())
+    # Aborting removed the multipart upload and its parts; no object was written.
+    assert _stored_files(s3_dir) == []
+
+
+def test_put_file_multipart_removes_source(s3_dir, tmp_path):
+    storage = _storage(s3_dir)
+    data = os.urandom(MIN_PART_SIZE_BYTES + 1000)
+    src = tmp_path / "session.part"
+    src.write_bytes(data)
+
+    async def scenario():
+        await storage.put_file(str(src), SAVED_AS, content_type="video/mp4")
+        response = await _fetch(storage, storage.url(SAVED_AS))
+        await storage.close()
+        return response
+
+    assert asyncio.run(scenario()).content == data
+    assert not src.exists()
+    assert storage.stats()["parts_uploaded"] == 2
+
+
+def test_retries_server_errors_with_backoff(monkeypatch):
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds, *args, **kwargs):
+        delays.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(s3_storage.asyncio, "sleep", sleep)
+    statuses = [503, 500, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), headers={"ETag": '"abc"'})
+
+    storage = S3Storage(ENDPOINT, "videos", "AK", "SK", transport=httpx.MockTransport(handler), max_retries=2)
+
+    async def scenario():
+        await storage.put_object("key", memoryview(b"data"))
+        await storage.close()
+
+    asyncio.run(scenario())
+    assert delays == [0.2, 0.4]
+    assert (storage.requests, storage.retries, storage.errors) == (3, 2, 0)
+
+    statuses[:] = [503, 503, 503]
+    with pytest.raises(StorageError, match="503"):
+        asyncio.run(scenario())
+    assert storage.errors == 1
+
+
+def test_part_size_below_minimum_rejected():
+    with pytest.raises(ValueError):
+        S3Storage(ENDPOINT, "videos", "AK", "SK", part_size=MIB)
+
+
+def test_upload_and_video_redirect(client, s3_dir, monkeypatch):
+    storage = _storage(s3_dir)
+    monkeypatch.setattr(main, "storage", storage)
+    data = os.urandom(3000)
+    response = client.post("/upload/stream", files={"file": ("clip.mp4", data, "video/mp4")})
+    assert response.status_code == 200, response.text
+    saved_as = response.json()["saved_as"]
+    assert response.json()["sha256"] == hashlib.sha256(data).hexdigest()
+    redirect = client.get(f"/videos/{saved_as}", follow_redirects=False)
+    assert redirect.status_code == 307
+    location = redirect.headers["location"]
+    assert location.startswith(f"{ENDPOINT}/videos/media/") and "X-Amz-Signature=" in location
+    assert asyncio.run(_fetch(storage, location)).content == data
+    assert client.get("/videos/..%2Fx", follow_redirects=False).status_code == 404
@@ -0,0 +1,146 @@
+"""Upload admission scheduler: limits, round-robin grants across clients, and queue overflow."""
+import asyncio
+
+from src.api import scheduler as scheduler_module
+from src.api.scheduler import SchedulerBusy, UploadScheduler, UploadSchedulerMiddleware
+
+
+def test_defaults_cap_clients_and_bound_the_queue():
+    assert scheduler_module.UPLOAD_MAX_PER_CLIENT > 0
+    assert scheduler_module.UPLOAD_MAX_QUEUED > 0
+
+
+def test_round_robin_across_clients():
+    async def scenario():
+        scheduler = UploadScheduler(max_concurrent=1, max_per_client=0, max_queued=10, queue_timeout=5)
+        granted = [await scheduler.acquire("a", 0)]
+        order = []
+
+        async def wait(client, tag):
+            granted.append(await scheduler.acquire(client, 0))
+            order.append(tag)
+
+        # Client a queues three uploads before b and c queue one each.
+        waits = [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1")]
+        tasks = [asyncio.create_task(wait(client, tag)) for client, tag in waits]
+        await asyncio.sleep(0)
+        assert scheduler.queued == 5
+        for count in range(2, len(tasks) + 2):
+            # One slot: each release hands it to exactly one waiter.
+            scheduler.release(granted[-1])
+            while len(granted) < count:
+                await asyncio.sleep(0)
+        scheduler.release(granted[-1])
+        await asyncio.gather(*tasks)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(scenario())
+    # One grant per client per pass: a's backlog does not hold b and c back.
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+    assert scheduler.active == 0 and scheduler.queued == 0
+
+
+def test_per_client_cap_does_not_block_other_clients():
+    async def scenario():
+        scheduler = UploadScheduler(max_concurrent=0, max_per_client=2, max_queued=10, queue_timeout=5)
+        held = [await scheduler.acquire("a", 0) for _ in range(2)]
+        waiting = asyncio.create_task(scheduler.acquire("a", 0))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        # Another client is admitted while a's third upload waits.
+        other = await asyncio.wait_for(scheduler.acquire("b", 0), 1)
+        scheduler.release(held[0])
+        third = await asyncio.wait_for(waiting, 1)
+        for ticket in (held[1], other, third):
+            scheduler.release(ticket)
+        return scheduler
+
+    assert asyncio.run(scenario()).active == 0
+
+
+def test_queue_overflow_and_timeout_rejected():
+    async def scenario():
+        scheduler = UploadScheduler(max_concurrent=1, max_queued=1, queue_timeout=0.05)
+        ticket = await scheduler.acquire("a", 0)
+        waiting = asyncio.create_task(scheduler.acquire("b", 0))
+        await asyncio.sleep(0)
+        try:
+            await scheduler.acquire("c", 0)
+        except SchedulerBusy:
+            overflowed = True
+        else:  # pragma: no cover
+            overflowed = False
+        try:
+            await waiting
+        except SchedulerBusy:
+            timed_out = True
+        else:  # pragma: no cover
+            timed_out = False
+        scheduler.release(ticket)
+        return scheduler, overflowed, timed_out
+
+    scheduler, overflowed, timed_out = asyncio.run(scenario())
+    assert overflowed and timed_out
+    assert scheduler.rejected == 1 and scheduler.timed_out == 1
+    assert scheduler.queued == 0 and scheduler.active == 0
+
+
+def test_bytes_budget_admits_single_oversized_upload():
+    async def scenario():
+        scheduler = UploadScheduler(max_concurrent=0, max_inflight_bytes=100, max_queued=0)
+        await scheduler.acquire("a", 500)
+        try:
+            await scheduler.acquire("b", 1)
+        except SchedulerBusy:
+            return True
+        return False  # pragma: no cover
+
+    assert asyncio.run(scenario())
+
+
+def test_middleware_answers_429_with_retry_after_when_queue_full():
+    sent = []
+    release = asyncio.Event()
+
+    async def endpoint(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():  # pragma: no cover - the rejected request never reads
+        raise AssertionError("body read")
+
+    def scope(client):
+        return {
+            "type": "http",
+            "method": "POST",
+            "path": "/upload",
+            "headers": [(b"content-length", b"10")],
+            "client": (client, 1234),
+        }
+
+    async def scenario():
+        middleware = UploadSchedulerMiddleware(
+            endpoint,
+            UploadScheduler(max_concurrent=1, max_queued=1, queue_timeout=5),
+            routes=[("POST", r"^/upload$")],
+            retry_after=7,
+        )
+        admitted = asyncio.create_task(middleware(scope("10.0.0.1"), receive, lambda m: asyncio.sleep(0)))
+        queued = asyncio.create_task(middleware(scope("10.0.0.2"), receive, lambda m: asyncio.sleep(0)))
+        await asyncio.sleep(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope("10.0.0.3"), receive, send)
+        release.set()
+        await asyncio.gather(admitted, queued)
+        return middleware.scheduler
+
+    scheduler = asyncio.run(scenario())
+    start = sent[0]
+    assert start["status"] == 429
+    headers = dict(start["headers"])
+    assert headers[b"retry-after"] == b"7"
+    assert scheduler.rejected == 1 and scheduler.active == 0
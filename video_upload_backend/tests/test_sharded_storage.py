@@ -0,0 +1,183 @@
+"""Sharded storage: names steered to their root, placement policies, lookups and the upload endpoints."""
+import asyncio
+import errno
+import os
+import time
+
+import pytest
+
+from src.api import main
+from src.api.layout import ShardLayout
+from src.api.disk_space import DiskSpaceGuard
+from src.api.storage import PART_PREFIX, ShardedStorage
+
+UUID = "0123456789abcdef0123456789abcdef"
+SAVED_AS = f"20261016T120000Z_{UUID}.mp4"
+
+
+@pytest.fixture
+def roots(tmp_path):
+    return [str(tmp_path / f"disk{i}") for i in range(3)]
+
+
+def _sharded(roots, placement="round-robin", **kwargs) -> ShardedStorage:
+    storage = ShardedStorage(roots, ShardLayout("none", 0), placement, **kwargs)
+    storage.ensure_ready()
+    return storage
+
+
+def _pin_free(storage: ShardedStorage, free) -> None:
+    """Set the measured free space of the roots and keep choose_root() from measuring again."""
+    storage._free = list(free)
+    storage._free_at = time.monotonic() + 3600
+
+
+def test_steer_maps_name_to_each_root(roots):
+    storage = _sharded(roots)
+    for index in range(len(roots)):
+        steered = storage._steer(SAVED_AS, index)
+        assert storage.root_for(steered) is storage.roots[index]
+        # Only the first 8 hex digits of the uuid change; the rest of the name is kept.
+        assert steered[:17] == SAVED_AS[:17] and steered[25:] == SAVED_AS[25:]
+    home = storage._index_of(SAVED_AS)
+    assert storage._steer(SAVED_AS, home) == SAVED_AS
+
+
+def test_steer_near_the_top_of_the_uuid_range(roots):
+    storage = _sharded(roots)
+    name = "20261016T120000Z_ffffffff" + "0" * 24 + ".mp4"
+    for index in range(len(roots)):
+        steered = storage._steer(name, index)
+        assert storage._index_of(steered) == index
+        assert len(steered) == len(name)
+
+
+def test_names_without_uuid_hash_to_a_stable_root(roots):
+    storage = _sharded(roots)
+    assert storage._steer("legacy.mp4", 2) == "legacy.mp4"
+    assert storage.root_for("legacy.mp4") is storage.root_for("legacy.mp4")
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError, match="STORAGE_ROOTS"):
+        ShardedStorage([])
+    with pytest.raises(ValueError, match="STORAGE_PLACEMENT"):
+        ShardedStorage(["/tmp/a"], placement="random")
+
+
+def test_round_robin_placement(roots):
+    storage = _sharded(roots)
+    _pin_free(storage, [None] * 3)
+    chosen = [asyncio.run(storage.choose_root()) for _ in range(6)]
+    assert chosen == [0, 1, 2, 0, 1, 2]
+    assert storage.placed == [2, 2, 2]
+
+
+def test_least_busy_placement(roots):
+    storage = _sharded(roots, "least-busy")
+    _pin_free(storage, [None] * 3)
+    storage.roots[0].writes_in_flight = 2
+    storage.roots[1].writes_in_flight = 1
+    storage.roots[2].writes_in_flight = 2
+    assert asyncio.run(storage.choose_root()) == 1
+    # Equally busy roots are taken in turn.
+    storage.roots[1].writes_in_flight = 2
+    assert [asyncio.run(storage.choose_root()) for _ in range(3)] == [2, 0, 1]
+
+
+def test_least_used_placement(roots):
+    storage = _sharded(roots, "least-used")
+    _pin_free(storage, [10 ** 9, 5 * 10 ** 9, 2 * 10 ** 9])
+    assert asyncio.run(storage.choose_root()) == 1
+
+
+def test_full_roots_skipped_then_enospc(roots):
+    storage = _sharded(roots, "least-used", min_free_bytes=10 ** 9)
+    _pin_free(storage, [10 ** 8, 10 ** 8, 2 * 10 ** 9])
+    assert asyncio.run(storage.choose_root()) == 2
+    _pin_free(storage, [10 ** 8] * 3)
+    with pytest.raises(OSError) as excinfo:
+        asyncio.run(storage.choose_root())
+    assert excinfo.value.errno == errno.ENOSPC
+
+
+def test_free_space_refreshed_from_disk(roots):
+    storage = _sharded(roots, "least-used")
+    asyncio.run(storage.choose_root())
+    assert all(free is not None and free > 0 for free in storage._free)
+
+
+def _write(storage: ShardedStorage, data: bytes, staging_dir=None):
+    async def scenario():
+        writer = await storage.open_writer(SAVED_AS, "video/mp4", staging_dir)
+        await writer.write(data)
+        await writer.commit()
+        return writer.saved_as
+
+    return asyncio.run(scenario())
+
+
+def test_writer_lands_on_chosen_root(roots):
+    storage = _sharded(roots)
+    _pin_free(storage, [None] * 3)
+    names = [_write(storage, b"v" * (i + 1)) for i in range(3)]
+    for index, saved_as in enumerate(names):
+        path = storage.locate(saved_as)
+        assert path == os.path.join(roots[index], saved_as)
+        assert os.path.getsize(path) == index + 1
+    # No '.part' files are left behind.
+    assert not [name for root in roots for name in os.listdir(root) if name.startswith(PART_PREFIX)]
+    assert [root["objects_written"] for root in storage.stats()["roots"]] == [1, 1, 1]
+
+
+def test_staging_dir_pins_the_root(roots):
+    storage = _sharded(roots)
+    _pin_free(storage, [None] * 3)
+    saved_as = _write(storage, b"pinned", staging_dir=roots[2])
+    assert storage.locate(saved_as) == os.path.join(roots[2], saved_as)
+    # A completed session keeps the root its '.part' file is on; no new placement is made.
+    assert storage.root_for(asyncio.run(storage.assign_name(SAVED_AS, roots[1]))) is storage.roots[1]
+    assert storage.placed == [0, 0, 0]
+
+
+def test_locate_falls_back_to_other_roots(roots):
+    storage = _sharded(roots)
+    home = storage._index_of(SAVED_AS)
+    other = roots[(home + 1) % len(roots)]
+    # A file stored before STORAGE_ROOTS changed sits outside its current home root.
+    with open(os.path.join(other, SAVED_AS), "wb") as f:
+        f.write(b"moved")
+    assert storage.locate(SAVED_AS) == os.path.join(other, SAVED_AS)
+    asyncio.run(storage.delete(SAVED_AS))
+    assert storage.locate(SAVED_AS) is None
+
+
+@pytest.fixture
+def sharded_app(roots, monkeypatch):
+    storage = _sharded(roots)
+    monkeypatch.setattr(main, "storage", storage)
+    # As at startup: one guard per root, so space is reserved on the root the upload is placed on.
+    guards = {main.UPLOAD_DIR: main.disk_guard, **{root: DiskSpaceGuard(root) for root in roots}}
+    monkeypatch.setattr(main, "disk_guards", guards)
+    return storage
+
+
+def test_uploads_spread_over_roots(client, sharded_app, roots):
+    _pin_free(sharded_app, [None] * 3)
+    names = []
+    for i in range(3):
+        response = client.post("/upload/stream", files={"file": (f"{i}.mp4", b"x" * (i + 1), "video/mp4")})
+        assert response.status_code == 200, response.text
+        names.append(response.json()["saved_as"])
+    assert sorted(sharded_app._index_of(name) for name in names) == [0, 1, 2]
+    for i, saved_as in enumerate(names):
+        assert client.get(f"/videos/{saved_as}").content == b"x" * (i + 1)
+    roots_stats = client.get("/health/storage").json()["roots"]
+    assert [root["placed"] for root in roots_stats] == [1, 1, 1]
+
+
+def test_all_roots_full_answers_507(client, sharded_app):
+    sharded_app.min_free_bytes = 10 ** 9
+    _pin_free(sharded_app, [10 ** 8] * 3)
+    response = client.post("/upload/stream", files={"file": ("full.mp4", b"x", "video/mp4")})
+    assert response.status_code == 507
@@ -0,0 +1,172 @@
+"""Incremental multipart parsing (src/api/streaming.py) and POST /upload/stream."""
+import asyncio
+import os
+from typing import Iterable, List, Tuple
+
+import pytest
+from starlette.requests import Request
+
+from src.api.streaming import MultipartStreamError, iter_multipart
+
+BOUNDARY = "testboundary42"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def multipart_body(*parts: Tuple[str, str, bytes]) -> bytes:
+    """Build a body from (field name, filename or '', data) parts."""
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def request_for(chunks: Iterable[bytes], content_type: str = CONTENT_TYPE) -> Request:
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def parse(chunks: Iterable[bytes], content_type: str = CONTENT_TYPE) -> List[Tuple[str, str, bytes]]:
+    """Run iter_multipart and return (field name, filename, data) per part."""
+
+    async def run():
+        parts = []
+        async for kind, payload in iter_multipart(request_for(chunks, content_type)):
+            if kind == "part":
+                parts.append([payload.name, payload.filename, b""])
+            elif kind == "data":
+                parts[-1][2] += bytes(payload)
+        return [tuple(part) for part in parts]
+
+    return asyncio.run(run())
+
+
+def split(data: bytes, size: int) -> List[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_single_chunk():
+    data = os.urandom(1000)
+    assert parse([multipart_body(("file", "a.mp4", data))]) == [("file", "a.mp4", data)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 61])
+def test_boundary_split_across_chunks(size):
+    # Data containing boundary-like prefixes must survive every split of the delimiter.
+    data = b"\r\n--" + BOUNDARY.encode()[:-1] + b"x" + os.urandom(200) + b"\r\n-"
+    body = multipart_body(("title", "", b"hello"), ("file", "a.mp4", data))
+    assert parse(split(body, size)) == [("title", None, b"hello"), ("file", "a.mp4", data)]
+
+
+def test_every_split_point():
+    data = os.urandom(64)
+    body = multipart_body(("file", "a.mp4", data))
+    for cut in range(1, len(body)):
+        assert parse([body[:cut], body[cut:]]) == [("file", "a.mp4", data)], cut
+
+
+def test_empty_file_part():
+    assert parse([multipart_body(("file", "empty.mp4", b""))]) == [("file", "empty.mp4", b"")]
+
+
+def test_truncated_body():
+    body = multipart_body(("file", "a.mp4", os.urandom(100)))
+    with pytest.raises(MultipartStreamError):
+        parse([body[:-20]])
+
+
+@pytest.mark.parametrize("content_type", [
+    "multipart/form-data; boundary=otherboundary",
+    "multipart/form-data; boundary=",
+    f"multipart/form-data; boundary={BOUNDARY}x",
+])
+def test_boundary_not_matching_body(content_type):
+    with pytest.raises(MultipartStreamError):
+        parse([multipart_body(("file", "a.mp4", b"x"))], content_type)
+
+
+@pytest.mark.parametrize("delimiter", [f"--{BOUNDARY}XX\r\n", f"--{BOUNDARY}", f"-{BOUNDARY}\r\n"])
+def test_malformed_delimiter_line(delimiter):
+    body = multipart_body(("file", "a.mp4", b"x")).replace(f"--{BOUNDARY}\r\n".encode(), delimiter.encode(), 1)
+    with pytest.raises(MultipartStreamError):
+        parse([body])
+
+
+def test_preamble_before_first_boundary():
+    with pytest.raises(MultipartStreamError):
+        parse([b"junk\r\n" + multipart_body(("file", "a.mp4", b"x"))])
+
+
+@pytest.mark.parametrize("cut", [
+    b"\r\n--" + BOUNDARY.encode() + b"--",  # final part data without its delimiter
+    b"--\r\n",                               # closing delimiter without the trailing '--'
+    b"-\r\n",                                # closing delimiter cut inside the '--'
+])
+def test_truncated_final_part(cut):
+    data = os.urandom(100)
+    body = multipart_body(("title", "", b"hello"), ("file", "a.mp4", data))
+    body = body[:body.rindex(cut)]
+    events = []
+
+    async def run():
+        async for kind, payload in iter_multipart(request_for(split(body, 37))):
+            events.append(kind)
+
+    with pytest.raises(MultipartStreamError):
+        asyncio.run(run())
+    # The complete first part was delivered; the truncated one never got its "end" event.
+    assert events[:3] == ["part", "data", "end"] and events[3] == "part"
+    assert events.count("end") == 1
+
+
+def test_missing_content_disposition():
+    body = f"--{BOUNDARY}\r\nContent-Type: video/mp4\r\n\r\ndata\r\n--{BOUNDARY}--\r\n".encode()
+    with pytest.raises(MultipartStreamError):
+        parse([body])
+
+
+def test_garbage_body():
+    with pytest.raises(MultipartStreamError):
+        parse([b"this is not multipart at all"])
+
+
+@pytest.mark.parametrize("content_type", ["", "application/json", "multipart/form-data"])
+def test_bad_content_type(content_type):
+    with pytest.raises(MultipartStreamError):
+        parse([multipart_body(("file", "a.mp4", b"x"))], content_type)
+
+
+def test_oversized_part_headers():
+    body = f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"\r\nX-Pad: {'a' * 20000}\r\n\r\n".encode()
+    with pytest.raises(MultipartStreamError):
+        parse([body])
+
+
+def test_upload_stream_stores_file(client, stored_path):
+    data = os.urandom(300 * 1024)
+    response = client.post(
+        "/upload/stream",
+        content=iter(split(multipart_body(("file", "clip.mp4", data)), 4093)),
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+    assert response.status_code == 200, response.text
+    with open(stored_path(response.json()["saved_as"]), "rb") as f:
+        assert f.read() == data
+
+
+def test_upload_stream_rejects_malformed_body(client):
+    response = client.post("/upload/stream", content=b"garbage", headers={"Content-Type": CONTENT_TYPE})
+    assert response.status_code == 400
+
+
+def test_upload_stream_without_file_part(client):
+    response = client.post(
+        "/upload/stream", content=multipart_body(("title", "", b"x")), headers={"Content-Type": CONTENT_TYPE}
+    )
+    assert response.status_code == 400